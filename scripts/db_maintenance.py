@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""物品数据库维护脚本
+
+手动执行后台维护任务 (历史归档、软删除清理、全文索引合并、空闲页回收),
+并输出每个步骤的耗时。默认参数来自配置 (.env)。
+
+用法:
+    python scripts/db_maintenance.py all
+    python scripts/db_maintenance.py tombstones --grace-days 7
+    python scripts/db_maintenance.py fts-optimize
+    python scripts/db_maintenance.py vacuum-convert   # 旧数据库一次性切换到增量 auto_vacuum
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加 src 到 sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core.database import get_database
+from core.db_sharding import ShardedItemDatabase
+from core.item_maintenance import MaintenanceScheduler
+
+# 命令 -> 调度器步骤名
+ACTION_STEPS = {
+    'retention': 'history_retention',
+    'tombstones': 'tombstone_purge',
+    'fts-merge': 'fts_merge',
+    'vacuum': 'vacuum',
+}
+
+
+def _format_result(result) -> str:
+    """把步骤结果转换为可读文本"""
+    if hasattr(result, 'rows_archived'):
+        return f"扫描 {result.items_scanned} 个物品, 归档 {result.rows_archived} 条历史"
+    if isinstance(result, int):
+        return f"{result}"
+    return "完成"
+
+
+def run(action: str, grace_days=None, fts_pages=None):
+    """执行维护并打印耗时"""
+    db = get_database()
+    scheduler = MaintenanceScheduler.from_config(db)
+    if grace_days is not None:
+        scheduler.tombstone_grace_days = grace_days
+    if fts_pages is not None:
+        scheduler.fts_merge_pages = fts_pages
+
+    print("=" * 60)
+    print(f"数据库维护: {db.shard_dir if isinstance(db, ShardedItemDatabase) else db.db_path}")
+    print("=" * 60)
+
+    total_start = time.perf_counter()
+    if action == 'fts-optimize':
+        start = time.perf_counter()
+        scheduler.optimize_fts()
+        print(f"  fts_optimize: 完成 ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    elif action == 'vacuum-convert':
+        start = time.perf_counter()
+        converted = scheduler.convert_to_incremental()
+        print(f"  vacuum_convert: 切换 {converted} 个数据库 ({(time.perf_counter() - start) * 1000:.1f} ms)")
+    else:
+        only = None if action == 'all' else [ACTION_STEPS[action]]
+        for step in scheduler.run_once(only=only):
+            print(f"  {step.name}: {_format_result(step.result)} ({step.seconds * 1000:.1f} ms)")
+
+    print(f"\n总耗时: {(time.perf_counter() - total_start) * 1000:.1f} ms")
+    db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='物品数据库维护工具')
+    parser.add_argument('action', choices=['all', 'fts-optimize', 'vacuum-convert', *ACTION_STEPS],
+                        help='操作类型 (all 依次执行 retention / tombstones / fts-merge / vacuum)')
+    parser.add_argument('--grace-days', type=int, help='软删除物品保留天数 (覆盖 TOMBSTONE_GRACE_DAYS)')
+    parser.add_argument('--fts-pages', type=int, help='fts-merge 每次最多处理的页数')
+
+    args = parser.parse_args()
+    run(args.action, grace_days=args.grace_days, fts_pages=args.fts_pages)
+
+
+if __name__ == '__main__':
+    main()
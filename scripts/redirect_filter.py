@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""回退预判过滤器脚本
+
+从 interaction_logs.db 挖掘被 calendar_agent 回退的消息, 生成过滤器文件;
+以及统计回退耗时和过滤器节省的耗时。
+
+用法:
+    python scripts/redirect_filter.py build
+    python scripts/redirect_filter.py build --min-support 5 --dry-run
+    python scripts/redirect_filter.py report --since 2025-11-01
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加 src 到 sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import config
+from core.keyword_router import KeywordRouter
+from core.redirect_filter import RedirectFilter, load_calendar_outcomes, redirect_savings_report
+
+
+def _check_db(db_path: Path):
+    if not db_path.exists():
+        print(f"❌ 交互日志不存在: {db_path}")
+        sys.exit(1)
+
+
+def build(db_path: Path, output: Path, since=None, min_support=3, dry_run=False):
+    """生成过滤器"""
+    _check_db(db_path)
+    outcomes = load_calendar_outcomes(db_path, since)
+
+    redirect_filter = RedirectFilter.build(
+        outcomes['redirected'],
+        outcomes['accepted'],
+        min_support=min_support,
+        # 日历关键词本身不能作为负向片段
+        protected=KeywordRouter.CALENDAR_ACTION_KEYWORDS + KeywordRouter.CALENDAR_TIME_EXPRESSIONS
+    )
+
+    metadata = redirect_filter.metadata
+    print("=" * 60)
+    print("回退预判过滤器")
+    print("=" * 60)
+    print(f"\n📊 样本: 回退 {metadata['redirected']} 条, 日历成功处理 {metadata['accepted']} 条")
+    print(f"  整句模式: {metadata['message_patterns']}")
+    for n, count in metadata['ngram_patterns'].items():
+        print(f"  {n} 字片段模式: {count}")
+
+    # 成功处理过的消息不能被过滤 (片段模式只来自回退消息, 这里再确认一次)
+    blocked = [message for message in outcomes['accepted'] if redirect_filter.check(message)]
+    if blocked:
+        print(f"\n⚠️  {len(blocked)} 条日历消息会被过滤, 例如: {blocked[:3]}")
+
+    if dry_run:
+        print("\n(dry-run, 未保存过滤器)")
+        return
+
+    redirect_filter.save(output)
+    print(f"\n✓ 过滤器 v{redirect_filter.version} 已保存到 {output} (重启服务后生效)")
+
+
+def show_report(db_path: Path, since=None):
+    """显示回退耗时和节省情况"""
+    _check_db(db_path)
+    report = redirect_savings_report(db_path, since)
+
+    def fmt_ms(value):
+        return f"{value:.0f} ms" if value is not None else "N/A"
+
+    print("=" * 60)
+    print("关键词路由回退统计")
+    print("=" * 60)
+    accepted, redirected, filtered = report['calendar_accepted'], report['calendar_redirected'], report['filtered']
+    print(f"\n📅 关键词 → calendar_agent:")
+    print(f"  正常处理: {accepted['count']} 次, 平均 {fmt_ms(accepted['avg_ms'])}")
+    print(f"  回退到 Supervisor: {redirected['count']} 次, 平均 {fmt_ms(redirected['avg_ms'])}")
+    if report['redirect_rate_without_filter'] is not None:
+        print(f"  不使用过滤器时的回退率: {report['redirect_rate_without_filter']:.2%}")
+
+    print(f"\n🚫 回退预判过滤:")
+    print(f"  跳过 calendar_agent: {filtered['count']} 次, 平均 {fmt_ms(filtered['avg_ms'])}")
+    if report['filter_hit_rate'] is not None:
+        print(f"  预判命中率 (过滤 / (过滤 + 仍回退)): {report['filter_hit_rate']:.2%}")
+    if report['saved_ms_total'] is not None:
+        print(f"  每次节省: {fmt_ms(report['saved_ms_per_request'])}")
+        print(f"  累计节省: {report['saved_ms_total'] / 1000:.1f} s")
+    print("=" * 60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='回退预判过滤器工具')
+    parser.add_argument('action', choices=['build', 'report'], help='操作类型')
+    parser.add_argument('--db', type=Path, default=config.DATA_DIR / 'interaction_logs.db', help='交互日志数据库')
+    parser.add_argument('--output', type=Path, default=config.REDIRECT_FILTER_PATH, help='过滤器输出路径 (build)')
+    parser.add_argument('--since', help='只使用该日期之后的日志 (YYYY-MM-DD)')
+    parser.add_argument('--min-support', type=int, default=3, help='片段模式至少出现在多少条回退消息中 (build)')
+    parser.add_argument('--dry-run', action='store_true', help='只统计, 不保存过滤器 (build)')
+
+    args = parser.parse_args()
+
+    if args.action == 'build':
+        build(args.db, args.output, args.since, args.min_support, args.dry_run)
+
+    elif args.action == 'report':
+        show_report(args.db, args.since)
+
+
+if __name__ == '__main__':
+    main()
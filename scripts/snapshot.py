@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""本地数据快照脚本
+
+服务运行中也可以执行, 导出物品、笔记、交互日志数据库和 Qdrant 本地存储。
+
+用法:
+    python scripts/snapshot.py create
+    python scripts/snapshot.py list
+    python scripts/snapshot.py verify data/snapshots/youyou-snapshot-xxx.tar.gz
+"""
+
+import argparse
+import sys
+from pathlib import Path
+
+# 添加 src 到 sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from core.snapshot import create_snapshot, list_snapshots, verify_snapshot
+
+
+def show_create(output_dir=None, keep=None):
+    """导出快照并显示清单"""
+    result = create_snapshot(output_dir=output_dir, keep=keep)
+
+    print("=" * 60)
+    print(f"快照: {result['archive']}")
+    print("=" * 60)
+    for entry in result['manifest']['files']:
+        version = f", v{entry['user_version']}" if 'user_version' in entry else ""
+        print(f"  {entry['name']}: {entry['bytes']} 字节{version} ({entry['seconds'] * 1000:.1f} ms)")
+    print(f"\n✓ 共 {len(result['manifest']['files'])} 个文件, 归档 {result['bytes']} 字节, 耗时 {result['seconds']:.2f}s")
+
+
+def show_list(output_dir=None):
+    """列出已有快照"""
+    snapshots = list_snapshots(output_dir)
+    if not snapshots:
+        print("暂无快照")
+        return
+    for snapshot in snapshots:
+        print(f"  {snapshot['archive']}  ({snapshot['bytes']} 字节)")
+
+
+def show_verify(archive: Path):
+    """校验快照"""
+    result = verify_snapshot(archive)
+    if result['ok']:
+        print(f"✓ 校验通过: {len(result['manifest']['files'])} 个文件, 创建于 {result['manifest']['created_at']}")
+    else:
+        for error in result['errors']:
+            print(f"❌ {error}")
+        sys.exit(1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='本地数据快照工具')
+    parser.add_argument('action', choices=['create', 'list', 'verify'], help='操作类型')
+    parser.add_argument('archive', nargs='?', type=Path, help='要校验的快照文件 (verify)')
+    parser.add_argument('--output-dir', type=Path, help='快照目录 (默认 SNAPSHOT_DIR)')
+    parser.add_argument('--keep', type=int, help='保留最近 N 个快照 (默认 SNAPSHOT_KEEP)')
+
+    args = parser.parse_args()
+
+    if args.action == 'create':
+        show_create(args.output_dir, args.keep)
+
+    elif args.action == 'list':
+        show_list(args.output_dir)
+
+    elif args.action == 'verify':
+        if not args.archive:
+            print("❌ 请指定快照文件: verify <archive>")
+            return
+        show_verify(args.archive)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""把单库 items.db 按用户拆分为分片
+
+启用 ITEMS_SHARDING_ENABLED 之前执行一次。源库只读取不修改, 确认分片无误后可自行删除。
+
+用法:
+    python scripts/split_items_db.py
+    python scripts/split_items_db.py --source data/items.db --shard-dir data/items_shards
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加 src 到 sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import config
+from core.db_sharding import shard_filename, split_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description='物品数据库分片拆分工具')
+    parser.add_argument('--source', type=Path, default=config.ITEMS_DB_PATH, help='源数据库路径')
+    parser.add_argument('--shard-dir', type=Path, default=config.ITEMS_SHARD_DIR, help='分片目录')
+
+    args = parser.parse_args()
+
+    if not args.source.exists():
+        print(f"❌ 源数据库不存在: {args.source}")
+        return
+
+    print("=" * 60)
+    print(f"拆分 {args.source} -> {args.shard_dir}")
+    print("=" * 60)
+
+    start = time.perf_counter()
+    copied = split_database(args.source, args.shard_dir)
+    for user_id, count in copied.items():
+        print(f"  {user_id}: {count} 个物品 -> {shard_filename(user_id)}")
+
+    print(f"\n✓ 拆分 {len(copied)} 个用户, 耗时 {time.perf_counter() - start:.2f}s")
+    print("  设置 ITEMS_SHARDING_ENABLED=true 后重启服务生效")
+
+
+if __name__ == '__main__':
+    main()
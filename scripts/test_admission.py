@@ -0,0 +1,283 @@
+"""测试请求准入控制
+
+验证每个 Agent 的并发上限、FIFO 排队、队列已满 (429) 和排队超时 (503) 的快速拒绝,
+异步槽位与取消, router 模式下子 Agent 占用自己的槽位, /chat/message 返回 Retry-After,
+以及会话历史写入 Zep 的积压上限。
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造模型, 不会调用
+
+import core.admission as admission_module
+from core.admission import AdmissionController, AdmissionRejected, parse_agent_limits
+
+
+def _hold(controller: AdmissionController, agent: str, release: threading.Event) -> threading.Thread:
+    """在后台线程中占用一个槽位, 直到 release 被设置"""
+    acquired = threading.Event()
+
+    def run():
+        with controller.slot(agent):
+            acquired.set()
+            release.wait()
+
+    thread = threading.Thread(target=run)
+    thread.start()
+    assert acquired.wait(1)
+    return thread
+
+
+def test_limits_and_rejections():
+    """超过并发数时排队; 队列已满返回 429; 排队超时返回 503; 不同 Agent 互不影响"""
+    controller = AdmissionController(max_concurrent=2, max_queue=1, queue_timeout=0.2)
+    release = threading.Event()
+    holders = [_hold(controller, "note_agent", release) for _ in range(2)]
+
+    # 排队超时
+    start = time.monotonic()
+    try:
+        with controller.slot("note_agent"):
+            raise AssertionError("不应获得槽位")
+    except AdmissionRejected as e:
+        assert e.status_code == 503 and e.retry_after >= 1
+    assert time.monotonic() - start >= 0.2
+
+    # 队列已满: 一个请求在排队, 下一个立即拒绝
+    controller.queue_timeout = 5
+    waiter_done = threading.Event()
+
+    def wait_in_queue():
+        with controller.slot("note_agent"):
+            waiter_done.set()
+
+    queued = threading.Thread(target=wait_in_queue)
+    queued.start()
+    while controller.stats()["note_agent"]["queue_depth"] == 0:
+        time.sleep(0.01)
+    start = time.monotonic()
+    try:
+        with controller.slot("note_agent"):
+            raise AssertionError("不应获得槽位")
+    except AdmissionRejected as e:
+        assert e.status_code == 429
+        print(f"  429: {e} (Retry-After {e.retry_after}s)")
+    assert time.monotonic() - start < 0.1
+
+    # 其他 Agent 有独立的槽位
+    with controller.slot("calendar_agent"):
+        pass
+
+    # 释放后排队的请求获得槽位
+    time.sleep(0.05)
+    release.set()
+    for thread in holders + [queued]:
+        thread.join(1)
+    assert waiter_done.is_set()
+
+    stats = controller.stats()["note_agent"]
+    print(f"  {stats}")
+    assert stats["active"] == 0 and stats["queue_depth"] == 0
+    assert stats["admitted"] == 3 and stats["queued"] == 2
+    assert stats["rejected_queue_full"] == 1 and stats["rejected_timeout"] == 1
+    assert stats["wait_seconds_max"] >= 0.05 and stats["avg_call_seconds"] > 0
+
+
+def test_async_slots():
+    """协程排队时不阻塞事件循环, 同时执行数不超过上限; 排队中被取消时移出队列"""
+    controller = AdmissionController(max_concurrent=3, max_queue=20, queue_timeout=5)
+    running = 0
+    peak = 0
+
+    async def call(i):
+        nonlocal running, peak
+        async with controller.aslot("chat_agent"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.02)
+            running -= 1
+        return i
+
+    async def run_all():
+        return await asyncio.gather(*(call(i) for i in range(12)))
+
+    assert asyncio.run(run_all()) == list(range(12))
+    stats = controller.stats()["chat_agent"]
+    print(f"  峰值并发 {peak}, 排队 {stats['queued']}, 平均等待 {stats['wait_seconds_avg']}s")
+    assert peak == 3 and stats["queued"] == 9 and stats["active"] == 0
+
+    async def cancel_queued():
+        release = asyncio.Event()
+
+        async def hold():
+            async with controller.aslot("chat_agent"):
+                await release.wait()
+
+        holders = [asyncio.create_task(hold()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(call(99))
+        await asyncio.sleep(0.01)
+        assert controller.stats()["chat_agent"]["queue_depth"] == 1
+        waiter.cancel()
+        await asyncio.sleep(0)
+        assert controller.stats()["chat_agent"]["queue_depth"] == 0
+        release.set()
+        await asyncio.gather(*holders)
+
+    asyncio.run(cancel_queued())
+    assert controller.stats()["chat_agent"]["active"] == 0
+
+
+def test_parse_agent_limits():
+    """单独的并发限制覆盖默认值"""
+    assert parse_agent_limits("note_agent=2, supervisor=8,bad") == {"note_agent": 2, "supervisor": 8}
+    controller = AdmissionController(max_concurrent=4, agent_limits={"note_agent": 1})
+    with controller.slot("note_agent"), controller.slot("item_agent"):
+        stats = controller.stats()
+    assert stats["note_agent"]["max_concurrent"] == 1 and stats["item_agent"]["max_concurrent"] == 4
+
+
+def test_chat_message_rejected():
+    """Agent 饱和时 /chat/message 快速返回 429 和 Retry-After, 快速路径不受影响"""
+    import core.database as database
+    import core.interaction_logger as interaction_logger_module
+    import core.response_cache as response_cache_module
+    from core.database import ItemDatabase
+    from core.interaction_logger import InteractionLogger
+    import server
+
+    data_dir = Path(tempfile.mkdtemp())
+    previous = (database._db_instance, interaction_logger_module._interaction_logger,
+                response_cache_module._cache, response_cache_module._cache_loaded,
+                admission_module._controller, admission_module._controller_loaded)
+    database._db_instance = ItemDatabase(data_dir / "items.db")
+    database._db_instance.remember_item("钥匙", "门口")  # 快速路径只处理已记录的物品
+    interaction_logger_module._interaction_logger = InteractionLogger(data_dir)
+    response_cache_module._cache, response_cache_module._cache_loaded = None, True
+    controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1)
+    admission_module._controller, admission_module._controller_loaded = controller, True
+    try:
+        client = server.app.test_client()
+        with controller.slot("note_agent"):
+            result = client.post("/api/v1/chat/message", json={"message": "#note 写周报"})
+            print(f"  {result.status_code} Retry-After={result.headers.get('Retry-After')} {result.get_json()}")
+            assert result.status_code == 429
+            assert int(result.headers["Retry-After"]) >= 1
+            assert result.get_json()["retry_after"] == int(result.headers["Retry-After"])
+
+            # 物品快速路径不调用 LLM, 不受准入控制
+            assert client.post("/api/v1/chat/message", json={"message": "钥匙放在书桌上"}).status_code == 200
+
+        stats = client.get("/api/v1/system/admission").get_json()
+        assert stats["enabled"] and stats["agents"]["note_agent"]["rejected_queue_full"] == 1
+        assert "pending" in stats["zep_persist"]
+
+        assert len(interaction_logger_module._interaction_logger.query(status="rejected")) == 1
+    finally:
+        database._db_instance.close()
+        (database._db_instance, interaction_logger_module._interaction_logger,
+         response_cache_module._cache, response_cache_module._cache_loaded,
+         admission_module._controller, admission_module._controller_loaded) = previous
+
+
+def test_router_mode_sub_agent_slots():
+    """router 模式: 路由调用占用 supervisor 槽位, 选出的子 Agent 占用自己的槽位"""
+    import server
+    from agents.note_agent import note_agent
+    from agents.supervisor.agent import SupervisorRouter
+    from config import config
+    from core.response_types import AgentResponse
+    from test_supervisor_router import FixedDecisionModel
+
+    controller = AdmissionController(max_concurrent=1, max_queue=0, queue_timeout=1)
+    active = []
+
+    def invoke(query):
+        stats = controller.stats()
+        active.append((stats["supervisor"]["active"], stats["note_agent"]["active"]))
+        return AgentResponse(success=True, agent="note_agent", message="已保存", actions=[])
+
+    previous = (config.SUPERVISOR_MODE, server.supervisor_router, note_agent.invoke,
+                admission_module._controller, admission_module._controller_loaded)
+    config.SUPERVISOR_MODE = "router"
+    server.supervisor_router = SupervisorRouter(FixedDecisionModel("note_agent", "写周报"))
+    note_agent.invoke = invoke
+    admission_module._controller, admission_module._controller_loaded = controller, True
+    messages = [{"role": "user", "content": "写周报"}]
+    try:
+        assert server._invoke_supervisor(messages).message == "已保存"
+        assert active == [(0, 1)]  # 子 Agent 执行时已释放 supervisor 槽位
+
+        # note_agent 饱和时, 经 Supervisor 路由的请求同样被拒绝
+        with controller.slot("note_agent"):
+            try:
+                server._invoke_supervisor(messages)
+                assert False, "应当被拒绝"
+            except AdmissionRejected as e:
+                assert e.status_code == 429
+        stats = controller.stats()
+        print(f"  {[(name, s['rejected_queue_full']) for name, s in stats.items()]}")
+        assert stats["note_agent"]["rejected_queue_full"] == 1 and stats["supervisor"]["active"] == 0
+    finally:
+        (config.SUPERVISOR_MODE, server.supervisor_router, note_agent.invoke,
+         admission_module._controller, admission_module._controller_loaded) = previous
+
+
+def test_bounded_zep_persist():
+    """写入 Zep 使用固定线程数; 积压超过上限时丢弃, 内存历史照常更新"""
+    import core.session_history as session_history_module
+    from core.session_history import SessionHistoryManager
+
+    release = threading.Event()
+    threads = set()
+
+    class BlockingZep:
+        def add_interaction(self, **kwargs):
+            threads.add(threading.current_thread().name)
+            release.wait(2)
+
+    previous = session_history_module.get_zep_memory
+    session_history_module.get_zep_memory = lambda: BlockingZep()
+    try:
+        manager = SessionHistoryManager(max_history_length=10, refresh_interval=0,
+                                        persist_workers=1, max_pending_persist=3)
+        for i in range(5):
+            manager.add_interaction("u", f"问题 {i}", f"回答 {i}")
+        stats = manager.persist_stats()
+        print(f"  {stats}")
+        assert stats["pending"] == 3 and stats["dropped"] == 2
+        assert len(manager._histories["u"]) == 10
+
+        release.set()
+        manager._persist_executor.shutdown(wait=True)
+        assert manager.persist_stats()["pending"] == 0
+        assert len(threads) == 1
+    finally:
+        session_history_module.get_zep_memory = previous
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 准入控制测试")
+    print("=" * 80)
+
+    test_limits_and_rejections()
+    test_async_slots()
+    test_parse_agent_limits()
+    test_chat_message_rejected()
+    test_router_mode_sub_agent_slots()
+    test_bounded_zep_persist()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""测试 Aho–Corasick 自动机和关键词路由的单次扫描
+
+验证重叠匹配和位置、与逐个关键词子串查找的结果一致,
+以及 KeywordRouter 返回的匹配位置。
+"""
+import random
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.aho_corasick import AhoCorasick, KeywordMatch
+from core.keyword_router import KeywordRouter
+
+
+def _brute_force(keywords, text):
+    """逐个关键词查找所有出现位置"""
+    found = set()
+    for keyword, value in keywords:
+        start = text.find(keyword)
+        while start != -1:
+            found.add((start, start + len(keyword), keyword, value))
+            start = text.find(keyword, start + 1)
+    return found
+
+
+def test_overlapping_matches():
+    """重叠和嵌套的关键词都能匹配, 并给出位置"""
+    automaton = AhoCorasick([("下周", "时间"), ("下下周", "时间"), ("周一", "时间"), ("提醒", "动作")])
+    matches = list(automaton.find_all("下下周一提醒我"))
+    print(f"  {matches}")
+    assert matches == [
+        KeywordMatch(0, 3, "下下周", "时间"),
+        KeywordMatch(1, 3, "下周", "时间"),
+        KeywordMatch(2, 4, "周一", "时间"),
+        KeywordMatch(4, 6, "提醒", "动作"),
+    ]
+    assert list(automaton.find_all("")) == []
+
+
+def test_matches_brute_force():
+    """随机关键词和文本, 结果与逐个子串查找一致"""
+    rng = random.Random(42)
+    alphabet = "abc天明提"
+    for _ in range(200):
+        keywords = [("".join(rng.choices(alphabet, k=rng.randint(1, 4))), rng.randint(0, 2))
+                    for _ in range(rng.randint(1, 12))]
+        text = "".join(rng.choices(alphabet, k=rng.randint(0, 40)))
+        automaton = AhoCorasick(keywords)
+        assert set(automaton.find_all(text)) == _brute_force(set(keywords), text), (keywords, text)
+
+
+def test_router_match_positions():
+    """路由结果带有每个关键词的类别和位置"""
+    message = "明天下午3点提醒我开会"
+    result = KeywordRouter.match(message)
+    assert result.matched and result.target_agent == "calendar_agent"
+    assert result.matched_keywords == ["动作:提醒", "时间:明天", "时间:下午", r"时间点:\d+[点時时]"]
+
+    spans = [(m.value, message[m.start:m.end]) for m in result.matches]
+    print(f"  {spans}")
+    assert spans == [("时间", "明天"), ("时间", "下午"), ("时间点", "3点"), ("动作", "提醒")]
+
+    # 排除关键词出现在 matches 中, 但不出现在 matched_keywords 中
+    result = KeywordRouter.match("明天天气怎么样")
+    assert not result.matched and result.matched_keywords == []
+    assert {m.keyword for m in result.matches if m.value == KeywordRouter.CATEGORY_EXCLUDE} >= {"天气", "怎么样"}
+
+
+def test_recompile_after_adding_keywords():
+    """修改关键词列表后重新编译生效"""
+    original = KeywordRouter.CALENDAR_ACTION_KEYWORDS
+    try:
+        KeywordRouter.CALENDAR_ACTION_KEYWORDS = original + ['待办']
+        KeywordRouter.compile()
+        assert KeywordRouter.match("加个待办").matched_keywords == ["动作:待办"]
+    finally:
+        KeywordRouter.CALENDAR_ACTION_KEYWORDS = original
+        KeywordRouter.compile()
+    assert not KeywordRouter.match("加个待办").matched
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 Aho–Corasick 关键词匹配测试")
+    print("=" * 80)
+
+    test_overlapping_matches()
+    test_matches_brute_force()
+    test_router_match_positions()
+    test_recompile_after_adding_keywords()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
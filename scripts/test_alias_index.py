@@ -0,0 +1,189 @@
+"""测试别名内存索引
+
+验证 _AliasIndex 的查找结果与逐行扫描 + 双向子串比对完全一致,
+以及 remember_item / delete_item 对索引的增量维护、其他连接写入的同步, 查询不占用写锁。
+"""
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.database import ItemDatabase, _AliasIndex, extract_aliases, normalize_item_name
+
+
+ITEMS = [
+    "钥匙", "充电器", "耳机", "苹果手机", "iPad平板", "MacBook笔记本",
+    "笔记本电脑", "摩托车钥匙", "护照", "蓝色的保温杯", "身份证",
+]
+
+QUERIES = [
+    "钥匙", "手机", "phone", "laptop", "key", "摩托车的钥匙", "保温杯",
+    "我的护照", "电脑", "id", "车钥匙", "充电线", "时光机", "a",
+]
+
+
+def _brute_force(aliases_by_id, normalized):
+    """逐一比对 (索引引入前的实现)"""
+    matched = []
+    for item_id, aliases in aliases_by_id.items():
+        for alias in aliases:
+            alias_normalized = normalize_item_name(alias)
+            if normalized in alias_normalized or alias_normalized in normalized:
+                matched.append(item_id)
+                break
+    return sorted(matched)
+
+
+def test_lookup_matches_brute_force():
+    """索引查找与逐行扫描结果一致"""
+    index = _AliasIndex()
+    aliases_by_id = {}
+    for item_id, name in enumerate(ITEMS, start=1):
+        aliases_by_id[item_id] = extract_aliases(name)
+        index.add(item_id, aliases_by_id[item_id])
+
+    for query in QUERIES:
+        normalized = normalize_item_name(query)
+        expected = _brute_force(aliases_by_id, normalized)
+        actual = index.lookup(normalized)
+        status = "✓" if actual == expected else "✗"
+        print(f"  {status} '{query}' → {actual}")
+        assert actual == expected
+
+
+def test_remove_cleans_postings():
+    """移除物品后不再命中, 且倒排表被清理"""
+    index = _AliasIndex()
+    index.add(1, extract_aliases("耳机"))
+    index.add(2, extract_aliases("苹果手机"))
+
+    assert index.lookup("phone") == [1, 2]
+    index.remove(1)
+    assert index.lookup("phone") == [2]
+    index.remove(2)
+    assert index.lookup("phone") == []
+    assert not index._by_alias and not index._by_gram
+
+
+def test_database_keeps_index_in_sync():
+    """remember_item / delete_item 增量维护索引"""
+    db = ItemDatabase(Path(tempfile.mkdtemp()) / "items.db")
+    try:
+        db.remember_item("耳机", "书房抽屉")
+        assert db.query_item("headphone")["item"] == "耳机"  # 首次查询构建索引
+
+        db.remember_item("苹果手机", "客厅沙发")  # 索引已构建, 增量加入
+        assert db.query_item("电话")["item"] == "苹果手机"
+
+        db.delete_item("耳机")
+        result = db.query_item("phone")
+        assert result["item"] == "苹果手机", result
+    finally:
+        db.close()
+
+
+def _alias_lookup(db: ItemDatabase, name: str) -> list:
+    with db._read_connection() as conn:
+        return db._get_alias_index(conn, "default").lookup(normalize_item_name(name))
+
+
+def test_index_syncs_external_writes():
+    """其他连接 (如另一个 worker 进程) 新建的物品同步进索引, 删除的物品不再命中"""
+    path = Path(tempfile.mkdtemp()) / "items.db"
+    worker_a, worker_b = ItemDatabase(path), ItemDatabase(path)
+    try:
+        worker_a.remember_item("耳机", "书房抽屉")
+        assert worker_b.query_item("headphone")["item"] == "耳机"  # worker B 构建索引
+
+        worker_a.remember_item("苹果手机", "客厅沙发")
+        result = worker_b.query_item("电话")
+        assert result["item"] == "苹果手机" and result["match_type"] == "alias", result
+
+        worker_a.delete_item("耳机")
+        assert not worker_b.has_item("headphone")
+        assert worker_b.query_item("headphone").get("item") != "耳机"
+        assert 1 not in _alias_lookup(worker_b, "headphone")  # 回表校验后从索引中清除
+    finally:
+        worker_a.close()
+        worker_b.close()
+
+
+def test_concurrent_query_and_delete():
+    """查询与 remember/delete 并发执行时索引保持一致, 不抛出异常"""
+    db = ItemDatabase(Path(tempfile.mkdtemp()) / "items.db")
+    errors = []
+    stop = threading.Event()
+
+    def query():
+        try:
+            while not stop.is_set():
+                for name in ("phone", "钥匙", "耳机", "充电"):
+                    db.query_item(name)
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        db.remember_item("耳机", "书房抽屉")
+        db.query_item("headphone")  # 构建索引
+        readers = [threading.Thread(target=query) for _ in range(4)]
+        for thread in readers:
+            thread.start()
+        for i in range(100):
+            db.remember_item(f"苹果手机{i}", "客厅")
+            db.remember_item(f"摩托车钥匙{i}", "门口")
+            db.delete_item(f"苹果手机{i}")
+            db.delete_item(f"摩托车钥匙{i}")
+        stop.set()
+        for thread in readers:
+            thread.join()
+
+        assert not errors, errors
+        assert db.query_item("headphone")["item"] == "耳机"
+        # 删除的物品已从索引中移除, 只剩 "耳机"
+        db.query_item("phone")
+        db.query_item("摩托车")
+        assert _alias_lookup(db, "phone") == [1]
+        assert _alias_lookup(db, "摩托车") == []
+    finally:
+        stop.set()
+        db.close()
+
+
+def test_query_without_writer_lock():
+    """别名查询 (含首次构建索引) 只使用读连接, 写事务进行中也不会阻塞"""
+    db = ItemDatabase(Path(tempfile.mkdtemp()) / "items.db")
+    try:
+        db.remember_item("耳机", "书房抽屉")
+        results = []
+        with db._lock:  # 模拟长时间的写事务 / 维护批次
+            thread = threading.Thread(target=lambda: results.append(
+                (db.query_item("headphone")["item"], db.has_item("headphone"))))
+            thread.start()
+            thread.join(timeout=5)
+            assert not thread.is_alive(), "查询在等待写锁"
+        assert results == [("耳机", True)]
+    finally:
+        db.close()
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 别名索引测试")
+    print("=" * 80)
+
+    test_lookup_matches_brute_force()
+    test_remove_cleans_postings()
+    test_database_keeps_index_in_sync()
+    test_index_syncs_external_writes()
+    test_concurrent_query_and_delete()
+    test_query_without_writer_lock()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
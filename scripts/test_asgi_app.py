@@ -0,0 +1,252 @@
+"""测试 ASGI 服务模式
+
+用按脚本回复的模型代替真实 LLM, 验证 asgi_app 的对话接口 (异步执行) 与 Flask 服务返回相同的响应,
+其余接口转发给 Flask 应用, Agent 的 ainvoke 在一个事件循环中并发等待 LLM,
+以及路由流程中的同步步骤 (SQLite、会话历史、交互日志) 不在事件循环线程中执行。
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造模型, 不会调用
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+from starlette.testclient import TestClient
+
+from core.agent_base import BaseAgent, run_agent_graph
+from core.response_types import AgentResponse
+from test_chat_stream import ScriptedModel, _parse_sse, _scripted_graph
+
+
+class SlowModel(ScriptedModel):
+    """异步调用时等待一段时间再回复 (模拟 LLM 网络延迟)"""
+
+    delay: float = 0.2
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content="好的"))])
+
+
+class SlowAgent(BaseAgent):
+    def __init__(self):
+        super().__init__(name="slow_agent", description="测试用 Agent")
+        self.agent = create_agent(model=SlowModel(replies=[]), tools=[])
+
+    def invoke(self, query: str) -> AgentResponse:
+        return self._extract_response_from_result(
+            run_agent_graph(self.agent, [{"role": "user", "content": query}], self.name)
+        )
+
+
+def test_concurrent_ainvoke():
+    """并发的 ainvoke 共用一个事件循环, 总耗时接近单次调用"""
+    agent = SlowAgent()
+
+    async def run_all():
+        return await asyncio.gather(*(agent.ainvoke(f"问题 {i}") for i in range(50)))
+
+    start = time.perf_counter()
+    responses = asyncio.run(run_all())
+    elapsed = time.perf_counter() - start
+    print(f"  50 个并发请求 (每个等待 0.2s): {elapsed:.2f}s")
+    assert all(r.success and r.message == "好的" for r in responses)
+    assert elapsed < 2
+
+
+class _Server:
+    """使用临时数据目录和脚本模型的服务 (Flask 与 ASGI 共用)"""
+
+    def __enter__(self):
+        import core.database as database
+        import core.intent_classifier as intent_classifier_module
+        import core.interaction_logger as interaction_logger_module
+        import core.response_cache as response_cache_module
+        from core.database import ItemDatabase
+        from core.interaction_logger import InteractionLogger
+        import server
+        from agents.note_agent import note_agent
+
+        self.modules = (database, intent_classifier_module, interaction_logger_module, response_cache_module, server)
+        self.note_agent = note_agent
+        self.previous = (database._db_instance, interaction_logger_module._interaction_logger, note_agent.agent,
+                         response_cache_module._cache, response_cache_module._cache_loaded,
+                         intent_classifier_module._classifier, intent_classifier_module._classifier_loaded,
+                         server.supervisor_router)
+
+        data_dir = Path(tempfile.mkdtemp())
+        database._db_instance = ItemDatabase(data_dir / "items.db")
+        database._db_instance.remember_item("钥匙", "门口")  # 快速路径只处理已记录的物品
+        interaction_logger_module._interaction_logger = InteractionLogger(data_dir)
+        response_cache_module._cache, response_cache_module._cache_loaded = None, True
+        intent_classifier_module._classifier, intent_classifier_module._classifier_loaded = None, True
+        return self
+
+    def __exit__(self, *exc):
+        database, intent_classifier_module, interaction_logger_module, response_cache_module, server = self.modules
+        database._db_instance.close()
+        (database._db_instance, interaction_logger_module._interaction_logger, self.note_agent.agent,
+         response_cache_module._cache, response_cache_module._cache_loaded,
+         intent_classifier_module._classifier, intent_classifier_module._classifier_loaded,
+         server.supervisor_router) = self.previous
+
+
+def _without_timestamp(response: dict) -> dict:
+    return {k: v for k, v in response.items() if k != "timestamp"}
+
+
+def test_same_responses_as_flask():
+    """同一请求在 Flask 与 ASGI 服务中返回相同的状态码和响应"""
+    import server
+    from asgi_app import app
+
+    with _Server() as env:
+        flask_client = server.app.test_client()
+        asgi_client = TestClient(app)
+
+        # 物品快速路径 (不调用 LLM)
+        asgi = asgi_client.post("/api/v1/chat/message", json={"message": "钥匙放在书桌上"})
+        assert asgi.status_code == 200
+        flask = flask_client.post("/api/v1/chat/message", json={"message": "钥匙在哪"}).get_json()
+        assert flask["actions"][0]["data"]["location"] == "书桌上"
+        asgi = asgi_client.post("/api/v1/chat/message", json={"message": "钥匙在哪"}).json()
+        assert _without_timestamp(asgi) == _without_timestamp(flask)
+
+        # 标记路由 → NoteAgent (ASGI 服务通过 ainvoke 调用)
+        results = []
+        for post in (lambda: flask_client.post("/api/v1/chat/message", json={"message": "#note 写周报"}).get_json(),
+                     lambda: asgi_client.post("/api/v1/chat/message", json={"message": "#note 写周报"}).json()):
+            env.note_agent.agent = _scripted_graph("好的, 已记下")
+            results.append(_without_timestamp(post()))
+        print(f"  {results[1]}")
+        assert results[0] == results[1]
+        assert results[1]["agent"] == "note_agent" and results[1]["message"] == "好的, 已记下"
+
+        # 参数校验
+        for message in ["", "x" * (server.MAX_MESSAGE_LENGTH + 1)]:
+            flask = flask_client.post("/api/v1/chat/message", json={"message": message})
+            asgi = asgi_client.post("/api/v1/chat/message", json={"message": message})
+            assert asgi.status_code == flask.status_code == 400
+            assert asgi.json() == flask.get_json()
+
+        # 其余接口由 Flask 应用处理
+        health = asgi_client.get("/api/v1/system/health")
+        assert health.status_code == 200 and health.json()["status"] == "ok"
+        page = asgi_client.get("/api/v1/items?fields=item,location").json()
+        assert page["items"] == [{"item": "钥匙", "location": "书桌上"}]
+
+
+def test_router_mode_async():
+    """router 模式: Supervisor 异步路由后调用子 Agent 的 ainvoke, 子 Agent 收到用户的原始消息"""
+    import server
+    from agents.supervisor.agent import SupervisorRouter
+    from asgi_app import app
+
+    with _Server() as env:
+        previous_mode = server.config.SUPERVISOR_MODE
+        server.config.SUPERVISOR_MODE = "router"
+        server.supervisor_router = SupervisorRouter(ScriptedModel(replies=[AIMessage(content="", tool_calls=[
+            {"name": "RoutingDecision", "args": {"agent": "note_agent", "query": "记录想法"}, "id": "call_1"}
+        ])]))
+        env.note_agent.agent = _scripted_graph("好的, 已记下")
+        queries = []
+        ainvoke = env.note_agent.ainvoke
+        env.note_agent.ainvoke = lambda query: queries.append(query) or ainvoke(query)
+        try:
+            body = TestClient(app).post("/api/v1/chat/stream", json={"message": "周报的想法"}).text
+        finally:
+            server.config.SUPERVISOR_MODE = previous_mode
+            del env.note_agent.ainvoke
+
+        assert queries == ["周报的想法"]  # 不是 Supervisor 改写后的 query
+
+        events = _parse_sse(body)
+        names = [event for event, _ in events]
+        print(f"  {names}")
+        assert events[0] == ("routing", {"stage": "supervisor", "agent": "note_agent", "keywords": []})
+        assert names[1:3] == ["tool_call", "tool_result"] and names[-1] == "response"
+        assert "".join(data["text"] for event, data in events if event == "token") == "好的, 已记下"
+        assert events[-1][1]["agent"] == "note_agent"
+
+
+def test_blocking_steps_off_event_loop():
+    """物品快速路径和交互日志在线程池中执行, 慢的 SQLite 写入不阻塞其他请求"""
+    import server
+    from agents.item_agent import item_agent
+
+    threads = []
+
+    def slow_handle_intent(intent):
+        threads.append(threading.current_thread())
+        time.sleep(0.3)
+        return handle_intent(intent)
+
+    async def run():
+        loop_thread = threading.current_thread()
+        ticks = []
+
+        async def heartbeat():
+            for _ in range(5):
+                ticks.append(time.perf_counter())
+                await asyncio.sleep(0.02)
+
+        await asyncio.gather(server._ahandle_message("钥匙放在书桌上"), heartbeat())
+        return loop_thread, ticks
+
+    with _Server():
+        handle_intent = item_agent.handle_intent
+        item_agent.handle_intent = slow_handle_intent
+        try:
+            loop_thread, ticks = asyncio.run(run())
+        finally:
+            del item_agent.handle_intent
+
+    assert threads and loop_thread not in threads
+    # 快速路径执行期间事件循环仍在调度其他协程
+    assert ticks[-1] - ticks[0] < 0.25, ticks
+
+
+def test_stream_same_events_as_flask():
+    """流式接口在 Flask 与 ASGI 服务中推送相同的事件序列"""
+    import server
+    from asgi_app import app
+
+    with _Server() as env:
+        bodies = []
+        for post in (lambda: server.app.test_client().post(
+                         "/api/v1/chat/stream", json={"message": "#note 写周报"}).get_data(as_text=True),
+                     lambda: TestClient(app).post("/api/v1/chat/stream", json={"message": "#note 写周报"}).text):
+            env.note_agent.agent = _scripted_graph("好的, 已记下")
+            bodies.append([(event, _without_timestamp(data) if event == "response" else data)
+                           for event, data in _parse_sse(post())])
+        print(f"  {[event for event, _ in bodies[1]]}")
+        assert bodies[0] == bodies[1]
+        assert json.dumps(bodies[1], ensure_ascii=False).count("tool_call") == 1
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 ASGI 服务模式测试")
+    print("=" * 80)
+
+    test_concurrent_ainvoke()
+    test_same_responses_as_flask()
+    test_router_mode_async()
+    test_blocking_steps_off_event_loop()
+    test_stream_same_events_as_flask()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
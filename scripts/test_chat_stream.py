@@ -0,0 +1,177 @@
+"""测试流式对话接口
+
+用按脚本回复的模型代替真实 LLM, 验证 run_agent_graph 的流式事件与非流式结果一致,
+以及 POST /api/v1/chat/stream 按顺序推送路由、工具调用、token 和最终响应。
+"""
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+from typing import Iterator, List
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造模型, 不会调用
+
+from langchain.agents import create_agent
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.tools import tool
+
+from core.agent_base import BaseAgent, run_agent_graph, stream_events
+from core.response_types import AgentResponse
+
+
+class ScriptedModel(BaseChatModel):
+    """按顺序返回预设回复的模型 (流式时逐字输出)"""
+
+    replies: List[AIMessage]
+
+    @property
+    def _llm_type(self) -> str:
+        return "scripted"
+
+    def bind_tools(self, tools, **kwargs):
+        return self
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self.replies.pop(0))])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        reply = self.replies.pop(0)
+        if reply.tool_calls:
+            yield ChatGenerationChunk(message=AIMessageChunk(content="", tool_call_chunks=[
+                {"name": call["name"], "args": json.dumps(call["args"]), "id": call["id"], "index": i}
+                for i, call in enumerate(reply.tool_calls)
+            ]))
+            return
+        for char in reply.content:
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=char))
+            if run_manager:
+                run_manager.on_llm_new_token(char, chunk=chunk)
+            yield chunk
+
+
+@tool
+def save_idea(content: str) -> dict:
+    """保存一条想法"""
+    return {"action_type": "note_saved", "data": {"content": content}}
+
+
+def _scripted_graph(answer: str = "已保存"):
+    return create_agent(
+        model=ScriptedModel(replies=[
+            AIMessage(content="", tool_calls=[{"name": "save_idea", "args": {"content": "写周报"}, "id": "call_1"}]),
+            AIMessage(content=answer),
+        ]),
+        tools=[save_idea]
+    )
+
+
+class ScriptedAgent(BaseAgent):
+    def __init__(self):
+        super().__init__(name="scripted_agent", description="测试用 Agent")
+        self.agent = _scripted_graph()
+
+    def invoke(self, query: str) -> AgentResponse:
+        result = run_agent_graph(self.agent, [{"role": "user", "content": query}], self.name)
+        return self._extract_response_from_result(result)
+
+
+def test_run_agent_graph_streaming():
+    """流式执行推送 tool_call / tool_result / token, 返回值与非流式相同"""
+    expected = ScriptedAgent().invoke("记一下写周报")
+
+    events = []
+    response = ScriptedAgent().stream("记一下写周报", lambda event, data: events.append((event, data)))
+    for event in events:
+        print(f"  {event}")
+
+    assert response.message == expected.message == "已保存"
+    assert [a.to_dict() for a in response.actions] == [a.to_dict() for a in expected.actions]
+    assert events[0] == ("tool_call", {"agent": "scripted_agent", "tool": "save_idea", "args": {"content": "写周报"}})
+    assert events[1] == ("tool_result", {
+        "agent": "scripted_agent", "tool": "save_idea",
+        "actions": [{"type": "note_saved", "data": {"content": "写周报"}}]
+    })
+    assert "".join(data["text"] for event, data in events if event == "token") == "已保存"
+
+    # 上下文结束后不再推送
+    events.clear()
+    ScriptedAgent().invoke("记一下写周报")
+    assert events == []
+
+
+def _parse_sse(body: str):
+    events = []
+    for block in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in block.split("\n") if not line.startswith(":"))
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+
+def test_stream_endpoint():
+    """/chat/stream 推送路由决策、工具调用和 token, 最后是与 /chat/message 相同格式的响应"""
+    import core.database as database
+    import core.interaction_logger as interaction_logger_module
+    import core.response_cache as response_cache_module
+    from core.database import ItemDatabase
+    from core.interaction_logger import InteractionLogger
+    import server
+    from agents.note_agent import note_agent
+
+    data_dir = Path(tempfile.mkdtemp())
+    previous = (database._db_instance, interaction_logger_module._interaction_logger, note_agent.agent,
+                response_cache_module._cache, response_cache_module._cache_loaded)
+    database._db_instance = ItemDatabase(data_dir / "items.db")
+    database._db_instance.remember_item("钥匙", "门口")  # 快速路径只处理已记录的物品
+    interaction_logger_module._interaction_logger = InteractionLogger(data_dir)
+    response_cache_module._cache, response_cache_module._cache_loaded = None, True
+    note_agent.agent = _scripted_graph("好的, 已记下")
+    try:
+        client = server.app.test_client()
+
+        # 标记路由 → NoteAgent (LLM 流式)
+        result = client.post("/api/v1/chat/stream", json={"message": "#note 写周报"})
+        assert result.status_code == 200 and result.mimetype == "text/event-stream"
+        events = _parse_sse(result.get_data(as_text=True))
+        names = [event for event, _ in events]
+        print(f"  {names}")
+        assert events[0] == ("routing", {"stage": "tag", "agent": "note_agent", "keywords": ["标记:note"]})
+        assert names[1:3] == ["tool_call", "tool_result"] and names[-1] == "response"
+        assert "".join(data["text"] for event, data in events if event == "token") == "好的, 已记下"
+        final = events[-1][1]
+        assert final["agent"] == "note_agent" and final["message"] == "好的, 已记下"
+        assert final["actions"] == [{"type": "note_saved", "data": {"content": "写周报"}}]
+
+        # 物品快速路径: 没有 LLM 调用, 只有路由和最终响应
+        events = _parse_sse(client.post("/api/v1/chat/stream", json={"message": "钥匙放在书桌上"}).get_data(as_text=True))
+        assert [event for event, _ in events] == ["routing", "response"]
+        assert events[0][1]["stage"] == "item_fast_path"
+        blocking = client.post("/api/v1/chat/message", json={"message": "钥匙在哪"}).get_json()
+        assert blocking["actions"][0]["data"]["location"] == "书桌上"
+
+        # 参数校验与 /chat/message 相同
+        assert client.post("/api/v1/chat/stream", json={"message": ""}).status_code == 400
+    finally:
+        database._db_instance.close()
+        (database._db_instance, interaction_logger_module._interaction_logger, note_agent.agent,
+         response_cache_module._cache, response_cache_module._cache_loaded) = previous
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 流式对话接口测试")
+    print("=" * 80)
+
+    test_run_agent_graph_streaming()
+    test_stream_endpoint()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
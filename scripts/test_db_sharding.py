@@ -0,0 +1,179 @@
+"""物品数据库分片测试
+
+验证按 user_id 路由与隔离、LRU 关闭分片时不影响正在借用的分片、
+空闲分片自动关闭, 以及从单库 items.db 拆分。
+"""
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.database import ItemDatabase
+from core.db_sharding import ShardedItemDatabase, shard_filename, split_database
+from core.item_maintenance import MaintenanceScheduler
+
+
+def test_routing_and_isolation():
+    """不同用户写入各自的分片, 互不可见"""
+    db = ShardedItemDatabase(Path(tempfile.mkdtemp()), idle_seconds=0)
+    try:
+        db.remember_item("钥匙", "书桌", user_id="alice")
+        db.remember_item("钥匙", "玄关", user_id="bob")
+        db.remember_items([{"item": "护照", "location": "保险柜"}], user_id="bob")
+
+        assert db.query_item("钥匙", user_id="alice")["location"] == "书桌"
+        assert db.query_item("钥匙", user_id="bob")["location"] == "玄关"
+        assert db.query_item("护照", user_id="alice")["status"] == "not_found"
+        assert db.count_items(user_id="bob") == 2
+        assert [item["item"] for item in db.iter_items("alice")] == ["钥匙"]
+        assert db.list_items("bob", limit=1)["has_more"]
+
+        names = sorted(path.name for path in db.shard_paths())
+        print(f"  分片文件: {names}")
+        assert names == sorted([shard_filename("alice"), shard_filename("bob")])
+        assert shard_filename("../etc") != shard_filename("__etc")
+    finally:
+        db.close()
+
+
+def test_lru_keeps_leased_shards():
+    """超出上限时只关闭未被借用的分片"""
+    db = ShardedItemDatabase(Path(tempfile.mkdtemp()), max_open=2, idle_seconds=0)
+    try:
+        with db.lease("u0") as held:
+            for i in range(1, 5):
+                db.remember_item("钥匙", f"位置{i}", user_id=f"u{i}")
+            assert db.open_count() == 2  # u0 (借用中) + 最近使用的 u4
+            held.remember_item("钥匙", "仍可写入", user_id="u0")
+
+        assert db.query_item("钥匙", user_id="u1")["location"] == "位置1"  # 重新打开
+        assert db.query_item("钥匙", user_id="u0")["location"] == "仍可写入"
+        assert db.open_count() == 2
+    finally:
+        db.close()
+
+
+def test_concurrent_users():
+    """多线程并发访问多个用户"""
+    db = ShardedItemDatabase(Path(tempfile.mkdtemp()), max_open=3, idle_seconds=0)
+    errors = []
+
+    def worker(user_no: int):
+        try:
+            for i in range(20):
+                db.remember_item(f"物品{i}", "柜子", user_id=f"user{user_no}")
+            assert db.count_items(user_id=f"user{user_no}") == 20
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=worker, args=(n,)) for n in range(6)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert not errors, errors
+        assert db.open_count() <= 3
+    finally:
+        db.close()
+
+
+def test_reap_idle_and_maintenance():
+    """空闲分片被关闭; 维护任务遍历所有分片"""
+    db = ShardedItemDatabase(Path(tempfile.mkdtemp()), idle_seconds=0)
+    try:
+        for user in ("alice", "bob"):
+            db.remember_item("钥匙", "书桌", user_id=user)
+            db.delete_item("钥匙", user_id=user)
+        assert db.open_count() == 2
+        assert db.reap_idle() == 2 and db.open_count() == 0
+
+        steps = MaintenanceScheduler(db, tombstone_grace_days=-1).run_once(only=["tombstone_purge"])
+        assert steps[0].result == 2
+        assert db.count_items(user_id="alice", include_deleted=True) == 0
+    finally:
+        db.close()
+
+
+def test_maintenance_skips_unchanged_shards():
+    """维护只处理有写入或有到期工作的分片, 且不把活跃用户的分片挤出 LRU"""
+    db = ShardedItemDatabase(Path(tempfile.mkdtemp()), max_open=2, idle_seconds=0)
+    scheduler = MaintenanceScheduler(db, tombstone_grace_days=30)
+    try:
+        for user in ("alice", "bob", "carol"):
+            db.remember_item("钥匙", "书桌", user_id=user)
+        db.delete_item("钥匙", user_id="carol")
+        steps = {step.name: step.result for step in scheduler.run_once()}
+        assert steps["history_retention"].items_scanned == 3
+        assert steps["tombstone_purge"] == 0
+
+        # 没有写入也没有到期工作: 不打开任何分片
+        db.reap_idle()
+        assert scheduler.run_once() == [] and db.open_count() == 0
+
+        # 只维护有写入的分片, 维护打开的分片归还后先被关闭
+        db.remember_item("钥匙", "玄关", user_id="bob")
+        db.reap_idle()
+        db.query_item("钥匙", user_id="alice")
+        db.query_item("钥匙", user_id="carol")
+        steps = {step.name: step.result for step in scheduler.run_once()}
+        assert steps["history_retention"].items_scanned == 1
+        active = {db.shard_path("alice"), db.shard_path("carol")}
+        assert set(db._shards) == active
+
+        # 软删除超过保留期: 分片没有新写入也会被维护
+        scheduler.tombstone_grace_days = -1
+        steps = {step.name: step.result for step in scheduler.run_once()}
+        assert steps["tombstone_purge"] == 1
+        assert db.count_items(user_id="carol", include_deleted=True) == 0
+    finally:
+        db.close()
+
+
+def test_split_database():
+    """单库按用户拆分, 保留历史并重建全文索引"""
+    root = Path(tempfile.mkdtemp())
+    source = ItemDatabase(root / "items.db")
+    source.remember_item("钥匙", "书桌", user_id="alice")
+    source.remember_item("钥匙", "玄关", user_id="alice")
+    source.remember_item("摩托车钥匙", "门口挂钩", user_id="bob")
+    source.remember_item("笔记本电脑", "书房", user_id="bob")
+    source.close()
+
+    copied = split_database(root / "items.db", root / "shards")
+    print(f"  拆分结果: {copied}")
+    assert copied == {"alice": 1, "bob": 2}
+    assert split_database(root / "items.db", root / "shards") == {}  # 已有数据的分片跳过
+
+    db = ShardedItemDatabase(root / "shards", idle_seconds=0)
+    try:
+        assert db.get_item_history("钥匙", user_id="alice")["count"] == 2
+        assert db.query_item("钥匙", user_id="bob")["item"] == "摩托车钥匙"  # 全文 / n-gram 匹配
+        assert db.query_item("laptop", user_id="bob")["item"] == "笔记本电脑"
+        db.remember_item("护照", "保险柜", user_id="bob")  # 自增 id 从已复制的 id 之后继续
+        assert db.count_items(user_id="bob") == 3
+    finally:
+        db.close()
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 物品数据库分片测试")
+    print("=" * 80)
+
+    test_routing_and_isolation()
+    test_lru_keeps_leased_shards()
+    test_concurrent_users()
+    test_reap_idle_and_maintenance()
+    test_maintenance_skips_unchanged_shards()
+    test_split_database()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
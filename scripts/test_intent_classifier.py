@@ -0,0 +1,127 @@
+"""测试本地意图分类器
+
+验证从交互日志读取训练样本、训练和预测、置信度/覆盖率过滤,
+以及模型文件的保存和加载。
+"""
+import json
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.intent_classifier import IntentClassifier, evaluate, load_training_samples
+from core.interaction_logger import InteractionLog, InteractionLogger
+
+ITEMS = ["钥匙", "护照", "充电器", "耳机", "钱包", "身份证", "雨伞", "U盘"]
+PLACES = ["书桌抽屉", "卧室柜子", "背包", "门口鞋柜", "客厅茶几"]
+TOPICS = ["Python", "机器学习", "读书笔记", "周报", "装修方案"]
+
+SAMPLES = (
+    [(f"帮我看看{item}是不是还在{place}", "item_agent") for item in ITEMS for place in PLACES]
+    + [(f"{item}好像被我收到{place}那边去了", "item_agent") for item in ITEMS for place in PLACES[:3]]
+    + [(f"保存一条关于{topic}的笔记", "note_agent") for topic in TOPICS]
+    + [(f"搜索一下我写过的{topic}笔记", "note_agent") for topic in TOPICS]
+    + [(f"把这段{topic}的想法记到笔记里", "note_agent") for topic in TOPICS]
+    + [(text, "supervisor") for text in [
+        "你好呀", "讲个笑话", "你是谁", "谢谢你", "什么是人工智能", "推荐一本书",
+        "心情不太好", "晚安", "给我讲讲历史", "你会做什么",
+    ]]
+)
+
+
+def _log(interaction_logger, user_input, final_agent, **kwargs):
+    interaction_logger.log(InteractionLog(
+        user_id="test",
+        timestamp=datetime.now().isoformat(),
+        user_input=user_input,
+        input_length=len(user_input),
+        routing_stage=kwargs.pop('routing_stage', 'supervisor'),
+        routing_matched=False,
+        final_agent=final_agent,
+        **kwargs
+    ))
+
+
+def test_load_training_samples():
+    """只使用成功的请求; 分类器自己路由且未回退的请求不作为样本"""
+    data_dir = Path(tempfile.mkdtemp())
+    interaction_logger = InteractionLogger(data_dir)
+    _log(interaction_logger, "钥匙在哪", "item_agent")
+    _log(interaction_logger, "保存笔记", "note_agent", routing_stage='tag')
+    _log(interaction_logger, "出错的请求", "item_agent", status='error')
+    _log(interaction_logger, "分类器路由", "item_agent", routing_stage='classifier')
+    _log(interaction_logger, "分类器回退", "note_agent", routing_stage='classifier',
+         redirect_occurred=True, status='redirect')
+    _log(interaction_logger, "没有结果", None)
+
+    samples = load_training_samples(data_dir / InteractionLogger.DB_FILE)
+    print(f"  {samples}")
+    assert samples == [("钥匙在哪", "item_agent"), ("保存笔记", "note_agent"), ("分类器回退", "note_agent")]
+    assert load_training_samples(data_dir / InteractionLogger.DB_FILE, since="2999-01-01") == []
+
+
+def test_train_and_predict():
+    """训练后对相似说法给出高置信度, 对训练数据之外的说法不路由"""
+    classifier = IntentClassifier.train(SAMPLES)
+    assert classifier.labels == ["item_agent", "note_agent", "supervisor"]
+
+    for message, label in [
+        ("帮我看看雨伞是不是还在客厅茶几", "item_agent"),
+        ("搜索一下我写过的周报笔记", "note_agent"),
+        ("把这段读书笔记的想法记到笔记里", "note_agent"),
+    ]:
+        prediction = classifier.classify(message, threshold=0.95)
+        print(f"  {message} → {prediction.label} ({prediction.confidence:.3f}, 覆盖率 {prediction.coverage:.2f})")
+        assert prediction.label == label
+
+    # 训练数据中没有出现过的说法: 覆盖率低, 不路由
+    prediction = classifier.predict("量子纠缠态坍缩实验")
+    assert prediction.coverage < IntentClassifier.MIN_COVERAGE
+    assert classifier.classify("量子纠缠态坍缩实验", threshold=0.95) is None
+    assert classifier.predict("   ") is None
+
+    report = evaluate(classifier, SAMPLES, threshold=0.95)
+    print(f"  {report}")
+    assert report['accuracy'] > 0.95 and report['routed_accuracy'] == 1.0
+
+
+def test_save_and_load():
+    """模型保存后加载, 预测结果一致; 格式版本不匹配时拒绝加载"""
+    classifier = IntentClassifier.train(SAMPLES, metadata={'source': 'test'})
+    path = Path(tempfile.mkdtemp()) / "model" / "intent_classifier.json"
+    classifier.save(path)
+
+    loaded = IntentClassifier.load(path)
+    assert loaded.version == classifier.version and loaded.metadata['source'] == 'test'
+    message = "耳机好像被我收到背包那边去了"
+    assert loaded.predict(message).scores == classifier.predict(message).scores
+
+    data = json.loads(path.read_text(encoding='utf-8'))
+    data['format'] = 0
+    path.write_text(json.dumps(data), encoding='utf-8')
+    try:
+        IntentClassifier.load(path)
+    except ValueError as e:
+        print(f"  {e}")
+    else:
+        raise AssertionError("格式版本不匹配时应该拒绝加载")
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 意图分类器测试")
+    print("=" * 80)
+
+    test_load_training_samples()
+    test_train_and_predict()
+    test_save_and_load()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+"""ItemDatabase 离线测试
+
+直接使用临时数据库文件测试数据库层, 不依赖服务和 LLM:
+1. 批量记录/查询
+2. 访问统计延迟写入
+3. 多线程读写 (写连接 + 只读连接池)
+4. 游标分页 / 字段投影 / 流式读取
+"""
+import sqlite3
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.database import ItemDatabase, decode_list_cursor
+
+
+def _new_db(**kwargs) -> ItemDatabase:
+    """在临时目录创建数据库"""
+    return ItemDatabase(Path(tempfile.mkdtemp()) / "items.db", **kwargs)
+
+
+def test_batch_remember_matches_single_calls():
+    """批量记录与逐条调用结果一致"""
+    batch = [
+        {"item": "钥匙", "location": "书桌"},
+        {"item": "护照", "location": "保险柜"},
+        {"item": "护照", "location": "抽屉"},
+        {"item": "钥匙", "location": "书桌"},
+    ]
+
+    single_db = _new_db()
+    batch_db = _new_db()
+    try:
+        expected = [single_db.remember_item(e["item"], e["location"]) for e in batch]
+        actual = batch_db.remember_items(batch)
+
+        for e, a in zip(expected, actual):
+            print(f"  {a['action']}: {a['message']}")
+        assert [r["action"] for r in actual] == ["created", "created", "moved", "confirmed"]
+        assert actual == expected
+
+        history = batch_db.get_item_history("护照")
+        assert history["count"] == 2
+    finally:
+        single_db.close()
+        batch_db.close()
+
+
+def test_batch_query():
+    """批量查询: 精确命中与回退到完整查询策略"""
+    db = _new_db()
+    try:
+        db.remember_items([
+            {"item": "钥匙", "location": "书桌"},
+            {"item": "苹果手机", "location": "客厅沙发"},
+        ])
+        results = db.query_items(["钥匙", "手机", "时光机"])
+        assert [r["status"] for r in results] == ["success", "success", "not_found"]
+        assert results[0]["match_type"] == "exact"
+        assert results[1]["item"] == "苹果手机"
+    finally:
+        db.close()
+
+
+def test_access_stats_are_deferred():
+    """查询只写内存缓冲, 达到阈值或 close() 时写入"""
+    db = _new_db(access_flush_interval=60, access_flush_size=2)
+    path = db.db_path
+
+    def query_counts():
+        conn = sqlite3.connect(str(path))
+        try:
+            return dict(conn.execute("SELECT item_name, query_count FROM items").fetchall())
+        finally:
+            conn.close()
+
+    db.remember_item("钥匙", "书桌")
+    db.remember_item("护照", "抽屉")
+
+    for _ in range(3):
+        db.query_item("钥匙")
+    assert query_counts() == {"钥匙": 0, "护照": 0}  # 尚未写入
+
+    db.query_item("护照")  # 缓冲达到 2 个物品, 立即写入
+    assert query_counts() == {"钥匙": 3, "护照": 1}
+
+    db.query_item("钥匙")
+    db.close()  # close() 写入剩余统计
+    assert query_counts() == {"钥匙": 4, "护照": 1}
+
+
+def test_concurrent_reads_and_writes():
+    """多线程同时查询和记录, 读连接数不超过连接池大小"""
+    db = _new_db(reader_pool_size=3)
+    names = [f"物品{i}" for i in range(20)]
+    errors = []
+
+    def writer():
+        try:
+            for round_no in range(5):
+                for name in names:
+                    db.remember_item(name, f"柜子{round_no}")
+        except Exception as e:
+            errors.append(e)
+
+    def reader():
+        try:
+            for _ in range(10):
+                for name in names:
+                    result = db.query_item(name)
+                    assert result["status"] in ("success", "not_found")
+                assert db.list_all_items()["count"] <= len(names)
+                db.get_item_history(names[0])
+        except Exception as e:
+            errors.append(e)
+
+    try:
+        threads = [threading.Thread(target=writer)] + [threading.Thread(target=reader) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+
+        assert not errors, errors
+        assert len(db._readers) <= 3
+        print(f"  只读连接数: {len(db._readers)}")
+
+        # 写入全部完成后, 读连接能看到最新数据
+        assert db.query_item("物品7")["location"] == "柜子4"
+        assert db.get_item_history("物品7")["count"] == 5
+    finally:
+        db.close()
+
+
+def test_keyset_pagination():
+    """游标分页: 相同 updated_at 的物品也不重不漏, 支持字段投影"""
+    db = _new_db()
+    try:
+        # 批量记录的物品 updated_at 完全相同, 依靠 id 区分先后
+        db.remember_items([{"item": f"物品{i}", "location": "柜子"} for i in range(23)])
+        db.remember_item("物品5", "书桌")  # 移动后 updated_at 最新, 排在第一页首位
+
+        seen = []
+        cursor = None
+        pages = 0
+        while True:
+            page = db.list_items(limit=10, cursor=cursor, fields=["item", "location"])
+            pages += 1
+            assert all(set(item) == {"item", "location"} for item in page["items"])
+            seen.extend(item["item"] for item in page["items"])
+            if not page["has_more"]:
+                assert page["next_cursor"] is None
+                break
+            cursor = page["next_cursor"]
+
+        print(f"  {pages} 页, 共 {len(seen)} 个物品")
+        assert pages == 3
+        assert seen[0] == "物品5"
+        assert sorted(seen) == sorted(f"物品{i}" for i in range(23))
+        assert seen == [item["item"] for item in db.iter_items(batch_size=4)]
+        assert db.count_items() == 23
+
+        for bad_cursor, bad_fields in [("not-a-cursor", None), (None, ["item", "password"])]:
+            try:
+                db.list_items(cursor=bad_cursor, fields=bad_fields)
+                raise AssertionError("应当抛出 ValueError")
+            except ValueError as e:
+                print(f"  ✓ {e}")
+
+        updated_at, item_id = decode_list_cursor(db.list_items(limit=1)["next_cursor"])
+        assert isinstance(updated_at, str) and isinstance(item_id, int)
+    finally:
+        db.close()
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 ItemDatabase 离线测试")
+    print("=" * 80)
+
+    test_batch_remember_matches_single_calls()
+    test_batch_query()
+    test_access_stats_are_deferred()
+    test_concurrent_reads_and_writes()
+    test_keyset_pagination()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
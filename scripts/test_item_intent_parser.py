@@ -0,0 +1,164 @@
+"""测试物品意图解析器 (物品快速路径)
+
+验证常见记录/查询/列表句式被正确解析, 含糊的句子和主语不是已记录物品的句子交给 Supervisor,
+以及 ItemAgent.handle_intent 不经过 LLM 返回与工具一致的结构化响应。
+"""
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造 ItemAgent, 不会调用模型
+
+from core.item_intent_parser import ItemIntentParser
+
+# 已记录的物品
+KNOWN = {"钥匙", "护照", "耳机", "笔记本电脑", "充电器", "钱包", "书"}.__contains__
+
+
+def test_remember_patterns():
+    """记录句式"""
+    cases = {
+        "钥匙放在书桌抽屉里": ("钥匙", "书桌抽屉里"),
+        "我把钥匙放在门口挂钩上了": ("钥匙", "门口挂钩上"),
+        "我已经把护照放到保险柜了。": ("护照", "保险柜"),
+        "耳机塞在沙发缝里": ("耳机", "沙发缝里"),
+        "笔记本电脑放在书房": ("笔记本电脑", "书房"),
+        "钥匙在书桌上": ("钥匙", "书桌上"),
+        "我的充电器在背包里": ("充电器", "背包里"),
+    }
+    for message, (item, location) in cases.items():
+        intent = ItemIntentParser.parse(message, is_known_item=KNOWN)
+        print(f"  {message} → {intent}")
+        assert intent is not None and intent.action == "remember"
+        assert (intent.item, intent.location) == (item, location)
+
+
+def test_requires_known_item():
+    """主语是人、地点或抽象事物 (不是已记录的物品) 时不解析, 交给 Supervisor"""
+    for message in [
+        "妈妈在厨房里",
+        "孩子在学校里",
+        "小明在楼下",
+        "心思在工作上",
+        "bug在代码里",
+        "猫在沙发上",
+        "这件事放在心上",
+        "故宫在哪里？",
+        "北京在哪儿",
+        "最近的医院在哪",
+        "雨伞放在门口",  # 新物品的第一次记录
+    ]:
+        intent = ItemIntentParser.parse(message, is_known_item=KNOWN)
+        assert intent is None, (message, intent)
+
+    # 未提供 is_known_item 时只解析列表句式
+    for message in ["钥匙在书桌上", "钥匙放在书桌上", "钥匙在哪"]:
+        assert ItemIntentParser.parse(message) is None
+        assert ItemIntentParser.parse(message, is_known_item=KNOWN).item == "钥匙"
+    assert ItemIntentParser.parse("列出所有物品").action == "list"
+
+
+def test_query_and_list_patterns():
+    """查询和列表句式"""
+    queries = {
+        "钥匙在哪": "钥匙",
+        "钥匙在哪里？": "钥匙",
+        "我的护照在哪儿呢": "护照",
+        "我把充电器放哪了": "充电器",
+        "钱包放哪里了？": "钱包",
+    }
+    for message, item in queries.items():
+        intent = ItemIntentParser.parse(message, is_known_item=KNOWN)
+        assert intent is not None and intent.action == "query" and intent.item == item, (message, intent)
+
+    for message in ["我记录了哪些物品", "列出所有物品", "我都记了哪些东西", "所有物品"]:
+        intent = ItemIntentParser.parse(message)
+        assert intent is not None and intent.action == "list", message
+
+
+def test_ambiguous_falls_back():
+    """含糊的句子不解析, 交给 Supervisor"""
+    for message in [
+        "妈妈在厨房",                 # "在" 后不是方位
+        "我在上班",
+        "它放在哪",                   # 代词
+        "钥匙和钱包放在桌上",          # 多个物品
+        "钥匙放在桌上，钱包放在包里",   # 多个分句
+        "钥匙不在书桌上",              # 否定
+        "书在桌子上吗",                # 疑问
+        "钥匙放在哪里比较好",          # 不是查询记录
+        "我想把书放在桌上",            # 意图不明确
+        "帮我记一下钥匙放在书桌上",
+        "你好",
+        "今天天气怎么样",
+    ]:
+        intent = ItemIntentParser.parse(message, is_known_item=KNOWN)
+        assert intent is None, (message, intent)
+
+
+def test_handle_intent_without_llm():
+    """快速路径直接调用工具实现, 返回结构化响应"""
+    import core.database as database
+    from config import config
+    from core.database import ItemDatabase
+
+    config.OPENAI_API_KEY = config.OPENAI_API_KEY or "sk-test"
+    from agents.item_agent import item_agent
+
+    previous = database._db_instance
+    database._db_instance = ItemDatabase(Path(tempfile.mkdtemp()) / "items.db")
+    db = database._db_instance
+    try:
+        # 新物品不走快速路径
+        assert ItemIntentParser.parse("钥匙放在书桌抽屉里", is_known_item=db.has_item) is None
+        db.remember_item("钥匙", "门口")
+
+        start = time.perf_counter()
+        response = item_agent.handle_intent(ItemIntentParser.parse("钥匙放在书桌抽屉里", is_known_item=db.has_item))
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        print(f"  记录: {response.message} ({elapsed_ms:.1f} ms)")
+        assert response.success and response.agent == "item_agent"
+        assert response.actions[0].type == "item_remembered"
+        assert response.actions[0].data == {"item": "钥匙", "location": "书桌抽屉里", "action": "moved"}
+
+        response = item_agent.handle_intent(ItemIntentParser.parse("钥匙在哪", is_known_item=db.has_item))
+        assert response.actions[0].type == "item_location"
+        assert response.actions[0].data["location"] == "书桌抽屉里"
+
+        # 已记录的物品可以用 "X在Y里" 更新位置, 未记录的主语不解析
+        assert db.has_item("钥匙") and db.has_item("key") and not db.has_item("妈妈")
+        assert ItemIntentParser.parse("妈妈在厨房里", is_known_item=db.has_item) is None
+        assert ItemIntentParser.parse("故宫在哪里？", is_known_item=db.has_item) is None
+        response = item_agent.handle_intent(ItemIntentParser.parse("钥匙在门口挂钩上", is_known_item=db.has_item))
+        assert response.actions[0].data["action"] == "moved", response.actions[0].data
+
+        response = item_agent.handle_intent(ItemIntentParser.parse("我记录了哪些物品"))
+        assert response.actions[0].type == "item_list"
+        assert response.actions[0].data["count"] == 1
+    finally:
+        database._db_instance.close()
+        database._db_instance = previous
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 物品意图解析器测试")
+    print("=" * 80)
+
+    test_remember_patterns()
+    test_requires_known_item()
+    test_query_and_list_patterns()
+    test_ambiguous_falls_back()
+    test_handle_intent_without_llm()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""物品数据库维护测试
+
+验证历史保留策略 (保留最近 N 次移动 / 按时间归档)、归档内容可恢复,
+软删除物品的重建与过期清除, 以及增量 auto_vacuum 回收空闲页
+(旧数据库由后台任务跳过, 手动切换到增量模式)。
+"""
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.database import ItemDatabase
+from core.item_maintenance import (
+    HistoryRetentionEngine,
+    HistoryRetentionPolicy,
+    MaintenanceScheduler,
+    TombstoneManager,
+)
+
+
+def _new_db() -> ItemDatabase:
+    """在临时目录创建数据库"""
+    return ItemDatabase(Path(tempfile.mkdtemp()) / "items.db")
+
+
+def _history_count(db: ItemDatabase) -> int:
+    return db.conn.execute("SELECT COUNT(*) FROM item_history").fetchone()[0]
+
+
+def test_keep_last_moves():
+    """每个物品只保留最近 N 次移动, 其余归档且可恢复"""
+    db = _new_db()
+    try:
+        for i in range(10):
+            db.remember_item("钥匙", f"位置{i}")  # 1 次创建 + 9 次移动
+        db.remember_item("护照", "保险柜")         # 只有创建记录
+        full = db.get_item_history("钥匙")["history"]
+
+        # batch_size=1: 每批一个物品, 验证增量推进
+        engine = HistoryRetentionEngine(db, HistoryRetentionPolicy(keep_last_moves=3, batch_size=1))
+        first = engine.run_increment()
+        assert first.items_scanned == 1 and not first.finished
+
+        stats = engine.run_cycle(pause=0)
+        stats.add(first)
+        print(f"  归档 {stats.rows_archived} 条, 扫描 {stats.items_scanned} 个物品")
+        assert stats.rows_archived == 6
+
+        kept = db.get_item_history("钥匙")["history"]
+        assert [h["action"] for h in kept] == ["move", "move", "move", "create"]
+        assert kept[0]["location"] == "位置9"
+        assert db.get_item_history("护照")["count"] == 1
+
+        # 归档的历史可以完整取回
+        restored = db.get_item_history("钥匙", include_archived=True)["history"]
+        assert restored == full
+
+        # 再次执行无事可做
+        assert engine.run_cycle(pause=0).rows_archived == 0
+    finally:
+        db.close()
+
+
+def test_archive_after_days():
+    """早于 X 天的历史归档, 但每个物品保留最新一条"""
+    db = _new_db()
+    try:
+        db.remember_item("钥匙", "书桌")
+        db.remember_item("钥匙", "玄关")
+        db.remember_item("护照", "保险柜")
+        db.conn.execute("UPDATE item_history SET timestamp = '2020-01-01T00:00:00+00:00'")
+
+        engine = HistoryRetentionEngine(db, HistoryRetentionPolicy(keep_last_moves=0, archive_after_days=30))
+        stats = engine.run_cycle(pause=0)
+        assert stats.rows_archived == 1  # 钥匙的创建记录
+        assert _history_count(db) == 2
+    finally:
+        db.close()
+
+
+def test_incremental_vacuum():
+    """大量历史归档后回收空闲页"""
+    db = _new_db()
+    try:
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        db.remember_items([{"item": f"物品{i}", "location": "柜子"} for i in range(300)])
+        for round_no in range(5):
+            db.remember_items([{"item": f"物品{i}", "location": f"柜子{round_no}" * 20} for i in range(300)])
+
+        HistoryRetentionEngine(db, HistoryRetentionPolicy(keep_last_moves=1)).run_cycle(pause=0)
+        assert _history_count(db) == 600
+
+        free_before = db.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        freed = MaintenanceScheduler(db, vacuum_pages=10000).vacuum()
+        print(f"  空闲页 {free_before}, 回收 {freed}")
+        assert free_before > 0 and freed == free_before
+    finally:
+        db.close()
+
+
+def test_legacy_database_vacuum():
+    """非增量模式的旧数据库: 后台回收跳过 (不执行完整 VACUUM), 手动切换后按增量回收"""
+    path = Path(tempfile.mkdtemp()) / "items.db"
+    legacy = sqlite3.connect(path)
+    legacy.execute("CREATE TABLE legacy (x)")  # 已有数据的文件, auto_vacuum 设置不再生效
+    legacy.close()
+
+    db = ItemDatabase(path)
+    try:
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        db.remember_items([{"item": f"物品{i}", "location": "柜子" * 50} for i in range(300)])
+        for i in range(300):
+            db.delete_item(f"物品{i}")
+        TombstoneManager(db, grace_days=0).purge()
+        free_before = db.conn.execute("PRAGMA freelist_count").fetchone()[0]
+        assert free_before > 0
+
+        scheduler = MaintenanceScheduler(db, vacuum_pages=10)
+        assert scheduler.vacuum() == 0
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 0
+        assert db.conn.execute("PRAGMA freelist_count").fetchone()[0] == free_before
+
+        assert scheduler.convert_to_incremental() == 1
+        assert db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert scheduler.convert_to_incremental() == 0
+        print(f"  空闲页 {free_before}, 切换后 {db.conn.execute('PRAGMA freelist_count').fetchone()[0]}")
+    finally:
+        db.close()
+
+
+def _count(db: ItemDatabase, sql: str) -> int:
+    return db.conn.execute(sql).fetchone()[0]
+
+
+def test_recreate_soft_deleted():
+    """软删除后可以用同名重新记录"""
+    db = _new_db()
+    try:
+        db.remember_item("钥匙", "书桌")
+        assert db.delete_item("钥匙")["status"] == "success"
+        assert db.delete_item("钥匙")["status"] == "not_found"  # 已删除的不再计入
+
+        result = db.remember_item("钥匙", "玄关")
+        assert result["status"] == "success"
+        assert db.query_item("钥匙")["location"] == "玄关"
+        assert db.get_item_history("钥匙")["count"] == 1  # 旧记录的历史一并清除
+
+        db.remember_item("护照", "保险柜")
+        db.delete_item("护照")
+        db.remember_items([{"item": "护照", "location": "抽屉"}])
+        assert db.query_item("护照")["location"] == "抽屉"
+    finally:
+        db.close()
+
+
+def test_tombstone_purge():
+    """超过保留期的软删除物品连同历史、n-gram、全文索引一起清除"""
+    db = _new_db()
+    try:
+        db.remember_items([{"item": f"物品{i}", "location": "柜子"} for i in range(10)])
+        for i in range(6):
+            db.delete_item(f"物品{i}")
+        # 4 个删除于 60 天前, 2 个刚删除
+        db.conn.execute("""
+            UPDATE items SET updated_at = '2020-01-01T00:00:00+00:00'
+            WHERE item_name IN ('物品0', '物品1', '物品2', '物品3')
+        """)
+
+        manager = TombstoneManager(db, grace_days=30, batch_size=3)
+        assert manager.purge() == 4
+        assert _count(db, "SELECT COUNT(*) FROM items") == 6
+        assert _count(db, "SELECT COUNT(*) FROM items WHERE is_deleted = 1") == 2
+        assert _count(db, "SELECT COUNT(*) FROM items_fts") == 6
+        assert _count(db, "SELECT COUNT(DISTINCT item_id) FROM item_ngrams") == 6
+        assert _count(db, "SELECT COUNT(*) FROM item_history") == 6
+        assert db.query_item("物品7")["status"] == "success"
+
+        # merge / optimize 后全文检索仍然可用
+        manager.merge_fts(pages=100)
+        manager.optimize_fts()
+        assert db.query_item("物品9")["location"] == "柜子"
+        assert manager.purge() == 0
+
+        steps = MaintenanceScheduler(db, tombstone_grace_days=0).run_once(only=["tombstone_purge"])
+        print(f"  {[(step.name, step.result, round(step.seconds, 4)) for step in steps]}")
+        assert steps[0].result == 2
+    finally:
+        db.close()
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 数据库维护测试")
+    print("=" * 80)
+
+    test_keep_last_moves()
+    test_archive_after_days()
+    test_incremental_vacuum()
+    test_legacy_database_vacuum()
+    test_recreate_soft_deleted()
+    test_tombstone_purge()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
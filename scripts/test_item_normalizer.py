@@ -0,0 +1,84 @@
+"""测试物品名称规范化模块
+
+验证 item_normalizer 的规范化、别名、关键词提取结果,
+以及缓存结果不可变、可在调用方之间安全共享。
+"""
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core import item_normalizer
+from core.database import extract_aliases, extract_keywords
+
+
+def test_normalize():
+    """转小写、去标点、压缩空格"""
+    cases = {
+        "  iPad平板 ": "ipad平板",
+        "钥匙，备用": "钥匙备用",
+        "《三体》": "三体",
+        "Mac   Book\tPro": "mac book pro",
+    }
+    for raw, expected in cases.items():
+        actual = item_normalizer.normalize(raw)
+        print(f"  '{raw}' → '{actual}'")
+        assert actual == expected
+
+
+def test_aliases():
+    """别名包含原名称和映射别名, 去重且顺序稳定"""
+    assert item_normalizer.aliases("笔记本电脑") == ("笔记本电脑", "电脑", "笔记本", "laptop")
+    assert item_normalizer.aliases("苹果手机") == ("苹果手机", "电话", "phone")
+    assert item_normalizer.normalized_aliases("iPad平板") == ("ipad平板",)
+
+    # 兼容接口返回新列表, 修改不影响缓存
+    aliases = extract_aliases("钥匙")
+    aliases.append("修改")
+    assert item_normalizer.aliases("钥匙") == ("钥匙", "key")
+
+
+def test_keywords_single_pass_stopwords():
+    """停用词一次扫描移除, 长停用词优先"""
+    keywords = extract_keywords("摩托车的钥匙")
+    print(f"  摩托车的钥匙 → {keywords}")
+    assert keywords == ["摩托车的钥匙", "摩托车", "钥匙"]
+
+    # "没有" 整体作为停用词移除, 不会残留 "没"
+    assert extract_keywords("盒子没有钥匙") == ["盒子没有钥匙", "盒子", "钥匙"]
+
+    # 长词提取 2-4 字子串, 同长度按字典序
+    keywords = item_normalizer.keywords("蓝色保温杯子")
+    assert keywords[0] == "蓝色保温杯子"
+    assert {"蓝色", "保温杯", "保温杯子"} <= set(keywords)
+    assert list(keywords) == sorted(keywords, key=lambda word: (-len(word), word))
+
+
+def test_cache_hits():
+    """重复调用命中缓存"""
+    item_normalizer.clear_caches()
+    for _ in range(3):
+        item_normalizer.keywords("摩托车的钥匙")
+    info = item_normalizer.cache_info()
+    print(f"  {info['keywords']}")
+    assert info['keywords']['hits'] == 2
+    assert info['keywords']['misses'] == 1
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 物品名称规范化测试")
+    print("=" * 80)
+
+    test_normalize()
+    test_aliases()
+    test_keywords_single_pass_stopwords()
+    test_cache_hits()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""测试共享 LLM 客户端工厂
+
+验证相同参数复用同一个模型实例和连接池、不同模型使用独立连接池,
+连接池参数来自配置, 以及各 Agent 共享同一个 HTTP 客户端。
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造客户端, 不会调用模型
+
+from config import config
+from core.llm_factory import (
+    close_http_clients, get_async_http_client, get_chat_model, get_embeddings, get_http_client,
+)
+
+config.OPENAI_API_KEY = config.OPENAI_API_KEY or "sk-test"
+
+
+def test_shared_instances():
+    """相同参数返回同一个实例; 同一模型的不同温度共享连接池"""
+    close_http_clients()
+    model = get_chat_model(temperature=0)
+    assert get_chat_model(config.AGENT_MODEL, temperature=0) is model
+
+    creative = get_chat_model(temperature=0.7)
+    assert creative is not model
+    assert creative.root_client._client is model.root_client._client
+    assert model.root_client._client is get_http_client(config.OPENAI_API_BASE, config.AGENT_MODEL)
+    assert model.root_async_client._client is get_async_http_client(config.OPENAI_API_BASE, config.AGENT_MODEL)
+
+    # 不同模型 / 地址使用独立连接池
+    other = get_chat_model("another-model", temperature=0)
+    assert other.root_client._client is not model.root_client._client
+    assert get_http_client("http://localhost:1/v1", config.AGENT_MODEL) is not model.root_client._client
+
+    embeddings = get_embeddings()
+    assert get_embeddings(config.EMBEDDING_MODEL) is embeddings
+    assert embeddings.client._client._client is get_http_client(config.OPENAI_API_BASE, config.EMBEDDING_MODEL)
+    print(f"  连接池: {config.AGENT_MODEL}, another-model, {config.EMBEDDING_MODEL}")
+
+
+def test_pool_settings():
+    """连接池大小、超时和重试次数来自配置"""
+    close_http_clients()
+    model = get_chat_model(temperature=0)
+    assert model.max_retries == config.LLM_MAX_RETRIES
+
+    client = model.root_client._client
+    assert client.timeout.read == config.LLM_TIMEOUT_SECONDS
+    assert client.timeout.connect == config.LLM_CONNECT_TIMEOUT_SECONDS
+
+    pool = client._transport._pool
+    print(f"  max_connections={pool._max_connections}, max_keepalive={pool._max_keepalive_connections}, "
+          f"keepalive_expiry={pool._keepalive_expiry}, retries={pool._retries}")
+    assert pool._max_connections == config.LLM_POOL_MAX_CONNECTIONS
+    assert pool._max_keepalive_connections == config.LLM_POOL_MAX_KEEPALIVE
+    assert pool._keepalive_expiry == config.LLM_KEEPALIVE_SECONDS
+    assert pool._retries == config.LLM_MAX_RETRIES
+
+
+def test_close_http_clients():
+    """同步和异步连接池都被关闭, 之后重新创建连接池和实例 (在事件循环中调用同样可用)"""
+    model = get_chat_model(temperature=0)
+    client, async_client = model.root_client._client, model.root_async_client._client
+    close_http_clients()
+    assert client.is_closed and async_client.is_closed
+    assert get_chat_model(temperature=0) is not model
+
+    async def close_in_loop():
+        async_client = get_async_http_client(config.OPENAI_API_BASE, config.AGENT_MODEL)
+        close_http_clients()
+        return async_client
+
+    assert asyncio.run(close_in_loop()).is_closed
+
+
+def test_agents_share_client():
+    """各 Agent 和工具共用同一个连接池"""
+    from agents.calendar_agent.agent import calendar_agent
+    from agents.chat_agent.agent import chat_agent
+    from agents.item_agent.agent import item_agent
+    from agents.note_agent.agent import note_agent
+
+    clients = {
+        agent.name: agent.model.root_client._client
+        for agent in (calendar_agent, chat_agent, item_agent, note_agent)
+    }
+    print(f"  {sorted(clients)}")
+    assert len({id(client) for client in clients.values()}) == 1
+    assert calendar_agent.model is item_agent.model is note_agent.model
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 LLM 客户端工厂测试")
+    print("=" * 80)
+
+    test_shared_instances()
+    test_pool_settings()
+    test_close_http_clients()
+    test_agents_share_client()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""测试运行指标
+
+验证按线程分片的计数器和直方图在多线程下的合并 (含已退出线程的分片)、Prometheus 文本格式,
+LLM 调用通过回调自动计数, 以及 GET /metrics 输出请求延迟、物品查询延迟、缓存和 Zep 积压等指标。
+"""
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造模型, 不会调用
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+
+from core.agent_base import run_agent_graph
+from core.metrics import CONTENT_TYPE, MetricsRegistry, render_metrics
+from test_chat_stream import ScriptedModel
+
+
+def _parse(text: str) -> dict:
+    """解析 Prometheus 文本为 {'name{labels}': 值}"""
+    samples = {}
+    for line in text.splitlines():
+        if line and not line.startswith('#'):
+            key, _, value = line.rpartition(' ')
+            samples[key] = float(value)
+    return samples
+
+
+def test_per_thread_aggregation():
+    """各线程写自己的分片, 抓取时合并; 已退出线程的计数保留"""
+    registry = MetricsRegistry()
+    requests = registry.counter("test_requests_total", "请求数", ("agent",))
+    latency = registry.histogram("test_latency_seconds", "耗时", (), buckets=(0.1, 1))
+
+    def work():
+        for i in range(1000):
+            requests.inc("note_agent")
+            latency.observe(0.05 if i % 2 else 0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    # 写入过程中抓取不会出错
+    registry.render()
+    for thread in threads:
+        thread.join()
+
+    requests.inc("item_agent", amount=2)
+    samples = _parse(registry.render())
+    print(f"  {samples}")
+    assert samples['test_requests_total{agent="note_agent"}'] == 8000
+    assert samples['test_requests_total{agent="item_agent"}'] == 2
+    assert samples['test_latency_seconds_bucket{le="0.1"}'] == 4000
+    assert samples['test_latency_seconds_bucket{le="1"}'] == 8000
+    assert samples['test_latency_seconds_bucket{le="+Inf"}'] == 8000
+    assert samples['test_latency_seconds_count'] == 8000
+    assert abs(samples['test_latency_seconds_sum'] - 2200) < 1e-6
+    # 已退出线程的分片已合并, 只剩当前线程
+    assert len(registry._shards) == 1
+
+    disabled = MetricsRegistry(enabled=False)
+    counter = disabled.counter("test_disabled_total", "不记录")
+    counter.inc()
+    assert disabled.snapshot() == {}
+
+
+def test_text_format():
+    """标签值转义, 采集函数出错时跳过"""
+    registry = MetricsRegistry()
+    registry.counter("test_total", "说明", ("name",)).inc('a"b\\c')
+    registry.register_collector(lambda: [("test_gauge", "gauge", "采集", [({'x': '1'}, 2.5)])])
+    registry.register_collector(lambda: 1 / 0)
+    text = registry.render()
+    print(text)
+    assert '# TYPE test_total counter' in text
+    assert 'test_total{name="a\\"b\\\\c"} 1' in text
+    assert 'test_gauge{x="1"} 2.5' in text
+
+
+def test_llm_metrics():
+    """Agent 图内的 LLM 调用按模型自动计数"""
+    key = 'youyou_llm_duration_seconds_count{model="ScriptedModel",status="success"}'
+    before = _parse(render_metrics()).get(key, 0)
+    graph = create_agent(model=ScriptedModel(replies=[AIMessage(content="你好")]), tools=[])
+    run_agent_graph(graph, [{"role": "user", "content": "你好"}], "chat_agent")
+    assert _parse(render_metrics())[key] == before + 1
+
+
+def test_metrics_endpoint():
+    """GET /metrics 输出请求延迟、物品查询延迟、缓存和 Zep 积压; ASGI 模式下同样可用"""
+    import core.database as database
+    import core.interaction_logger as interaction_logger_module
+    from core.database import ItemDatabase
+    from core.interaction_logger import InteractionLogger
+    from starlette.testclient import TestClient
+    from asgi_app import app as asgi_app
+    import server
+
+    data_dir = Path(tempfile.mkdtemp())
+    previous = (database._db_instance, interaction_logger_module._interaction_logger)
+    database._db_instance = ItemDatabase(data_dir / "items.db")
+    database._db_instance.remember_item("钥匙", "门口")  # 快速路径只处理已记录的物品
+    interaction_logger_module._interaction_logger = InteractionLogger(data_dir)
+    try:
+        client = server.app.test_client()
+        stage = 'routing_stage="item_fast_path",final_agent="item_agent",status="success"'
+        before = _parse(client.get("/metrics").get_data(as_text=True))
+
+        client.post("/api/v1/chat/message", json={"message": "钥匙放在书桌上"})
+        client.post("/api/v1/chat/message", json={"message": "钥匙在哪"})
+
+        result = client.get("/metrics")
+        assert result.status_code == 200 and result.headers["Content-Type"] == CONTENT_TYPE
+        samples = _parse(result.get_data(as_text=True))
+        delta = lambda key: samples[key] - before.get(key, 0)
+        print(f"  请求 +{delta(f'youyou_request_duration_seconds_count{{{stage}}}'):.0f}, "
+              f"精确查询 +{delta('youyou_item_query_duration_seconds_count{match_type=\"exact\"}'):.0f}")
+        assert delta(f'youyou_request_duration_seconds_count{{{stage}}}') == 2
+        assert delta('youyou_item_query_duration_seconds_count{match_type="exact"}') == 1
+        assert 'youyou_zep_persist_pending' in samples
+
+        asgi = TestClient(asgi_app).get("/metrics")
+        assert asgi.status_code == 200 and "youyou_request_duration_seconds" in asgi.text
+
+        server.config.METRICS_ENABLED = False
+        try:
+            assert client.get("/metrics").status_code == 404
+        finally:
+            server.config.METRICS_ENABLED = True
+    finally:
+        database._db_instance.close()
+        database._db_instance, interaction_logger_module._interaction_logger = previous
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 运行指标测试")
+    print("=" * 80)
+
+    test_per_thread_aggregation()
+    test_text_format()
+    test_llm_metrics()
+    test_metrics_endpoint()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
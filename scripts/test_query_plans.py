@@ -0,0 +1,113 @@
+"""物品数据库查询计划回归测试
+
+通过 sqlite3 的 trace 回调记录 ItemDatabase 公开接口实际执行的每条 SQL
+(参数已展开), 再对其执行 EXPLAIN QUERY PLAN, 断言没有对
+items / item_history / item_ngrams 的全表 (或全索引) 扫描。
+
+新增查询或调整索引后运行本测试, 防止查询退化为全表扫描。
+"""
+import re
+import sqlite3
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.database import ItemDatabase
+
+# 计划中出现这些表的 SCAN 即视为全表扫描 (items_fts 虚拟表除外)
+FULL_SCAN_RE = re.compile(r'^SCAN (items|item_history|item_ngrams)\b')
+
+
+class _TracedItemDatabase(ItemDatabase):
+    """记录所有连接 (写连接 + 只读连接) 执行的 SQL"""
+
+    def __init__(self, *args, **kwargs):
+        self.statements = []
+        super().__init__(*args, **kwargs)
+        self.conn.set_trace_callback(self.statements.append)
+
+    def _open_reader(self):
+        conn = super()._open_reader()
+        conn.set_trace_callback(self.statements.append)
+        return conn
+
+
+def _run_workload(db: ItemDatabase) -> None:
+    """覆盖物品数据库的所有查询形态"""
+    db.remember_items([
+        {"item": f"物品{i}", "location": f"柜子{i % 5}"} for i in range(50)
+    ] + [
+        {"item": "苹果手机", "location": "客厅沙发"},
+        {"item": "摩托车钥匙", "location": "门口挂钩"},
+        {"item": "笔记本电脑", "location": "书桌"},
+    ])
+    db.remember_item("钥匙", "书桌")          # 新建
+    db.remember_item("钥匙", "书桌")          # 确认
+    db.remember_item("钥匙", "玄关")          # 移动
+
+    db.query_item("钥匙")                     # 精确匹配
+    db.query_item("phone")                    # 别名匹配
+    db.query_item("摩托车的钥匙")              # 全文 / n-gram
+    db.query_item("时光机")                   # 未找到
+    db.query_items(["钥匙", "电脑", "不存在的东西"])
+
+    page = db.list_items(limit=10)
+    db.list_items(limit=10, cursor=page["next_cursor"], fields=["item", "location"])
+    db.list_all_items()
+    db.count_items()
+    db.get_item_history("钥匙")
+
+    db.flush_access_stats()
+    db.delete_item("物品1")
+    db.delete_item("物品2", soft=False)
+    db.query_item("phone")                    # 删除后重新构建别名索引之外的查询路径
+
+
+def test_no_full_table_scans():
+    """所有查询都应通过索引定位"""
+    db = _TracedItemDatabase(Path(tempfile.mkdtemp()) / "items.db")
+    try:
+        db.statements.clear()  # 忽略初始化 (迁移) 阶段
+        _run_workload(db)
+
+        statements = [
+            sql for sql in dict.fromkeys(db.statements)
+            if sql.lstrip().upper().startswith(('SELECT', 'UPDATE', 'DELETE'))
+        ]
+        assert statements
+
+        conn = sqlite3.connect(str(db.db_path))
+        failures = []
+        try:
+            for sql in statements:
+                plan = [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+                scans = [step for step in plan if FULL_SCAN_RE.match(step)]
+                if scans:
+                    failures.append((" ".join(sql.split()), scans))
+        finally:
+            conn.close()
+
+        print(f"  检查 {len(statements)} 条语句")
+        for sql, scans in failures:
+            print(f"  ✗ {sql[:120]}\n      {scans}")
+        assert not failures
+    finally:
+        db.close()
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 查询计划回归测试")
+    print("=" * 80)
+
+    test_no_full_table_scans()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
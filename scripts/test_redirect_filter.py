@@ -0,0 +1,151 @@
+"""测试回退预判过滤器
+
+验证从回退记录生成负向模式、KeywordRouter 跳过历史上会回退的消息,
+以及从交互日志读取样本和统计节省的耗时。
+"""
+import sqlite3
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+import core.redirect_filter as redirect_filter_module
+from core.interaction_logger import InteractionLog, InteractionLogger
+from core.keyword_router import KeywordRouter
+from core.redirect_filter import (
+    MATCH_MESSAGE, MATCH_NGRAM, RedirectFilter, load_calendar_outcomes, normalize_message,
+    redirect_savings_report,
+)
+
+# 带 "安排" 等动作词、会被关键词路由到 calendar_agent 但实际不是日程的消息
+REDIRECTED = ["帮我安排明天的穿搭", "安排一下后天的穿搭？", "周末穿搭怎么安排", "下午茶安排在哪家店", "帮我安排一份减脂食谱"]
+ACCEPTED = ["明天8点开会", "安排明天下午3点体检", "提醒我明天穿正装去面试", "下周一安排团队会议"]
+PROTECTED = KeywordRouter.CALENDAR_ACTION_KEYWORDS + KeywordRouter.CALENDAR_TIME_EXPRESSIONS
+
+
+def test_build_and_check():
+    """整句和片段模式; 成功处理过的日历消息不受影响"""
+    assert normalize_message("明天 8点，开会!") == normalize_message("明天10点开会") == "明天0点开会"
+
+    redirect_filter = RedirectFilter.build(REDIRECTED, ACCEPTED, protected=PROTECTED)
+    print(f"  {redirect_filter.metadata}")
+
+    assert redirect_filter.check("帮我安排一份减脂食谱!") == MATCH_MESSAGE
+    assert redirect_filter.check("下周的穿搭安排一下") == MATCH_NGRAM  # "穿搭" 出现在 3 条回退消息中
+    for message in ACCEPTED + ["明天9点开会", "周五穿正装参加婚礼", "帮我安排明天的会议"]:
+        assert redirect_filter.check(message) is None, message
+
+    # 日历关键词本身不会成为片段模式
+    redirect_filter = RedirectFilter.build(["明天穿什么", "明天吃什么", "明天去哪"], [], min_support=3,
+                                           protected=PROTECTED)
+    assert redirect_filter.check("明天下午开会") is None
+
+
+def test_keyword_router_skips_filtered():
+    """命中过滤器时不路由到 calendar_agent; 显式标记不受影响"""
+    previous = (redirect_filter_module._filter, redirect_filter_module._filter_loaded)
+    redirect_filter_module._filter, redirect_filter_module._filter_loaded = None, True
+    try:
+        # 没有过滤器时照常路由
+        assert KeywordRouter.match("周末穿搭怎么安排呢").target_agent == "calendar_agent"
+
+        redirect_filter_module._filter = RedirectFilter.build(REDIRECTED, ACCEPTED, protected=PROTECTED)
+        result = KeywordRouter.match("周末穿搭怎么安排呢")
+        print(f"  {result.matched_keywords}")
+        assert not result.matched and result.filtered
+        assert result.matched_keywords == ["动作:安排", f"排除:历史回退({MATCH_NGRAM})"]
+
+        assert KeywordRouter.match("明天8点开会").target_agent == "calendar_agent"
+        assert KeywordRouter.match("#提醒 周末穿搭怎么安排").target_agent == "calendar_agent"
+    finally:
+        redirect_filter_module._filter, redirect_filter_module._filter_loaded = previous
+
+
+def _log(interaction_logger, user_input, response_time_ms, **kwargs):
+    interaction_logger.log(InteractionLog(
+        user_id="test",
+        timestamp=datetime.now().isoformat(),
+        user_input=user_input,
+        input_length=len(user_input),
+        response_time_ms=response_time_ms,
+        routing_matched=True,
+        **kwargs
+    ))
+
+
+def test_outcomes_and_report():
+    """从日志读取回退样本, 统计节省的耗时; 旧日志库自动补充新列"""
+    data_dir = Path(tempfile.mkdtemp())
+    db_path = data_dir / InteractionLogger.DB_FILE
+
+    # 旧版本日志库: 没有 redirect_filtered 列
+    conn = sqlite3.connect(str(db_path))
+    conn.execute("""
+        CREATE TABLE interaction_logs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT, user_id TEXT NOT NULL, timestamp DATETIME,
+            user_input TEXT NOT NULL, input_length INTEGER, routing_stage TEXT, routing_matched BOOLEAN,
+            routing_keywords TEXT, target_agent TEXT, redirect_occurred BOOLEAN DEFAULT 0,
+            redirect_reason TEXT, final_agent TEXT, response_text TEXT, response_length INTEGER,
+            response_time_ms INTEGER, status TEXT, error_message TEXT, created_date TEXT
+        )
+    """)
+    conn.close()
+    assert redirect_savings_report(db_path)['filtered'] == {'count': 0, 'avg_ms': None}
+
+    interaction_logger = InteractionLogger(data_dir)
+    keyword = dict(routing_stage='keyword', target_agent='calendar_agent')
+    _log(interaction_logger, "明天8点开会", 2000, final_agent='calendar_agent', **keyword)
+    _log(interaction_logger, "明天穿什么", 6000, final_agent='chat_agent', redirect_occurred=True,
+         status='redirect', **keyword)
+    _log(interaction_logger, "后天吃什么", 5000, final_agent='supervisor', redirect_occurred=True,
+         status='redirect', **keyword)
+    _log(interaction_logger, "周五穿什么", 2500, routing_stage='supervisor', target_agent='supervisor',
+         final_agent='chat_agent', redirect_filtered=True)
+    # 被过滤但 Supervisor 仍交给了 calendar_agent: 算作成功处理
+    _log(interaction_logger, "下午穿什么去开会", 3000, routing_stage='supervisor', target_agent='supervisor',
+         final_agent='calendar_agent', redirect_filtered=True)
+
+    outcomes = load_calendar_outcomes(db_path)
+    print(f"  {outcomes}")
+    assert outcomes['redirected'] == ["明天穿什么", "后天吃什么", "周五穿什么"]
+    assert outcomes['accepted'] == ["明天8点开会", "下午穿什么去开会"]
+
+    report = redirect_savings_report(db_path)
+    print(f"  {report}")
+    assert report['calendar_redirected'] == {'count': 2, 'avg_ms': 5500.0}
+    assert report['filtered'] == {'count': 2, 'avg_ms': 2750.0}
+    assert report['saved_ms_per_request'] == 2750.0 and report['saved_ms_total'] == 5500
+    assert report['filter_hit_rate'] == 0.5
+
+
+def test_save_and_load():
+    """过滤器文件只保存哈希, 加载后结果一致"""
+    redirect_filter = RedirectFilter.build(REDIRECTED, ACCEPTED, protected=PROTECTED)
+    path = Path(tempfile.mkdtemp()) / "redirect_filter.json"
+    redirect_filter.save(path)
+    assert "穿搭" not in path.read_text(encoding='utf-8')
+
+    loaded = RedirectFilter.load(path)
+    assert len(loaded) == len(redirect_filter) and loaded.version == redirect_filter.version
+    assert loaded.check("下周的穿搭安排一下") == MATCH_NGRAM
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 回退预判过滤器测试")
+    print("=" * 80)
+
+    test_build_and_check()
+    test_keyword_router_skips_filtered()
+    test_outcomes_and_report()
+    test_save_and_load()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,219 @@
+"""测试 Agent 响应缓存
+
+验证输入归一化、TTL 和 LRU 淘汰、命中/未命中计数,
+缓存装饰器只缓存只读请求, 以及物品/笔记存储的数据版本在写入后变化。
+"""
+import asyncio
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+import core.response_cache as response_cache_module
+from config import Config
+from core.database import ItemDatabase
+from core.db_sharding import ShardedItemDatabase
+from core.response_cache import ResponseCache, cached_response, normalize_query
+from core.response_types import AgentResponse
+
+
+def _response(message: str, success: bool = True) -> AgentResponse:
+    return AgentResponse(success=success, agent="item_agent", message=message)
+
+
+def test_normalize_query():
+    """全角/半角、空白和句末标点不影响缓存键, 数字和句中标点保留"""
+    assert normalize_query("我记录了哪些物品？") == normalize_query(" 我记录了哪些物品 ") == "我记录了哪些物品"
+    assert normalize_query("搜索  Python\t笔记!") == "搜索 python 笔记"
+    assert normalize_query("3号柜里有什么") != normalize_query("4号柜里有什么")
+    assert normalize_query("C++ 笔记") != normalize_query("C 笔记")
+
+
+def test_ttl_and_lru():
+    """过期条目不返回; 超出容量时淘汰最久未使用的条目"""
+    cache = ResponseCache(max_entries=2, ttl_seconds=0.05)
+    cache.put("a", _response("A"))
+    assert cache.get("a").message == "A"
+    time.sleep(0.06)
+    assert cache.get("a") is None
+
+    cache = ResponseCache(max_entries=2, ttl_seconds=60)
+    cache.put("a", _response("A"))
+    cache.put("b", _response("B"))
+    cache.get("a")  # a 变为最近使用
+    cache.put("c", _response("C"))
+    assert cache.get("b") is None and cache.get("a") is not None and cache.get("c") is not None
+
+    # 返回副本, 修改不影响缓存
+    cache.get("a").message = "changed"
+    assert cache.get("a").message == "A"
+
+    stats = cache.stats()
+    print(f"  {stats}")
+    assert stats['hits'] == 5 and stats['misses'] == 1 and stats['evictions'] == 1
+    assert stats['size'] == 2 and stats['hit_rate'] == round(5 / 6, 4)
+
+
+class CountingAgent:
+    """每次 invoke 计数; 以 "记录" 开头的请求会修改数据版本"""
+
+    def __init__(self):
+        self.version = 0
+        self.calls = 0
+
+    @cached_response("test_agent", lambda: (agent.version,))
+    def invoke(self, query: str) -> AgentResponse:
+        self.calls += 1
+        if query.startswith("记录"):
+            self.version += 1
+            return _response("已记录")
+        if query.startswith("出错"):
+            return _response("失败", success=False)
+        if query.startswith("回退"):
+            return _response("[REDIRECT:不是物品问题]")
+        return _response(f"第 {self.calls} 次回答")
+
+
+agent = CountingAgent()
+
+
+def test_cached_response_decorator():
+    """只读请求命中缓存; 写操作、失败和回退不缓存; 数据版本变化后重新调用"""
+    previous = (response_cache_module._cache, response_cache_module._cache_loaded)
+    cache = ResponseCache(max_entries=16, ttl_seconds=60)
+    response_cache_module._cache, response_cache_module._cache_loaded = cache, True
+    try:
+        first = agent.invoke("我记录了哪些物品？")
+        assert agent.invoke("我记录了哪些物品?").message == first.message
+        assert agent.calls == 1
+
+        # 写操作: 调用期间数据版本变化, 不缓存, 重复请求会再次执行
+        agent.invoke("记录钥匙在书桌")
+        agent.invoke("记录钥匙在书桌")
+        assert agent.calls == 3
+
+        # 数据版本已变化, 之前的回答不再命中
+        assert agent.invoke("我记录了哪些物品").message == "第 4 次回答"
+        assert agent.invoke("我记录了哪些物品").message == "第 4 次回答"
+
+        for query in ["出错了", "出错了", "回退一下", "回退一下"]:
+            agent.invoke(query)
+        assert agent.calls == 8
+
+        stats = cache.stats()
+        print(f"  {stats}")
+        assert stats['hits'] == 2 and stats['stores'] == 2 and stats['uncacheable'] == 6
+
+        # 未启用缓存时直接调用
+        response_cache_module._cache = None
+        agent.invoke("我记录了哪些物品")
+        assert agent.calls == 9
+    finally:
+        response_cache_module._cache, response_cache_module._cache_loaded = previous
+
+
+class AsyncCountingAgent(CountingAgent):
+    @cached_response("test_agent", lambda: (async_agent.version,))
+    async def ainvoke(self, query: str) -> AgentResponse:
+        await asyncio.sleep(0)
+        return CountingAgent.invoke.__wrapped__(self, query)
+
+
+async_agent = AsyncCountingAgent()
+
+
+def test_cached_response_async():
+    """async def ainvoke 同样只缓存只读请求"""
+    previous = (response_cache_module._cache, response_cache_module._cache_loaded)
+    cache = ResponseCache(max_entries=16, ttl_seconds=60)
+    response_cache_module._cache, response_cache_module._cache_loaded = cache, True
+    try:
+        for query in ["我记录了哪些物品", "我记录了哪些物品？", "记录钥匙在书桌", "记录钥匙在书桌"]:
+            asyncio.run(async_agent.ainvoke(query))
+        assert async_agent.calls == 3
+        assert asyncio.run(async_agent.ainvoke("我记录了哪些物品")).message == "第 4 次回答"
+        stats = cache.stats()
+        print(f"  {stats}")
+        assert stats['hits'] == 1 and stats['stores'] == 2 and stats['uncacheable'] == 2
+    finally:
+        response_cache_module._cache, response_cache_module._cache_loaded = previous
+
+
+def test_item_data_version():
+    """物品写入后版本变化; 访问统计不影响版本; 其他连接的写入同样会被发现"""
+    db_path = Path(tempfile.mkdtemp()) / "items.db"
+    db = ItemDatabase(db_path)
+    try:
+        v0 = db.data_version()
+        db.remember_item("钥匙", "书桌")
+        v1 = db.data_version()
+        assert v1 != v0
+
+        db.query_item("钥匙")
+        assert db.flush_access_stats() == 1
+        assert db.data_version() == v1
+
+        # 其他进程直接写入数据库文件
+        conn = sqlite3.connect(str(db_path))
+        conn.execute("UPDATE items SET location = '抽屉'")
+        conn.commit()
+        conn.close()
+        v2 = db.data_version()
+        print(f"  {v0} → {v1} → {v2}")
+        assert v2 != v1
+    finally:
+        db.close()
+
+    # 分片模式: 按用户路由; 分片关闭后重新打开不会复用旧版本号
+    sharded = ShardedItemDatabase(Path(tempfile.mkdtemp()), max_open=1)
+    try:
+        alice = sharded.data_version('alice')
+        sharded.remember_item("钥匙", "书桌", user_id='alice')
+        assert sharded.data_version('alice') != alice
+        sharded.data_version('bob')  # 挤出 alice 的分片
+        assert sharded.data_version('alice') != alice
+    finally:
+        sharded.close()
+
+
+def test_note_data_version():
+    """保存和删除笔记后版本变化"""
+    from tools.storage import NoteStorage, NoteType
+
+    config = Config()
+    config.DATA_DIR = Path(tempfile.mkdtemp())
+    storage = NoteStorage(config)
+
+    v0 = storage.data_version()
+    storage.save_note("n1", NoteType.INSPIRATION, "想法", "内容", {}, [])
+    v1 = storage.data_version()
+    storage.list_notes()
+    assert storage.data_version() == v1
+    storage.delete_note("n1")
+    v2 = storage.data_version()
+    print(f"  {v0} → {v1} → {v2}")
+    assert len({v0, v1, v2}) == 3
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 响应缓存测试")
+    print("=" * 80)
+
+    test_normalize_query()
+    test_ttl_and_lru()
+    test_cached_response_decorator()
+    test_cached_response_async()
+    test_item_data_version()
+    test_note_data_version()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
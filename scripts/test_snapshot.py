@@ -0,0 +1,126 @@
+"""在线快照测试
+
+验证写入进行中也能导出一致的快照、归档包含 manifest 且校验通过、
+快照中的数据库可直接打开, 以及旧快照按数量清理。
+"""
+import io
+import json
+import sqlite3
+import sys
+import tarfile
+import tempfile
+import threading
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+from core.database import ItemDatabase
+from core.snapshot import MANIFEST_NAME, create_snapshot, list_snapshots, verify_snapshot
+
+
+def _make_data_dir() -> Path:
+    """构造包含所有存储的数据目录"""
+    data_dir = Path(tempfile.mkdtemp())
+
+    notes_dir = data_dir / "notes"
+    collection_dir = notes_dir / "qdrant" / "collection" / "notes"
+    collection_dir.mkdir(parents=True)
+    (notes_dir / "qdrant" / "meta.json").write_text('{"collections": {}, "aliases": {}}')
+    (notes_dir / "qdrant" / ".lock").write_text("")
+
+    for path, table in ((notes_dir / "notes.db", "notes"),
+                        (collection_dir / "storage.sqlite", "points"),
+                        (data_dir / "interaction_logs.db", "interaction_logs")):
+        conn = sqlite3.connect(str(path))
+        conn.execute(f"CREATE TABLE {table} (id INTEGER PRIMARY KEY, value TEXT)")
+        conn.execute(f"INSERT INTO {table} (value) VALUES ('a'), ('b')")
+        conn.commit()
+        conn.close()
+    return data_dir
+
+
+def test_snapshot_during_writes():
+    """写入进行中导出快照"""
+    data_dir = _make_data_dir()
+    db = ItemDatabase(data_dir / "items.db")
+    db.remember_items([{"item": f"物品{i}", "location": "柜子"} for i in range(500)])
+
+    stop = threading.Event()
+    writes = []
+
+    def writer():
+        while not stop.is_set():
+            db.remember_item(f"新物品{len(writes)}", "书桌")
+            writes.append(1)
+
+    thread = threading.Thread(target=writer)
+    thread.start()
+    try:
+        result = create_snapshot(data_dir, output_dir=data_dir / "snapshots", keep=0)
+    finally:
+        stop.set()
+        thread.join()
+        db.close()
+
+    names = [entry['name'] for entry in result['manifest']['files']]
+    print(f"  {names}, 快照期间写入 {len(writes)} 次")
+    assert names == ["items.db", "interaction_logs.db", "notes/notes.db",
+                     "notes/qdrant/collection/notes/storage.sqlite", "notes/qdrant/meta.json"]
+    assert verify_snapshot(Path(result['archive']))['ok']
+
+    # 解压后的数据库可以直接打开, 内容是某一时刻的一致状态
+    extract_dir = Path(tempfile.mkdtemp())
+    with tarfile.open(result['archive']) as tar:
+        tar.extractall(extract_dir, filter="data")
+    assert json.loads((extract_dir / MANIFEST_NAME).read_text())['format'] == 1
+    restored = ItemDatabase(extract_dir / "items.db")
+    try:
+        assert restored.count_items() >= 500
+        assert restored.query_item("物品42")["location"] == "柜子"
+    finally:
+        restored.close()
+
+
+def test_verify_detects_corruption():
+    """文件内容被修改时校验失败"""
+    data_dir = _make_data_dir()
+    result = create_snapshot(data_dir, output_dir=data_dir / "snapshots", keep=0)
+
+    tampered = data_dir / "tampered.tar.gz"
+    with tarfile.open(result['archive']) as src, tarfile.open(tampered, "w:gz") as dst:
+        for member in src.getmembers():
+            data = src.extractfile(member).read()
+            if member.name == "notes/qdrant/meta.json":
+                data = b'{}'
+                member.size = len(data)
+            dst.addfile(member, io.BytesIO(data))
+
+    check = verify_snapshot(tampered)
+    assert not check['ok'] and "meta.json" in check['errors'][0]
+
+
+def test_prune_old_snapshots():
+    """只保留最新的 keep 个快照"""
+    data_dir = _make_data_dir()
+    output_dir = data_dir / "snapshots"
+    for _ in range(3):
+        create_snapshot(data_dir, output_dir=output_dir, keep=2)
+    assert len(list_snapshots(output_dir)) == 2
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 在线快照测试")
+    print("=" * 80)
+
+    test_snapshot_during_writes()
+    test_verify_detects_corruption()
+    test_prune_old_snapshots()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
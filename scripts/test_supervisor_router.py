@@ -0,0 +1,100 @@
+"""测试仅路由模式的 Supervisor
+
+用固定返回路由决策的模型代替 LLM, 验证路由结果的校验 (未注册/已排除的 Agent、
+空 query) 以及服务端直接调用子 Agent 并原样返回其 AgentResponse。
+"""
+import os
+import sys
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造模型, 不会调用
+
+from agents.supervisor.agent import RoutingDecision, SupervisorRouter
+from core.response_types import Action, AgentResponse
+
+
+class FixedDecisionModel:
+    """with_structured_output 后返回固定路由决策, 并记录收到的消息"""
+
+    def __init__(self, agent: str, query: str):
+        self.decision = RoutingDecision(agent=agent, query=query)
+        self.received = None
+
+    def with_structured_output(self, schema, method=None):
+        assert schema is RoutingDecision and method == "function_calling"
+        return self
+
+    def invoke(self, messages):
+        self.received = messages
+        return self.decision
+
+
+def test_route():
+    """路由到已注册的 Agent, 提示词列出所有可选 Agent"""
+    model = FixedDecisionModel("item_agent", "钥匙放哪了")
+    decision = SupervisorRouter(model).route([{"role": "user", "content": "钥匙放哪了"}])
+    assert decision == RoutingDecision(agent="item_agent", query="钥匙放哪了")
+
+    system_prompt = model.received[0]["content"]
+    print(system_prompt.split("可用 Agent:")[1].split("路由规则")[0])
+    for name in ["item_agent", "chat_agent", "note_agent", "calendar_agent"]:
+        assert f"- {name}:" in system_prompt
+
+
+def test_invalid_decisions_fall_back():
+    """未注册或已排除的 Agent 改用 chat_agent; 空 query 使用原始消息"""
+    messages = [{"role": "user", "content": "随便聊聊"}]
+    assert SupervisorRouter(FixedDecisionModel("weather_agent", "随便聊聊")).route(messages).agent == "chat_agent"
+
+    model = FixedDecisionModel("calendar_agent", "随便聊聊")
+    decision = SupervisorRouter(model).route(messages, exclude=("calendar_agent",))
+    assert decision.agent == "chat_agent"
+    assert "- calendar_agent:" not in model.received[0]["content"]
+
+    decision = SupervisorRouter(FixedDecisionModel("note_agent", "  ")).route(messages)
+    assert decision == RoutingDecision(agent="note_agent", query="随便聊聊")
+
+
+def test_server_dispatches_directly():
+    """router 模式下服务端直接调用子 Agent, 其 AgentResponse 原样返回"""
+    import server
+    from agents.note_agent import note_agent
+    from config import config
+
+    expected = AgentResponse(success=True, agent="note_agent", message="已保存",
+                             actions=[Action(type="note_saved", data={"id": 1})])
+    calls = []
+
+    previous = (config.SUPERVISOR_MODE, server.supervisor_router, note_agent.invoke)
+    config.SUPERVISOR_MODE = "router"
+    server.supervisor_router = SupervisorRouter(FixedDecisionModel("note_agent", "#note 想法"))
+    note_agent.invoke = lambda query: calls.append(query) or expected
+    try:
+        response = server._invoke_supervisor([{"role": "user", "content": "[系统提示] #note 想法"}])
+        assert response is expected and calls == ["#note 想法"]
+
+        # 指定 query 时 (回退路由) 子 Agent 收到原始消息
+        server._invoke_supervisor([{"role": "user", "content": "[系统提示] #note 想法"}], query="原始消息")
+        assert calls[-1] == "原始消息"
+    finally:
+        config.SUPERVISOR_MODE, server.supervisor_router, note_agent.invoke = previous
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 仅路由模式 Supervisor 测试")
+    print("=" * 80)
+
+    test_route()
+    test_invalid_decisions_fall_back()
+    test_server_dispatches_directly()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""测试请求链路追踪
+
+验证 span 的嵌套与不在追踪中时的空操作, LangChain 回调自动记录的 LLM / 工具 span
+(工具内部的 span 挂在工具 span 下), 以及对话接口返回 X-Trace-Id、span 树写入交互日志库
+并可通过 GET /api/v1/system/traces/<trace_id> 查询。
+"""
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root / "src"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")  # 只构造模型, 不会调用
+
+from langchain.agents import create_agent
+from langchain_core.messages import AIMessage
+from langchain_core.tools import tool
+
+from core.agent_base import arun_agent_graph, run_agent_graph
+from core.tracing import current_trace_id, span, start_trace
+from test_chat_stream import ScriptedModel
+
+
+def _find(node: dict, name: str):
+    """在 span 树中按名称查找第一个节点"""
+    if node['name'] == name:
+        return node
+    for child in node['children']:
+        found = _find(child, name)
+        if found:
+            return found
+    return None
+
+
+def _names(node: dict) -> list:
+    return [node['name']] + [name for child in node['children'] for name in _names(child)]
+
+
+def test_span_nesting():
+    """嵌套的 span 形成父子关系; 异常记录在 span 上; 不在追踪中时 span() 为空操作"""
+    with span("outside") as s:
+        assert s is None and current_trace_id() is None
+
+    try:
+        with start_trace("chat", user="u") as trace:
+            with span("stage_a"):
+                with span("stage_b", kind="agent", n=1) as b:
+                    b.attributes['extra'] = True
+            with span("stage_c"):
+                raise ValueError("boom")
+    except ValueError:
+        pass
+
+    assert current_trace_id() is None
+    tree = trace.tree()
+    print(f"  {_names(tree)}")
+    assert tree['name'] == "chat" and tree['attributes'] == {'user': 'u'}
+    assert [c['name'] for c in tree['children']] == ["stage_a", "stage_c"]
+    b = tree['children'][0]['children'][0]
+    assert b['kind'] == "agent" and b['attributes'] == {'n': 1, 'extra': True}
+    assert tree['children'][1]['error'] == "ValueError: boom" and "ValueError" in tree['error']
+    assert tree['duration_ms'] >= b['duration_ms'] >= 0
+
+
+@tool
+def lookup(name: str) -> str:
+    """查询物品位置"""
+    with span("db.query_item"):
+        return "书桌上"
+
+
+def _graph():
+    return create_agent(
+        model=ScriptedModel(replies=[
+            AIMessage(content="", tool_calls=[{"name": "lookup", "args": {"name": "钥匙"}, "id": "call_1"}]),
+            AIMessage(content="钥匙在书桌上"),
+        ]),
+        tools=[lookup]
+    )
+
+
+def test_llm_and_tool_spans():
+    """Agent 图内的 LLM 调用和工具执行自动记录为 Agent span 的子节点 (同步与异步)"""
+    with start_trace("chat") as trace:
+        run_agent_graph(_graph(), [{"role": "user", "content": "钥匙在哪"}], "item_agent")
+
+    async def arun():
+        with start_trace("chat") as trace:
+            await arun_agent_graph(_graph(), [{"role": "user", "content": "钥匙在哪"}], "item_agent")
+        return trace
+
+    for tree in (trace.tree(), asyncio.run(arun()).tree()):
+        print(f"  {_names(tree)}")
+        agent = _find(tree, "agent:item_agent")
+        assert agent is not None and agent['kind'] == "agent"
+        kinds = [c['kind'] for c in agent['children']]
+        assert kinds.count("llm") == 2 and kinds.count("tool") == 1
+        tool_span = _find(agent, "tool:lookup")
+        assert [c['name'] for c in tool_span['children']] == ["db.query_item"]
+        assert all(c['duration_ms'] is not None for c in agent['children'])
+
+
+def test_trace_endpoint():
+    """对话接口返回 X-Trace-Id, span 树写入交互日志库并可查询"""
+    import core.database as database
+    import core.interaction_logger as interaction_logger_module
+    import core.response_cache as response_cache_module
+    from core.database import ItemDatabase
+    from core.interaction_logger import InteractionLogger
+    from agents.note_agent import note_agent
+    import server
+
+    data_dir = Path(tempfile.mkdtemp())
+    previous = (database._db_instance, interaction_logger_module._interaction_logger,
+                response_cache_module._cache, response_cache_module._cache_loaded, note_agent.agent)
+    database._db_instance = ItemDatabase(data_dir / "items.db")
+    database._db_instance.remember_item("钥匙", "门口")  # 快速路径只处理已记录的物品
+    logger_instance = InteractionLogger(data_dir)
+    interaction_logger_module._interaction_logger = logger_instance
+    response_cache_module._cache, response_cache_module._cache_loaded = None, True
+    note_agent.agent = create_agent(
+        model=ScriptedModel(replies=[
+            AIMessage(content="", tool_calls=[{"name": "lookup", "args": {"name": "周报"}, "id": "call_1"}]),
+            AIMessage(content="好的, 已记下"),
+        ]),
+        tools=[lookup]
+    )
+    try:
+        client = server.app.test_client()
+        result = client.post("/api/v1/chat/message", json={"message": "#note 写周报"})
+        assert result.status_code == 200
+        trace_id = result.headers["X-Trace-Id"]
+
+        trace = client.get(f"/api/v1/system/traces/{trace_id}").get_json()
+        root = trace['root']
+        print(f"  {_names(root)}")
+        assert trace['trace_id'] == trace_id and root['kind'] == "request"
+        assert trace['interaction']['routing_stage'] == "tag"
+        assert trace['interaction']['final_agent'] == "note_agent"
+        for name in ("tag_parser", "agent:note_agent", "tool:lookup", "session_history.save", "interaction_log"):
+            assert _find(root, name) is not None, name
+        assert _find(root, "admission")['attributes'] == {'agent': 'note_agent'}
+        assert any(n.startswith("llm:") for n in _names(_find(root, "agent:note_agent")))
+
+        logs = logger_instance.query()
+        assert logs[0]['trace_id'] == trace_id
+
+        # 物品快速路径同样记录
+        result = client.post("/api/v1/chat/message", json={"message": "钥匙放在书桌上"})
+        root = client.get(f"/api/v1/system/traces/{result.headers['X-Trace-Id']}").get_json()['root']
+        print(f"  {_names(root)}")
+        assert _find(_find(root, "agent:item_agent"), "db.remember_item") is not None
+        assert not any(n.startswith("llm:") for n in _names(root))
+
+        missing = client.get("/api/v1/system/traces/not-a-trace")
+        assert missing.status_code == 404 and "error" in missing.get_json()
+
+        # 关闭链路追踪: 不返回 X-Trace-Id, 交互日志照常记录
+        server.config.TRACING_ENABLED = False
+        try:
+            result = client.post("/api/v1/chat/message", json={"message": "钥匙在哪"})
+        finally:
+            server.config.TRACING_ENABLED = True
+        assert result.status_code == 200 and "X-Trace-Id" not in result.headers
+        assert logger_instance.query(limit=1)[0]['trace_id'] is None
+    finally:
+        database._db_instance.close()
+        (database._db_instance, interaction_logger_module._interaction_logger,
+         response_cache_module._cache, response_cache_module._cache_loaded, note_agent.agent) = previous
+
+
+def main():
+    """主函数"""
+    print("=" * 80)
+    print("🧪 链路追踪测试")
+    print("=" * 80)
+
+    test_span_nesting()
+    test_llm_and_tool_spans()
+    test_trace_endpoint()
+
+    print("\n🎉 测试完成！")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""意图分类器训练脚本
+
+从 interaction_logs.db 读取 (用户输入, 最终处理的 Agent), 留出一部分样本评估,
+再用全部样本训练并保存模型。服务重启后加载新模型。
+
+用法:
+    python scripts/train_intent_classifier.py
+    python scripts/train_intent_classifier.py --since 2025-11-01 --threshold 0.97
+    python scripts/train_intent_classifier.py --dry-run
+"""
+
+import argparse
+import random
+import sys
+from collections import Counter
+from pathlib import Path
+
+# 添加 src 到 sys.path
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
+
+from config import config
+from core.intent_classifier import IntentClassifier, evaluate, load_training_samples
+
+
+def train(db_path: Path, output: Path, since=None, min_samples=5, holdout=0.2,
+          threshold=None, seed=42, dry_run=False):
+    """训练、评估并保存模型"""
+    threshold = config.INTENT_CLASSIFIER_THRESHOLD if threshold is None else threshold
+
+    if not db_path.exists():
+        print(f"❌ 交互日志不存在: {db_path}")
+        sys.exit(1)
+
+    samples = load_training_samples(db_path, since)
+    label_counts = Counter(label for _, label in samples)
+
+    # 样本太少的类别不参与训练 (预测时也就不会路由到这些 Agent)
+    dropped = {label: count for label, count in label_counts.items() if count < min_samples}
+    samples = [(text, label) for text, label in samples if label not in dropped]
+    label_counts = Counter(label for _, label in samples)
+
+    print("=" * 60)
+    print("意图分类器训练")
+    print("=" * 60)
+    print(f"\n📊 样本: {len(samples)} 条")
+    for label, count in label_counts.most_common():
+        print(f"  {label}: {count}")
+    if dropped:
+        print(f"  (样本少于 {min_samples} 条, 已忽略: {dropped})")
+
+    if len(label_counts) < 2:
+        print("\n❌ 至少需要两个类别的样本, 请积累更多交互日志后再训练")
+        sys.exit(1)
+
+    # 留出评估
+    shuffled = samples[:]
+    random.Random(seed).shuffle(shuffled)
+    split = int(len(shuffled) * (1 - holdout))
+    report = None
+    if 0 < split < len(shuffled):
+        report = evaluate(IntentClassifier.train(shuffled[:split]), shuffled[split:], threshold)
+        print(f"\n🧪 留出评估 ({report['samples']} 条, 阈值 {threshold}):")
+        print(f"  准确率: {report['accuracy']:.2%}")
+        print(f"  跳过 Supervisor 的比例: {report['routed_rate']:.2%}")
+        if report['routed_accuracy'] is not None:
+            print(f"  其中预测正确: {report['routed_accuracy']:.2%}")
+
+    classifier = IntentClassifier.train(samples, metadata={
+        'source': str(db_path),
+        'since': since,
+        'label_counts': dict(label_counts),
+        'evaluation': report,
+    })
+
+    if dry_run:
+        print("\n(dry-run, 未保存模型)")
+        return
+
+    classifier.save(output)
+    print(f"\n✓ 模型 v{classifier.version} 已保存到 {output} (重启服务后生效)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='从交互日志训练本地意图分类器')
+    parser.add_argument('--db', type=Path, default=config.DATA_DIR / 'interaction_logs.db', help='交互日志数据库')
+    parser.add_argument('--output', type=Path, default=config.INTENT_CLASSIFIER_MODEL_PATH, help='模型输出路径')
+    parser.add_argument('--since', help='只使用该日期之后的日志 (YYYY-MM-DD)')
+    parser.add_argument('--min-samples', type=int, default=5, help='每个类别的最少样本数')
+    parser.add_argument('--holdout', type=float, default=0.2, help='留出评估的样本比例')
+    parser.add_argument('--threshold', type=float, help='评估使用的置信度阈值 (默认 INTENT_CLASSIFIER_THRESHOLD)')
+    parser.add_argument('--seed', type=int, default=42, help='划分评估集的随机种子')
+    parser.add_argument('--dry-run', action='store_true', help='只评估, 不保存模型')
+
+    args = parser.parse_args()
+    train(args.db, args.output, args.since, args.min_samples, args.holdout,
+          args.threshold, args.seed, args.dry_run)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,9 @@
 """CalendarAgent - 日历提醒 Agent"""
 from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
 
 from config import config
-from core.agent_base import BaseAgent, AgentRegistry
+from core.agent_base import BaseAgent, AgentRegistry, run_agent_graph
+from core.llm_factory import get_chat_model
 from core.logger import logger
 from core.response_types import AgentResponse
 from .tools import get_calendar_tools
@@ -44,12 +44,7 @@ class CalendarAgent(BaseAgent):
             logger.warning(f"[{self.name}] ⚠️ 警告：未配置 CalDAV，日历功能将不可用")
             logger.info(f"[{self.name}] 💡 请在 .env 中配置 CALDAV_URL、CALDAV_USERNAME 和 CALDAV_PASSWORD")
 
-        self.model = ChatOpenAI(
-            model=config.AGENT_MODEL,
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            temperature=0,
-        )
+        self.model = get_chat_model(temperature=0)
 
         tools = get_calendar_tools()
 
@@ -67,35 +62,37 @@ class CalendarAgent(BaseAgent):
         logger.info(f"[{self.name}] 📅 处理查询: {query}")
 
         try:
-            result = self.agent.invoke(
-                {"messages": [{"role": "user", "content": query}]}
-            )
+            result = run_agent_graph(self.agent, [{"role": "user", "content": query}], self.name)
             agent_response = self._extract_response_from_result(result)
             logger.info(f"[{self.name}] ✓ 响应: {agent_response.message[:100]}...")
             return agent_response
         except Exception as e:
-            error_msg = f"处理失败: {str(e)}"
-            logger.error(f"[{self.name}] ✗ {error_msg}")
-
-            # 友好的错误提示
-            if "CalDAV" in str(e) or "连接" in str(e):
-                error_detail = (
-                    f"CalDAV 服务连接失败：{str(e)}\n\n"
-                    "请检查以下配置：\n"
-                    "1. .env 文件中的 CALDAV_URL、CALDAV_USERNAME、CALDAV_PASSWORD\n"
-                    "2. CalDAV 服务器是否可访问\n"
-                    "3. 用户名和密码是否正确（建议使用 App 专用密码）"
-                )
-                return AgentResponse.error_response(
-                    agent=self.name,
-                    error=error_detail
-                )
-
+            return self._error_response(e)
+
+    def _error_response(self, error: Exception) -> AgentResponse:
+        """调用失败时的响应 (CalDAV 连接问题给出配置提示)"""
+        error_msg = f"处理失败: {str(error)}"
+        logger.error(f"[{self.name}] ✗ {error_msg}")
+
+        # 友好的错误提示
+        if "CalDAV" in str(error) or "连接" in str(error):
+            error_detail = (
+                f"CalDAV 服务连接失败：{str(error)}\n\n"
+                "请检查以下配置：\n"
+                "1. .env 文件中的 CALDAV_URL、CALDAV_USERNAME、CALDAV_PASSWORD\n"
+                "2. CalDAV 服务器是否可访问\n"
+                "3. 用户名和密码是否正确（建议使用 App 专用密码）"
+            )
             return AgentResponse.error_response(
                 agent=self.name,
-                error=error_msg
+                error=error_detail
             )
 
+        return AgentResponse.error_response(
+            agent=self.name,
+            error=error_msg
+        )
+
 
 # 创建并注册 CalendarAgent 实例
 calendar_agent = CalendarAgent()
@@ -4,10 +4,9 @@
 """
 from pydantic import BaseModel, Field
 from datetime import datetime, timedelta
-from langchain_openai import ChatOpenAI
 from langchain_core.prompts import ChatPromptTemplate
 
-from config import config
+from core.llm_factory import get_chat_model
 
 
 class CalendarReminder(BaseModel):
@@ -97,12 +96,7 @@ def parse_time_from_natural_language(user_input: str) -> CalendarReminder:
         ("user", "{user_input}")
     ])
 
-    model = ChatOpenAI(
-        model=config.AGENT_MODEL,
-        base_url=config.OPENAI_API_BASE,
-        api_key=config.OPENAI_API_KEY,
-        temperature=0
-    )
+    model = get_chat_model(temperature=0)  # 共享实例和连接池, 不再每次调用新建客户端
 
     chain = prompt | model.with_structured_output(CalendarReminder)
 
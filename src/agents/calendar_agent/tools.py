@@ -4,6 +4,7 @@ from typing import Optional
 from datetime import datetime
 
 from core.logger import logger
+from core.tracing import span
 from .time_parser import parse_time_from_natural_language
 from .caldav_client import CalDAVManager
 from config import config
@@ -53,13 +54,14 @@ def add_calendar_reminder(
 
         # 3. 创建日历事件
         manager = _get_caldav_manager()
-        event_uid = manager.add_event(
-            summary=reminder.summary,
-            start_time=reminder.start_time,
-            duration_minutes=reminder.duration_minutes,
-            reminder_minutes=reminder.reminder_minutes,
-            description=f"由 YouYou 创建于 {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        )
+        with span("caldav.add_event"):
+            event_uid = manager.add_event(
+                summary=reminder.summary,
+                start_time=reminder.start_time,
+                duration_minutes=reminder.duration_minutes,
+                reminder_minutes=reminder.reminder_minutes,
+                description=f"由 YouYou 创建于 {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+            )
 
         # 返回结构化数据
         formatted_time = reminder.start_time.strftime('%Y-%m-%d %H:%M')
@@ -104,7 +106,8 @@ def list_upcoming_reminders(days_ahead: int = 7) -> dict:
     """
     try:
         manager = _get_caldav_manager()
-        events = manager.get_upcoming_events(days_ahead)
+        with span("caldav.get_upcoming_events"):
+            events = manager.get_upcoming_events(days_ahead)
 
         if not events:
             return {
@@ -166,7 +169,8 @@ def delete_calendar_reminder(event_uid: str) -> dict:
     """
     try:
         manager = _get_caldav_manager()
-        manager.delete_event(event_uid)
+        with span("caldav.delete_event"):
+            manager.delete_event(event_uid)
 
         return {
             "action_type": "reminder_deleted",
@@ -1,9 +1,8 @@
 """通用对话 Agent - 使用 LangChain 1.0 + BaseAgent 接口"""
 from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
 
-from config import config
-from core.agent_base import BaseAgent, AgentRegistry
+from core.agent_base import BaseAgent, AgentRegistry, run_agent_graph
+from core.llm_factory import get_chat_model
 from core.logger import logger
 from core.response_types import AgentResponse
 from .prompts import CHAT_SYSTEM_PROMPT
@@ -36,12 +35,7 @@ class ChatAgent(BaseAgent):
         )
 
         # 创建 LangChain Agent
-        self.model = ChatOpenAI(
-            model=config.AGENT_MODEL,
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            temperature=0.7,  # 对话可以有创造性
-        )
+        self.model = get_chat_model(temperature=0.7)  # 对话可以有创造性
 
         self.agent = create_agent(
             model=self.model,
@@ -61,7 +55,7 @@ class ChatAgent(BaseAgent):
         logger.info(f"[{self.name}] 📝 处理查询: {query}")
 
         try:
-            result = self.agent.invoke({"messages": [{"role": "user", "content": query}]})
+            result = run_agent_graph(self.agent, [{"role": "user", "content": query}], self.name)
             agent_response = self._extract_response_from_result(result)
 
             logger.info(f"[{self.name}] ✓ 响应: {agent_response.message[:100]}...")
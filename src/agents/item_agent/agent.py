@@ -1,15 +1,27 @@
 """物品管理 Agent - 使用 LangChain 1.0 + BaseAgent 接口"""
 from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
 
 from config import config
-from core.agent_base import BaseAgent, AgentRegistry
+from core.agent_base import BaseAgent, AgentRegistry, run_agent_graph
+from core.database import get_database
+from core.llm_factory import get_chat_model
 from core.logger import logger
-from core.response_types import AgentResponse
-from .tools import remember_item_location, query_item_location, list_all_items
+from core.item_intent_parser import ItemIntent
+from core.response_cache import cached_response
+from core.response_types import AgentResponse, Action
+from .tools import (
+    remember_item_location, query_item_location, list_all_items,
+    _remember_item_location_impl, _query_item_location_impl, _list_all_items_impl,
+    _remember_payload, _query_payload, _list_payload,
+)
 from .prompts import ITEM_SYSTEM_PROMPT
 
 
+def _data_versions() -> tuple:
+    """响应缓存使用的数据版本 (当前用户的物品库)"""
+    return (get_database().data_version(config.USER_ID),)
+
+
 class ItemAgent(BaseAgent):
     """物品位置管理 Agent
 
@@ -37,12 +49,7 @@ class ItemAgent(BaseAgent):
         )
 
         # 创建 LangChain Agent
-        self.model = ChatOpenAI(
-            model=config.AGENT_MODEL,
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            temperature=0,  # 工具调用需要确定性
-        )
+        self.model = get_chat_model(temperature=0)  # 工具调用需要确定性
 
         self.agent = create_agent(
             model=self.model,
@@ -50,9 +57,12 @@ class ItemAgent(BaseAgent):
             system_prompt=ITEM_SYSTEM_PROMPT
         )
 
+    @cached_response("item_agent", _data_versions)
     def invoke(self, query: str) -> AgentResponse:
         """处理物品位置相关请求
 
+        只读请求的响应按物品数据版本缓存, 记录/删除物品后自动失效。
+
         Args:
             query: 用户的原始查询文本
 
@@ -62,7 +72,7 @@ class ItemAgent(BaseAgent):
         logger.info(f"[{self.name}] 📝 处理查询: {query}")
 
         try:
-            result = self.agent.invoke({"messages": [{"role": "user", "content": query}]})
+            result = run_agent_graph(self.agent, [{"role": "user", "content": query}], self.name)
             agent_response = self._extract_response_from_result(result)
 
             logger.info(f"[{self.name}] ✓ 响应: {agent_response.message[:100]}...")
@@ -76,6 +86,49 @@ class ItemAgent(BaseAgent):
                 error=error_msg
             )
 
+    @cached_response("item_agent", _data_versions)
+    async def ainvoke(self, query: str) -> AgentResponse:
+        """异步处理物品位置相关请求 (与 invoke 共用响应缓存)"""
+        return await super().ainvoke(query)
+
+    def handle_intent(self, intent: ItemIntent) -> AgentResponse:
+        """直接执行已解析的物品意图 (快速路径, 不调用 LLM)
+
+        返回的 actions 与 LLM 调用对应工具时完全一致。
+
+        Args:
+            intent: ItemIntentParser 解析出的意图
+
+        Returns:
+            结构化响应对象
+        """
+        logger.info(f"[{self.name}] ⚡ 快速路径: {intent.action} item={intent.item} location={intent.location}")
+
+        try:
+            if intent.action == "remember":
+                result = _remember_item_location_impl(intent.item, intent.location)
+                payload = _remember_payload(result, intent.item, intent.location)
+            elif intent.action == "query":
+                result = _query_item_location_impl(intent.item)
+                payload = _query_payload(result, intent.item)
+            else:
+                result = _list_all_items_impl()
+                payload = _list_payload(result)
+        except Exception as e:
+            error_msg = f"处理失败: {str(e)}"
+            logger.error(f"[{self.name}] ✗ {error_msg}")
+            return AgentResponse.error_response(agent=self.name, error=error_msg)
+
+        if result.get("status") == "error":
+            return AgentResponse.error_response(agent=self.name, error=payload["message"])
+
+        return AgentResponse(
+            success=True,
+            agent=self.name,
+            message=payload["message"],
+            actions=[Action(type=payload["action_type"], data=payload["data"])]
+        )
+
 
 # 创建并注册 ItemAgent 实例
 item_agent = ItemAgent()
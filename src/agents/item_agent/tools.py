@@ -2,14 +2,18 @@
 
 直接调用数据库层进行物品管理,无需中间封装层。
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 from langchain_core.tools import tool
 
 from core.database import get_database
 from core.zep_memory import get_zep_memory
 from core.logger import logger
+from core.tracing import span
 from config import config
 
+# item_list 单次返回给 LLM 的物品数上限
+LIST_PAGE_SIZE = 50
+
 
 def _remember_item_location_impl(item: str, location: str) -> Dict[str, Any]:
     """
@@ -31,11 +35,14 @@ def _remember_item_location_impl(item: str, location: str) -> Dict[str, Any]:
 
         # 使用数据库存储
         db = get_database()
-        result = db.remember_item(
-            item=item,
-            location=location,
-            user_id=config.USER_ID
-        )
+        with span("db.remember_item") as s:
+            result = db.remember_item(
+                item=item,
+                location=location,
+                user_id=config.USER_ID
+            )
+            if s:
+                s.attributes['action'] = result.get("action")
 
         logger.debug(f"[物品工具] 数据库返回: {result}")
 
@@ -64,7 +71,7 @@ def _query_item_location_impl(item: str) -> Dict[str, Any]:
     1. 精确匹配 (normalized_name)
     2. 别名匹配 (item_aliases)
     3. FTS5 全文搜索
-    4. LIKE 关键词模糊匹配
+    4. n-gram 关键词模糊匹配
     5. Zep 语义搜索历史对话 (兜底)
 
     Args:
@@ -78,10 +85,13 @@ def _query_item_location_impl(item: str) -> Dict[str, Any]:
 
         # 级别 1-4: 使用数据库查询 (四级策略)
         db = get_database()
-        result = db.query_item(
-            item=item,
-            user_id=config.USER_ID
-        )
+        with span("db.query_item") as s:
+            result = db.query_item(
+                item=item,
+                user_id=config.USER_ID
+            )
+            if s:
+                s.attributes['match_type'] = result.get("match_type")
 
         logger.debug(f"[物品工具] 数据库返回: {result}")
 
@@ -95,10 +105,11 @@ def _query_item_location_impl(item: str) -> Dict[str, Any]:
             # 级别 5: Zep 语义搜索兜底
             try:
                 zep = get_zep_memory()
-                memories = zep.search_memory(
-                    query=f"用户提到 {item} 的位置、存放位置、放在哪里",
-                    limit=3
-                )
+                with span("zep.search_memory"):
+                    memories = zep.search_memory(
+                        query=f"用户提到 {item} 的位置、存放位置、放在哪里",
+                        limit=3
+                    )
 
                 if memories:
                     logger.success(f"[物品工具] ✓ Zep 找到 {len(memories)} 条相关记忆")
@@ -134,21 +145,33 @@ def _query_item_location_impl(item: str) -> Dict[str, Any]:
         return {"status": "error", "message": f"查询失败: {str(e)}"}
 
 
-def _list_all_items_impl() -> Dict[str, Any]:
+def _list_all_items_impl(cursor: Optional[str] = None) -> Dict[str, Any]:
     """
-    列出所有已记录的物品
+    分页列出已记录的物品
+
+    每页最多 LIST_PAGE_SIZE 个, 只返回名称和位置, 避免大量物品撑爆工具消息。
+
+    Args:
+        cursor: 上一页返回的 next_cursor, 为空时返回第一页
 
     Returns:
-        包含物品列表的字典
+        包含物品列表、总数和分页信息的字典
     """
     try:
-        logger.info("[物品工具] 列出所有物品")
+        logger.info(f"[物品工具] 列出物品 (cursor={cursor})")
 
-        # 使用数据库查询
+        # 使用数据库分页查询
         db = get_database()
-        result = db.list_all_items(user_id=config.USER_ID)
+        with span("db.list_items"):
+            result = db.list_items(
+                user_id=config.USER_ID,
+                limit=LIST_PAGE_SIZE,
+                cursor=cursor or None,
+                fields=['item', 'location']
+            )
+            result['total'] = db.count_items(user_id=config.USER_ID)
 
-        logger.info(f"[物品工具] 数据库返回: 共 {result.get('count', 0)} 个物品")
+        logger.info(f"[物品工具] 数据库返回: 本页 {result['count']} 个, 共 {result['total']} 个物品")
 
         return result
 
@@ -157,21 +180,10 @@ def _list_all_items_impl() -> Dict[str, Any]:
         return {"status": "error", "message": f"列出物品失败: {str(e)}"}
 
 
-# ========== LangChain Tool 封装 ==========
-
-@tool
-def remember_item_location(item: str, location: str) -> dict:
-    """记录物品的位置信息
-
-    Args:
-        item: 物品名称
-        location: 物品位置
-
-    Returns:
-        包含 action_type 和 data 的字典
-    """
-    result = _remember_item_location_impl(item, location)
+# ========== 工具返回数据 (LangChain 工具与快速路径共用) ==========
 
+def _remember_payload(result: Dict[str, Any], item: str, location: str) -> Dict[str, Any]:
+    """把记录结果转换为工具返回格式 (action_type / data / message)"""
     if result.get("status") != "success":
         return {
             "action_type": "error",
@@ -206,18 +218,8 @@ def remember_item_location(item: str, location: str) -> dict:
     }
 
 
-@tool
-def query_item_location(item: str) -> dict:
-    """查询物品的位置
-
-    Args:
-        item: 要查询的物品名称
-
-    Returns:
-        包含 action_type 和 data 的字典
-    """
-    result = _query_item_location_impl(item)
-
+def _query_payload(result: Dict[str, Any], item: str) -> Dict[str, Any]:
+    """把查询结果转换为工具返回格式"""
     if result.get("status") == "success":
         return {
             "action_type": "item_location",
@@ -236,29 +238,27 @@ def query_item_location(item: str) -> dict:
         }
 
 
-@tool
-def list_all_items() -> dict:
-    """列出所有已记录的物品及其位置
-
-    Returns:
-        包含 action_type 和 data 的字典
-    """
-    result = _list_all_items_impl()
-
+def _list_payload(result: Dict[str, Any]) -> Dict[str, Any]:
+    """把分页列表结果转换为工具返回格式"""
     if result.get("status") == "success":
-        count = result.get("count", 0)
+        total = result.get("total", 0)
         items = result.get("items", [])
+        has_more = result.get("has_more", False)
 
-        if count > 0:
-            message = f"共有 {count} 个物品"
-        else:
+        if total == 0:
             message = "没有物品记录"
+        elif has_more:
+            message = f"共有 {total} 个物品, 本次列出 {len(items)} 个, 还有更多 (next_cursor: {result['next_cursor']})"
+        else:
+            message = f"共有 {total} 个物品"
 
         return {
             "action_type": "item_list",
             "data": {
                 "items": items,
-                "count": count
+                "count": total,
+                "has_more": has_more,
+                "next_cursor": result.get("next_cursor")
             },
             "message": message
         }
@@ -268,3 +268,45 @@ def list_all_items() -> dict:
             "data": {"error": result.get("message", "列出物品失败")},
             "message": result.get("message", "列出物品失败")
         }
+
+
+# ========== LangChain Tool 封装 ==========
+
+@tool
+def remember_item_location(item: str, location: str) -> dict:
+    """记录物品的位置信息
+
+    Args:
+        item: 物品名称
+        location: 物品位置
+
+    Returns:
+        包含 action_type 和 data 的字典
+    """
+    return _remember_payload(_remember_item_location_impl(item, location), item, location)
+
+
+@tool
+def query_item_location(item: str) -> dict:
+    """查询物品的位置
+
+    Args:
+        item: 要查询的物品名称
+
+    Returns:
+        包含 action_type 和 data 的字典
+    """
+    return _query_payload(_query_item_location_impl(item), item)
+
+
+@tool
+def list_all_items(cursor: str = "") -> dict:
+    """列出已记录的物品及其位置 (分页, 每页最多 50 个)
+
+    Args:
+        cursor: 翻页游标; 首次调用留空, 用户要求查看更多时传入上次返回的 next_cursor
+
+    Returns:
+        包含 action_type 和 data 的字典
+    """
+    return _list_payload(_list_all_items_impl(cursor))
@@ -1,15 +1,20 @@
 """NoteAgent - 笔记本 Agent - 使用 LangChain 1.0 + BaseAgent 接口"""
 from langchain.agents import create_agent
-from langchain_openai import ChatOpenAI
 
-from config import config
-from core.agent_base import BaseAgent, AgentRegistry
+from core.agent_base import BaseAgent, AgentRegistry, run_agent_graph
+from core.llm_factory import get_chat_model
 from core.logger import logger
+from core.response_cache import cached_response
 from core.response_types import AgentResponse
-from agents.note_agent.tools import get_note_agent_tools
+from agents.note_agent.tools import _get_storage, get_note_agent_tools
 from agents.note_agent.prompts import NOTE_AGENT_SYSTEM_PROMPT
 
 
+def _data_versions() -> tuple:
+    """响应缓存使用的数据版本 (笔记库)"""
+    return (_get_storage().data_version(),)
+
+
 class NoteAgent(BaseAgent):
     """笔记本 Agent
 
@@ -20,6 +25,9 @@ class NoteAgent(BaseAgent):
     - 知识管理中枢
     """
 
+    # 增加递归限制到 50，避免复杂任务超出限制
+    graph_config = {"recursion_limit": 50, "debug": True}  # 启用调试模式
+
     def __init__(self):
         super().__init__(
             name="note_agent",
@@ -39,12 +47,7 @@ class NoteAgent(BaseAgent):
         )
 
         # 创建 LangChain Agent
-        self.model = ChatOpenAI(
-            model=config.AGENT_MODEL,
-            base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            temperature=0,
-        )
+        self.model = get_chat_model(temperature=0)
 
         tools = get_note_agent_tools()
 
@@ -54,9 +57,12 @@ class NoteAgent(BaseAgent):
             system_prompt=NOTE_AGENT_SYSTEM_PROMPT
         )
 
+    @cached_response("note_agent", _data_versions)
     def invoke(self, query: str) -> AgentResponse:
         """处理笔记相关请求
 
+        只读请求 (搜索、列出笔记) 的响应按笔记数据版本缓存, 保存/删除笔记后自动失效。
+
         Args:
             query: 用户的原始查询文本
 
@@ -66,10 +72,11 @@ class NoteAgent(BaseAgent):
         logger.info(f"[{self.name}] 📝 处理查询: {query}")
 
         try:
-            # 增加递归限制到 50，避免复杂任务超出限制
-            result = self.agent.invoke(
-                {"messages": [{"role": "user", "content": query}]},
-                config={"recursion_limit": 50, "debug": True}  # 启用调试模式
+            result = run_agent_graph(
+                self.agent,
+                [{"role": "user", "content": query}],
+                self.name,
+                config=self.graph_config
             )
             agent_response = self._extract_response_from_result(result)
 
@@ -88,6 +95,11 @@ class NoteAgent(BaseAgent):
                 error=error_msg
             )
 
+    @cached_response("note_agent", _data_versions)
+    async def ainvoke(self, query: str) -> AgentResponse:
+        """异步处理笔记相关请求 (与 invoke 共用响应缓存)"""
+        return await super().ainvoke(query)
+
 
 # 创建并注册 NoteAgent 实例
 note_agent = NoteAgent()
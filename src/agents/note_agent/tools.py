@@ -9,6 +9,7 @@ from langchain_core.tools import tool
 
 from config import Config
 from core.logger import logger
+from core.tracing import span
 from tools.storage import NoteStorage, NoteType, NoteUtils
 from tools.github import GitHubAnalyzer
 
@@ -150,7 +151,8 @@ def analyze_github_project(github_url: str, custom_tags: Optional[List[str]] = N
 
         # 步骤 2: 分析 GitHub 项目
         logger.info(f"[analyze_github_project] 开始分析项目...")
-        result = analyzer.analyze_repo(github_url)
+        with span("github.analyze_repo"):
+            result = analyzer.analyze_repo(github_url)
 
         if not result:
             error_msg = f"❌ 无法分析项目：{github_url}\n请检查 URL 是否正确"
@@ -308,11 +310,12 @@ def search_notes(query: str, note_type: Optional[str] = None, limit: int = 5) ->
                 pass
 
         # 1. 先尝试关键词搜索
-        keyword_results = storage.search_notes_by_keyword(
-            keyword=query,
-            note_type=nt,
-            limit=limit
-        )
+        with span("notes.keyword_search"):
+            keyword_results = storage.search_notes_by_keyword(
+                keyword=query,
+                note_type=nt,
+                limit=limit
+            )
 
         # 如果关键词搜索找到足够的结果，直接返回
         if len(keyword_results) >= limit:
@@ -328,11 +331,12 @@ def search_notes(query: str, note_type: Optional[str] = None, limit: int = 5) ->
                 return "❌ 未找到相关笔记"
 
         # 语义搜索
-        semantic_results = storage.search_notes_by_vector(
-            query_vector=query_vector,
-            note_type=nt,
-            limit=limit
-        )
+        with span("notes.vector_search"):
+            semantic_results = storage.search_notes_by_vector(
+                query_vector=query_vector,
+                note_type=nt,
+                limit=limit
+            )
 
         # 合并结果（去重）
         seen_ids = {note.id for note in keyword_results}
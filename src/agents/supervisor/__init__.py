@@ -1,4 +1,4 @@
 """Supervisor Agent - 协调子 Agent"""
-from .agent import supervisor
+from .agent import supervisor, supervisor_router
 
-__all__ = ["supervisor"]
+__all__ = ["supervisor", "supervisor_router"]
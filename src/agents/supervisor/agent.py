@@ -1,11 +1,22 @@
-"""Supervisor Agent - 使用 LangChain 1.0 + 自动注册系统"""
+"""Supervisor Agent - 使用 LangChain 1.0 + 自动注册系统
+
+两种模式 (config.SUPERVISOR_MODE):
+- tools (默认): Supervisor 把子 Agent 当作工具调用, 子 Agent 返回后 Supervisor 再生成一次回复
+- router: Supervisor 只做一次结构化输出 {agent, query}, 由调用方直接调用子 Agent,
+  子 Agent 的 AgentResponse 原样返回 (省去 Supervisor 的第二次生成和 ToolMessage 解析)
+"""
+from typing import Any, Dict, Iterable, List, Set
+
 from langchain.agents import create_agent
 from langchain_openai import ChatOpenAI
+from pydantic import BaseModel, Field
 
 from config import config
 from core.agent_base import AgentRegistry
+from core.llm_factory import get_chat_model
 from core.logger import logger
-from .prompts import SUPERVISOR_SYSTEM_PROMPT
+from core.tracing import span
+from .prompts import SUPERVISOR_SYSTEM_PROMPT, SUPERVISOR_ROUTER_PROMPT
 
 # 导入所有子 Agent 以触发注册
 # 每个子 Agent 在导入时会自动调用 AgentRegistry.register()
@@ -27,12 +38,7 @@ def create_supervisor():
     logger.info("[Supervisor] 🚀 初始化...")
 
     # 创建模型实例
-    supervisor_model = ChatOpenAI(
-        model=config.ROUTER_MODEL,
-        base_url=config.OPENAI_API_BASE,
-        api_key=config.OPENAI_API_KEY,
-        temperature=0,  # 路由决策需要确定性
-    )
+    supervisor_model = get_chat_model(config.ROUTER_MODEL, temperature=0)  # 路由决策需要确定性
 
     # 从注册中心自动获取所有子 Agent 的工具
     tools = AgentRegistry.get_all_tools()
@@ -54,7 +60,75 @@ def create_supervisor():
     return supervisor
 
 
+class RoutingDecision(BaseModel):
+    """仅路由模式下 Supervisor 的结构化输出"""
+    agent: str = Field(description="处理该消息的 Agent 名称")
+    query: str = Field(description="交给该 Agent 的用户完整原始消息 (原封不动)")
+
+
+class SupervisorRouter:
+    """仅路由模式的 Supervisor: 一次 LLM 调用选出目标 Agent"""
+
+    # 路由结果不是已注册的 Agent 时的兜底
+    DEFAULT_AGENT = "chat_agent"
+
+    def __init__(self, model: ChatOpenAI):
+        self._model = model.with_structured_output(RoutingDecision, method="function_calling")
+
+    def route(self, messages: List[Dict[str, Any]], exclude: Iterable[str] = ()) -> RoutingDecision:
+        """选择处理最新一条消息的 Agent
+
+        Args:
+            messages: 会话历史 + 当前消息 ({"role", "content"} 列表)
+            exclude: 不能选择的 Agent (如已经回退的 calendar_agent)
+
+        Returns:
+            RoutingDecision, agent 一定是已注册且未排除的 Agent
+        """
+        exclude = set(exclude)
+        with span("agent:supervisor", kind="agent", mode="router"):
+            decision = self._model.invoke(self._build_messages(messages, exclude))
+            return self._validate(decision, messages, exclude)
+
+    async def aroute(self, messages: List[Dict[str, Any]], exclude: Iterable[str] = ()) -> RoutingDecision:
+        """route 的异步版本 (ASGI 服务使用)"""
+        exclude = set(exclude)
+        with span("agent:supervisor", kind="agent", mode="router"):
+            decision = await self._model.ainvoke(self._build_messages(messages, exclude))
+            return self._validate(decision, messages, exclude)
+
+    @staticmethod
+    def _build_messages(messages: List[Dict[str, Any]], exclude: Set[str]) -> List[Dict[str, Any]]:
+        """系统提示 (列出可选的 Agent) + 会话消息"""
+        agents = [agent for agent in AgentRegistry.get_all_agents() if agent.name not in exclude]
+        prompt = SUPERVISOR_ROUTER_PROMPT.format(agents="\n".join(
+            f"- {agent.name}: {agent.description.strip().splitlines()[0]}" for agent in agents
+        ))
+        return [{"role": "system", "content": prompt}] + messages
+
+    def _validate(self, decision: RoutingDecision, messages: List[Dict[str, Any]],
+                  exclude: Set[str]) -> RoutingDecision:
+        """未知或已排除的 Agent 改用兜底 Agent, 空 query 使用原始消息"""
+        if AgentRegistry.get(decision.agent) is None or decision.agent in exclude:
+            logger.warning(f"[Supervisor] ⚠️ 路由到未知或已排除的 Agent: {decision.agent}, 改用 {self.DEFAULT_AGENT}")
+            decision = RoutingDecision(agent=self.DEFAULT_AGENT, query=decision.query)
+        if not decision.query.strip():
+            decision = RoutingDecision(agent=decision.agent, query=messages[-1]["content"])
+
+        logger.info(f"[Supervisor] 🎯 路由: {decision.agent}")
+        return decision
+
+
+def create_supervisor_router() -> SupervisorRouter:
+    """创建仅路由模式的 Supervisor"""
+    return SupervisorRouter(get_chat_model(config.ROUTER_MODEL, temperature=0))  # 路由决策需要确定性
+
+
 # 创建 Supervisor 实例
 supervisor = create_supervisor()
+supervisor_router = create_supervisor_router()
 
-__all__ = ["supervisor", "create_supervisor"]
+__all__ = [
+    "supervisor", "create_supervisor",
+    "supervisor_router", "create_supervisor_router", "SupervisorRouter", "RoutingDecision",
+]
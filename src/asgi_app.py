@@ -0,0 +1,109 @@
+"""YouYou ASGI 服务 - 对话接口异步执行, 其余接口复用 Flask 应用
+
+Flask 开发服务器每个请求占用一个线程, 直到整个 LLM 调用链 (数秒) 结束。
+ASGI 模式下:
+- POST /api/v1/chat/message 与 /chat/stream 在事件循环中执行, Agent 通过 ainvoke
+  (graph.ainvoke / astream) 调用 LLM, 等待响应时不占用线程, 大量请求可以共用一个事件循环
+- 其余接口 (物品、系统、Swagger 文档) 通过 WSGI 适配器交给原 Flask 应用处理
+
+请求和响应格式与 Flask 服务完全相同 (路由流程由 server._message_pipeline 共用)。
+
+启动:
+    SERVER_MODE=asgi python src/server.py
+    # 或直接使用 uvicorn
+    uvicorn asgi_app:app --app-dir src --port 8000 --workers 2
+
+需要安装可选依赖: uv sync --extra asgi (或 pip install starlette uvicorn a2wsgi)
+"""
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+from core.admission import AdmissionRejected, get_admission_controller
+from core.intent_classifier import get_intent_classifier
+from core.redirect_filter import get_redirect_filter
+from core.response_cache import get_response_cache
+from server import (
+    app as flask_app, logger, _ahandle_message, _astream_message, _new_trace_id, _rejection_body,
+    _trace_headers, _validate_message,
+)
+
+
+async def _read_message(request: Request) -> str:
+    """读取请求体中的 message 字段 (请求体不是 JSON 对象时视为空消息)"""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    return data.get('message', '') if isinstance(data, dict) else ''
+
+
+async def chat_message(request: Request) -> JSONResponse:
+    """POST /api/v1/chat/message (与 Flask 版 ChatMessage.post 相同)"""
+    trace_id = _new_trace_id()
+    try:
+        user_input = await _read_message(request)
+
+        error = _validate_message(user_input)
+        if error:
+            return JSONResponse({"error": error}, status_code=400)
+
+        agent_response = await _ahandle_message(user_input, trace_id)
+        return JSONResponse(agent_response.to_dict(), headers=_trace_headers(trace_id))
+
+    except AdmissionRejected as e:
+        return JSONResponse(_rejection_body(e), status_code=e.status_code,
+                            headers={'Retry-After': str(e.retry_after), **_trace_headers(trace_id)})
+    except Exception as e:
+        return JSONResponse({"error": str(e)}, status_code=500, headers=_trace_headers(trace_id))
+
+
+async def chat_stream(request: Request):
+    """POST /api/v1/chat/stream (与 Flask 版 ChatStream.post 相同)"""
+    user_input = await _read_message(request)
+
+    error = _validate_message(user_input)
+    if error:
+        return JSONResponse({"error": error}, status_code=400)
+
+    trace_id = _new_trace_id()
+    return StreamingResponse(
+        _astream_message(user_input, trace_id),
+        media_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **_trace_headers(trace_id)}
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: Starlette):
+    """每个 worker 启动时加载本地意图分类器、回退预判过滤器、响应缓存和准入控制"""
+    get_intent_classifier()
+    get_redirect_filter()
+    get_response_cache()
+    get_admission_controller()
+    logger.info("✓ ASGI worker 已就绪")
+    yield
+
+
+app = Starlette(
+    routes=[
+        Route('/api/v1/chat/message', chat_message, methods=['POST']),
+        Route('/api/v1/chat/stream', chat_stream, methods=['POST']),
+        # 其余接口交给 Flask 应用 (在线程池中执行)
+        Mount('/', app=WSGIMiddleware(flask_app)),
+    ],
+    middleware=[
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*'],
+                   expose_headers=['Retry-After', 'X-Trace-Id']),  # 允许跨域
+    ],
+    lifespan=lifespan,
+)
+
+
+__all__ = ['app']
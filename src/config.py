@@ -23,13 +23,83 @@ class Config:
     AGENT_MODEL: str = os.getenv("AGENT_MODEL", "gpt-4")
     EMBEDDING_MODEL: str = os.getenv("EMBEDDING_MODEL", "text-embedding-ada-002")
 
+    # LLM HTTP 连接池 (每个 base_url + 模型共享一个, 见 core.llm_factory)
+    LLM_POOL_MAX_CONNECTIONS: int = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "20"))
+    LLM_POOL_MAX_KEEPALIVE: int = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "10"))  # 保持的空闲长连接数
+    LLM_KEEPALIVE_SECONDS: float = float(os.getenv("LLM_KEEPALIVE_SECONDS", "60"))  # 空闲连接保持时间
+    LLM_TIMEOUT_SECONDS: float = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))  # 请求超时
+    LLM_CONNECT_TIMEOUT_SECONDS: float = float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "10"))  # 建立连接超时
+    LLM_MAX_RETRIES: int = int(os.getenv("LLM_MAX_RETRIES", "2"))  # 失败重试次数
+
+    # Supervisor 模式: tools (子 Agent 作为工具调用, 默认) / router (一次结构化输出选出 Agent 后直接调用)
+    SUPERVISOR_MODE: str = os.getenv("SUPERVISOR_MODE", "tools").lower()
+
+    # 服务模式: flask (Flask 内置服务器) / asgi (uvicorn + asgi_app, 对话接口异步执行, 需安装 asgi 可选依赖)
+    SERVER_MODE: str = os.getenv("SERVER_MODE", "flask").lower()
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", "1"))  # asgi 模式的 worker 进程数
+
     # 系统配置
     USER_ID: str = os.getenv("USER_ID", "default")
     DATA_DIR: Path = Path(os.getenv("DATA_DIR", "./data"))
 
+    # 物品快速路径: 常见物品句式不经过 LLM 直接处理 (见 core.item_intent_parser)
+    ITEM_FAST_PATH_ENABLED: bool = os.getenv("ITEM_FAST_PATH_ENABLED", "true").lower() == "true"
+
+    # 本地意图分类器: 高置信度消息跳过 Supervisor 直接路由 (见 core.intent_classifier)
+    INTENT_CLASSIFIER_ENABLED: bool = os.getenv("INTENT_CLASSIFIER_ENABLED", "true").lower() == "true"
+    INTENT_CLASSIFIER_MODEL_PATH: Path = Path(
+        os.getenv("INTENT_CLASSIFIER_MODEL_PATH", str(DATA_DIR / "intent_classifier.json"))
+    )
+    INTENT_CLASSIFIER_THRESHOLD: float = float(os.getenv("INTENT_CLASSIFIER_THRESHOLD", "0.95"))  # 置信度阈值
+
+    # 回退预判过滤器: 历史上会被 calendar_agent 回退的消息不再走关键词路由 (见 core.redirect_filter)
+    REDIRECT_FILTER_ENABLED: bool = os.getenv("REDIRECT_FILTER_ENABLED", "true").lower() == "true"
+    REDIRECT_FILTER_PATH: Path = Path(os.getenv("REDIRECT_FILTER_PATH", str(DATA_DIR / "redirect_filter.json")))
+
+    # 响应缓存: 只读请求的 Agent 回答按 (归一化输入, 数据版本) 缓存 (见 core.response_cache)
+    RESPONSE_CACHE_ENABLED: bool = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+    RESPONSE_CACHE_MAX_ENTRIES: int = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "256"))
+    RESPONSE_CACHE_TTL_SECONDS: float = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+
+    # 准入控制: 每个 Agent 的并发 LLM 调用数和排队上限, 饱和时返回 429/503 (见 core.admission)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_MAX_CONCURRENT: int = int(os.getenv("ADMISSION_MAX_CONCURRENT", "4"))  # 每个 Agent 的并发数
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", "16"))  # 每个 Agent 的排队上限
+    ADMISSION_QUEUE_TIMEOUT_SECONDS: float = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "30"))
+    ADMISSION_AGENT_LIMITS: str = os.getenv("ADMISSION_AGENT_LIMITS", "")  # 单独设置, 如 "note_agent=2,supervisor=8"
+
+    # 链路追踪: 记录每个请求各阶段的耗时, span 树写入交互日志库 (见 core.tracing)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+    # 运行指标: GET /metrics 以 Prometheus 文本格式输出 (见 core.metrics)
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+
+    # 会话历史异步写入 Zep 的线程数和积压上限 (超出时丢弃, 内存中的会话历史不受影响)
+    ZEP_PERSIST_WORKERS: int = int(os.getenv("ZEP_PERSIST_WORKERS", "1"))  # 1 个线程保证写入顺序
+    ZEP_PERSIST_MAX_PENDING: int = int(os.getenv("ZEP_PERSIST_MAX_PENDING", "1000"))
+
     # SQLite 数据库配置
     ITEMS_DB_PATH: Path = DATA_DIR / "items.db"
 
+    # 物品数据库按用户分片 (每个 user_id 一个数据库文件, 见 core.db_sharding)
+    ITEMS_SHARDING_ENABLED: bool = os.getenv("ITEMS_SHARDING_ENABLED", "false").lower() == "true"
+    ITEMS_SHARD_DIR: Path = Path(os.getenv("ITEMS_SHARD_DIR", str(DATA_DIR / "items_shards")))
+    ITEMS_SHARD_MAX_OPEN: int = int(os.getenv("ITEMS_SHARD_MAX_OPEN", "32"))  # 同时打开的分片上限
+    ITEMS_SHARD_IDLE_SECONDS: int = int(os.getenv("ITEMS_SHARD_IDLE_SECONDS", "300"))  # 空闲分片自动关闭时间
+
+    # 物品历史保留与数据库维护 (后台任务)
+    MAINTENANCE_ENABLED: bool = os.getenv("MAINTENANCE_ENABLED", "true").lower() == "true"
+    HISTORY_KEEP_LAST_MOVES: int = int(os.getenv("HISTORY_KEEP_LAST_MOVES", "50"))  # 每个物品保留最近 N 次移动
+    HISTORY_ARCHIVE_AFTER_DAYS: int = int(os.getenv("HISTORY_ARCHIVE_AFTER_DAYS", "365"))  # 超过 X 天的历史归档, 0 表示不按时间归档
+    HISTORY_RETENTION_BATCH: int = int(os.getenv("HISTORY_RETENTION_BATCH", "200"))  # 每批处理的物品数
+    MAINTENANCE_INTERVAL_SECONDS: int = int(os.getenv("MAINTENANCE_INTERVAL_SECONDS", "3600"))
+    VACUUM_PAGES_PER_RUN: int = int(os.getenv("VACUUM_PAGES_PER_RUN", "1000"))  # 每次增量回收的空闲页数
+    TOMBSTONE_GRACE_DAYS: int = int(os.getenv("TOMBSTONE_GRACE_DAYS", "30"))  # 软删除物品保留天数, 之后彻底清除
+
+    # 在线快照 (见 core.snapshot)
+    SNAPSHOT_DIR: Path = Path(os.getenv("SNAPSHOT_DIR", str(DATA_DIR / "snapshots")))
+    SNAPSHOT_KEEP: int = int(os.getenv("SNAPSHOT_KEEP", "7"))  # 保留最近 N 个快照, 0 表示不清理
+
     # Zep 记忆系统配置 (可选)
     ZEP_API_KEY: str = os.getenv("ZEP_API_KEY", "")  # Zep Cloud API Key
     ZEP_API_URL: str = os.getenv("ZEP_API_URL", "http://localhost:8000")  # 本地 Zep URL
@@ -66,6 +136,8 @@ class Config:
         logger.info(f"  API Key: {masked_key}")
         logger.info(f"  路由模型: {cls.ROUTER_MODEL}")
         logger.info(f"  Agent模型: {cls.AGENT_MODEL}")
+        logger.info(f"  Supervisor 模式: {cls.SUPERVISOR_MODE}")
+        logger.info(f"  服务模式: {cls.SERVER_MODE} (workers={cls.SERVER_WORKERS})")
         logger.info(f"  用户ID: {cls.USER_ID}")
         logger.info(f"  数据目录: {cls.DATA_DIR}")
         logger.info(f"  Zep API Key: {masked_zep_key}")
@@ -0,0 +1,311 @@
+"""请求准入控制 - 按 Agent 限制并发的 LLM 调用链, 饱和时快速拒绝
+
+突发的大量消息会同时启动同样多的 LLM 调用链, 所有请求一起变慢, 最终一起超时。
+本模块为每个 Agent (以及 Supervisor) 维护一个准入槽位:
+
+- 最多 max_concurrent 个调用同时执行, 其余按到达顺序排队
+- 队列最多 max_queue 个请求, 已满时立即拒绝 (HTTP 429)
+- 排队超过 queue_timeout 秒仍未轮到时放弃 (HTTP 503)
+- 拒绝时根据最近的调用耗时估算 Retry-After
+
+只有需要调用 LLM 的步骤受控 (server._message_pipeline 中 yield 的 Agent / Supervisor 调用),
+物品快速路径等本地处理不受影响。同步 (Flask 线程) 和异步 (ASGI 事件循环) 服务共用同一套槽位。
+
+示例:
+    with admit("note_agent"):
+        response = note_agent.invoke(query)
+
+    async with aadmit("note_agent"):
+        response = await note_agent.ainvoke(query)
+
+排队深度和等待时间见 AdmissionController.stats() (GET /api/v1/system/admission)。
+"""
+
+import asyncio
+import math
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager, nullcontext
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, Optional
+
+from config import config
+from core.logger import logger
+from core.tracing import span
+
+
+class AdmissionRejected(RuntimeError):
+    """请求未获准执行 (队列已满或排队超时)"""
+
+    def __init__(self, message: str, status_code: int, retry_after: int):
+        super().__init__(message)
+        self.status_code = status_code  # 429: 队列已满, 503: 排队超时
+        self.retry_after = retry_after  # 建议的重试间隔 (秒)
+
+
+class _Waiter:
+    """一个排队中的请求 (线程用 Event 等待, 协程用 Future 等待)"""
+
+    def __init__(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        self.loop = loop
+        self.event = threading.Event() if loop is None else None
+        self.future = loop.create_future() if loop is not None else None
+        self.granted = False  # 在 _AgentSlots 的锁内修改
+
+    def wake(self) -> None:
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: "asyncio.Future") -> None:
+    if not future.done():
+        future.set_result(None)
+
+
+class _AgentSlots:
+    """一个 Agent 的并发槽位和 FIFO 等待队列 (线程安全)"""
+
+    # 平均调用耗时的指数滑动平均系数
+    EWMA_ALPHA = 0.2
+
+    def __init__(self, name: str, max_concurrent: int, max_queue: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active = 0
+        self._waiters: Deque[_Waiter] = deque()
+        self._lock = threading.Lock()
+        self._avg_hold: Optional[float] = None
+        self._counters: Dict[str, Any] = dict.fromkeys((
+            'admitted', 'queued', 'rejected_queue_full', 'rejected_timeout',
+        ), 0)
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._queue_max = 0
+
+    # ----- 获取 / 释放 -----
+
+    def _try_acquire(self, waiter_factory) -> Optional[_Waiter]:
+        """有空闲槽位且无人排队时直接占用 (返回 None), 否则入队 (返回 waiter), 队列已满时拒绝"""
+        with self._lock:
+            if self._active < self.max_concurrent and not self._waiters:
+                self._active += 1
+                self._counters['admitted'] += 1
+                return None
+            if len(self._waiters) >= self.max_queue:
+                self._counters['rejected_queue_full'] += 1
+                raise AdmissionRejected(
+                    f"{self.name} 繁忙 (执行中 {self._active}, 排队 {len(self._waiters)}), 请稍后重试",
+                    429, self._retry_after_locked()
+                )
+            waiter = waiter_factory()
+            self._waiters.append(waiter)
+            self._counters['queued'] += 1
+            self._queue_max = max(self._queue_max, len(self._waiters))
+            return waiter
+
+    def _finish_wait(self, waiter: _Waiter, waited: float) -> None:
+        """等待结束: 已被唤醒则记录等待时间, 否则移出队列并拒绝"""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                self._counters['rejected_timeout'] += 1
+                raise AdmissionRejected(
+                    f"{self.name} 排队超过 {self.queue_timeout:.0f}s, 请稍后重试",
+                    503, self._retry_after_locked()
+                )
+            self._counters['admitted'] += 1
+            self._wait_total += waited
+            self._wait_max = max(self._wait_max, waited)
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """协程在排队时被取消: 移出队列, 已分到的槽位交还"""
+        with self._lock:
+            if not waiter.granted:
+                self._waiters.remove(waiter)
+                return
+        self.release(0.0)
+
+    def acquire(self) -> None:
+        """占用一个槽位 (排队时阻塞当前线程)"""
+        waiter = self._try_acquire(_Waiter)
+        if waiter is None:
+            return
+        start = time.monotonic()
+        waiter.event.wait(self.queue_timeout)
+        self._finish_wait(waiter, time.monotonic() - start)
+
+    async def aacquire(self) -> None:
+        """占用一个槽位 (排队时只挂起当前协程)"""
+        loop = asyncio.get_running_loop()
+        waiter = self._try_acquire(lambda: _Waiter(loop))
+        if waiter is None:
+            return
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter.future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            pass
+        except asyncio.CancelledError:
+            self._abandon(waiter)
+            raise
+        self._finish_wait(waiter, time.monotonic() - start)
+
+    def release(self, held: float) -> None:
+        """释放槽位: 有人排队时直接交给队首, 否则空出一个槽位"""
+        with self._lock:
+            if held > 0:
+                self._avg_hold = held if self._avg_hold is None else (
+                    self.EWMA_ALPHA * held + (1 - self.EWMA_ALPHA) * self._avg_hold
+                )
+            if self._waiters:
+                waiter = self._waiters.popleft()
+                waiter.granted = True
+            else:
+                self._active -= 1
+                return
+        waiter.wake()
+
+    def _retry_after_locked(self) -> int:
+        """估算重试间隔: 排在前面的请求按平均调用耗时分批执行完所需的时间"""
+        avg_hold = self._avg_hold if self._avg_hold is not None else 1.0
+        rounds = (len(self._waiters) + 1) / self.max_concurrent
+        return max(1, math.ceil(avg_hold * rounds))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            waited = self._counters['queued'] - self._counters['rejected_timeout'] - len(self._waiters)
+            return dict(
+                self._counters,
+                active=self._active,
+                queue_depth=len(self._waiters),
+                queue_depth_max=self._queue_max,
+                max_concurrent=self.max_concurrent,
+                max_queue=self.max_queue,
+                queue_timeout_seconds=self.queue_timeout,
+                wait_seconds_total=round(self._wait_total, 4),
+                wait_seconds_max=round(self._wait_max, 4),
+                wait_seconds_avg=round(self._wait_total / waited, 4) if waited > 0 else None,
+                avg_call_seconds=round(self._avg_hold, 4) if self._avg_hold is not None else None,
+            )
+
+
+class AdmissionController:
+    """按 Agent 名称分配准入槽位"""
+
+    def __init__(self, max_concurrent: int = 4, max_queue: int = 16, queue_timeout: float = 30,
+                 agent_limits: Optional[Dict[str, int]] = None):
+        """
+        Args:
+            max_concurrent: 每个 Agent 默认的最大并发调用数
+            max_queue: 每个 Agent 最多排队的请求数
+            queue_timeout: 排队的最长等待时间 (秒)
+            agent_limits: 单独设置某些 Agent 的最大并发数 {agent: n}
+        """
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.agent_limits = dict(agent_limits or {})
+        self._slots: Dict[str, _AgentSlots] = {}
+        self._lock = threading.Lock()
+
+    def _get_slots(self, agent: str) -> _AgentSlots:
+        slots = self._slots.get(agent)
+        if slots is None:
+            with self._lock:
+                slots = self._slots.get(agent)
+                if slots is None:
+                    slots = _AgentSlots(agent, max(1, self.agent_limits.get(agent, self.max_concurrent)),
+                                        self.max_queue, self.queue_timeout)
+                    self._slots[agent] = slots
+        return slots
+
+    @contextmanager
+    def slot(self, agent: str) -> Iterator[None]:
+        """在 with 块内占用 agent 的一个槽位 (无法获得时抛出 AdmissionRejected)"""
+        slots = self._get_slots(agent)
+        with span("admission", agent=agent):
+            slots.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            slots.release(time.monotonic() - start)
+
+    @asynccontextmanager
+    async def aslot(self, agent: str) -> AsyncIterator[None]:
+        """slot 的异步版本"""
+        slots = self._get_slots(agent)
+        with span("admission", agent=agent):
+            await slots.aacquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            slots.release(time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        """每个 Agent 的执行数、排队深度、等待时间和拒绝次数"""
+        with self._lock:
+            slots = list(self._slots.values())
+        return {s.name: s.stats() for s in sorted(slots, key=lambda s: s.name)}
+
+
+def parse_agent_limits(value: str) -> Dict[str, int]:
+    """解析 "note_agent=2,calendar_agent=1" 形式的单独并发限制"""
+    limits = {}
+    for part in value.split(','):
+        if not part.strip():
+            continue
+        name, _, limit = part.partition('=')
+        try:
+            limits[name.strip()] = int(limit)
+        except ValueError:
+            logger.warning(f"[准入控制] 忽略无效的并发限制: {part.strip()}")
+    return limits
+
+
+# 全局实例
+_controller: Optional[AdmissionController] = None
+_controller_loaded = False
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """获取全局准入控制器 (未启用时返回 None)"""
+    global _controller, _controller_loaded
+    if not _controller_loaded:
+        with _controller_lock:
+            if not _controller_loaded:
+                if config.ADMISSION_ENABLED:
+                    _controller = AdmissionController(
+                        config.ADMISSION_MAX_CONCURRENT,
+                        config.ADMISSION_MAX_QUEUE,
+                        config.ADMISSION_QUEUE_TIMEOUT_SECONDS,
+                        parse_agent_limits(config.ADMISSION_AGENT_LIMITS),
+                    )
+                    logger.info(f"[准入控制] ✓ 已启用: 每个 Agent 并发 {_controller.max_concurrent}, "
+                                f"排队 {_controller.max_queue}, 等待上限 {_controller.queue_timeout:.0f}s")
+                _controller_loaded = True
+    return _controller
+
+
+def admit(agent: str):
+    """占用 agent 的准入槽位 (未启用准入控制时不做限制)"""
+    controller = get_admission_controller()
+    return controller.slot(agent) if controller else nullcontext()
+
+
+def aadmit(agent: str):
+    """admit 的异步版本"""
+    controller = get_admission_controller()
+    return controller.aslot(agent) if controller else nullcontext()
+
+
+__all__ = [
+    'AdmissionController', 'AdmissionRejected', 'parse_agent_limits',
+    'get_admission_controller', 'admit', 'aadmit',
+]
@@ -2,15 +2,146 @@
 
 定义所有子 Agent 必须实现的标准接口,实现 Agent 的自动注册和统一调用。
 """
-from typing import Protocol, Dict, Any, List, runtime_checkable
+from typing import Protocol, Callable, Dict, Any, Iterator, List, Optional, runtime_checkable
 from abc import ABC, abstractmethod
-from langchain_core.tools import tool
+import asyncio
+from contextlib import contextmanager
+from contextvars import ContextVar
+from langchain_core.tools import StructuredTool
 import json
 
 from core.logger import logger
+from core.tracing import span
 from core.response_types import AgentResponse, Action
 
 
+# 流式事件回调: emit(事件名, 数据), 见 stream_events()
+StreamEmitter = Callable[[str, Dict[str, Any]], None]
+
+_stream_emitter: ContextVar[Optional[StreamEmitter]] = ContextVar('stream_emitter', default=None)
+
+
+@contextmanager
+def stream_events(emit: StreamEmitter) -> Iterator[None]:
+    """在当前上下文中开启流式事件推送
+
+    上下文内的 Agent 调用 (run_agent_graph) 改用 LangGraph 的 stream(),
+    路由决策、工具调用和 LLM token 通过 emit 实时推送; Agent 的返回值不变。
+
+    Example:
+        with stream_events(lambda event, data: print(event, data)):
+            response = item_agent.invoke("我记录了哪些物品?")
+    """
+    token = _stream_emitter.set(emit)
+    try:
+        yield
+    finally:
+        _stream_emitter.reset(token)
+
+
+def emit_event(event: str, data: Dict[str, Any]) -> None:
+    """推送一个流式事件 (没有开启流式推送时什么都不做)"""
+    emit = _stream_emitter.get()
+    if emit is None:
+        return
+    try:
+        emit(event, data)
+    except Exception as e:
+        logger.debug(f"[流式] 推送 {event} 事件失败: {e}")
+
+
+def _tool_actions(content: Any) -> List[Dict[str, Any]]:
+    """从 ToolMessage 内容中解析结构化操作 (子 Agent 工具返回 actions 列表)"""
+    try:
+        tool_data = json.loads(content)
+    except (json.JSONDecodeError, TypeError):
+        return []
+    if not isinstance(tool_data, dict):
+        return []
+    if "action_type" in tool_data and "data" in tool_data:
+        return [{"type": tool_data["action_type"], "data": tool_data["data"]}]
+    return tool_data.get("actions", []) if isinstance(tool_data.get("actions"), list) else []
+
+
+# graph.stream 的输出模式: token / 节点更新 / 完整状态
+_STREAM_MODES = ["messages", "updates", "values"]
+
+
+def _emit_graph_chunk(agent_name: str, mode: str, chunk: Any) -> None:
+    """把 graph.stream 的一个 messages / updates 输出转为流式事件"""
+    from langchain_core.messages import AIMessage, AIMessageChunk, ToolMessage
+
+    if mode == "messages":
+        message, _metadata = chunk
+        if isinstance(message, AIMessageChunk) and isinstance(message.content, str) and message.content:
+            emit_event("token", {"agent": agent_name, "text": message.content})
+    elif mode == "updates":
+        for update in chunk.values():
+            for message in (update.get("messages", []) if isinstance(update, dict) else []):
+                if isinstance(message, AIMessage):
+                    for call in message.tool_calls:
+                        emit_event("tool_call", {"agent": agent_name, "tool": call["name"], "args": call["args"]})
+                elif isinstance(message, ToolMessage):
+                    emit_event("tool_result", {
+                        "agent": agent_name,
+                        "tool": message.name,
+                        "actions": _tool_actions(message.content)
+                    })
+
+
+def run_agent_graph(graph, messages: List[Dict[str, Any]], agent_name: str,
+                    config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """执行 create_agent 生成的 LangGraph 图
+
+    开启流式推送时使用 graph.stream(), 边执行边推送事件:
+    - token: LLM 输出的文本片段 {"agent", "text"}
+    - tool_call: 模型决定调用工具 {"agent", "tool", "args"}
+    - tool_result: 工具执行完成 {"agent", "tool", "actions"}
+
+    Args:
+        graph: create_agent 返回的图
+        messages: 输入消息
+        agent_name: 事件中标注的 Agent 名称
+        config: 传给图的运行配置 (如 recursion_limit)
+
+    Returns:
+        图的最终状态 (与 graph.invoke 的返回值相同)
+    """
+    payload = {"messages": messages}
+    # 链路追踪: 图内的 LLM 调用和工具执行自动记录为该 span 的子节点
+    with span(f"agent:{agent_name}", kind="agent"):
+        if _stream_emitter.get() is None:
+            return graph.invoke(payload, config=config)
+
+        final_state: Dict[str, Any] = {}
+        for mode, chunk in graph.stream(payload, config=config, stream_mode=_STREAM_MODES):
+            if mode == "values":
+                final_state = chunk
+            else:
+                _emit_graph_chunk(agent_name, mode, chunk)
+        return final_state
+
+
+async def arun_agent_graph(graph, messages: List[Dict[str, Any]], agent_name: str,
+                           config: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """run_agent_graph 的异步版本 (graph.ainvoke / graph.astream)
+
+    等待 LLM 响应时不占用线程, 大量并发请求可以共用一个事件循环。
+    """
+    payload = {"messages": messages}
+    with span(f"agent:{agent_name}", kind="agent"):
+        if _stream_emitter.get() is None:
+            return await graph.ainvoke(payload, config=config)
+
+        final_state: Dict[str, Any] = {}
+        async for mode, chunk in graph.astream(payload, config=config, stream_mode=_STREAM_MODES):
+            if mode == "values":
+                final_state = chunk
+            else:
+                _emit_graph_chunk(agent_name, mode, chunk)
+        return final_state
+
+
 @runtime_checkable
 class AgentProtocol(Protocol):
     """Agent 协议 - 定义所有 Agent 必须实现的接口"""
@@ -36,10 +167,17 @@ class AgentProtocol(Protocol):
         """
         ...
 
+    async def ainvoke(self, query: str) -> AgentResponse:
+        """异步处理用户请求 (与 invoke 返回相同的响应)"""
+        ...
+
 
 class BaseAgent(ABC):
     """Agent 基类 - 提供默认实现和工具生成"""
 
+    # LangGraph 图 (self.agent) 的运行配置, 如 {"recursion_limit": 50}
+    graph_config: Optional[Dict[str, Any]] = None
+
     def __init__(self, name: str, description: str):
         self._name = name
         self._description = description
@@ -57,6 +195,37 @@ class BaseAgent(ABC):
         """子类必须实现的核心处理逻辑"""
         pass
 
+    async def ainvoke(self, query: str) -> AgentResponse:
+        """异步处理请求 (ASGI 服务使用)
+
+        有 LangGraph 图 (self.agent) 时通过 graph.ainvoke / astream 执行, 等待 LLM 时不占用线程;
+        否则在线程池中执行 invoke。
+        """
+        graph = getattr(self, "agent", None)
+        if graph is None:
+            return await asyncio.to_thread(self.invoke, query)
+
+        logger.info(f"[{self.name}] 📝 处理查询 (异步): {query}")
+        try:
+            result = await arun_agent_graph(graph, [{"role": "user", "content": query}], self.name, self.graph_config)
+            agent_response = self._extract_response_from_result(result)
+        except Exception as e:
+            return self._error_response(e)
+
+        logger.info(f"[{self.name}] ✓ 响应: {agent_response.message[:100]}...")
+        return agent_response
+
+    def _error_response(self, error: Exception) -> AgentResponse:
+        """调用失败时的响应 (子类可覆盖, 提供更具体的提示)"""
+        error_msg = f"处理失败: {str(error)}"
+        logger.error(f"[{self.name}] ✗ {error_msg}")
+        return AgentResponse.error_response(agent=self.name, error=error_msg)
+
+    def stream(self, query: str, emit: StreamEmitter) -> AgentResponse:
+        """流式处理请求: 执行过程中通过 emit 推送工具调用和 LLM token, 返回与 invoke 相同的响应"""
+        with stream_events(emit):
+            return self.invoke(query)
+
     def _extract_response_from_result(self, result: Dict[str, Any]) -> AgentResponse:
         """从 LangChain Agent 返回结果中提取结构化响应
 
@@ -130,16 +299,11 @@ class BaseAgent(ABC):
         Supervisor 可以直接使用,无需手写包装代码。
 
         工具函数返回 dict（包含结构化数据），LangChain 会自动序列化为 JSON。
+        Supervisor 异步执行 (graph.ainvoke) 时调用 Agent 的 ainvoke。
         """
         agent_instance = self
-        agent_description = self.description
-
-        @tool
-        def agent_tool(query: str) -> dict:
-            """Agent tool generated from BaseAgent"""
-            # 调用 Agent 的 invoke 方法，返回 AgentResponse 对象
-            agent_response = agent_instance.invoke(query)
 
+        def to_dict(agent_response: AgentResponse) -> dict:
             # 将 AgentResponse 转换为 dict，供 LangChain 序列化
             return {
                 "agent": agent_response.agent,
@@ -151,11 +315,22 @@ class BaseAgent(ABC):
                 ]
             }
 
-        # 动态设置工具的名称和描述
-        agent_tool.name = f"{self.name}_tool"
-        agent_tool.description = agent_description
+        def agent_tool(query: str) -> dict:
+            """Agent tool generated from BaseAgent"""
+            # 调用 Agent 的 invoke 方法，返回 AgentResponse 对象
+            return to_dict(agent_instance.invoke(query))
+
+        async def agent_atool(query: str) -> dict:
+            """Agent tool generated from BaseAgent"""
+            return to_dict(await agent_instance.ainvoke(query))
 
-        return agent_tool
+        # 动态设置工具的名称和描述
+        return StructuredTool.from_function(
+            func=agent_tool,
+            coroutine=agent_atool,
+            name=f"{self.name}_tool",
+            description=self.description
+        )
 
 
 class AgentRegistry:
@@ -182,6 +357,11 @@ class AgentRegistry:
         cls._agents[agent.name] = agent
         logger.info(f"[注册中心] ✓ 注册 Agent: {agent.name}")
 
+    @classmethod
+    def get(cls, name: str) -> Optional[AgentProtocol]:
+        """按名称获取已注册的 Agent, 未注册时返回 None"""
+        return cls._agents.get(name)
+
     @classmethod
     def get_all_agents(cls) -> List[AgentProtocol]:
         """获取所有已注册的 Agent"""
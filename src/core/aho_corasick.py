@@ -0,0 +1,83 @@
+"""Aho–Corasick 多模式字符串匹配
+
+把一组关键词编译为一个自动机, 一次扫描文本即可找出所有关键词 (含重叠) 的出现位置。
+扫描耗时只与文本长度和匹配数有关, 与关键词数量无关, 适合关键词路由这类
+"每条消息对几百个关键词做子串匹配" 的场景。
+
+构造时把失配指针展开为完整的状态转移表 (只包含关键词中出现过的字符),
+扫描时每个字符只做一次字典查找。
+
+示例:
+    >>> automaton = AhoCorasick([("明天", "time"), ("提醒", "action")])
+    >>> [(m.start, m.keyword, m.value) for m in automaton.find_all("明天提醒我")]
+    [(0, '明天', 'time'), (2, '提醒', 'action')]
+"""
+from collections import deque
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Tuple
+
+
+class KeywordMatch(NamedTuple):
+    """一次关键词匹配"""
+    start: int  # 在文本中的起始位置
+    end: int  # 结束位置 (不含)
+    keyword: str
+    value: Any  # 关键词附带的值 (如类别)
+
+
+class AhoCorasick:
+    """Aho–Corasick 自动机 (构造后只读, 可在多线程间共享)"""
+
+    def __init__(self, keywords: Iterable[Tuple[str, Any]]):
+        """
+        Args:
+            keywords: (关键词, 附带值) 列表; 同一关键词可以出现多次 (附带不同的值)
+        """
+        self._goto: List[Dict[str, int]] = [{}]  # 状态转移表 (构造完成后为完整转移)
+        self._output: List[Tuple[Tuple[str, Any], ...]] = [()]  # 到达该状态时匹配的关键词
+
+        for keyword, value in keywords:
+            if keyword:
+                self._add(keyword, value)
+        self._build()
+
+    def __len__(self) -> int:
+        """状态数"""
+        return len(self._goto)
+
+    def _add(self, keyword: str, value: Any) -> None:
+        state = 0
+        for ch in keyword:
+            next_state = self._goto[state].get(ch)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][ch] = next_state
+                self._goto.append({})
+                self._output.append(())
+            state = next_state
+        self._output[state] += ((keyword, value),)
+
+    def _build(self) -> None:
+        """广度优先计算失配指针, 合并失配链上的输出, 并把失配转移展开到转移表中"""
+        children = [dict(edges) for edges in self._goto]  # 字典树的边 (展开前)
+        fail = [0] * len(self._goto)
+        queue = deque(children[0].values())
+
+        while queue:
+            state = queue.popleft()
+            for ch, child in children[state].items():
+                queue.append(child)
+                # 失配状态更浅, 转移表已经展开完成
+                fail[child] = self._goto[fail[state]].get(ch, 0) if state else 0
+                self._output[child] += self._output[fail[child]]
+            for ch, target in self._goto[fail[state]].items():
+                self._goto[state].setdefault(ch, target)
+
+    def find_all(self, text: str) -> Iterator[KeywordMatch]:
+        """按结束位置顺序产出所有匹配 (包括重叠的匹配)"""
+        goto, output = self._goto, self._output
+        state = 0
+        for index, ch in enumerate(text):
+            state = goto[state].get(ch, 0)
+            if output[state]:
+                for keyword, value in output[state]:
+                    yield KeywordMatch(index + 1 - len(keyword), index + 1, keyword, value)
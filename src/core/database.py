@@ -4,13 +4,42 @@
 """
 import sqlite3
 import json
+import base64
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Any, List, Optional
-import re
+from typing import TYPE_CHECKING, Dict, Any, Iterator, List, Optional, Set, Tuple, Union
+from contextlib import contextmanager
+import queue
 import threading
+import time
+import uuid
+import zlib
 
+from core import item_normalizer
+from core.db_migrations import migrate, fts_tokenizer
 from core.logger import logger
+from core.metrics import ITEM_QUERY_SECONDS
+
+if TYPE_CHECKING:
+    from core.db_sharding import ShardedItemDatabase
+
+# 批量操作中单条 IN 查询的最大参数个数
+_SQL_CHUNK_SIZE = 500
+
+# 物品列表字段 -> items 表列名 (列表接口的可选投影字段)
+LIST_FIELDS: Dict[str, str] = {
+    'item': 'item_name',
+    'location': 'location',
+    'location_detail': 'location_detail',
+    'created_at': 'created_at',
+    'updated_at': 'updated_at',
+    'moved_at': 'moved_at',
+    'move_count': 'move_count',
+    'query_count': 'query_count',
+}
+
+# 分页查询单页最大条数
+MAX_PAGE_SIZE = 500
 
 
 def get_timestamp() -> str:
@@ -19,118 +48,220 @@ def get_timestamp() -> str:
 
 
 def normalize_item_name(item: str) -> str:
-    """
-    规范化物品名称
-
-    规则:
-    - 转小写
-    - 去除多余空格
-    - 去除常见标点符号
-    """
-    item = item.lower().strip()
-    # 去除标点
-    item = re.sub(r'[，。！？、；：""''（）《》【】]', '', item)
-    # 压缩空格
-    item = re.sub(r'\s+', ' ', item)
-    return item
+    """规范化物品名称 (见 item_normalizer.normalize)"""
+    return item_normalizer.normalize(item)
 
 
 def extract_aliases(item: str) -> List[str]:
     """
-    从物品名称提取可能的别名
+    从物品名称提取可能的别名 (见 item_normalizer.aliases)
 
-    例如: "笔记本电脑" -> ["笔记本电脑", "笔记本", "电脑", "laptop"]
+    例如: "笔记本电脑" -> ["笔记本电脑", "电脑", "笔记本", "laptop"]
     """
-    aliases = [item]
-    normalized = normalize_item_name(item)
+    return list(item_normalizer.aliases(item))
 
-    # 常见简称映射
-    alias_map = {
-        "笔记本电脑": ["电脑", "笔记本", "laptop"],
-        "手机": ["电话", "phone"],
-        "钥匙": ["key"],
-        "护照": ["passport"],
-        "身份证": ["id", "身份证件"],
-        "充电器": ["充电线", "charger"],
-        "耳机": ["headphone", "earphone"],
-        "钱包": ["wallet"],
-    }
 
-    for key, values in alias_map.items():
-        if key in normalized:
-            aliases.extend(values)
+def extract_keywords(text: str) -> List[str]:
+    """
+    从文本中提取关键词用于模糊搜索 (见 item_normalizer.keywords)
 
-    # 去重
-    return list(set(aliases))
+    例如: "摩托车的钥匙" -> ["摩托车的钥匙", "摩托车", "钥匙"]
+    """
+    return list(item_normalizer.keywords(text))
 
 
-def extract_keywords(text: str) -> List[str]:
+def extract_ngrams(text: str) -> Set[str]:
     """
-    从文本中提取关键词用于模糊搜索
+    提取文本的 bigram / trigram (见 item_normalizer.ngrams)
 
-    策略:
-    1. 移除常见的助词、介词、量词
-    2. 提取2-4个字的词组
-    3. 保留单个汉字(长度>=2时)
+    例如: "摩托车钥匙" -> {"摩托", "托车", "车钥", "钥匙", "摩托车", "托车钥", "车钥匙"}
+    """
+    return set(item_normalizer.ngrams(text))
 
-    例如: "摩托车钥匙" -> ["摩托车", "钥匙", "摩托车钥匙"]
-         "摩托车的钥匙" -> ["摩托车", "钥匙", "摩托车的钥匙"]
 
-    Args:
-        text: 输入文本
+def encode_list_cursor(updated_at: str, item_id: int) -> str:
+    """将分页位置 (updated_at, id) 编码为不透明游标"""
+    raw = json.dumps([updated_at, item_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
 
-    Returns:
-        关键词列表
-    """
-    # 常见的停用词(助词、介词等)
-    stopwords = {'的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看'}
 
-    normalized = normalize_item_name(text)
-    keywords = []
+def decode_list_cursor(cursor: str) -> tuple:
+    """解析分页游标
 
-    # 保留完整文本
-    keywords.append(normalized)
+    Raises:
+        ValueError: 游标格式无效
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        updated_at, item_id = json.loads(raw)
+        if not isinstance(updated_at, str) or not isinstance(item_id, int):
+            raise TypeError
+        return updated_at, item_id
+    except (ValueError, TypeError):
+        raise ValueError(f"无效的分页游标: {cursor}")
 
-    # 移除停用词
-    for word in stopwords:
-        normalized = normalized.replace(word, ' ')
 
-    # 按空格分割
-    parts = normalized.split()
-    for part in parts:
-        part = part.strip()
-        if len(part) >= 2:  # 至少2个字符
-            keywords.append(part)
+class _AliasIndex:
+    """单个用户的别名内存索引
 
-            # 如果是长词,提取子串(2-4字)
-            if len(part) > 4:
-                for i in range(len(part) - 1):
-                    for length in [2, 3, 4]:
-                        if i + length <= len(part):
-                            substr = part[i:i+length]
-                            if len(substr) >= 2:
-                                keywords.append(substr)
+    维护 规范化别名 -> 物品ID 的倒排表, 以及别名字符 n-gram -> 别名 的倒排表,
+    使别名匹配无需扫描整张 items 表:
+    - 别名包含在查询词中: 枚举查询词的所有子串, 逐个查表
+    - 查询词包含在别名中: 用查询词的 bigram 倒排表求交集得到候选别名, 再做子串校验
 
-    # 去重并按长度排序(优先使用长关键词)
-    keywords = list(set(keywords))
-    keywords.sort(key=len, reverse=True)
+    线程安全: 查询在读连接上并发执行, 与 remember/delete 的增量维护共用 self._lock
+    (单次查找只做内存查表, 持锁时间很短)。
 
-    return keywords
+    物品ID自增且不复用, 别名创建后不变, 因此其他连接新建的物品可按 ID 增量同步
+    (synced_id 之后的行); 其他连接删除的物品可能残留在索引中, 由调用方回表校验。
+    """
+
+    def __init__(self, synced_id: int = 0):
+        self._lock = threading.Lock()
+        self.synced_id = synced_id  # 已从数据库同步到的最大物品ID (含其他用户的行)
+        self._by_alias: Dict[str, Set[int]] = {}  # 规范化别名 -> 物品ID集合
+        self._by_gram: Dict[str, Set[str]] = {}  # 单字/双字 -> 规范化别名集合
+        self._item_aliases: Dict[int, List[str]] = {}  # 物品ID -> 规范化别名列表
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        """提取单字和双字 n-gram"""
+        grams = set(text)
+        grams.update(text[i:i + 2] for i in range(len(text) - 1))
+        return grams
+
+    def add(self, item_id: int, aliases: List[str]) -> None:
+        """添加(或替换)一个物品的别名"""
+        normalized_aliases = list({normalize_item_name(alias) for alias in aliases})
+        with self._lock:
+            self._add_locked(item_id, normalized_aliases)
+
+    def _add_locked(self, item_id: int, normalized_aliases: List[str]) -> None:
+        self._remove_locked(item_id)
+        self._item_aliases[item_id] = normalized_aliases
+        for alias in normalized_aliases:
+            self._by_alias.setdefault(alias, set()).add(item_id)
+            for gram in self._grams(alias):
+                self._by_gram.setdefault(gram, set()).add(alias)
+
+    def remove(self, item_id: int) -> None:
+        """移除一个物品的所有别名"""
+        with self._lock:
+            self._remove_locked(item_id)
+
+    def _remove_locked(self, item_id: int) -> None:
+        for alias in self._item_aliases.pop(item_id, []):
+            ids = self._by_alias.get(alias)
+            if ids is None:
+                continue
+            ids.discard(item_id)
+            if ids:
+                continue
+            # 该别名已无物品引用, 同时清理 n-gram 倒排表
+            del self._by_alias[alias]
+            for gram in self._grams(alias):
+                aliases = self._by_gram.get(gram)
+                if aliases is not None:
+                    aliases.discard(alias)
+                    if not aliases:
+                        del self._by_gram[gram]
+
+    def lookup(self, normalized: str) -> List[int]:
+        """双向子串匹配查找物品ID (按ID升序, 与表扫描顺序一致)"""
+        with self._lock:
+            return self._lookup_locked(normalized)
+
+    def _lookup_locked(self, normalized: str) -> List[int]:
+        if not normalized:
+            # 空串是任何别名的子串
+            return sorted(self._item_aliases)
+
+        matched: Set[int] = set()
+
+        # 1. 别名包含在查询词中
+        length = len(normalized)
+        for start in range(length):
+            for end in range(start + 1, length + 1):
+                ids = self._by_alias.get(normalized[start:end])
+                if ids:
+                    matched.update(ids)
+
+        # 2. 查询词包含在别名中
+        grams = [normalized] if length == 1 else [normalized[i:i + 2] for i in range(length - 1)]
+        postings = [self._by_gram.get(gram) for gram in grams]
+        if all(postings):
+            candidates = set.intersection(*sorted(postings, key=len))
+            for alias in candidates:
+                if normalized in alias:
+                    matched.update(self._by_alias[alias])
+
+        return sorted(matched)
+
+    def exact(self, normalized: str) -> List[int]:
+        """使用这个规范化别名 (精确匹配) 的物品ID"""
+        with self._lock:
+            return sorted(self._by_alias.get(normalized, ()))
+
+    def sync(self, rows: List[Tuple[int, Optional[str]]], synced_id: int) -> None:
+        """加入 synced_id 之后新建的物品 (rows 为未删除物品的 (id, normalized_aliases JSON))"""
+        with self._lock:
+            if synced_id <= self.synced_id:
+                return  # 其他线程已同步
+            for item_id, aliases_json in rows:
+                if item_id <= self.synced_id or not aliases_json:
+                    continue
+                try:
+                    self._add_locked(item_id, json.loads(aliases_json))
+                except (json.JSONDecodeError, TypeError):
+                    continue
+            self.synced_id = synced_id
 
 
 class ItemDatabase:
     """物品数据库管理类"""
 
-    def __init__(self, db_path: Path):
+    def __init__(self, db_path: Path,
+                 access_flush_interval: float = 5.0,
+                 access_flush_size: int = 100,
+                 reader_pool_size: int = 4):
         """
         初始化数据库
 
+        连接模型:
+        - 写连接 (self.conn): 唯一, 所有写操作持有 _lock 串行执行
+        - 读连接池: 只读 WAL 连接, 每次读操作独占借出一个, 读之间互不阻塞
+
         Args:
             db_path: 数据库文件路径
+            access_flush_interval: 访问统计定时写入间隔(秒)
+            access_flush_size: 缓冲的物品数达到该值时立即写入访问统计
+            reader_pool_size: 只读连接池大小 (同时进行的读操作上限)
         """
         self.db_path = db_path
         self.conn: Optional[sqlite3.Connection] = None
-        self._lock = threading.RLock()  # 添加线程锁
+        self._lock = threading.RLock()  # 写锁: 保护写连接
+
+        # 数据版本: 本实例提交的写事务计数 (实例标识避免分片重新打开后与旧版本号重复)
+        self._instance_token = uuid.uuid4().hex[:8]
+        self._write_version = 0
+
+        # 只读连接池: 空闲连接队列 + 信号量限制连接总数 (按需创建)
+        self._reader_slots = threading.BoundedSemaphore(reader_pool_size)
+        self._idle_readers: "queue.LifoQueue[sqlite3.Connection]" = queue.LifoQueue()
+        self._readers: List[sqlite3.Connection] = []
+        self._readers_lock = threading.Lock()
+        self._alias_indexes: Dict[str, _AliasIndex] = {}  # {user_id: 别名索引}, 首次查询时构建
+        self._alias_lock = threading.Lock()  # 保护 _alias_indexes (不占用写锁)
+        self._fts_tokenizer_name: Optional[str] = None
+
+        # 访问统计缓冲: 查询只记内存, 由后台线程/数量阈值/close() 合并写入
+        self._access_flush_interval = access_flush_interval
+        self._access_flush_size = access_flush_size
+        self._pending_access: Dict[int, List[Any]] = {}  # {item_id: [查询次数增量, 最后访问时间]}
+        self._access_lock = threading.Lock()
+        self._access_stop = threading.Event()
+        self._access_thread: Optional[threading.Thread] = None
+
         self._init_db()
 
     def _init_db(self):
@@ -148,6 +279,9 @@ class ItemDatabase:
         )
         self.conn.row_factory = sqlite3.Row
 
+        # 新建数据库使用增量 auto_vacuum, 空闲页由维护任务分批回收 (对已有数据库不生效)
+        self.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+
         # 启用 WAL 模式 (Write-Ahead Logging) 支持并发
         self.conn.execute("PRAGMA journal_mode=WAL")
         self.conn.execute("PRAGMA synchronous=NORMAL")
@@ -160,150 +294,209 @@ class ItemDatabase:
         logger.success("[数据库] ✓ 数据库初始化完成")
 
     def _create_tables(self):
-        """创建数据库表结构"""
-        cursor = self.conn.cursor()
+        """创建/升级数据库表结构 (见 core.db_migrations)"""
+        version = migrate(self.conn)
+        logger.info(f"[数据库] 表结构版本: v{version}")
+
+    def _fts_tokenizer(self) -> str:
+        """items_fts 使用的分词器 (trigram 或 unicode61)"""
+        if self._fts_tokenizer_name is None:
+            self._fts_tokenizer_name = fts_tokenizer(self.conn) or 'unicode61'
+        return self._fts_tokenizer_name
+
+    def _index_ngrams(self, cursor: sqlite3.Cursor, user_id: str,
+                      item_id: int, normalized: str) -> None:
+        """写入新物品的 n-gram 索引"""
+        cursor.executemany(
+            "INSERT OR IGNORE INTO item_ngrams (user_id, gram, item_id) VALUES (?, ?, ?)",
+            [(user_id, gram, item_id) for gram in extract_ngrams(normalized)]
+        )
+
+    @contextmanager
+    def _write_transaction(self, data_changed: bool = True) -> Iterator[sqlite3.Cursor]:
+        """在写连接上执行一个写事务
+
+        持有写锁并以 BEGIN IMMEDIATE 开启事务, 正常退出时提交, 异常时回滚。
+
+        Args:
+            data_changed: 提交后是否更新数据版本 (只写访问统计时为 False)
+        """
+        with self._lock:
+            cursor = self.conn.cursor()
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                yield cursor
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            if data_changed:
+                self._write_version += 1
 
-        # 主表: items
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS items (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+    def data_version(self, user_id: str = 'default') -> str:
+        """数据版本戳, 每次写事务提交后都会改变 (用于响应缓存的键)
 
-                -- 物品标识
-                item_name TEXT NOT NULL,
-                normalized_name TEXT NOT NULL,
-                item_aliases TEXT,
+        由本实例的写事务计数和 SQLite 的 PRAGMA data_version 组成,
+        后者在其他连接 (如其他进程) 提交写入后变化。
 
-                -- 位置信息
-                location TEXT NOT NULL,
-                location_detail TEXT,
+        Args:
+            user_id: 仅用于分片路由, 单库模式下所有用户共用一个版本
+        """
+        with self._lock:
+            external = self.conn.execute("PRAGMA data_version").fetchone()[0]
+            return f"{self._instance_token}.{self._write_version}.{external}"
+
+    def _open_reader(self) -> sqlite3.Connection:
+        """创建一个只读连接"""
+        conn = sqlite3.connect(
+            f"{self.db_path.resolve().as_uri()}?mode=ro",
+            uri=True,
+            check_same_thread=False,  # 连接会被不同线程先后借用, 但同一时刻只属于一个线程
+            isolation_level=None,
+            timeout=30.0
+        )
+        conn.row_factory = sqlite3.Row
+        with self._readers_lock:
+            self._readers.append(conn)
+        logger.debug(f"[数据库] 创建只读连接, 当前连接数: {len(self._readers)}")
+        return conn
 
-                -- 用户信息
-                user_id TEXT NOT NULL DEFAULT 'default',
+    @contextmanager
+    def _read_connection(self) -> Iterator[sqlite3.Connection]:
+        """从只读连接池借出一个连接, 用完归还
 
-                -- 时间戳
-                created_at TEXT NOT NULL,
-                updated_at TEXT NOT NULL,
-                moved_at TEXT,
+        连接池满时阻塞等待其他读操作归还连接。
+        """
+        self._reader_slots.acquire()
+        try:
+            try:
+                conn = self._idle_readers.get_nowait()
+            except queue.Empty:
+                conn = self._open_reader()
+            try:
+                yield conn
+            finally:
+                self._idle_readers.put(conn)
+        finally:
+            self._reader_slots.release()
 
-                -- 统计信息
-                move_count INTEGER DEFAULT 0,
-                query_count INTEGER DEFAULT 0,
+    def _get_alias_index(self, conn: sqlite3.Connection, user_id: str) -> _AliasIndex:
+        """获取用户的别名索引 (不存在时构建), 并同步其他连接新建的物品
 
-                -- 状态标记
-                is_deleted INTEGER DEFAULT 0,
-                is_active INTEGER DEFAULT 1,
+        只使用传入的只读连接和 self._alias_lock, 不占用写锁。本实例的写入会增量维护索引;
+        其他连接 (如 ASGI 的其他 worker 进程) 新建的物品按 ID 增量同步, 删除的物品由
+        查询时回表校验过滤。
 
-                -- 额外元数据
-                tags TEXT,
-                notes TEXT,
-                importance INTEGER DEFAULT 0,
+        Args:
+            conn: 只读连接 (见 _read_connection)
+            user_id: 用户ID
+        """
+        with self._alias_lock:
+            index = self._alias_indexes.get(user_id)
+            if index is None:
+                synced_id = conn.execute("SELECT COALESCE(MAX(id), 0) FROM items").fetchone()[0]
+                index = _AliasIndex(synced_id)
+                cursor = conn.execute("""
+                    SELECT id, normalized_aliases FROM items
+                    WHERE user_id = ? AND is_deleted = 0 AND id <= ?
+                """, (user_id, synced_id))
+                for row in cursor.fetchall():
+                    if not row['normalized_aliases']:
+                        continue
+                    try:
+                        index.add(row['id'], json.loads(row['normalized_aliases']))
+                    except (json.JSONDecodeError, TypeError):
+                        continue
+
+                self._alias_indexes[user_id] = index
+                logger.debug(f"[数据库] 构建别名索引: user_id={user_id}, 物品数={len(index._item_aliases)}")
+                return index
+
+        # 增量同步: 主键范围查询, 没有新物品时只读一个页
+        rows = conn.execute("""
+            SELECT id, user_id, is_deleted, normalized_aliases FROM items
+            WHERE id > ? ORDER BY id
+        """, (index.synced_id,)).fetchall()
+        if rows:
+            index.sync([(row['id'], row['normalized_aliases']) for row in rows
+                        if row['user_id'] == user_id and not row['is_deleted']], rows[-1]['id'])
+        return index
+
+    def _index_aliases(self, user_id: str, item_id: int, aliases: List[str]) -> None:
+        """将新物品的别名加入已构建的索引 (未构建时由首次查询统一加载)"""
+        with self._alias_lock:
+            index = self._alias_indexes.get(user_id)
+        if index is not None:
+            index.add(item_id, aliases)
+
+    def _unindex_aliases(self, user_id: str, item_ids: List[int]) -> None:
+        """从已构建的索引中移除物品别名"""
+        with self._alias_lock:
+            index = self._alias_indexes.get(user_id)
+        if index is not None:
+            for item_id in item_ids:
+                index.remove(item_id)
+
+    def _record_access(self, item_id: int, accessed_at: str) -> None:
+        """记录一次物品访问 (仅写内存缓冲, 不触发数据库写入)"""
+        with self._access_lock:
+            pending = self._pending_access.get(item_id)
+            if pending is None:
+                self._pending_access[item_id] = [1, accessed_at]
+            else:
+                pending[0] += 1
+                pending[1] = accessed_at
+            should_flush = len(self._pending_access) >= self._access_flush_size
+
+            if self._access_thread is None:
+                self._access_thread = threading.Thread(
+                    target=self._access_flush_loop,
+                    name="item-access-flush",
+                    daemon=True
+                )
+                self._access_thread.start()
+
+        if should_flush:
+            self.flush_access_stats()
+
+    def _access_flush_loop(self) -> None:
+        """后台定时写入访问统计"""
+        while not self._access_stop.wait(self._access_flush_interval):
+            try:
+                self.flush_access_stats()
+            except Exception as e:
+                logger.warning(f"[数据库] ⚠️  访问统计写入失败: {e}")
 
-                -- 最后访问时间
-                last_accessed_at TEXT,
+    def flush_access_stats(self) -> int:
+        """将缓冲的访问统计合并写入数据库
 
-                -- 唯一约束
-                UNIQUE(user_id, normalized_name)
-            )
-        """)
-
-        # 索引
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_items_user_normalized
-            ON items(user_id, normalized_name)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_items_updated_at
-            ON items(updated_at)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_items_is_deleted
-            ON items(is_deleted)
-        """)
-
-        # 历史表: item_history
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS item_history (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-
-                -- 关联
-                item_id INTEGER NOT NULL,
-
-                -- 快照数据
-                item_name TEXT NOT NULL,
-                location TEXT NOT NULL,
-                location_detail TEXT,
-
-                -- 变更信息
-                action TEXT NOT NULL,
-                changed_field TEXT,
-                old_value TEXT,
-                new_value TEXT,
-
-                -- 时间戳
-                timestamp TEXT NOT NULL,
-
-                -- 用户信息
-                user_id TEXT NOT NULL,
-
-                -- 额外信息
-                notes TEXT,
-
-                FOREIGN KEY (item_id) REFERENCES items(id)
-            )
-        """)
-
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_history_item_id
-            ON item_history(item_id)
-        """)
-        cursor.execute("""
-            CREATE INDEX IF NOT EXISTS idx_history_timestamp
-            ON item_history(timestamp)
-        """)
-
-        # FTS5 全文搜索表
-        cursor.execute("""
-            CREATE VIRTUAL TABLE IF NOT EXISTS items_fts USING fts5(
-                item_name,
-                normalized_name,
-                item_aliases,
-                location,
-                tags,
-                content='items',
-                content_rowid='id'
-            )
-        """)
-
-        # 触发器: 自动同步 FTS5
-        cursor.execute("""
-            CREATE TRIGGER IF NOT EXISTS items_fts_insert
-            AFTER INSERT ON items BEGIN
-                INSERT INTO items_fts(rowid, item_name, normalized_name, item_aliases, location, tags)
-                VALUES (new.id, new.item_name, new.normalized_name, new.item_aliases, new.location, new.tags);
-            END
-        """)
-
-        cursor.execute("""
-            CREATE TRIGGER IF NOT EXISTS items_fts_update
-            AFTER UPDATE ON items BEGIN
-                UPDATE items_fts
-                SET item_name = new.item_name,
-                    normalized_name = new.normalized_name,
-                    item_aliases = new.item_aliases,
-                    location = new.location,
-                    tags = new.tags
-                WHERE rowid = new.id;
-            END
-        """)
-
-        cursor.execute("""
-            CREATE TRIGGER IF NOT EXISTS items_fts_delete
-            AFTER DELETE ON items BEGIN
-                DELETE FROM items_fts WHERE rowid = old.id;
-            END
-        """)
-
-        self.conn.commit()
+        Returns:
+            写入的物品数
+        """
+        with self._access_lock:
+            if not self._pending_access:
+                return 0
+            pending, self._pending_access = self._pending_access, {}
+
+        try:
+            # 访问统计不影响 Agent 的回答, 不更新数据版本
+            with self._write_transaction(data_changed=False) as cursor:
+                cursor.executemany("""
+                    UPDATE items
+                    SET query_count = query_count + ?,
+                        last_accessed_at = ?
+                    WHERE id = ?
+                """, [(count, accessed_at, item_id) for item_id, (count, accessed_at) in pending.items()])
+        except Exception:
+            # 写入失败时放回缓冲, 等待下次重试
+            with self._access_lock:
+                for item_id, (count, accessed_at) in pending.items():
+                    current = self._pending_access.setdefault(item_id, [0, accessed_at])
+                    current[0] += count
+            raise
+
+        logger.debug(f"[数据库] 写入访问统计: {len(pending)} 个物品")
+        return len(pending)
 
     def _verify_item_name(self, result: Dict[str, Any], query_item: str) -> bool:
         """验证查询结果的物品名称是否匹配查询
@@ -325,7 +518,8 @@ class ItemDatabase:
         stored_name = result['item_name'].lower().strip()
         query_name = query_item.lower().strip()
         normalized_query = normalize_item_name(query_item)
-        normalized_stored = normalize_item_name(result['item_name'])
+        # 使用入库时保存的规范化结果, 不再对每个候选行重新计算
+        normalized_stored = result.get('normalized_name') or normalize_item_name(result['item_name'])
 
         # 策略1: 查询词完全包含在物品名称中
         if query_name in stored_name:
@@ -339,15 +533,13 @@ class ItemDatabase:
         if normalized_query in normalized_stored or normalized_stored in normalized_query:
             return True
 
-        # 策略4: 检查别名
-        if 'item_aliases' in result and result['item_aliases']:
+        # 策略4: 检查别名 (入库时已规范化)
+        if result.get('normalized_aliases'):
             try:
-                aliases = json.loads(result['item_aliases'])
-                for alias in aliases:
-                    alias_lower = alias.lower().strip()
-                    if query_name in alias_lower or alias_lower in query_name:
+                for alias in json.loads(result['normalized_aliases']):
+                    if query_name in alias or alias in query_name:
                         return True
-            except (json.JSONDecodeError, TypeError, AttributeError):
+            except (json.JSONDecodeError, TypeError):
                 # JSON 解析失败或数据类型错误，忽略别名检查
                 pass
 
@@ -373,50 +565,48 @@ class ItemDatabase:
         Returns:
             包含操作结果的字典
         """
-        with self._lock:  # 使用线程锁
-            normalized = normalize_item_name(item)
-            aliases = extract_aliases(item)
-            now = get_timestamp()
-
-            logger.info(f"[数据库] 记录物品: {item} -> {location}")
-            logger.info(f"[数据库]   规范化名称: {normalized}")
-            logger.info(f"[数据库]   别名: {aliases}")
+        normalized = normalize_item_name(item)
+        aliases = extract_aliases(item)
+        normalized_aliases = list(item_normalizer.normalized_aliases(item))
+        now = get_timestamp()
 
-            cursor = self.conn.cursor()
+        logger.info(f"[数据库] 记录物品: {item} -> {location}")
+        logger.info(f"[数据库]   规范化名称: {normalized}")
+        logger.info(f"[数据库]   别名: {aliases}")
 
-        # 检查是否已存在
-        cursor.execute("""
-            SELECT * FROM items
-            WHERE user_id = ? AND normalized_name = ? AND is_deleted = 0
-        """, (user_id, normalized))
+        # 整个读-改-写过程在写连接的同一事务内完成
+        with self._write_transaction() as cursor:
+            # 检查是否已存在
+            cursor.execute("""
+                SELECT * FROM items
+                WHERE user_id = ? AND normalized_name = ? AND is_deleted = 0
+            """, (user_id, normalized))
 
-        existing = cursor.fetchone()
+            existing = cursor.fetchone()
 
-        if existing:
-            existing_dict = dict(existing)
-            logger.info(f"[数据库] 物品已存在, ID: {existing_dict['id']}")
+            if existing:
+                existing_dict = dict(existing)
+                logger.info(f"[数据库] 物品已存在, ID: {existing_dict['id']}")
 
-            # 位置相同 -> 仅更新访问时间
-            if existing_dict['location'] == location:
-                cursor.execute("""
-                    UPDATE items
-                    SET last_accessed_at = ?,
-                        query_count = query_count + 1
-                    WHERE id = ?
-                """, (now, existing_dict['id']))
-                self.conn.commit()
+                # 位置相同 -> 仅更新访问时间
+                if existing_dict['location'] == location:
+                    cursor.execute("""
+                        UPDATE items
+                        SET last_accessed_at = ?,
+                            query_count = query_count + 1
+                        WHERE id = ?
+                    """, (now, existing_dict['id']))
 
-                logger.success(f"[数据库] ✓ 位置相同,仅更新访问时间")
-                return {
-                    'status': 'success',
-                    'action': 'confirmed',
-                    'item': item,
-                    'location': location,
-                    'message': f"{item}确实在{location}"
-                }
+                    logger.success(f"[数据库] ✓ 位置相同,仅更新访问时间")
+                    return {
+                        'status': 'success',
+                        'action': 'confirmed',
+                        'item': item,
+                        'location': location,
+                        'message': f"{item}确实在{location}"
+                    }
 
-            # 位置不同 -> 更新位置并记录历史
-            else:
+                # 位置不同 -> 更新位置并记录历史
                 old_location = existing_dict['location']
 
                 cursor.execute("""
@@ -438,8 +628,6 @@ class ItemDatabase:
                 """, (existing_dict['id'], item, location, location_detail,
                       'move', 'location', old_location, location, now, user_id))
 
-                self.conn.commit()
-
                 logger.success(f"[数据库] ✓ 位置已更新: {old_location} -> {location}")
                 return {
                     'status': 'success',
@@ -451,17 +639,24 @@ class ItemDatabase:
                     'message': f"{item}已从{old_location}移动到{location}"
                 }
 
-        # 不存在 -> 创建新记录
-        else:
+            # 不存在 -> 创建新记录 (同名的软删除记录会占用唯一约束, 先清除)
+            cursor.execute("""
+                SELECT id FROM items
+                WHERE user_id = ? AND normalized_name = ? AND is_deleted = 1
+            """, (user_id, normalized))
+            self._purge_items(cursor, [row['id'] for row in cursor.fetchall()])
+
             cursor.execute("""
                 INSERT INTO items
-                (item_name, normalized_name, item_aliases, location, location_detail,
-                 user_id, created_at, updated_at, moved_at, move_count)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                (item_name, normalized_name, item_aliases, normalized_aliases,
+                 location, location_detail, user_id, created_at, updated_at, moved_at, move_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
             """, (item, normalized, json.dumps(aliases, ensure_ascii=False),
+                  json.dumps(normalized_aliases, ensure_ascii=False),
                   location, location_detail, user_id, now, now, now, 0))
 
             item_id = cursor.lastrowid
+            self._index_ngrams(cursor, user_id, item_id, normalized)
 
             # 记录历史
             cursor.execute("""
@@ -472,16 +667,17 @@ class ItemDatabase:
             """, (item_id, item, location, location_detail,
                   'create', location, now, user_id))
 
-            self.conn.commit()
+        # 事务提交后再更新内存别名索引
+        self._index_aliases(user_id, item_id, normalized_aliases)
 
-            logger.success(f"[数据库] ✓ 新建记录, ID: {item_id}")
-            return {
-                'status': 'success',
-                'action': 'created',
-                'item': item,
-                'location': location,
-                'message': f"已记住: {item}在{location}"
-            }
+        logger.success(f"[数据库] ✓ 新建记录, ID: {item_id}")
+        return {
+            'status': 'success',
+            'action': 'created',
+            'item': item,
+            'location': location,
+            'message': f"已记住: {item}在{location}"
+        }
 
     def query_item(self, item: str, user_id: str = 'default') -> Dict[str, Any]:
         """
@@ -489,9 +685,9 @@ class ItemDatabase:
 
         查询优先级:
         1. 精确匹配 (normalized_name)
-        2. 别名匹配 (item_aliases LIKE)
+        2. 别名匹配 (内存别名索引)
         3. FTS5 全文搜索
-        4. LIKE 中文模糊匹配 (关键词子串)
+        4. n-gram 索引模糊匹配 (bigram/trigram, SQL 内打分)
 
         Args:
             item: 物品名称
@@ -500,211 +696,574 @@ class ItemDatabase:
         Returns:
             包含查询结果的字典
         """
+        start = time.perf_counter()
+        result = self._query_item(item, user_id)
+        ITEM_QUERY_SECONDS.observe(time.perf_counter() - start, result.get('match_type', result['status']))
+        return result
+
+    def _query_item(self, item: str, user_id: str) -> Dict[str, Any]:
         normalized = normalize_item_name(item)
         now = get_timestamp()
 
         logger.debug(f"[数据库] 🔍 查询物品: {item}")
         logger.debug(f"[数据库]   规范化名称: {normalized}")
 
-        cursor = self.conn.cursor()
-
-        # 级别1: 精确匹配
-        cursor.execute("""
-            SELECT * FROM items
-            WHERE user_id = ? AND normalized_name = ? AND is_deleted = 0
-        """, (user_id, normalized))
-
-        result = cursor.fetchone()
-        if result:
-            result_dict = dict(result)
-            logger.success(f"[数据库] ✓ 精确匹配成功, ID: {result_dict['id']}")
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
 
-            # 更新访问统计
+            # 级别1: 精确匹配
             cursor.execute("""
-                UPDATE items
-                SET query_count = query_count + 1,
-                    last_accessed_at = ?
-                WHERE id = ?
-            """, (now, result_dict['id']))
-            self.conn.commit()
+                SELECT * FROM items
+                WHERE user_id = ? AND normalized_name = ? AND is_deleted = 0
+            """, (user_id, normalized))
 
-            return {
-                'status': 'success',
-                'match_type': 'exact',
-                'item': result_dict['item_name'],
-                'location': result_dict['location'],
-                'location_detail': result_dict['location_detail'],
-                'moved_at': result_dict['moved_at'],
-                'move_count': result_dict['move_count'],
-                'message': f"{result_dict['item_name']}在{result_dict['location']}"
-            }
+            result = cursor.fetchone()
+            if result:
+                result_dict = dict(result)
+                logger.success(f"[数据库] ✓ 精确匹配成功, ID: {result_dict['id']}")
+
+                # 记录访问统计 (延迟批量写入)
+                self._record_access(result_dict['id'], now)
+
+                return self._exact_match_result(result_dict)
+
+            # 级别2: 别名匹配 (内存别名索引) + 验证
+            logger.debug(f"[数据库] 精确匹配失败,尝试别名匹配...")
+
+            # 通过别名索引定位候选物品, 仅回表读取候选行
+            alias_index = self._get_alias_index(conn, user_id)
+            candidate_ids = alias_index.lookup(normalized)
+            matched_items = []
+
+            if candidate_ids:
+                placeholders = ','.join('?' * len(candidate_ids))
+                cursor.execute(f"""
+                    SELECT * FROM items
+                    WHERE id IN ({placeholders}) AND is_deleted = 0
+                    ORDER BY id
+                """, candidate_ids)
+                matched_items = [dict(row) for row in cursor.fetchall()]
+                # 其他连接已删除的物品残留在索引中, 顺便清除
+                for item_id in set(candidate_ids) - {match['id'] for match in matched_items}:
+                    alias_index.remove(item_id)
+                for match in matched_items:
+                    logger.debug(f"[数据库]   别名匹配候选: {match['item_name']}")
+
+            # 验证匹配结果
+            if matched_items:
+                for match in matched_items:
+                    if self._verify_item_name(match, item):
+                        logger.success(f"[数据库] ✓ 别名匹配成功(已验证): {match['item_name']}")
 
-        # 级别2: 别名匹配 (JSON 解析 + 逐一比对) + 验证
-        logger.debug(f"[数据库] 精确匹配失败,尝试别名匹配...")
+                        # 记录访问统计 (延迟批量写入)
+                        self._record_access(match['id'], now)
 
-        # 获取所有未删除的物品
-        cursor.execute("""
-            SELECT * FROM items
-            WHERE user_id = ? AND is_deleted = 0
-        """, (user_id,))
+                        return {
+                            'status': 'success',
+                            'match_type': 'alias',
+                            'item': match['item_name'],
+                            'location': match['location'],
+                            'location_detail': match['location_detail'],
+                            'message': f"找到相似物品: {match['item_name']}在{match['location']}"
+                        }
 
-        all_items = cursor.fetchall()
-        matched_items = []
+                logger.debug(f"[数据库] 别名匹配验证失败,无匹配物品")
 
-        # 逐一检查别名
-        for row in all_items:
-            item_dict = dict(row)
+            # 级别3: FTS5 全文搜索 (带验证)
+            logger.debug(f"[数据库] 别名匹配失败,尝试全文搜索...")
+            try:
+                # trigram 分词器无法匹配少于 3 个字符的查询, 直接跳过
+                if self._fts_tokenizer() == 'trigram' and len(normalized) < 3:
+                    results = []
+                else:
+                    # 短语查询 (转义双引号), 仅匹配名称和别名列
+                    fts_query = '{item_name normalized_name item_aliases} : "' + normalized.replace('"', '""') + '"'
+                    cursor.execute("""
+                        SELECT items.* FROM items_fts
+                        JOIN items ON items_fts.rowid = items.id
+                        WHERE items_fts MATCH ?
+                        AND items.user_id = ?
+                        AND items.is_deleted = 0
+                        ORDER BY rank
+                        LIMIT 3
+                    """, (fts_query, user_id))
+
+                    results = cursor.fetchall()
+                if results:
+                    # 验证每个全文搜索结果
+                    for row in results:
+                        match = dict(row)
+                        if self._verify_item_name(match, item):
+                            logger.success(f"[数据库] ✓ 全文搜索成功(已验证): {match['item_name']}")
+
+                            # 记录访问统计 (延迟批量写入)
+                            self._record_access(match['id'], now)
+
+                            return {
+                                'status': 'success',
+                                'match_type': 'fuzzy',
+                                'item': match['item_name'],
+                                'location': match['location'],
+                                'location_detail': match['location_detail'],
+                                'message': f"可能是: {match['item_name']}在{match['location']}"
+                            }
+
+                    logger.debug(f"[数据库] 全文搜索验证失败,无匹配物品")
+            except Exception as e:
+                logger.error(f"[数据库] 全文搜索失败: {e}")
+
+            # 级别4: n-gram 索引模糊匹配 (单次查询, 按共享 n-gram 数打分)
+            logger.debug(f"[数据库] 全文搜索失败,尝试关键词模糊匹配...")
+            keywords = extract_keywords(item)
+            logger.debug(f"[数据库]   提取关键词: {keywords[:5]}")  # 只显示前5个
+
+            query_grams = set()
+            for keyword in keywords:
+                query_grams |= extract_ngrams(keyword)
+
+            if query_grams:
+                placeholders = ','.join('?' * len(query_grams))
+                cursor.execute(f"""
+                    SELECT items.*, COUNT(*) AS match_score
+                    FROM item_ngrams
+                    JOIN items ON items.id = item_ngrams.item_id
+                    WHERE item_ngrams.user_id = ?
+                    AND item_ngrams.gram IN ({placeholders})
+                    AND items.is_deleted = 0
+                    GROUP BY items.id
+                    ORDER BY match_score DESC, items.id
+                    LIMIT 10
+                """, (user_id, *query_grams))
+
+                # 验证每个候选结果 - 使用 _verify_item_name
+                for row in cursor.fetchall():
+                    match = dict(row)
+                    if not self._verify_item_name(match, item):
+                        continue
 
-            # 解析 JSON 别名
-            if item_dict.get('item_aliases'):
-                try:
-                    aliases = json.loads(item_dict['item_aliases'])
-
-                    # 检查查询词是否在任何别名中
-                    for alias in aliases:
-                        alias_normalized = normalize_item_name(alias)
-                        # 双向匹配: normalized 在 alias 中，或 alias 在 normalized 中
-                        if normalized in alias_normalized or alias_normalized in normalized:
-                            matched_items.append(item_dict)
-                            logger.debug(f"[数据库]   别名匹配候选: {item_dict['item_name']} (别名: {alias})")
-                            break
-                except json.JSONDecodeError:
-                    continue
+                    match_score = match['match_score']
+                    # 命中的关键词: 优先取物品名称中包含的最长关键词, 否则取最长的共享 n-gram
+                    match_keyword = next(
+                        (kw for kw in keywords if kw in match['normalized_name']),
+                        max((g for g in query_grams if g in match['normalized_name']), key=len, default='')
+                    )
 
-        # 验证匹配结果
-        if matched_items:
-            for match in matched_items:
-                if self._verify_item_name(match, item):
-                    logger.success(f"[数据库] ✓ 别名匹配成功(已验证): {match['item_name']}")
+                    logger.success(f"[数据库] ✓ 关键词模糊匹配成功 (关键词: '{match_keyword}', 匹配度: {match_score}): {match['item_name']}")
 
-                    # 更新访问统计
-                    cursor.execute("""
-                        UPDATE items
-                        SET query_count = query_count + 1,
-                            last_accessed_at = ?
-                        WHERE id = ?
-                    """, (now, match['id']))
-                    self.conn.commit()
+                    # 记录访问统计 (延迟批量写入)
+                    self._record_access(match['id'], now)
 
                     return {
                         'status': 'success',
-                        'match_type': 'alias',
+                        'match_type': 'keyword_fuzzy',
                         'item': match['item_name'],
                         'location': match['location'],
                         'location_detail': match['location_detail'],
-                        'message': f"找到相似物品: {match['item_name']}在{match['location']}"
+                        'match_keyword': match_keyword,
+                        'match_score': match_score,
+                        'message': f"找到相关物品: {match['item_name']}在{match['location']}"
                     }
 
-            logger.debug(f"[数据库] 别名匹配验证失败,无匹配物品")
+            logger.debug(f"[数据库] 关键词模糊匹配失败,无匹配物品")
 
-        # 级别3: FTS5 全文搜索 (带验证)
-        logger.debug(f"[数据库] 别名匹配失败,尝试全文搜索...")
-        try:
-            cursor.execute("""
-                SELECT items.* FROM items_fts
-                JOIN items ON items_fts.rowid = items.id
-                WHERE items_fts MATCH ?
-                AND items.user_id = ?
-                AND items.is_deleted = 0
-                ORDER BY rank
-                LIMIT 3
-            """, (normalized, user_id))
-
-            results = cursor.fetchall()
-            if results:
-                # 验证每个全文搜索结果
-                for row in results:
-                    match = dict(row)
-                    if self._verify_item_name(match, item):
-                        logger.success(f"[数据库] ✓ 全文搜索成功(已验证): {match['item_name']}")
+            # 未找到
+            logger.error(f"[数据库] ✗ 未找到物品: {item}")
+            return {
+                'status': 'not_found',
+                'item': item,
+                'message': f"没有找到{item}的位置记录"
+            }
 
-                        # 更新访问统计
-                        cursor.execute("""
-                            UPDATE items
-                            SET query_count = query_count + 1,
-                                last_accessed_at = ?
-                            WHERE id = ?
-                        """, (now, match['id']))
-                        self.conn.commit()
+    @staticmethod
+    def _exact_match_result(row: Dict[str, Any]) -> Dict[str, Any]:
+        """构造精确匹配的查询结果"""
+        return {
+            'status': 'success',
+            'match_type': 'exact',
+            'item': row['item_name'],
+            'location': row['location'],
+            'location_detail': row['location_detail'],
+            'moved_at': row['moved_at'],
+            'move_count': row['move_count'],
+            'message': f"{row['item_name']}在{row['location']}"
+        }
 
-                        return {
-                            'status': 'success',
-                            'match_type': 'fuzzy',
-                            'item': match['item_name'],
-                            'location': match['location'],
-                            'location_detail': match['location_detail'],
-                            'message': f"可能是: {match['item_name']}在{match['location']}"
-                        }
+    def remember_items(self, batch: List[Dict[str, Any]],
+                       user_id: str = 'default') -> List[Dict[str, Any]]:
+        """
+        批量记录物品位置 (单事务, 一次提交)
 
-                logger.debug(f"[数据库] 全文搜索验证失败,无匹配物品")
-        except Exception as e:
-            logger.error(f"[数据库] 全文搜索失败: {e}")
+        语义与逐条调用 remember_item 相同 (批内同一物品按出现顺序依次生效),
+        但所有读写在一个事务内通过 executemany 完成, 适合大批量导入。
 
-        # 级别4: LIKE 中文模糊匹配 (关键词子串)
-        logger.debug(f"[数据库] 全文搜索失败,尝试关键词模糊匹配...")
-        keywords = extract_keywords(item)
-        logger.debug(f"[数据库]   提取关键词: {keywords[:5]}")  # 只显示前5个
+        Args:
+            batch: 物品列表, 每项包含 item, location, 可选 location_detail
+            user_id: 用户ID
 
-        for keyword in keywords:
-            if len(keyword) < 2:  # 跳过太短的关键词
-                continue
+        Returns:
+            与输入顺序一致的结果列表, 每项格式与 remember_item 返回值相同
+        """
+        entries = [
+            (entry['item'], entry['location'], entry.get('location_detail'),
+             normalize_item_name(entry['item']))
+            for entry in batch
+        ]
+        if not entries:
+            return []
 
-            cursor.execute("""
-                SELECT * FROM items
-                WHERE user_id = ?
-                AND is_deleted = 0
-                AND (item_name LIKE ? OR normalized_name LIKE ?)
-                LIMIT 5
-            """, (user_id, f'%{keyword}%', f'%{keyword}%'))
-
-            results = cursor.fetchall()
-            if results:
-                # 验证每个匹配结果 - 使用 _verify_item_name
-                for row in results:
-                    match = dict(row)
+        now = get_timestamp()
+        logger.info(f"[数据库] 批量记录物品: {len(entries)} 条")
+
+        with self._write_transaction() as cursor:
+            # 1. 一次性预取已存在的物品: {normalized: {'id', 'location'}}
+            state: Dict[str, Dict[str, Any]] = {}
+            names = list({entry[3] for entry in entries})
+            for start in range(0, len(names), _SQL_CHUNK_SIZE):
+                chunk = names[start:start + _SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT id, normalized_name, location FROM items
+                    WHERE user_id = ? AND is_deleted = 0
+                    AND normalized_name IN ({placeholders})
+                """, (user_id, *chunk))
+                for row in cursor.fetchall():
+                    state[row['normalized_name']] = {'id': row['id'], 'location': row['location']}
+
+            # 2. 批量插入新物品 (取首次出现的名称和位置)
+            new_items: Dict[str, tuple] = {}
+            for item, location, location_detail, normalized in entries:
+                if normalized not in state and normalized not in new_items:
+                    new_items[normalized] = (item, location, location_detail, extract_aliases(item))
+
+            # 同名的软删除记录会占用唯一约束, 先清除
+            new_names = list(new_items)
+            tombstones = []
+            for start in range(0, len(new_names), _SQL_CHUNK_SIZE):
+                chunk = new_names[start:start + _SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT id FROM items
+                    WHERE user_id = ? AND is_deleted = 1
+                    AND normalized_name IN ({placeholders})
+                """, (user_id, *chunk))
+                tombstones.extend(row['id'] for row in cursor.fetchall())
+            self._purge_items(cursor, tombstones)
+
+            cursor.executemany("""
+                INSERT INTO items
+                (item_name, normalized_name, item_aliases, normalized_aliases,
+                 location, location_detail, user_id, created_at, updated_at, moved_at, move_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (item, normalized, json.dumps(aliases, ensure_ascii=False),
+                 json.dumps(item_normalizer.normalized_aliases(item), ensure_ascii=False),
+                 location, location_detail, user_id, now, now, now, 0)
+                for normalized, (item, location, location_detail, aliases) in new_items.items()
+            ])
+
+            created_ids: Dict[str, int] = {}
+            for start in range(0, len(new_names), _SQL_CHUNK_SIZE):
+                chunk = new_names[start:start + _SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT id, normalized_name FROM items
+                    WHERE user_id = ? AND is_deleted = 0
+                    AND normalized_name IN ({placeholders})
+                """, (user_id, *chunk))
+                for row in cursor.fetchall():
+                    created_ids[row['normalized_name']] = row['id']
+
+            cursor.executemany(
+                "INSERT OR IGNORE INTO item_ngrams (user_id, gram, item_id) VALUES (?, ?, ?)",
+                [
+                    (user_id, gram, created_ids[normalized])
+                    for normalized in new_items
+                    for gram in extract_ngrams(normalized)
+                ]
+            )
 
-                    # 必须通过名称验证
-                    if self._verify_item_name(match, item):
-                        # 计算匹配度: 匹配的关键词数量
-                        match_score = sum(1 for kw in keywords if kw in match['normalized_name'])
+            # 3. 按输入顺序计算每条记录的结果, 收集更新和历史
+            results = []
+            confirms = []
+            moves = []
+            history = []
+            for item, location, location_detail, normalized in entries:
+                if normalized in new_items and normalized not in state:
+                    item_id = created_ids[normalized]
+                    state[normalized] = {'id': item_id, 'location': location}
+                    history.append((item_id, item, location, location_detail, 'create',
+                                    None, None, location, now, user_id))
+                    results.append({
+                        'status': 'success',
+                        'action': 'created',
+                        'item': item,
+                        'location': location,
+                        'message': f"已记住: {item}在{location}"
+                    })
+                    continue
 
-                        logger.success(f"[数据库] ✓ 关键词模糊匹配成功 (关键词: '{keyword}', 匹配度: {match_score}): {match['item_name']}")
+                current = state[normalized]
+                if current['location'] == location:
+                    confirms.append((now, current['id']))
+                    results.append({
+                        'status': 'success',
+                        'action': 'confirmed',
+                        'item': item,
+                        'location': location,
+                        'message': f"{item}确实在{location}"
+                    })
+                else:
+                    old_location = current['location']
+                    current['location'] = location
+                    moves.append((location, location_detail, now, now, current['id']))
+                    history.append((current['id'], item, location, location_detail, 'move',
+                                    'location', old_location, location, now, user_id))
+                    results.append({
+                        'status': 'success',
+                        'action': 'moved',
+                        'item': item,
+                        'location': location,
+                        'old_location': old_location,
+                        'new_location': location,
+                        'message': f"{item}已从{old_location}移动到{location}"
+                    })
+
+            cursor.executemany("""
+                UPDATE items
+                SET last_accessed_at = ?,
+                    query_count = query_count + 1
+                WHERE id = ?
+            """, confirms)
 
-                        # 更新访问统计
-                        cursor.execute("""
-                            UPDATE items
-                            SET query_count = query_count + 1,
-                                last_accessed_at = ?
-                            WHERE id = ?
-                        """, (now, match['id']))
-                        self.conn.commit()
+            cursor.executemany("""
+                UPDATE items
+                SET location = ?,
+                    location_detail = ?,
+                    updated_at = ?,
+                    moved_at = ?,
+                    move_count = move_count + 1
+                WHERE id = ?
+            """, moves)
 
-                        return {
-                            'status': 'success',
-                            'match_type': 'keyword_fuzzy',
-                            'item': match['item_name'],
-                            'location': match['location'],
-                            'location_detail': match['location_detail'],
-                            'match_keyword': keyword,
-                            'match_score': match_score,
-                            'message': f"找到相关物品: {match['item_name']}在{match['location']}"
-                        }
+            cursor.executemany("""
+                INSERT INTO item_history
+                (item_id, item_name, location, location_detail, action,
+                 changed_field, old_value, new_value, timestamp, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, history)
+
+        for normalized, (item, location, location_detail, aliases) in new_items.items():
+            self._index_aliases(user_id, created_ids[normalized], list(item_normalizer.normalized_aliases(item)))
 
-        logger.debug(f"[数据库] 关键词模糊匹配失败,无匹配物品")
+        logger.success(
+            f"[数据库] ✓ 批量记录完成: 新建 {len(new_items)}, "
+            f"移动 {len(moves)}, 确认 {len(confirms)}"
+        )
+        return results
+
+    def has_item(self, item: str, user_id: str = 'default') -> bool:
+        """物品是否已记录 (规范化名称或别名精确匹配, 不计入访问统计)
+
+        Args:
+            item: 物品名称
+            user_id: 用户ID
+        """
+        normalized = normalize_item_name(item)
+        if not normalized:
+            return False
+
+        with self._read_connection() as conn:
+            row = conn.execute("""
+                SELECT 1 FROM items
+                WHERE user_id = ? AND normalized_name = ? AND is_deleted = 0
+            """, (user_id, normalized)).fetchone()
+            if row is not None:
+                return True
+
+            candidate_ids = self._get_alias_index(conn, user_id).exact(normalized)
+            if not candidate_ids:
+                return False
+            placeholders = ','.join('?' * len(candidate_ids))
+            row = conn.execute(f"""
+                SELECT 1 FROM items WHERE id IN ({placeholders}) AND is_deleted = 0 LIMIT 1
+            """, candidate_ids).fetchone()
+        return row is not None
+
+    def query_items(self, names: List[str], user_id: str = 'default') -> List[Dict[str, Any]]:
+        """
+        批量查询物品位置
+
+        精确匹配阶段合并为一次 IN 查询, 访问统计与 query_item 一样延迟批量写入;
+        未精确命中的名称再逐个走 query_item 的后续查询策略。
+
+        Args:
+            names: 物品名称列表
+            user_id: 用户ID
+
+        Returns:
+            与输入顺序一致的结果列表, 每项格式与 query_item 返回值相同
+        """
+        normalized_names = [normalize_item_name(name) for name in names]
+        now = get_timestamp()
+
+        # 1. 批量精确匹配
+        exact: Dict[str, Dict[str, Any]] = {}
+        unique_names = list(set(normalized_names))
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
+            for start in range(0, len(unique_names), _SQL_CHUNK_SIZE):
+                chunk = unique_names[start:start + _SQL_CHUNK_SIZE]
+                placeholders = ','.join('?' * len(chunk))
+                cursor.execute(f"""
+                    SELECT * FROM items
+                    WHERE user_id = ? AND is_deleted = 0
+                    AND normalized_name IN ({placeholders})
+                """, (user_id, *chunk))
+                for row in cursor.fetchall():
+                    exact[row['normalized_name']] = dict(row)
+
+        # 2. 记录访问统计 (延迟批量写入)
+        hits = [exact[normalized]['id'] for normalized in normalized_names if normalized in exact]
+        for item_id in hits:
+            self._record_access(item_id, now)
+
+        # 3. 未命中的名称走完整查询策略
+        results = []
+        for name, normalized in zip(names, normalized_names):
+            if normalized in exact:
+                results.append(self._exact_match_result(exact[normalized]))
+            else:
+                results.append(self.query_item(name, user_id=user_id))
+
+        logger.info(f"[数据库] 批量查询完成: {len(names)} 条, 精确命中 {len(hits)} 条")
+        return results
+
+    @staticmethod
+    def _resolve_fields(fields: Optional[List[str]]) -> List[str]:
+        """校验列表投影字段 (None 表示全部字段)"""
+        if not fields:
+            return list(LIST_FIELDS)
+        unknown = [name for name in fields if name not in LIST_FIELDS]
+        if unknown:
+            raise ValueError(f"不支持的字段: {', '.join(unknown)}")
+        return list(dict.fromkeys(fields))
+
+    def _fetch_item_page(self, user_id: str, columns: List[str], limit: int,
+                         after: Optional[tuple], include_deleted: bool) -> List[sqlite3.Row]:
+        """读取一页物品 (按 updated_at, id 倒序, 从 after 位置之后开始)"""
+        query = f"""
+            SELECT id, updated_at AS _cursor_updated_at, {', '.join(columns)}
+            FROM items
+            WHERE user_id = ?
+        """
+        params: List[Any] = [user_id]
+        if not include_deleted:
+            query += " AND is_deleted = 0"
+        if after is not None:
+            query += " AND (updated_at, id) < (?, ?)"
+            params.extend(after)
+        query += " ORDER BY updated_at DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        with self._read_connection() as conn:
+            return conn.execute(query, params).fetchall()
+
+    def iter_items(self, user_id: str = 'default',
+                   fields: Optional[List[str]] = None,
+                   include_deleted: bool = False,
+                   batch_size: int = 200) -> Iterator[Dict[str, Any]]:
+        """
+        按更新时间倒序逐条生成物品 (流式读取)
+
+        每批通过 keyset 分页读取 batch_size 行, 读完即归还读连接,
+        内存占用与物品总数无关。
+
+        Args:
+            user_id: 用户ID
+            fields: 返回的字段 (见 LIST_FIELDS), 默认全部
+            include_deleted: 是否包含已删除的物品
+            batch_size: 每批读取的行数
+
+        Yields:
+            物品字典
+        """
+        names = self._resolve_fields(fields)
+        columns = [LIST_FIELDS[name] for name in names]
+        after = None
+
+        while True:
+            rows = self._fetch_item_page(user_id, columns, batch_size, after, include_deleted)
+            for row in rows:
+                yield {name: row[column] for name, column in zip(names, columns)}
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1]['_cursor_updated_at'], rows[-1]['id'])
+
+    def list_items(self, user_id: str = 'default',
+                   limit: int = 50,
+                   cursor: Optional[str] = None,
+                   fields: Optional[List[str]] = None,
+                   include_deleted: bool = False) -> Dict[str, Any]:
+        """
+        分页列出物品 (按更新时间倒序)
+
+        使用 (updated_at, id) keyset 分页, 翻页代价与页码无关;
+        返回的 next_cursor 传回即可获取下一页。
+
+        Args:
+            user_id: 用户ID
+            limit: 每页条数 (1 ~ MAX_PAGE_SIZE)
+            cursor: 上一页返回的 next_cursor, 为空时从第一页开始
+            fields: 返回的字段 (见 LIST_FIELDS), 默认全部
+            include_deleted: 是否包含已删除的物品
+
+        Returns:
+            包含当前页物品、has_more 和 next_cursor 的字典
+
+        Raises:
+            ValueError: 游标或字段无效
+        """
+        limit = max(1, min(limit, MAX_PAGE_SIZE))
+        names = self._resolve_fields(fields)
+        columns = [LIST_FIELDS[name] for name in names]
+        after = decode_list_cursor(cursor) if cursor else None
+
+        # 多取一行用于判断是否还有下一页
+        rows = self._fetch_item_page(user_id, columns, limit + 1, after, include_deleted)
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        items = [{name: row[column] for name, column in zip(names, columns)} for row in rows]
+        next_cursor = None
+        if has_more:
+            next_cursor = encode_list_cursor(rows[-1]['_cursor_updated_at'], rows[-1]['id'])
+
+        logger.info(f"[数据库] 分页列出物品: 本页 {len(items)} 个, has_more={has_more}")
 
-        # 未找到
-        logger.error(f"[数据库] ✗ 未找到物品: {item}")
         return {
-            'status': 'not_found',
-            'item': item,
-            'message': f"没有找到{item}的位置记录"
+            'status': 'success',
+            'count': len(items),
+            'items': items,
+            'has_more': has_more,
+            'next_cursor': next_cursor,
+            'message': f"本页 {len(items)} 个物品记录" if items else "还没有任何物品记录"
         }
 
+    def count_items(self, user_id: str = 'default', include_deleted: bool = False) -> int:
+        """统计物品数量"""
+        query = "SELECT COUNT(*) FROM items WHERE user_id = ?"
+        if not include_deleted:
+            query += " AND is_deleted = 0"
+        with self._read_connection() as conn:
+            return conn.execute(query, (user_id,)).fetchone()[0]
+
     def list_all_items(self, user_id: str = 'default',
                        include_deleted: bool = False) -> Dict[str, Any]:
         """
         列出所有物品
 
+        一次性返回全部物品; 物品较多时使用 list_items 分页或 iter_items 流式读取。
+
         Args:
             user_id: 用户ID
             include_deleted: 是否包含已删除的物品
@@ -712,32 +1271,7 @@ class ItemDatabase:
         Returns:
             包含物品列表的字典
         """
-        cursor = self.conn.cursor()
-
-        query = """
-            SELECT * FROM items
-            WHERE user_id = ?
-        """
-        if not include_deleted:
-            query += " AND is_deleted = 0"
-        query += " ORDER BY updated_at DESC"
-
-        cursor.execute(query, (user_id,))
-        results = cursor.fetchall()
-
-        items = []
-        for row in results:
-            row_dict = dict(row)
-            items.append({
-                'item': row_dict['item_name'],
-                'location': row_dict['location'],
-                'location_detail': row_dict['location_detail'],
-                'created_at': row_dict['created_at'],
-                'updated_at': row_dict['updated_at'],
-                'moved_at': row_dict['moved_at'],
-                'move_count': row_dict['move_count'],
-                'query_count': row_dict['query_count']
-            })
+        items = list(self.iter_items(user_id, include_deleted=include_deleted))
 
         logger.info(f"[数据库] 列出所有物品: 共 {len(items)} 个")
 
@@ -748,58 +1282,89 @@ class ItemDatabase:
             'message': f"共找到 {len(items)} 个物品记录" if items else "还没有任何物品记录"
         }
 
-    def get_item_history(self, item: str, user_id: str = 'default') -> Dict[str, Any]:
+    def get_item_history(self, item: str, user_id: str = 'default',
+                         include_archived: bool = False) -> Dict[str, Any]:
         """
         获取物品变更历史
 
         Args:
             item: 物品名称
             user_id: 用户ID
+            include_archived: 是否包含已被保留策略归档的历史 (见 core.item_maintenance)
 
         Returns:
             包含历史记录的字典
         """
         normalized = normalize_item_name(item)
-        cursor = self.conn.cursor()
+        with self._read_connection() as conn:
+            cursor = conn.cursor()
 
-        # 先找到物品ID
-        cursor.execute("""
-            SELECT id FROM items
-            WHERE user_id = ? AND normalized_name = ?
-        """, (user_id, normalized))
+            # 先找到物品ID
+            cursor.execute("""
+                SELECT id FROM items
+                WHERE user_id = ? AND normalized_name = ?
+            """, (user_id, normalized))
+
+            result = cursor.fetchone()
+            if not result:
+                return {
+                    'status': 'not_found',
+                    'message': f"没有找到{item}的记录"
+                }
+
+            item_id = result['id']
+
+            # 获取历史记录
+            cursor.execute("""
+                SELECT action, location, old_value, new_value, timestamp
+                FROM item_history
+                WHERE item_id = ?
+                ORDER BY timestamp DESC
+            """, (item_id,))
+
+            history = []
+            for row in cursor.fetchall():
+                row_dict = dict(row)
+                history.append({
+                    'action': row_dict['action'],
+                    'location': row_dict['location'],
+                    'old_value': row_dict['old_value'],
+                    'new_value': row_dict['new_value'],
+                    'timestamp': row_dict['timestamp']
+                })
+
+            if include_archived:
+                cursor.execute("""
+                    SELECT payload FROM item_history_archive
+                    WHERE item_id = ?
+                """, (item_id,))
+                for row in cursor.fetchall():
+                    archived = json.loads(zlib.decompress(row['payload']))
+                    history.extend(
+                        {key: entry[key] for key in ('action', 'location', 'old_value', 'new_value', 'timestamp')}
+                        for entry in archived
+                    )
+                history.sort(key=lambda entry: entry['timestamp'], reverse=True)
 
-        result = cursor.fetchone()
-        if not result:
             return {
-                'status': 'not_found',
-                'message': f"没有找到{item}的记录"
+                'status': 'success',
+                'count': len(history),
+                'history': history
             }
 
-        item_id = result['id']
-
-        # 获取历史记录
-        cursor.execute("""
-            SELECT * FROM item_history
-            WHERE item_id = ?
-            ORDER BY timestamp DESC
-        """, (item_id,))
-
-        history = []
-        for row in cursor.fetchall():
-            row_dict = dict(row)
-            history.append({
-                'action': row_dict['action'],
-                'location': row_dict['location'],
-                'old_value': row_dict['old_value'],
-                'new_value': row_dict['new_value'],
-                'timestamp': row_dict['timestamp']
-            })
+    def _purge_items(self, cursor: sqlite3.Cursor, item_ids: List[int]) -> int:
+        """在当前写事务内彻底删除物品及其历史 (n-gram / 全文索引由触发器同步删除)
 
-        return {
-            'status': 'success',
-            'count': len(history),
-            'history': history
-        }
+        Returns:
+            删除的物品数
+        """
+        if not item_ids:
+            return 0
+        params = [(item_id,) for item_id in item_ids]
+        cursor.executemany("DELETE FROM item_history WHERE item_id = ?", params)
+        cursor.executemany("DELETE FROM item_history_archive WHERE item_id = ?", params)
+        cursor.executemany("DELETE FROM items WHERE id = ?", params)
+        return len(item_ids)
 
     def delete_item(self, item: str, user_id: str = 'default',
                     soft: bool = True) -> Dict[str, Any]:
@@ -815,25 +1380,28 @@ class ItemDatabase:
             操作结果
         """
         normalized = normalize_item_name(item)
-        cursor = self.conn.cursor()
 
-        if soft:
-            # 软删除
+        with self._write_transaction() as cursor:
             cursor.execute("""
-                UPDATE items
-                SET is_deleted = 1, updated_at = ?
-                WHERE user_id = ? AND normalized_name = ?
-            """, (get_timestamp(), user_id, normalized))
-        else:
-            # 硬删除
-            cursor.execute("""
-                DELETE FROM items
+                SELECT id FROM items
                 WHERE user_id = ? AND normalized_name = ?
             """, (user_id, normalized))
+            deleted_ids = [row['id'] for row in cursor.fetchall()]
 
-        self.conn.commit()
+            if soft:
+                # 软删除 (超过保留期后由 TombstoneManager 清除, 见 core.item_maintenance)
+                cursor.execute("""
+                    UPDATE items
+                    SET is_deleted = 1, updated_at = ?
+                    WHERE user_id = ? AND normalized_name = ? AND is_deleted = 0
+                """, (get_timestamp(), user_id, normalized))
+                affected = cursor.rowcount
+            else:
+                # 硬删除
+                affected = self._purge_items(cursor, deleted_ids)
 
-        if cursor.rowcount > 0:
+        if affected > 0:
+            self._unindex_aliases(user_id, deleted_ids)
             return {
                 'status': 'success',
                 'message': f"已删除{item}"
@@ -845,24 +1413,39 @@ class ItemDatabase:
             }
 
     def close(self):
-        """关闭数据库连接"""
+        """关闭数据库连接 (先写入缓冲的访问统计)"""
+        self._access_stop.set()
+        if self._access_thread is not None:
+            self._access_thread.join(timeout=self._access_flush_interval)
+
         if self.conn:
+            try:
+                self.flush_access_stats()
+            except Exception as e:
+                logger.warning(f"[数据库] ⚠️  关闭前写入访问统计失败: {e}")
+
+            with self._readers_lock:
+                for reader in self._readers:
+                    reader.close()
+                self._readers.clear()
             self.conn.close()
             logger.info("[数据库] 连接已关闭")
 
 
 # 全局数据库实例 (延迟初始化)
-_db_instance: Optional[ItemDatabase] = None
+_db_instance: Optional[Union[ItemDatabase, "ShardedItemDatabase"]] = None
 _db_lock = threading.Lock()  # 线程锁保护单例初始化
 
 
-def get_database() -> ItemDatabase:
+def get_database() -> Union[ItemDatabase, "ShardedItemDatabase"]:
     """获取全局数据库实例 (线程安全单例模式)
 
     使用双重检查锁定 (Double-Checked Locking) 模式:
     - 第一次检查(无锁): 如果实例已存在,直接返回(快速路径)
     - 获取锁: 多个线程竞争锁,只有一个线程能获取
     - 第二次检查(有锁): 确保只有一个线程初始化实例
+
+    ITEMS_SHARDING_ENABLED=true 时返回按用户分片的 ShardedItemDatabase (接口相同)。
     """
     global _db_instance
 
@@ -872,7 +1455,15 @@ def get_database() -> ItemDatabase:
             # 第二次检查 (有锁) - 确保只有一个线程初始化
             if _db_instance is None:
                 from config import config
-                db_path = config.DATA_DIR / "items.db"
-                _db_instance = ItemDatabase(db_path)
+                if config.ITEMS_SHARDING_ENABLED:
+                    from core.db_sharding import ShardedItemDatabase
+                    _db_instance = ShardedItemDatabase(
+                        config.ITEMS_SHARD_DIR,
+                        max_open=config.ITEMS_SHARD_MAX_OPEN,
+                        idle_seconds=config.ITEMS_SHARD_IDLE_SECONDS
+                    )
+                else:
+                    db_path = config.DATA_DIR / "items.db"
+                    _db_instance = ItemDatabase(db_path)
 
     return _db_instance
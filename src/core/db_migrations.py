@@ -0,0 +1,380 @@
+"""物品数据库 (items.db) 的版本化迁移
+
+数据库版本记录在 PRAGMA user_version 中, 启动时按版本号顺序执行尚未执行的迁移:
+- 每个迁移在独立的 BEGIN IMMEDIATE 事务内执行, 并在同一事务内更新 user_version,
+  失败时整体回滚, 下次启动重试
+- 迁移只追加不修改: 调整表结构/索引时新增一个更高版本号的迁移
+
+引入本模块之前创建的数据库 user_version 为 0, 前几个迁移全部使用
+IF NOT EXISTS / 存在性检查编写, 可以安全地在这些旧库上执行。
+"""
+import json
+import re
+import sqlite3
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from core import item_normalizer
+from core.logger import logger
+
+
+@dataclass(frozen=True)
+class Migration:
+    """一个版本的迁移"""
+    version: int  # 目标版本号 (从 1 开始递增)
+    description: str  # 迁移说明
+    apply: Callable[[sqlite3.Cursor], None]  # 在事务内执行迁移
+
+
+ITEM_MIGRATIONS: List[Migration] = []
+
+
+def _migration(version: int, description: str):
+    """注册 items.db 迁移 (版本号必须连续递增)"""
+    def decorator(func: Callable[[sqlite3.Cursor], None]):
+        expected = len(ITEM_MIGRATIONS) + 1
+        if version != expected:
+            raise ValueError(f"迁移版本号不连续: 期望 {expected}, 实际 {version}")
+        ITEM_MIGRATIONS.append(Migration(version, description, func))
+        return func
+    return decorator
+
+
+def get_schema_version(conn: sqlite3.Connection) -> int:
+    """读取数据库当前版本"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn: sqlite3.Connection,
+            migrations: Optional[List[Migration]] = None) -> int:
+    """
+    将数据库升级到最新版本
+
+    Args:
+        conn: autocommit 模式 (isolation_level=None) 的连接
+        migrations: 迁移列表, 默认 ITEM_MIGRATIONS
+
+    Returns:
+        升级后的版本号
+
+    Raises:
+        RuntimeError: 数据库版本高于程序支持的版本
+    """
+    migrations = ITEM_MIGRATIONS if migrations is None else migrations
+    latest = migrations[-1].version if migrations else 0
+    current = get_schema_version(conn)
+
+    if current > latest:
+        raise RuntimeError(f"数据库版本 {current} 高于程序支持的版本 {latest}, 请升级程序")
+
+    for migration in migrations:
+        if migration.version <= current:
+            continue
+
+        logger.info(f"[数据库迁移] v{migration.version}: {migration.description}")
+        cursor = conn.cursor()
+        cursor.execute("BEGIN IMMEDIATE")
+        try:
+            migration.apply(cursor)
+            cursor.execute(f"PRAGMA user_version = {migration.version}")
+            cursor.execute("COMMIT")
+        except BaseException:
+            cursor.execute("ROLLBACK")
+            logger.error(f"[数据库迁移] ✗ v{migration.version} 失败, 已回滚")
+            raise
+        current = migration.version
+
+    return current
+
+
+# ========== FTS 分词器 ==========
+
+def detect_fts_tokenizer(conn: sqlite3.Connection) -> str:
+    """检测当前 SQLite 可用的 FTS5 分词器
+
+    中文不以空格分词, 默认的 unicode61 会把整段中文当作一个词, 部分名称几乎无法命中。
+    trigram 分词器 (SQLite >= 3.34) 按 3 字滑窗建索引, 支持任意子串匹配;
+    不支持时退回 unicode61。
+    """
+    try:
+        conn.execute("CREATE VIRTUAL TABLE temp.fts_probe USING fts5(x, tokenize='trigram')")
+        conn.execute("DROP TABLE temp.fts_probe")
+        return 'trigram'
+    except sqlite3.OperationalError:
+        logger.warning("[数据库] ⚠️  当前 SQLite 不支持 trigram 分词器, 使用 unicode61")
+        return 'unicode61'
+
+
+def fts_tokenizer(conn: sqlite3.Connection) -> Optional[str]:
+    """读取 items_fts 实际使用的分词器 (表不存在时返回 None)"""
+    row = conn.execute("SELECT sql FROM sqlite_master WHERE name = 'items_fts'").fetchone()
+    if row is None:
+        return None
+    match = re.search(r"tokenize\s*=\s*'(\w+)", row[0])
+    return match.group(1) if match else 'unicode61'
+
+
+# ========== items.db 迁移 ==========
+
+@_migration(1, "基础表结构: items / item_history")
+def _create_base_tables(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS items (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            -- 物品标识
+            item_name TEXT NOT NULL,
+            normalized_name TEXT NOT NULL,
+            item_aliases TEXT,
+
+            -- 位置信息
+            location TEXT NOT NULL,
+            location_detail TEXT,
+
+            -- 用户信息
+            user_id TEXT NOT NULL DEFAULT 'default',
+
+            -- 时间戳
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            moved_at TEXT,
+
+            -- 统计信息
+            move_count INTEGER DEFAULT 0,
+            query_count INTEGER DEFAULT 0,
+
+            -- 状态标记
+            is_deleted INTEGER DEFAULT 0,
+            is_active INTEGER DEFAULT 1,
+
+            -- 额外元数据
+            tags TEXT,
+            notes TEXT,
+            importance INTEGER DEFAULT 0,
+
+            -- 最后访问时间
+            last_accessed_at TEXT,
+
+            -- 唯一约束
+            UNIQUE(user_id, normalized_name)
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_user_normalized ON items(user_id, normalized_name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_updated_at ON items(updated_at)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_items_is_deleted ON items(is_deleted)")
+
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_history (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+
+            -- 关联
+            item_id INTEGER NOT NULL,
+
+            -- 快照数据
+            item_name TEXT NOT NULL,
+            location TEXT NOT NULL,
+            location_detail TEXT,
+
+            -- 变更信息
+            action TEXT NOT NULL,
+            changed_field TEXT,
+            old_value TEXT,
+            new_value TEXT,
+
+            -- 时间戳
+            timestamp TEXT NOT NULL,
+
+            -- 用户信息
+            user_id TEXT NOT NULL,
+
+            -- 额外信息
+            notes TEXT,
+
+            FOREIGN KEY (item_id) REFERENCES items(id)
+        )
+    """)
+
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_item_id ON item_history(item_id)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_history_timestamp ON item_history(timestamp)")
+
+
+@_migration(2, "items_fts 全文索引 (CJK 友好的 trigram 分词)")
+def _create_fts(cursor: sqlite3.Cursor) -> None:
+    tokenizer = detect_fts_tokenizer(cursor.connection)
+
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'items_fts'")
+    table = cursor.fetchone()
+    cursor.execute("SELECT sql FROM sqlite_master WHERE name = 'items_fts_update'")
+    update_trigger = cursor.fetchone()
+
+    if (table is not None and f"tokenize='{tokenizer}'" in table[0]
+            and update_trigger is not None and "'delete'" in update_trigger[0]):
+        return
+
+    cursor.execute("DROP TRIGGER IF EXISTS items_fts_insert")
+    cursor.execute("DROP TRIGGER IF EXISTS items_fts_update")
+    cursor.execute("DROP TRIGGER IF EXISTS items_fts_delete")
+    cursor.execute("DROP TABLE IF EXISTS items_fts")
+
+    cursor.execute(f"""
+        CREATE VIRTUAL TABLE items_fts USING fts5(
+            item_name,
+            normalized_name,
+            item_aliases,
+            location,
+            tags,
+            content='items',
+            content_rowid='id',
+            tokenize='{tokenizer}'
+        )
+    """)
+
+    # 触发器: 自动同步 FTS5 (外部内容表需先写入 'delete' 再插入新值)
+    cursor.execute("""
+        CREATE TRIGGER items_fts_insert
+        AFTER INSERT ON items BEGIN
+            INSERT INTO items_fts(rowid, item_name, normalized_name, item_aliases, location, tags)
+            VALUES (new.id, new.item_name, new.normalized_name, new.item_aliases, new.location, new.tags);
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER items_fts_update
+        AFTER UPDATE OF item_name, normalized_name, item_aliases, location, tags ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, item_name, normalized_name, item_aliases, location, tags)
+            VALUES ('delete', old.id, old.item_name, old.normalized_name, old.item_aliases, old.location, old.tags);
+            INSERT INTO items_fts(rowid, item_name, normalized_name, item_aliases, location, tags)
+            VALUES (new.id, new.item_name, new.normalized_name, new.item_aliases, new.location, new.tags);
+        END
+    """)
+
+    cursor.execute("""
+        CREATE TRIGGER items_fts_delete
+        AFTER DELETE ON items BEGIN
+            INSERT INTO items_fts(items_fts, rowid, item_name, normalized_name, item_aliases, location, tags)
+            VALUES ('delete', old.id, old.item_name, old.normalized_name, old.item_aliases, old.location, old.tags);
+        END
+    """)
+
+    # 根据 items 表重建全文索引
+    cursor.execute("INSERT INTO items_fts(items_fts) VALUES ('rebuild')")
+    logger.info(f"[数据库迁移] items_fts 使用 {tokenizer} 分词器重建完成")
+
+
+@_migration(3, "item_ngrams n-gram 模糊匹配索引")
+def _create_ngrams(cursor: sqlite3.Cursor) -> None:
+    # 物品名称的 bigram/trigram -> 物品ID, 用于单次查询的模糊匹配
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_ngrams (
+            user_id TEXT NOT NULL,
+            gram TEXT NOT NULL,
+            item_id INTEGER NOT NULL,
+            PRIMARY KEY (user_id, gram, item_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ngrams_item_id ON item_ngrams(item_id)")
+    cursor.execute("""
+        CREATE TRIGGER IF NOT EXISTS items_ngrams_delete
+        AFTER DELETE ON items BEGIN
+            DELETE FROM item_ngrams WHERE item_id = old.id;
+        END
+    """)
+
+    # 为已有物品回填 (已回填过的旧库跳过)
+    cursor.execute("SELECT 1 FROM item_ngrams LIMIT 1")
+    if cursor.fetchone() is not None:
+        return
+    cursor.execute("SELECT id, user_id, normalized_name FROM items")
+    rows = cursor.fetchall()
+    cursor.executemany(
+        "INSERT OR IGNORE INTO item_ngrams (user_id, gram, item_id) VALUES (?, ?, ?)",
+        [
+            (user_id, gram, item_id)
+            for item_id, user_id, normalized in rows
+            for gram in item_normalizer.ngrams(normalized)
+        ]
+    )
+    if rows:
+        logger.info(f"[数据库迁移] 回填 n-gram 索引: {len(rows)} 个物品")
+
+
+@_migration(4, "items.normalized_aliases 规范化别名列")
+def _add_normalized_aliases(cursor: sqlite3.Cursor) -> None:
+    cursor.execute("PRAGMA table_info(items)")
+    if 'normalized_aliases' not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE items ADD COLUMN normalized_aliases TEXT")
+
+    cursor.execute("""
+        SELECT id, item_name, item_aliases FROM items
+        WHERE normalized_aliases IS NULL
+    """)
+    updates = []
+    for item_id, item_name, item_aliases in cursor.fetchall():
+        try:
+            aliases = json.loads(item_aliases) if item_aliases else [item_name]
+        except (json.JSONDecodeError, TypeError):
+            aliases = [item_name]
+        normalized = list(dict.fromkeys(item_normalizer.normalize(alias) for alias in aliases))
+        updates.append((json.dumps(normalized, ensure_ascii=False), item_id))
+
+    cursor.executemany("UPDATE items SET normalized_aliases = ? WHERE id = ?", updates)
+    if updates:
+        logger.info(f"[数据库迁移] 回填规范化别名: {len(updates)} 个物品")
+
+
+@_migration(5, "按查询形态调整索引: 部分索引 / 覆盖索引")
+def _tune_query_indexes(cursor: sqlite3.Cursor) -> None:
+    # 列表分页 / 计数 / 别名索引构建: user_id + is_deleted = 0, 按 (updated_at, id) 倒序;
+    # 附带 item_name, location 覆盖物品工具默认的投影字段
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_items_live_list
+        ON items(user_id, updated_at, id, item_name, location)
+        WHERE is_deleted = 0
+    """)
+
+    # 历史查询: item_id 过滤 + timestamp 排序, 附带返回列, 无需回表
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_item_timestamp
+        ON item_history(item_id, timestamp, action, location, old_value, new_value)
+    """)
+
+    # - idx_items_user_normalized 与 UNIQUE(user_id, normalized_name) 的自动索引重复
+    # - idx_items_is_deleted / idx_items_updated_at 选择性低, 查询都先按 user_id 过滤
+    # - idx_items_user_updated 被 idx_items_live_list 取代
+    # - idx_history_item_id 是 idx_history_item_timestamp 的前缀
+    # - idx_history_timestamp 没有按时间跨物品查询历史的场景
+    for index in ('idx_items_user_normalized', 'idx_items_is_deleted', 'idx_items_updated_at',
+                  'idx_items_user_updated', 'idx_history_item_id', 'idx_history_timestamp'):
+        cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+
+@_migration(6, "item_history_archive 历史归档表")
+def _create_history_archive(cursor: sqlite3.Cursor) -> None:
+    # 由 HistoryRetentionEngine 写入: 每行是同一物品的一批历史记录 (JSON + zlib 压缩)
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS item_history_archive (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            item_id INTEGER NOT NULL,
+            user_id TEXT NOT NULL,
+            row_count INTEGER NOT NULL,
+            first_timestamp TEXT NOT NULL,
+            last_timestamp TEXT NOT NULL,
+            archived_at TEXT NOT NULL,
+            payload BLOB NOT NULL
+        )
+    """)
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_history_archive_item
+        ON item_history_archive(item_id, last_timestamp)
+    """)
+
+
+@_migration(7, "软删除记录的部分索引")
+def _create_tombstone_index(cursor: sqlite3.Cursor) -> None:
+    # TombstoneManager 按删除时间 (updated_at) 查找超过保留期的软删除记录
+    cursor.execute("""
+        CREATE INDEX IF NOT EXISTS idx_items_tombstones
+        ON items(updated_at)
+        WHERE is_deleted = 1
+    """)
@@ -0,0 +1,321 @@
+"""物品数据库按用户分片
+
+单个 items.db 只有一个写连接, 所有用户的写操作在同一把写锁上串行。
+分片模式下每个 user_id 使用独立的数据库文件 (ITEMS_SHARD_DIR/<user>-<hash>.db),
+一个用户的大量写入不会阻塞其他用户。
+
+- ShardedItemDatabase: 与 ItemDatabase 相同的接口, 按 user_id 路由到各自的分片
+- 打开的分片放在有界 LRU 中, 超出上限时关闭最久未使用且没有被借用的分片
+- 后台线程关闭空闲超过 idle_seconds 的分片
+- split_database(): 把已有的 items.db 按用户拆分为分片
+
+通过 ITEMS_SHARDING_ENABLED=true 启用, get_database() 会返回 ShardedItemDatabase。
+"""
+import hashlib
+import inspect
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from core.database import ItemDatabase
+from core.logger import logger
+
+_UNSAFE_CHARS_RE = re.compile(r'[^A-Za-z0-9_-]')
+
+# 拆分时复制的表 (item_history 按 item_id 归属用户, 其余表自带 user_id)
+_SPLIT_TABLES = ('items', 'item_history', 'item_history_archive', 'item_ngrams')
+
+
+def shard_filename(user_id: str) -> str:
+    """用户对应的分片文件名
+
+    文件名 = 可读前缀 + user_id 的哈希, 既便于排查, 也避免特殊字符与大小写冲突。
+    """
+    prefix = _UNSAFE_CHARS_RE.sub('_', user_id)[:32] or 'user'
+    digest = hashlib.sha1(user_id.encode('utf-8')).hexdigest()[:12]
+    return f"{prefix}-{digest}.db"
+
+
+@dataclass
+class _Shard:
+    """一个已打开的分片"""
+    db: ItemDatabase
+    leases: int = 0  # 正在使用该分片的操作数, > 0 时不会被关闭
+    last_used: float = field(default_factory=time.monotonic)
+
+
+def _routed(name: str) -> Callable[..., Any]:
+    """生成按 user_id 路由到分片的 ItemDatabase 方法"""
+    target = getattr(ItemDatabase, name)
+    signature = inspect.signature(target)
+    default_user = signature.parameters['user_id'].default
+
+    def method(self: "ShardedItemDatabase", *args, **kwargs):
+        bound = signature.bind(None, *args, **kwargs)
+        user_id = bound.arguments.get('user_id', default_user)
+        with self.lease(user_id) as db:
+            return getattr(db, name)(*args, **kwargs)
+
+    method.__name__ = name
+    method.__qualname__ = f"ShardedItemDatabase.{name}"
+    method.__doc__ = target.__doc__
+    return method
+
+
+class ShardedItemDatabase:
+    """按用户分片的物品数据库"""
+
+    def __init__(self, shard_dir: Path,
+                 max_open: int = 32,
+                 idle_seconds: float = 300,
+                 reader_pool_size: int = 2):
+        """
+        Args:
+            shard_dir: 分片文件目录
+            max_open: 同时打开的分片上限 (LRU 淘汰)
+            idle_seconds: 分片空闲超过该时间后自动关闭, <= 0 表示不自动关闭
+            reader_pool_size: 每个分片的只读连接池大小
+        """
+        self.shard_dir = shard_dir
+        self.max_open = max_open
+        self.idle_seconds = idle_seconds
+        self.reader_pool_size = reader_pool_size
+
+        self._shards: "OrderedDict[Path, _Shard]" = OrderedDict()  # {分片路径: 分片}, 按最近使用排序
+        self._lock = threading.Lock()
+        self._opening: Dict[Path, threading.Lock] = {}  # 每个分片一把打开锁, 打开慢不阻塞其他用户
+        self._closed = False
+
+        self._reaper_stop = threading.Event()
+        self._reaper: Optional[threading.Thread] = None
+        if idle_seconds > 0:
+            self._reaper = threading.Thread(target=self._reap_loop, name="item-shard-reaper", daemon=True)
+            self._reaper.start()
+
+        self.shard_dir.mkdir(parents=True, exist_ok=True)
+        logger.info(f"[数据库分片] 分片目录: {self.shard_dir}, 最多打开 {max_open} 个")
+
+    def shard_path(self, user_id: str) -> Path:
+        """用户的分片文件路径"""
+        return self.shard_dir / shard_filename(user_id)
+
+    def shard_paths(self) -> List[Path]:
+        """磁盘上所有分片文件"""
+        return sorted(self.shard_dir.glob("*.db"))
+
+    def open_count(self) -> int:
+        """当前打开的分片数"""
+        with self._lock:
+            return len(self._shards)
+
+    def _open(self, path: Path, recent: bool = True) -> _Shard:
+        """获取 (必要时打开) 分片并增加借用计数
+
+        recent=False 时不改变已打开分片的 LRU 顺序, 新打开的分片放在最久未使用的一端,
+        打开时不关闭其他分片
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("ShardedItemDatabase 已关闭")
+            shard = self._shards.get(path)
+            if shard is not None:
+                shard.leases += 1
+                if recent:
+                    self._shards.move_to_end(path)
+                return shard
+            opening = self._opening.setdefault(path, threading.Lock())
+
+        with opening:
+            with self._lock:
+                shard = self._shards.get(path)
+                if shard is not None:
+                    shard.leases += 1
+                    if recent:
+                        self._shards.move_to_end(path)
+                    return shard
+
+            db = ItemDatabase(path, reader_pool_size=self.reader_pool_size)
+
+            with self._lock:
+                shard = _Shard(db, leases=1)
+                self._shards[path] = shard
+                self._opening.pop(path, None)
+                if recent:
+                    evicted = self._evict_locked()
+                else:
+                    # 借用期间允许暂时超出上限, 归还时它在最久未使用一端, 先于活跃分片被关闭
+                    self._shards.move_to_end(path, last=False)
+                    evicted = []
+
+        for victim in evicted:
+            victim.close()
+        return shard
+
+    def _release(self, shard: _Shard) -> None:
+        with self._lock:
+            shard.leases -= 1
+            shard.last_used = time.monotonic()
+            evicted = self._evict_locked()
+        for victim in evicted:
+            victim.close()
+
+    def _evict_locked(self) -> List[ItemDatabase]:
+        """超出上限时移除最久未使用且未被借用的分片 (调用方持有 _lock, 在锁外关闭)"""
+        evicted = []
+        if len(self._shards) <= self.max_open:
+            return evicted
+        for key in list(self._shards):
+            if len(self._shards) <= self.max_open:
+                break
+            if self._shards[key].leases == 0:
+                evicted.append(self._shards.pop(key).db)
+        if evicted:
+            logger.debug(f"[数据库分片] LRU 关闭 {len(evicted)} 个分片")
+        return evicted
+
+    @contextmanager
+    def lease(self, user_id: str) -> Iterator[ItemDatabase]:
+        """借用用户的分片, 借用期间不会被关闭"""
+        with self.lease_path(self.shard_path(user_id)) as db:
+            yield db
+
+    @contextmanager
+    def lease_path(self, path: Path, recent: bool = True) -> Iterator[ItemDatabase]:
+        """按文件路径借用分片 (维护任务遍历分片时使用)
+
+        Args:
+            recent: 是否计为最近使用; 维护任务传 False, 避免把活跃用户的分片挤出 LRU
+        """
+        shard = self._open(path, recent=recent)
+        try:
+            yield shard.db
+        finally:
+            self._release(shard)
+
+    def reap_idle(self) -> int:
+        """关闭空闲超过 idle_seconds 的分片
+
+        Returns:
+            关闭的分片数
+        """
+        deadline = time.monotonic() - self.idle_seconds
+        with self._lock:
+            idle = [key for key, shard in self._shards.items()
+                    if shard.leases == 0 and shard.last_used < deadline]
+            victims = [self._shards.pop(key).db for key in idle]
+        for db in victims:
+            db.close()
+        if victims:
+            logger.info(f"[数据库分片] 关闭空闲分片: {len(victims)} 个")
+        return len(victims)
+
+    def _reap_loop(self) -> None:
+        """后台关闭空闲分片"""
+        while not self._reaper_stop.wait(max(self.idle_seconds / 2, 1.0)):
+            try:
+                self.reap_idle()
+            except Exception as e:
+                logger.warning(f"[数据库分片] ⚠️  关闭空闲分片失败: {e}")
+
+    remember_item = _routed('remember_item')
+    query_item = _routed('query_item')
+    has_item = _routed('has_item')
+    remember_items = _routed('remember_items')
+    query_items = _routed('query_items')
+    list_items = _routed('list_items')
+    count_items = _routed('count_items')
+    list_all_items = _routed('list_all_items')
+    get_item_history = _routed('get_item_history')
+    delete_item = _routed('delete_item')
+    data_version = _routed('data_version')
+
+    def iter_items(self, user_id: str = 'default', *args, **kwargs) -> Iterator[Dict[str, Any]]:
+        """逐批遍历用户的物品 (遍历期间持有分片)"""
+        with self.lease(user_id) as db:
+            yield from db.iter_items(user_id, *args, **kwargs)
+
+    def flush_access_stats(self) -> int:
+        """写入所有已打开分片的访问统计"""
+        with self._lock:
+            databases = [shard.db for shard in self._shards.values()]
+        return sum(db.flush_access_stats() for db in databases)
+
+    def close(self) -> None:
+        """关闭所有分片"""
+        self._reaper_stop.set()
+        if self._reaper is not None:
+            self._reaper.join(timeout=5)
+        with self._lock:
+            self._closed = True
+            databases = [shard.db for shard in self._shards.values()]
+            self._shards.clear()
+        for db in databases:
+            db.close()
+        logger.info(f"[数据库分片] 已关闭 {len(databases)} 个分片")
+
+
+def split_database(source_path: Path, shard_dir: Path) -> Dict[str, int]:
+    """把单库 items.db 按 user_id 拆分为分片
+
+    源库先升级到最新表结构; 每个用户的物品、历史、归档和 n-gram 原样复制 (保留 id),
+    全文索引由 items 上的触发器重建。目标分片已有数据时跳过该用户, 源库不做修改。
+
+    Returns:
+        {user_id: 复制的物品数}
+    """
+    ItemDatabase(source_path).close()  # 升级源库表结构
+
+    source = sqlite3.connect(str(source_path))
+    try:
+        user_ids = [row[0] for row in source.execute("SELECT DISTINCT user_id FROM items ORDER BY user_id")]
+        source_columns = {
+            table: [row[1] for row in source.execute(f"PRAGMA table_info({table})")]
+            for table in _SPLIT_TABLES
+        }
+    finally:
+        source.close()
+
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    copied: Dict[str, int] = {}
+    for user_id in user_ids:
+        path = shard_dir / shard_filename(user_id)
+        ItemDatabase(path).close()  # 创建分片表结构
+
+        conn = sqlite3.connect(str(path), isolation_level=None)
+        try:
+            if conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]:
+                logger.warning(f"[数据库分片] 分片已有数据, 跳过: user_id={user_id}, {path.name}")
+                continue
+
+            conn.execute("ATTACH DATABASE ? AS source", (str(source_path),))
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                for table in _SPLIT_TABLES:
+                    shard_columns = {row[1] for row in conn.execute(f"PRAGMA main.table_info({table})")}
+                    columns = ", ".join(c for c in source_columns[table] if c in shard_columns)
+                    if table == 'item_history':
+                        where = "item_id IN (SELECT id FROM source.items WHERE user_id = ?)"
+                    else:
+                        where = "user_id = ?"
+                    conn.execute(
+                        f"INSERT INTO main.{table} ({columns}) SELECT {columns} FROM source.{table} WHERE {where}",
+                        (user_id,)
+                    )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("DETACH DATABASE source")
+
+            copied[user_id] = conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+            logger.info(f"[数据库分片] 拆分完成: user_id={user_id}, 物品 {copied[user_id]} 条 -> {path.name}")
+        finally:
+            conn.close()
+
+    return copied
@@ -0,0 +1,308 @@
+"""本地意图分类器 - 从交互日志学习的路由模型
+
+InteractionLogger 为每次请求记录了用户输入和最终处理的 Agent (final_agent),
+这些记录就是现成的路由标注数据。本模块在这些数据上离线训练一个字符 n-gram
+多项式朴素贝叶斯分类器, 位于 KeywordRouter / 物品快速路径之后、Supervisor 之前:
+置信度足够高的消息直接交给目标 Agent, 每次命中省去一次 Supervisor 的 LLM 调用。
+
+模型保存为带版本号的 JSON 文件 (见 scripts/train_intent_classifier.py),
+服务启动时加载; 文件不存在时分类器不生效, 所有消息照常走 Supervisor。
+
+分类结果只在以下条件同时满足时采用 (宁可漏判, 不可误判):
+- 最高类别的后验概率 >= INTENT_CLASSIFIER_THRESHOLD
+- 消息中至少 MIN_COVERAGE 比例的 n-gram 在训练数据中出现过 (排除训练集外的说法)
+- 预测的 Agent 已在 AgentRegistry 注册 (预测为 supervisor 时照常走 Supervisor)
+"""
+
+import json
+import math
+import sqlite3
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import config
+from core.logger import logger
+
+# 模型文件格式版本 (结构变化时递增, 旧文件需重新训练)
+FORMAT_VERSION = 1
+
+
+@dataclass
+class IntentPrediction:
+    """一次分类结果"""
+    label: str  # 预测的 Agent 名称
+    confidence: float  # 后验概率
+    coverage: float  # 消息中在训练数据里出现过的 n-gram 比例
+    scores: Dict[str, float] = field(default_factory=dict)  # 每个类别的后验概率
+
+
+def extract_ngrams(text: str, ngram_range: Tuple[int, int] = (1, 3)) -> List[str]:
+    """提取字符 n-gram (转小写、合并空白)"""
+    text = ' '.join(text.lower().split())
+    low, high = ngram_range
+    return [text[i:i + n] for n in range(low, high + 1) for i in range(len(text) - n + 1)]
+
+
+class IntentClassifier:
+    """字符 n-gram 多项式朴素贝叶斯分类器 (构造后只读, 可在多线程间共享)"""
+
+    MIN_COVERAGE = 0.6
+
+    def __init__(
+        self,
+        class_counts: Dict[str, int],
+        ngram_counts: Dict[str, Dict[str, int]],
+        ngram_range: Tuple[int, int] = (1, 3),
+        alpha: float = 1.0,
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            class_counts: 每个类别的样本数
+            ngram_counts: 每个类别中各 n-gram 的出现次数
+            ngram_range: n-gram 长度范围
+            alpha: 拉普拉斯平滑系数
+            metadata: 训练信息 (版本、时间、样本数、评估结果等)
+        """
+        self.class_counts = dict(class_counts)
+        self.ngram_counts = {label: dict(counts) for label, counts in ngram_counts.items()}
+        self.ngram_range = tuple(ngram_range)
+        self.alpha = alpha
+        self.metadata = dict(metadata or {})
+
+        vocabulary = set()
+        for counts in self.ngram_counts.values():
+            vocabulary.update(counts)
+        self._vocabulary = vocabulary
+
+        # 预先计算对数概率, 预测时只做查表和加法
+        total_samples = sum(self.class_counts.values())
+        smoothing = alpha * max(len(vocabulary), 1)
+        self._log_prior = {}
+        self._log_prob = {}
+        self._log_unseen = {}
+        for label, count in self.class_counts.items():
+            counts = self.ngram_counts.get(label, {})
+            denominator = math.log(sum(counts.values()) + smoothing)
+            self._log_prior[label] = math.log(count / total_samples)
+            self._log_prob[label] = {
+                ngram: math.log(value + alpha) - denominator for ngram, value in counts.items()
+            }
+            self._log_unseen[label] = math.log(alpha) - denominator
+
+    @property
+    def labels(self) -> List[str]:
+        return sorted(self.class_counts)
+
+    @property
+    def version(self) -> str:
+        return self.metadata.get('version', 'unknown')
+
+    @classmethod
+    def train(
+        cls,
+        samples: Iterable[Tuple[str, str]],
+        ngram_range: Tuple[int, int] = (1, 3),
+        alpha: float = 1.0,
+        metadata: Optional[Dict[str, Any]] = None
+    ) -> 'IntentClassifier':
+        """训练分类器
+
+        Args:
+            samples: (消息, 类别) 列表
+            ngram_range: n-gram 长度范围
+            alpha: 拉普拉斯平滑系数
+            metadata: 附加的训练信息
+
+        Raises:
+            ValueError: 样本少于两个类别
+        """
+        class_counts: Counter = Counter()
+        ngram_counts: Dict[str, Counter] = {}
+        for text, label in samples:
+            ngrams = extract_ngrams(text, ngram_range)
+            if not ngrams:
+                continue
+            class_counts[label] += 1
+            ngram_counts.setdefault(label, Counter()).update(ngrams)
+
+        if len(class_counts) < 2:
+            raise ValueError(f"训练数据至少需要两个类别, 当前: {sorted(class_counts)}")
+
+        now = datetime.now(timezone.utc)
+        info = {
+            'version': now.strftime('%Y%m%dT%H%M%SZ'),
+            'trained_at': now.isoformat(),
+            'samples': sum(class_counts.values()),
+        }
+        info.update(metadata or {})
+        return cls(class_counts, ngram_counts, ngram_range, alpha, info)
+
+    def predict(self, text: str) -> Optional[IntentPrediction]:
+        """预测消息的目标 Agent, 消息为空时返回 None"""
+        ngrams = extract_ngrams(text, self.ngram_range)
+        if not ngrams:
+            return None
+
+        joint = {}
+        for label, log_prob in self._log_prob.items():
+            unseen = self._log_unseen[label]
+            joint[label] = self._log_prior[label] + sum(log_prob.get(ngram, unseen) for ngram in ngrams)
+
+        # softmax 得到后验概率
+        best = max(joint.values())
+        exp = {label: math.exp(score - best) for label, score in joint.items()}
+        total = sum(exp.values())
+        scores = {label: value / total for label, value in exp.items()}
+
+        label = max(scores, key=scores.get)
+        coverage = sum(1 for ngram in ngrams if ngram in self._vocabulary) / len(ngrams)
+        return IntentPrediction(label=label, confidence=scores[label], coverage=coverage, scores=scores)
+
+    def classify(self, text: str, threshold: float) -> Optional[IntentPrediction]:
+        """预测并按置信度和覆盖率过滤, 不可靠时返回 None"""
+        prediction = self.predict(text)
+        if prediction is None or prediction.confidence < threshold or prediction.coverage < self.MIN_COVERAGE:
+            return None
+        return prediction
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format': FORMAT_VERSION,
+            'model': 'char_ngram_multinomial_nb',
+            'ngram_range': list(self.ngram_range),
+            'alpha': self.alpha,
+            'metadata': self.metadata,
+            'class_counts': self.class_counts,
+            'ngram_counts': self.ngram_counts,
+        }
+
+    def save(self, path: Path) -> None:
+        """保存模型 (先写临时文件再替换, 服务读取时不会看到半个文件)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'IntentClassifier':
+        """加载模型
+
+        Raises:
+            ValueError: 模型格式版本不匹配
+        """
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != FORMAT_VERSION:
+            raise ValueError(f"模型格式版本 {data.get('format')} 不受支持 (需要 {FORMAT_VERSION}), 请重新训练")
+        return cls(
+            class_counts=data['class_counts'],
+            ngram_counts=data['ngram_counts'],
+            ngram_range=tuple(data['ngram_range']),
+            alpha=data['alpha'],
+            metadata=data.get('metadata')
+        )
+
+
+def load_training_samples(db_path: Path, since: Optional[str] = None) -> List[Tuple[str, str]]:
+    """从交互日志读取训练样本 (用户输入, 最终处理的 Agent)
+
+    跳过出错的请求, 以及由分类器自己路由且未回退的请求 (避免模型自我强化;
+    回退的请求由 Supervisor 重新路由, final_agent 是纠正后的标签, 保留)。
+
+    Args:
+        db_path: interaction_logs.db 路径
+        since: 只使用该日期 (YYYY-MM-DD) 之后的记录
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        rows = conn.execute("""
+            SELECT user_input, final_agent FROM interaction_logs
+            WHERE final_agent IS NOT NULL AND user_input != ''
+              AND status != 'error'
+              AND (routing_stage != 'classifier' OR redirect_occurred = 1)
+              AND created_date >= ?
+            ORDER BY id
+        """, (since or '',)).fetchall()
+    finally:
+        conn.close()
+    return [(text, label) for text, label in rows]
+
+
+def evaluate(classifier: IntentClassifier, samples: List[Tuple[str, str]], threshold: float) -> Dict[str, Any]:
+    """在留出样本上评估分类器
+
+    Returns:
+        accuracy: 所有样本的准确率
+        routed_rate: 达到阈值 (会跳过 Supervisor) 的样本比例
+        routed_accuracy: 达到阈值的样本中预测正确的比例
+    """
+    correct = routed = routed_correct = 0
+    for text, label in samples:
+        prediction = classifier.predict(text)
+        if prediction is None:
+            continue
+        correct += prediction.label == label
+        if classifier.classify(text, threshold) is not None:
+            routed += 1
+            routed_correct += prediction.label == label
+
+    total = len(samples)
+    return {
+        'samples': total,
+        'threshold': threshold,
+        'accuracy': round(correct / total, 4) if total else None,
+        'routed_rate': round(routed / total, 4) if total else None,
+        'routed_accuracy': round(routed_correct / routed, 4) if routed else None,
+    }
+
+
+# 全局实例
+_classifier: Optional[IntentClassifier] = None
+_classifier_loaded = False
+_classifier_lock = threading.Lock()
+
+
+def get_intent_classifier() -> Optional[IntentClassifier]:
+    """获取全局意图分类器 (首次调用时加载模型文件; 未启用或没有模型时返回 None)"""
+    global _classifier, _classifier_loaded
+    if not _classifier_loaded:
+        with _classifier_lock:
+            if not _classifier_loaded:
+                _classifier = _load_configured_model()
+                _classifier_loaded = True
+    return _classifier
+
+
+def _load_configured_model() -> Optional[IntentClassifier]:
+    if not config.INTENT_CLASSIFIER_ENABLED:
+        return None
+
+    path = config.INTENT_CLASSIFIER_MODEL_PATH
+    if not path.exists():
+        logger.info(f"[意图分类器] 未找到模型文件 {path}, 分类器不生效")
+        return None
+
+    try:
+        classifier = IntentClassifier.load(path)
+    except Exception as e:
+        logger.error(f"[意图分类器] 加载模型失败: {e}")
+        return None
+
+    logger.info(
+        f"[意图分类器] ✓ 已加载模型 v{classifier.version}: "
+        f"{classifier.metadata.get('samples', '?')} 条样本, 类别 {classifier.labels}"
+    )
+    return classifier
+
+
+__all__ = [
+    'IntentClassifier', 'IntentPrediction', 'extract_ngrams',
+    'load_training_samples', 'evaluate', 'get_intent_classifier',
+]
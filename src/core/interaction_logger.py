@@ -14,6 +14,7 @@ from dataclasses import dataclass, asdict
 
 from config import config
 from core.logger import logger
+from core.tracing import Trace, build_tree, span_to_row
 
 
 @dataclass
@@ -26,7 +27,7 @@ class InteractionLog:
     input_length: int
 
     # 路由信息
-    routing_stage: str  # 'tag', 'keyword', 'supervisor'
+    routing_stage: str  # 'tag', 'keyword', 'item_fast_path', 'classifier', 'supervisor'
     routing_matched: bool
     routing_keywords: Optional[str] = None  # JSON 字符串
     target_agent: Optional[str] = None
@@ -35,6 +36,7 @@ class InteractionLog:
     redirect_occurred: bool = False
     redirect_reason: Optional[str] = None
     final_agent: Optional[str] = None
+    redirect_filtered: bool = False  # 被回退预判过滤器跳过了 calendar_agent
 
     # 响应信息
     response_text: Optional[str] = None
@@ -47,6 +49,7 @@ class InteractionLog:
 
     # 辅助字段
     created_date: Optional[str] = None  # YYYY-MM-DD
+    trace_id: Optional[str] = None  # 链路追踪 ID (span 树见 interaction_spans 表)
 
     def __post_init__(self):
         if self.created_date is None:
@@ -101,6 +104,7 @@ class InteractionLogger:
                     redirect_occurred BOOLEAN DEFAULT 0,
                     redirect_reason TEXT,
                     final_agent TEXT,
+                    redirect_filtered BOOLEAN DEFAULT 0,
 
                     -- 响应信息
                     response_text TEXT,
@@ -112,7 +116,31 @@ class InteractionLogger:
                     error_message TEXT,
 
                     -- 索引字段
-                    created_date TEXT
+                    created_date TEXT,
+                    trace_id TEXT
+                )
+            """)
+
+            # 旧版本的日志库补充新增的列
+            columns = {row['name'] for row in cursor.execute("PRAGMA table_info(interaction_logs)")}
+            if 'redirect_filtered' not in columns:
+                cursor.execute("ALTER TABLE interaction_logs ADD COLUMN redirect_filtered BOOLEAN DEFAULT 0")
+            if 'trace_id' not in columns:
+                cursor.execute("ALTER TABLE interaction_logs ADD COLUMN trace_id TEXT")
+
+            # 链路追踪的 span (每个请求一组, 按 trace_id 关联交互日志)
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS interaction_spans (
+                    trace_id TEXT NOT NULL,
+                    span_id INTEGER NOT NULL,
+                    parent_id INTEGER,
+                    name TEXT NOT NULL,
+                    kind TEXT,
+                    start_ms REAL,
+                    duration_ms REAL,
+                    attributes TEXT,  -- JSON
+                    error TEXT,
+                    PRIMARY KEY (trace_id, span_id)
                 )
             """)
 
@@ -124,6 +152,7 @@ class InteractionLogger:
                 "CREATE INDEX IF NOT EXISTS idx_routing_stage ON interaction_logs(routing_stage)",
                 "CREATE INDEX IF NOT EXISTS idx_target_agent ON interaction_logs(target_agent)",
                 "CREATE INDEX IF NOT EXISTS idx_redirect_occurred ON interaction_logs(redirect_occurred)",
+                "CREATE INDEX IF NOT EXISTS idx_trace_id ON interaction_logs(trace_id)",
             ]
 
             for idx_sql in indexes:
@@ -162,15 +191,15 @@ class InteractionLogger:
                     INSERT INTO interaction_logs (
                         user_id, timestamp, user_input, input_length,
                         routing_stage, routing_matched, routing_keywords, target_agent,
-                        redirect_occurred, redirect_reason, final_agent,
+                        redirect_occurred, redirect_reason, final_agent, redirect_filtered,
                         response_text, response_length, response_time_ms,
-                        status, error_message, created_date
+                        status, error_message, created_date, trace_id
                     ) VALUES (
                         :user_id, :timestamp, :user_input, :input_length,
                         :routing_stage, :routing_matched, :routing_keywords, :target_agent,
-                        :redirect_occurred, :redirect_reason, :final_agent,
+                        :redirect_occurred, :redirect_reason, :final_agent, :redirect_filtered,
                         :response_text, :response_length, :response_time_ms,
-                        :status, :error_message, :created_date
+                        :status, :error_message, :created_date, :trace_id
                     )
                 """, data)
 
@@ -183,6 +212,70 @@ class InteractionLogger:
             logger.error(f"[交互日志] 记录失败: {e}")
             return None
 
+    def save_trace(self, trace: Trace) -> None:
+        """保存一个请求的 span 树
+
+        Args:
+            trace: 已结束的追踪
+        """
+        try:
+            self._ensure_initialized()
+
+            rows = [span_to_row(span) for span in list(trace.spans)]
+            with self._get_connection() as conn:
+                conn.executemany("""
+                    INSERT OR REPLACE INTO interaction_spans (
+                        trace_id, span_id, parent_id, name, kind, start_ms, duration_ms, attributes, error
+                    ) VALUES (
+                        :trace_id, :span_id, :parent_id, :name, :kind, :start_ms, :duration_ms, :attributes, :error
+                    )
+                """, [
+                    dict(row, trace_id=trace.trace_id,
+                         attributes=json.dumps(row['attributes'], ensure_ascii=False, default=str))
+                    for row in rows
+                ])
+                conn.commit()
+
+            logger.debug(f"[交互日志] 已记录追踪 {trace.trace_id} ({len(rows)} 个 span)")
+        except Exception as e:
+            logger.error(f"[交互日志] 记录追踪失败: {e}")
+
+    def get_trace(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        """查询一个请求的 span 树
+
+        Args:
+            trace_id: 追踪 ID (X-Trace-Id 响应头)
+
+        Returns:
+            {"trace_id", "interaction": 交互日志摘要, "root": 嵌套的 span 树}, 不存在时返回 None
+        """
+        self._ensure_initialized()
+
+        with self._get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT span_id, parent_id, name, kind, start_ms, duration_ms, attributes, error
+                FROM interaction_spans
+                WHERE trace_id = ?
+                ORDER BY span_id
+            """, (trace_id,))
+            rows = [dict(row, attributes=json.loads(row['attributes'] or '{}')) for row in cursor.fetchall()]
+            if not rows:
+                return None
+
+            cursor.execute("""
+                SELECT id, routing_stage, target_agent, final_agent, response_time_ms, status
+                FROM interaction_logs
+                WHERE trace_id = ?
+            """, (trace_id,))
+            interaction = cursor.fetchone()
+
+        return {
+            'trace_id': trace_id,
+            'interaction': dict(interaction) if interaction else None,
+            'root': build_tree(rows),
+        }
+
     def query(
         self,
         user_id: Optional[str] = None,
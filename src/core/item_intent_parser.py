@@ -0,0 +1,150 @@
+"""物品意图解析器 - 无需 LLM 的物品快速路径
+
+"钥匙放在书桌抽屉里"、"钥匙在哪" 这类最常见的物品请求句式固定,
+用确定性的规则即可解析出意图和参数, 直接调用物品工具, 省去
+Supervisor 和 ItemAgent 两次 LLM 调用。
+
+支持的句式:
+- 记录: "(我)(把)X 放在/放到/放进/搁在/收在/挂在/塞在/存放在 Y(了)"、"X 在 Y上/里/下..."
+- 查询: "(我的)X 在哪(里/儿)(了/呢)"、"(我)(把)X 放哪(里/儿)了"
+- 列表: "我记录了哪些物品"、"列出所有物品"
+
+记录和查询只处理已记录的物品 ("这件事放在心上"、"故宫在哪里" 的主语不是物品),
+新物品的第一次记录仍由 Supervisor 和 ItemAgent 处理。
+
+只接受结构清晰的短句; 含疑问、否定、代词、多个分句等情况一律不解析,
+交给 Supervisor 处理 (宁可漏判, 不可误判)。
+"""
+
+import re
+from dataclasses import dataclass
+from typing import Callable, Literal, Optional
+
+ItemIntentAction = Literal["remember", "query", "list"]
+
+
+@dataclass
+class ItemIntent:
+    """解析出的物品意图"""
+    action: ItemIntentAction
+    item: Optional[str] = None  # remember / query
+    location: Optional[str] = None  # remember
+    pattern: str = ""  # 命中的句式 (用于日志)
+
+
+class ItemIntentParser:
+    """物品意图解析器"""
+
+    # 句末语气词和标点
+    _TAIL = r'(?:了|啦|呢|啊|呀|吧|哦)?[。！!？?~～\s]*$'
+
+    # 明确表示"放置"的动词, 后面的位置可以是任意名词
+    PLACE_VERBS = ['存放在', '放在', '放到', '放进', '搁在', '收在', '挂在', '塞在', '藏在', '丢在', '扔在']
+
+    # 只用"在"连接时, 位置必须以方位词结尾
+    LOCATION_SUFFIXES = [
+        '上面', '下面', '里面', '外面', '旁边', '后面', '前面', '底下', '附近',
+        '上', '下', '里', '内', '中', '边', '旁', '抽屉', '柜子', '盒子', '包里', '口袋',
+    ]
+
+    # 物品名不能是代词或泛指 (需要上下文, 交给 LLM)
+    PRONOUNS = {'我', '你', '他', '她', '它', '我们', '你们', '他们', '这', '那', '这个', '那个', '它们', '东西'}
+
+    # 物品名中出现这些词说明前面还有其他动作 ("我想把书放在...", "帮我记一下钥匙放在...")
+    ITEM_REJECT_WORDS = ['把', '将', '想', '要把', '帮我', '记一下', '记住', '记录', '请帮', '一下', '告诉']
+
+    # 出现这些词说明句子不是简单的记录/查询
+    REJECT_WORDS = ['不', '没', '别', '吗', '么', '是否', '应该', '可能', '如果', '帮我想', '为什么', '怎么']
+
+    MAX_ITEM_LENGTH = 15
+    MAX_LOCATION_LENGTH = 20
+
+    _PREFIX = r'^(?:我(?=已经|刚|把|将))?(?:已经|刚刚|刚)?(?:把|将)?'
+
+    _PLACE_RE = re.compile(
+        _PREFIX + r'(?P<item>.+?)(?P<verb>' + '|'.join(PLACE_VERBS) + r')(?P<location>.+?)' + _TAIL
+    )
+    _AT_RE = re.compile(
+        r'^(?:我的)?(?P<item>.+?)在(?P<location>.+?(?:' + '|'.join(LOCATION_SUFFIXES) + r'))' + _TAIL
+    )
+    _QUERY_RE = re.compile(
+        _PREFIX + r'(?:我的)?(?P<item>.+?)(?:放在|放到|搁在|收在|放|在)(?:哪里|哪儿|哪)' + _TAIL
+    )
+    _LIST_RES = [
+        re.compile(r'^(?:我)?(?:都)?(?:记录|记|存)了?(?:哪些|什么|多少)(?:物品|东西)' + _TAIL),
+        re.compile(r'^(?:列出|查看|显示|看看)(?:一下)?(?:我的)?(?:所有|全部)?的?(?:物品|东西)(?:列表)?' + _TAIL),
+        re.compile(r'^(?:所有|全部)(?:的)?物品(?:列表)?' + _TAIL),
+    ]
+
+    # 分句、并列: "钥匙和钱包放在桌上" / "钥匙放桌上，钱包放包里"
+    _MULTI_CLAUSE_RE = re.compile(r'[，,；;、]|和|跟|还有|以及')
+
+    @classmethod
+    def parse(cls, message: str, is_known_item: Optional[Callable[[str], bool]] = None) -> Optional[ItemIntent]:
+        """解析消息
+
+        Args:
+            message: 用户输入的原始消息
+            is_known_item: 判断物品是否已记录的函数; 记录和查询句式只在物品已记录时解析,
+                未提供时只解析列表句式
+
+        Returns:
+            ItemIntent, 无法确定时返回 None (交给 Supervisor)
+        """
+        text = message.strip()
+        if not text or len(text) > cls.MAX_ITEM_LENGTH + cls.MAX_LOCATION_LENGTH + 6:
+            return None
+
+        for pattern in cls._LIST_RES:
+            if pattern.match(text):
+                return ItemIntent(action="list", pattern="列表")
+
+        if is_known_item is None:
+            return None
+
+        # 疑问句: 查询 ("故宫在哪里"、"最近的医院在哪" 不是物品查询)
+        match = cls._QUERY_RE.match(text)
+        if match:
+            item = cls._clean_item(match.group('item'))
+            if item is None or not is_known_item(item):
+                return None
+            return ItemIntent(action="query", item=item, pattern="查询:在哪")
+
+        # 陈述句: 记录 (包含疑问/否定等词时不处理)
+        if any(word in text for word in cls.REJECT_WORDS) or '哪' in text:
+            return None
+
+        match = cls._PLACE_RE.match(text)
+        pattern = f"记录:{match.group('verb')}" if match else None
+        if match is None:
+            match = cls._AT_RE.match(text)
+            pattern = "记录:在"
+        if match is None:
+            return None
+
+        item = cls._clean_item(match.group('item'))
+        location = match.group('location').strip()
+        if (item is None or not location or len(location) > cls.MAX_LOCATION_LENGTH
+                or cls._MULTI_CLAUSE_RE.search(location)):
+            return None
+        # 句子也可以描述人、地点或抽象事物 ("妈妈在厨房里"、"这件事放在心上"),
+        # 只有已记录的物品才直接更新位置
+        if not is_known_item(item):
+            return None
+        return ItemIntent(action="remember", item=item, location=location, pattern=pattern)
+
+    @classmethod
+    def _clean_item(cls, item: str) -> Optional[str]:
+        """清理并校验物品名称, 不合格返回 None"""
+        item = item.strip()
+        if item.startswith('我的'):
+            item = item[2:]
+        if (not item or len(item) > cls.MAX_ITEM_LENGTH or item in cls.PRONOUNS
+                or cls._MULTI_CLAUSE_RE.search(item)
+                or any(word in item for word in cls.ITEM_REJECT_WORDS)):
+            return None
+        return item
+
+
+# 导出
+__all__ = ['ItemIntentParser', 'ItemIntent']
@@ -0,0 +1,505 @@
+"""物品数据库后台维护
+
+item_history 每次创建/移动都会新增一行, 软删除的物品也一直留在 items / items_fts 中,
+不清理会无限增长。本模块提供:
+- HistoryRetentionPolicy / HistoryRetentionEngine: 历史保留策略 (每个物品保留最近 N 次移动,
+  超过 X 天的历史归档), 按批增量执行, 超出策略的历史压缩后移入 item_history_archive 表
+- TombstoneManager: 清除超过保留期的软删除物品, 以及 items_fts 的 merge / optimize 维护
+- MaintenanceScheduler: 后台线程定期执行以上任务, 并分批回收空闲页 (incremental_vacuum)
+
+归档的历史仍可通过 ItemDatabase.get_item_history(include_archived=True) 查看;
+手动执行见 scripts/db_maintenance.py。
+"""
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+from core.database import ItemDatabase, get_database, get_timestamp
+from core.db_sharding import ShardedItemDatabase
+from core.logger import logger
+
+# 归档时保存的历史字段
+_HISTORY_COLUMNS = ('id', 'item_id', 'item_name', 'location', 'location_detail', 'action',
+                    'changed_field', 'old_value', 'new_value', 'timestamp', 'user_id', 'notes')
+
+
+@dataclass
+class HistoryRetentionPolicy:
+    """历史保留策略
+
+    一条历史记录满足以下任一条件即被归档 (每个物品最新的一条始终保留):
+    - 是移动记录, 且不在该物品最近 keep_last_moves 次移动之内
+    - 早于 archive_after_days 天
+    """
+    keep_last_moves: int = 50  # <= 0 表示不按移动次数归档
+    archive_after_days: int = 365  # <= 0 表示不按时间归档
+    batch_size: int = 200  # 每批处理的物品数 (一个写事务)
+
+    @classmethod
+    def from_config(cls) -> "HistoryRetentionPolicy":
+        """从全局配置创建"""
+        from config import config
+        return cls(
+            keep_last_moves=config.HISTORY_KEEP_LAST_MOVES,
+            archive_after_days=config.HISTORY_ARCHIVE_AFTER_DAYS,
+            batch_size=config.HISTORY_RETENTION_BATCH,
+        )
+
+
+@dataclass
+class RetentionStats:
+    """一批 (或一轮) 保留策略的执行结果"""
+    items_scanned: int = 0
+    rows_archived: int = 0
+    archives_written: int = 0
+    finished: bool = False  # 本轮是否已处理完所有物品
+
+    def add(self, other: "RetentionStats") -> None:
+        self.items_scanned += other.items_scanned
+        self.rows_archived += other.rows_archived
+        self.archives_written += other.archives_written
+        self.finished = other.finished
+
+
+class HistoryRetentionEngine:
+    """历史保留引擎
+
+    按 item_id 顺序分批处理, 每批一个短写事务, 批与批之间让出写锁,
+    不会长时间阻塞前台写入; 处理进度保存在内存中, 一轮结束后从头开始。
+    """
+
+    def __init__(self, db: ItemDatabase, policy: Optional[HistoryRetentionPolicy] = None):
+        self.db = db
+        self.policy = policy or HistoryRetentionPolicy()
+        self._last_item_id = 0  # 下一批从该 item_id 之后开始
+
+    def _cutoff(self) -> str:
+        """按时间归档的截止时间戳 (空串表示不按时间归档)"""
+        if self.policy.archive_after_days <= 0:
+            return ''
+        cutoff = datetime.now(timezone.utc) - timedelta(days=self.policy.archive_after_days)
+        return cutoff.isoformat()
+
+    def run_increment(self) -> RetentionStats:
+        """处理下一批物品的历史"""
+        policy = self.policy
+        keep_moves = policy.keep_last_moves if policy.keep_last_moves > 0 else -1
+        stats = RetentionStats()
+
+        with self.db._write_transaction() as cursor:
+            cursor.execute("""
+                SELECT DISTINCT item_id FROM item_history
+                WHERE item_id > ?
+                ORDER BY item_id
+                LIMIT ?
+            """, (self._last_item_id, policy.batch_size))
+            item_ids = [row['item_id'] for row in cursor.fetchall()]
+
+            if not item_ids:
+                self._last_item_id = 0
+                stats.finished = True
+                return stats
+
+            # 按时间倒序为每个物品的历史编号: rn 为全部历史的序号, move_rank 为移动记录的序号
+            placeholders = ','.join('?' * len(item_ids))
+            cursor.execute(f"""
+                SELECT {', '.join(_HISTORY_COLUMNS)} FROM (
+                    SELECT *,
+                           ROW_NUMBER() OVER w AS rn,
+                           SUM(action = 'move') OVER w AS move_rank
+                    FROM item_history
+                    WHERE item_id IN ({placeholders})
+                    WINDOW w AS (PARTITION BY item_id ORDER BY timestamp DESC, id DESC)
+                )
+                WHERE rn > 1
+                AND ((action = 'move' AND ? > 0 AND move_rank > ?) OR timestamp < ?)
+                ORDER BY item_id, timestamp, id
+            """, (*item_ids, keep_moves, keep_moves, self._cutoff()))
+
+            archived: Dict[int, List[Dict[str, Any]]] = {}
+            for row in cursor.fetchall():
+                archived.setdefault(row['item_id'], []).append(dict(row))
+
+            now = get_timestamp()
+            cursor.executemany("""
+                INSERT INTO item_history_archive
+                (item_id, user_id, row_count, first_timestamp, last_timestamp, archived_at, payload)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, [
+                (item_id, rows[0]['user_id'], len(rows), rows[0]['timestamp'], rows[-1]['timestamp'], now,
+                 zlib.compress(json.dumps(rows, ensure_ascii=False).encode('utf-8')))
+                for item_id, rows in archived.items()
+            ])
+            cursor.executemany(
+                "DELETE FROM item_history WHERE id = ?",
+                [(row['id'],) for rows in archived.values() for row in rows]
+            )
+
+        self._last_item_id = item_ids[-1]
+        stats.items_scanned = len(item_ids)
+        stats.archives_written = len(archived)
+        stats.rows_archived = sum(len(rows) for rows in archived.values())
+        stats.finished = len(item_ids) < policy.batch_size
+        if stats.finished:
+            self._last_item_id = 0
+        return stats
+
+    def run_cycle(self, pause: float = 0.05,
+                  stop: Optional[threading.Event] = None) -> RetentionStats:
+        """完整执行一轮 (处理所有物品), 批与批之间暂停 pause 秒, stop 被设置时提前结束"""
+        start = time.time()
+        total = RetentionStats()
+        while stop is None or not stop.is_set():
+            total.add(self.run_increment())
+            if total.finished:
+                break
+            time.sleep(pause)
+
+        if total.rows_archived:
+            logger.info(
+                f"[数据库维护] 历史归档: {total.rows_archived} 条 ({total.archives_written} 个物品), "
+                f"扫描 {total.items_scanned} 个物品, 耗时 {time.time() - start:.2f}s"
+            )
+        return total
+
+
+class TombstoneManager:
+    """软删除记录清理
+
+    delete_item(soft=True) 只把物品标记为已删除; 超过保留期 (grace_days, 以删除时间
+    updated_at 计) 后, 由本类连同历史、n-gram 与全文索引条目一起彻底删除。
+    """
+
+    def __init__(self, db: ItemDatabase, grace_days: int = 30, batch_size: int = 500):
+        self.db = db
+        self.grace_days = grace_days
+        self.batch_size = batch_size
+
+    def purge(self, stop: Optional[threading.Event] = None) -> int:
+        """分批清除超过保留期的软删除物品
+
+        Returns:
+            清除的物品数
+        """
+        cutoff = (datetime.now(timezone.utc) - timedelta(days=self.grace_days)).isoformat()
+        purged = 0
+        while stop is None or not stop.is_set():
+            with self.db._write_transaction() as cursor:
+                cursor.execute("""
+                    SELECT id FROM items
+                    WHERE is_deleted = 1 AND updated_at < ?
+                    ORDER BY updated_at
+                    LIMIT ?
+                """, (cutoff, self.batch_size))
+                item_ids = [row['id'] for row in cursor.fetchall()]
+                purged += self.db._purge_items(cursor, item_ids)
+            if len(item_ids) < self.batch_size:
+                break
+
+        if purged:
+            logger.info(f"[数据库维护] 清除软删除物品: {purged} 个 (保留期 {self.grace_days} 天)")
+        return purged
+
+    def merge_fts(self, pages: int = 500) -> None:
+        """增量合并 items_fts 的 b-tree 段 (每次最多处理约 pages 页, 开销可控)"""
+        with self.db._write_transaction() as cursor:
+            cursor.execute("INSERT INTO items_fts(items_fts, rank) VALUES ('merge', ?)", (pages,))
+
+    def optimize_fts(self) -> None:
+        """把 items_fts 合并为单个 b-tree 段 (开销与索引大小成正比, 适合手动执行)"""
+        with self.db._write_transaction() as cursor:
+            cursor.execute("INSERT INTO items_fts(items_fts) VALUES ('optimize')")
+
+
+@dataclass
+class MaintenanceStep:
+    """一个维护步骤的执行结果"""
+    name: str
+    result: Any
+    seconds: float
+
+
+class MaintenanceScheduler:
+    """数据库维护调度器
+
+    每轮依次执行: 历史归档 -> 清除软删除物品 -> items_fts merge -> 回收空闲页,
+    后台线程按 interval_seconds 间隔循环执行。分片模式 (ShardedItemDatabase) 下
+    逐个分片执行, 结果合并统计; 先用只读短连接检查分片, 跳过上次维护后没有写入、
+    也没有到期工作的分片, 不必每轮打开所有分片。
+    """
+
+    def __init__(self, db: Union[ItemDatabase, ShardedItemDatabase],
+                 retention_policy: Optional[HistoryRetentionPolicy] = None,
+                 tombstone_grace_days: int = 30,
+                 interval_seconds: float = 3600,
+                 vacuum_pages: int = 1000,
+                 fts_merge_pages: int = 500):
+        self.db = db
+        self.retention_policy = retention_policy or HistoryRetentionPolicy()
+        self.tombstone_grace_days = tombstone_grace_days
+        self.interval_seconds = interval_seconds
+        self.vacuum_pages = vacuum_pages
+        self.fts_merge_pages = fts_merge_pages
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._shard_marks: Dict[Path, Tuple] = {}  # {分片路径: 上次维护后的写入标记}
+
+    @classmethod
+    def from_config(cls, db: Union[ItemDatabase, ShardedItemDatabase]) -> "MaintenanceScheduler":
+        """使用全局配置创建"""
+        from config import config
+        return cls(
+            db,
+            retention_policy=HistoryRetentionPolicy.from_config(),
+            tombstone_grace_days=config.TOMBSTONE_GRACE_DAYS,
+            interval_seconds=config.MAINTENANCE_INTERVAL_SECONDS,
+            vacuum_pages=config.VACUUM_PAGES_PER_RUN,
+        )
+
+    def _databases(self, changed_only: bool = False) -> Iterator[ItemDatabase]:
+        """依次产出需要维护的数据库
+
+        分片模式下逐个借用分片 (不计为最近使用, 不挤占活跃用户的分片);
+        changed_only 时 (完整一轮维护) 跳过不需要维护的分片 (见 _shard_pending),
+        并在调用方处理完一个分片后记录其写入标记。
+        """
+        if isinstance(self.db, ItemDatabase):
+            yield self.db
+            return
+        for path in self.db.shard_paths():
+            if self._stop.is_set():
+                return
+            if changed_only and not self._shard_pending(path):
+                continue
+            with self.db.lease_path(path, recent=False) as shard:
+                yield shard
+            if changed_only and not self._stop.is_set():
+                self._mark_shard(path)
+
+    @staticmethod
+    def _connect_shard(path: Path) -> sqlite3.Connection:
+        """打开分片的只读短连接 (不经过分片池, 不执行迁移, 不建只读连接池)"""
+        return sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=30.0)
+
+    @staticmethod
+    def _write_mark(conn: sqlite3.Connection) -> Tuple:
+        """分片的写入标记: 新增/修改/删除物品与新增历史都会改变它 (均走索引, 开销固定)"""
+        return conn.execute("""
+            SELECT (SELECT MAX(id) FROM items),
+                   (SELECT MAX(updated_at) FROM items),
+                   (SELECT MAX(id) FROM item_history)
+        """).fetchone()
+
+    def _mark_shard(self, path: Path) -> None:
+        """记录维护完成后分片的写入标记"""
+        try:
+            conn = self._connect_shard(path)
+        except sqlite3.Error:
+            return
+        try:
+            self._shard_marks[path] = self._write_mark(conn)
+        except sqlite3.Error:
+            self._shard_marks.pop(path, None)
+        finally:
+            conn.close()
+
+    def _has_due_work(self, conn: sqlite3.Connection) -> bool:
+        """是否有随时间到期的工作: 超过保留期的软删除、超过归档期的历史、增量模式下的空闲页"""
+        now = datetime.now(timezone.utc)
+        tombstone_cutoff = (now - timedelta(days=self.tombstone_grace_days)).isoformat()
+        if conn.execute("SELECT 1 FROM items WHERE is_deleted = 1 AND updated_at < ? LIMIT 1",
+                        (tombstone_cutoff,)).fetchone():
+            return True
+
+        if self.retention_policy.archive_after_days > 0:
+            # 每个物品最新的一条历史不归档
+            history_cutoff = (now - timedelta(days=self.retention_policy.archive_after_days)).isoformat()
+            if conn.execute("""
+                SELECT 1 FROM item_history h
+                WHERE h.timestamp < ?
+                AND h.id <> (SELECT id FROM item_history
+                             WHERE item_id = h.item_id
+                             ORDER BY timestamp DESC, id DESC LIMIT 1)
+                LIMIT 1
+            """, (history_cutoff,)).fetchone():
+                return True
+
+        return (conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+                and conn.execute("PRAGMA freelist_count").fetchone()[0] > 0)
+
+    def _shard_pending(self, path: Path) -> bool:
+        """分片是否需要维护
+
+        上次维护后有写入, 或有随时间到期的工作时需要维护; 无法检查时按需要维护处理。
+        """
+        try:
+            conn = self._connect_shard(path)
+        except sqlite3.Error:
+            return True
+        try:
+            if self._shard_marks.get(path) != self._write_mark(conn):
+                return True
+            return self._has_due_work(conn)
+        except sqlite3.Error as e:
+            logger.warning(f"[数据库维护] ⚠️  检查分片失败 ({path.name}): {e}")
+            return True
+        finally:
+            conn.close()
+
+    def vacuum(self, db: Optional[ItemDatabase] = None) -> int:
+        """回收空闲页
+
+        只处理增量 auto_vacuum 模式的数据库, 每次最多回收 vacuum_pages 页;
+        旧数据库 (非增量模式) 跳过, 需手动执行一次 convert_to_incremental()
+        (scripts/db_maintenance.py vacuum-convert)。
+
+        Args:
+            db: 只处理该数据库, 默认处理全部 (分片模式下为所有分片)
+
+        Returns:
+            回收的页数
+        """
+        if db is None:
+            return sum(self.vacuum(target) for target in self._databases())
+
+        conn = db.conn
+        with db._lock:
+            freelist = conn.execute("PRAGMA freelist_count").fetchone()[0]
+            if freelist == 0:
+                return 0
+
+            if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:  # 2 = INCREMENTAL
+                logger.info(f"[数据库维护] 非增量 auto_vacuum, 跳过空闲页回收 ({db.db_path.name}, "
+                            f"空闲 {freelist} 页, 可手动执行 db_maintenance.py vacuum-convert)")
+                return 0
+
+            conn.execute(f"PRAGMA incremental_vacuum({int(self.vacuum_pages)})").fetchall()
+            conn.execute("PRAGMA wal_checkpoint(PASSIVE)").fetchall()
+            freed = freelist - conn.execute("PRAGMA freelist_count").fetchone()[0]
+
+        logger.info(f"[数据库维护] 回收空闲页: {freed} 页 ({db.db_path.name})")
+        return freed
+
+    def convert_to_incremental(self, db: Optional[ItemDatabase] = None) -> int:
+        """把旧数据库切换到增量 auto_vacuum 模式 (手动维护使用)
+
+        需要执行一次完整 VACUUM, 期间重写整个数据库文件并阻塞写入, 不在后台线程中执行。
+
+        Args:
+            db: 只处理该数据库, 默认处理全部 (分片模式下为所有分片)
+
+        Returns:
+            切换的数据库个数
+        """
+        if db is None:
+            return sum(self.convert_to_incremental(target) for target in self._databases())
+
+        with db._lock:
+            if db.conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+                return 0
+            logger.info(f"[数据库维护] 切换到增量 auto_vacuum (执行完整 VACUUM): {db.db_path.name}")
+            db.conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            db.conn.execute("VACUUM")
+        return 1
+
+    def optimize_fts(self) -> None:
+        """对所有数据库执行 items_fts optimize (手动维护使用)"""
+        for db in self._databases():
+            TombstoneManager(db).optimize_fts()
+
+    def steps(self, db: ItemDatabase) -> Dict[str, Callable[[], Any]]:
+        """一个数据库上的维护步骤 (按执行顺序)"""
+        tombstones = TombstoneManager(db, grace_days=self.tombstone_grace_days)
+        return {
+            'history_retention': lambda: HistoryRetentionEngine(db, self.retention_policy).run_cycle(stop=self._stop),
+            'tombstone_purge': lambda: tombstones.purge(stop=self._stop),
+            'fts_merge': lambda: tombstones.merge_fts(self.fts_merge_pages),
+            'vacuum': lambda: self.vacuum(db),
+        }
+
+    def run_once(self, only: Optional[List[str]] = None) -> List[MaintenanceStep]:
+        """执行一轮维护
+
+        Args:
+            only: 只执行指定的步骤 (见 steps()), 默认全部
+
+        Returns:
+            每个步骤的结果与耗时 (分片模式下为所有分片的合计)
+        """
+        totals: Dict[str, MaintenanceStep] = {}
+        for db in self._databases(changed_only=only is None):
+            for name, step in self.steps(db).items():
+                if only is not None and name not in only:
+                    continue
+                start = time.perf_counter()
+                result = step()
+                seconds = time.perf_counter() - start
+
+                total = totals.get(name)
+                if total is None:
+                    totals[name] = MaintenanceStep(name, result, seconds)
+                    continue
+                total.seconds += seconds
+                if isinstance(total.result, RetentionStats):
+                    total.result.add(result)
+                elif isinstance(total.result, int):
+                    total.result += result
+        return list(totals.values())
+
+    def _loop(self) -> None:
+        """后台维护循环 (单个步骤失败不影响后续步骤)"""
+        while not self._stop.is_set():
+            try:
+                for db in self._databases(changed_only=True):
+                    for name, step in self.steps(db).items():
+                        if self._stop.is_set():
+                            break
+                        try:
+                            step()
+                        except Exception as e:
+                            logger.error(f"[数据库维护] {name} 执行失败 ({db.db_path.name}): {e}")
+            except Exception as e:
+                logger.error(f"[数据库维护] 执行失败: {e}")
+            self._stop.wait(self.interval_seconds)
+
+    def start(self) -> None:
+        """启动后台维护线程"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="item-maintenance", daemon=True)
+        self._thread.start()
+        policy = self.retention_policy
+        logger.info(
+            f"[数据库维护] 后台任务已启动: 保留最近 {policy.keep_last_moves} 次移动, "
+            f"归档 {policy.archive_after_days} 天前的历史, "
+            f"软删除保留 {self.tombstone_grace_days} 天, 间隔 {self.interval_seconds}s"
+        )
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """停止后台维护线程 (当前批次完成后退出)"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+
+# 全局实例
+_scheduler: Optional[MaintenanceScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_maintenance_scheduler() -> MaintenanceScheduler:
+    """获取全局维护调度器 (使用全局数据库和配置)"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = MaintenanceScheduler.from_config(get_database())
+    return _scheduler
@@ -0,0 +1,141 @@
+"""物品名称规范化模块
+
+集中管理物品名称的规范化、别名和关键词提取规则:
+- 正则、别名映射、停用词在导入时一次性编译
+- normalize / aliases / keywords / ngrams 使用 LRU 缓存, 同一请求内重复调用不再重复计算
+
+返回值是不可变的 str / tuple / frozenset, 可以安全地在调用方之间共享缓存结果。
+"""
+import re
+from functools import lru_cache
+from typing import Dict, FrozenSet, Tuple
+
+# 规范化时去除的标点
+_PUNCTUATION_RE = re.compile(r'[，。！？、；："（）《》【】]')
+_WHITESPACE_RE = re.compile(r'\s+')
+
+# 常见简称映射: 名称中包含 key 时追加对应别名
+ALIAS_MAP: Dict[str, Tuple[str, ...]] = {
+    "笔记本电脑": ("电脑", "笔记本", "laptop"),
+    "手机": ("电话", "phone"),
+    "钥匙": ("key",),
+    "护照": ("passport",),
+    "身份证": ("id", "身份证件"),
+    "充电器": ("充电线", "charger"),
+    "耳机": ("headphone", "earphone"),
+    "钱包": ("wallet",),
+}
+
+# 关键词提取时移除的停用词 (助词、介词等)
+STOPWORDS = frozenset({
+    '的', '了', '在', '是', '我', '有', '和', '就', '不', '人', '都', '一', '个',
+    '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看',
+})
+
+# 一次扫描替换所有停用词 (长词优先, "没有" 不会被拆成 "没" + "有")
+_STOPWORD_RE = re.compile('|'.join(
+    re.escape(word) for word in sorted(STOPWORDS, key=len, reverse=True)
+))
+
+_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalize(item: str) -> str:
+    """
+    规范化物品名称
+
+    规则:
+    - 转小写
+    - 去除多余空格
+    - 去除常见标点符号
+    """
+    item = _PUNCTUATION_RE.sub('', item.lower().strip())
+    return _WHITESPACE_RE.sub(' ', item)
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def aliases(item: str) -> Tuple[str, ...]:
+    """
+    从物品名称提取可能的别名 (包含原名称本身, 已去重)
+
+    例如: "笔记本电脑" -> ("笔记本电脑", "电脑", "笔记本", "laptop")
+    """
+    normalized = normalize(item)
+    result = [item]
+    for key, values in ALIAS_MAP.items():
+        if key in normalized:
+            result.extend(values)
+    return tuple(dict.fromkeys(result))
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def normalized_aliases(item: str) -> Tuple[str, ...]:
+    """规范化后的别名 (已去重)"""
+    return tuple(dict.fromkeys(normalize(alias) for alias in aliases(item)))
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def keywords(text: str) -> Tuple[str, ...]:
+    """
+    从文本中提取关键词用于模糊搜索
+
+    策略:
+    1. 移除常见的助词、介词、量词
+    2. 提取2-4个字的词组
+    3. 保留单个汉字(长度>=2时)
+
+    例如: "摩托车钥匙" -> ("摩托车钥匙", "摩托车", "钥匙", ...)
+         "摩托车的钥匙" -> ("摩托车的钥匙", "摩托车", "钥匙", ...)
+
+    Returns:
+        关键词元组, 按长度倒序 (优先使用长关键词), 同长度按字典序
+    """
+    normalized = normalize(text)
+    found = {normalized}  # 保留完整文本
+
+    for part in _STOPWORD_RE.sub(' ', normalized).split():
+        if len(part) < 2:  # 至少2个字符
+            continue
+        found.add(part)
+
+        # 如果是长词,提取子串(2-4字)
+        if len(part) > 4:
+            for i in range(len(part) - 1):
+                for length in (2, 3, 4):
+                    if i + length <= len(part):
+                        found.add(part[i:i + length])
+
+    return tuple(sorted(found, key=lambda word: (-len(word), word)))
+
+
+@lru_cache(maxsize=_CACHE_SIZE)
+def ngrams(text: str) -> FrozenSet[str]:
+    """
+    提取文本的 bigram / trigram, 用于 item_ngrams 模糊匹配索引
+
+    跳过包含空白的 n-gram (英文单词之间的空格不参与匹配)。
+
+    例如: "摩托车钥匙" -> {"摩托", "托车", "车钥", "钥匙", "摩托车", "托车钥", "车钥匙"}
+    """
+    grams = set()
+    for size in (2, 3):
+        for i in range(len(text) - size + 1):
+            gram = text[i:i + size]
+            if not any(ch.isspace() for ch in gram):
+                grams.add(gram)
+    return frozenset(grams)
+
+
+def cache_info() -> Dict[str, Dict[str, int]]:
+    """各缓存的命中统计"""
+    return {
+        func.__name__: func.cache_info()._asdict()
+        for func in (normalize, aliases, normalized_aliases, keywords, ngrams)
+    }
+
+
+def clear_caches() -> None:
+    """清空所有缓存 (修改 ALIAS_MAP / STOPWORDS 后调用)"""
+    for func in (normalize, aliases, normalized_aliases, keywords, ngrams):
+        func.cache_clear()
@@ -8,11 +8,21 @@
 
 当前支持的路由：
 - calendar_agent: 日历提醒相关
+
+所有关键词在类加载时编译为一个 Aho–Corasick 自动机 (正则同样预编译),
+每条消息只扫描一次即可得到全部类别的匹配及其位置, 关键词再多也不增加扫描次数。
+修改关键词列表后调用 KeywordRouter.compile() 重新编译。
+
+按关键词路由到 calendar_agent 之前会先检查回退预判过滤器 (core.redirect_filter),
+历史上会被 CalendarAgent 回退的消息不再路由 (RoutingResult.filtered 为 True)。
 """
 
 import re
-from dataclasses import dataclass
-from typing import Optional
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+from core.aho_corasick import AhoCorasick, KeywordMatch
+from core.redirect_filter import get_redirect_filter
 
 
 @dataclass
@@ -22,6 +32,8 @@ class RoutingResult:
     target_agent: Optional[str]  # 目标 Agent 名称（如果匹配）
     original_message: str  # 原始消息（不修改）
     matched_keywords: list[str]  # 匹配到的关键词（用于调试）
+    matches: list[KeywordMatch] = field(default_factory=list)  # 所有匹配及位置 (value 为类别)
+    filtered: bool = False  # 命中关键词, 但被回退预判过滤器排除
 
 
 class KeywordRouter:
@@ -104,6 +116,62 @@ class KeywordRouter:
         r'\d+月\d+[日号號]',  # 12月25日、1月1号
     ]
 
+    # 4. 只有时间词时的排除关键词（扩充后的列表）
+    CALENDAR_EXCLUDE_KEYWORDS = [
+        # 天气相关
+        '天气', '温度', '气温', '冷', '热',
+        # 疑问词
+        '穿什么', '吃什么', '做什么', '怎么样', '如何', '怎样',
+        '什么', '哪里', '哪儿', '哪个', '哪些', '谁', '为什么',
+        # 活动动词
+        '去', '玩', '看', '逛', '玩儿', '发生', '干', '搞',
+        # 生活场景
+        '电影', '游戏', '节目', '活动', '餐厅', '地方', '好玩',
+        # 问候语相关（防漏网之鱼）
+        '好', '您好', '你好', 'hi', 'hello',
+    ]
+
+    # 问候语模式：早上好、晚上好、上午好等
+    GREETING_PATTERN = r'^(早上|上午|下午|晚上|中午|今天|明天|晚安)好'
+
+    # 关键词类别 (用于 matched_keywords 前缀和 RoutingResult.matches)
+    CATEGORY_ACTION = '动作'
+    CATEGORY_TIME = '时间'
+    CATEGORY_EXCLUDE = '排除'
+    CATEGORY_TIME_POINT = '时间点'
+
+    # 由 compile() 生成
+    _automaton: AhoCorasick
+    _keyword_order: Dict[Tuple[str, str], int]
+    _greeting_re: re.Pattern
+    _tag_res: List[Tuple[str, re.Pattern]]
+    _time_point_res: List[Tuple[str, re.Pattern]]
+
+    @classmethod
+    def compile(cls) -> None:
+        """编译关键词自动机和正则 (类加载时自动执行一次)"""
+        keywords = [(keyword, cls.CATEGORY_ACTION) for keyword in cls.CALENDAR_ACTION_KEYWORDS]
+        keywords += [(keyword, cls.CATEGORY_TIME) for keyword in cls.CALENDAR_TIME_EXPRESSIONS]
+        keywords += [(keyword, cls.CATEGORY_EXCLUDE) for keyword in cls.CALENDAR_EXCLUDE_KEYWORDS]
+
+        cls._automaton = AhoCorasick(keywords)
+        # matched_keywords 按关键词在列表中的声明顺序输出
+        cls._keyword_order = {(category, keyword): i for i, (keyword, category) in enumerate(keywords)}
+        cls._greeting_re = re.compile(cls.GREETING_PATTERN)
+        cls._tag_res = [(pattern, re.compile(pattern)) for pattern in cls.CALENDAR_TAGS]
+        cls._time_point_res = [(pattern, re.compile(pattern)) for pattern in cls.CALENDAR_TIME_PATTERNS]
+
+    @classmethod
+    def scan(cls, message: str) -> List[KeywordMatch]:
+        """一次扫描返回消息中所有关键词及时间点的匹配 (按位置排序)"""
+        matches = list(cls._automaton.find_all(message))
+        for pattern, regex in cls._time_point_res:
+            found = regex.search(message)
+            if found:
+                matches.append(KeywordMatch(found.start(), found.end(), pattern, cls.CATEGORY_TIME_POINT))
+        matches.sort(key=lambda m: (m.start, m.end))
+        return matches
+
     @classmethod
     def match(cls, message: str) -> RoutingResult:
         """匹配消息并返回路由结果
@@ -114,12 +182,8 @@ class KeywordRouter:
         Returns:
             RoutingResult: 路由结果
         """
-        matched_keywords = []
-
         # 0. 排除问候语（最高优先级）
-        # 问候语模式：早上好、晚上好、上午好等
-        GREETING_PATTERN = r'^(早上|上午|下午|晚上|中午|今天|明天|晚安)好'
-        if re.match(GREETING_PATTERN, message):
+        if cls._greeting_re.match(message):
             # 明确的问候语，不路由
             return RoutingResult(
                 matched=False,
@@ -129,97 +193,95 @@ class KeywordRouter:
             )
 
         # 1. 检查显式标记（最高优先级）
-        for tag_pattern in cls.CALENDAR_TAGS:
-            if re.search(tag_pattern, message):
-                matched_keywords.append(f'标记:{tag_pattern}')
+        for tag_pattern, tag_re in cls._tag_res:
+            found = tag_re.search(message)
+            if found:
                 return RoutingResult(
                     matched=True,
                     target_agent='calendar_agent',
                     original_message=message,
-                    matched_keywords=matched_keywords
+                    matched_keywords=[f'标记:{tag_pattern}'],
+                    matches=[KeywordMatch(found.start(), found.end(), found.group(), '标记')]
                 )
 
-        # 2. 检查动作关键词
-        action_matched = False
-        for keyword in cls.CALENDAR_ACTION_KEYWORDS:
-            if keyword in message:
-                matched_keywords.append(f'动作:{keyword}')
-                action_matched = True
-
-        # 3. 检查时间表达式
-        time_matched = False
-        for time_expr in cls.CALENDAR_TIME_EXPRESSIONS:
-            if time_expr in message:
-                matched_keywords.append(f'时间:{time_expr}')
-                time_matched = True
-
-        # 4. 检查时间点表达式（正则）
-        for time_pattern in cls.CALENDAR_TIME_PATTERNS:
-            if re.search(time_pattern, message):
-                matched_keywords.append(f'时间点:{time_pattern}')
-                time_matched = True
+        # 2-4. 一次扫描得到动作关键词、时间表达式、排除关键词和时间点
+        matches = cls.scan(message)
+        found_keywords = {(m.value, m.keyword) for m in matches if m.value != cls.CATEGORY_TIME_POINT}
+        categories = {m.value for m in matches}
+
+        matched_keywords = [
+            f'{category}:{keyword}'
+            for category, keyword in sorted(found_keywords, key=cls._keyword_order.__getitem__)
+            if category != cls.CATEGORY_EXCLUDE
+        ]
+        matched_keywords += [
+            f'{cls.CATEGORY_TIME_POINT}:{pattern}'
+            for pattern, _ in cls._time_point_res
+            if any(m.keyword == pattern for m in matches)
+        ]
+
+        action_matched = cls.CATEGORY_ACTION in categories
+        has_time_point = cls.CATEGORY_TIME_POINT in categories
+        time_matched = cls.CATEGORY_TIME in categories or has_time_point
 
         # 5. 路由决策
         # 优先级：动作关键词 > 动作+时间组合 > 单独时间词（需谨慎）
         if action_matched:
             # 有动作关键词，直接路由
-            return RoutingResult(
-                matched=True,
-                target_agent='calendar_agent',
-                original_message=message,
-                matched_keywords=matched_keywords
-            )
+            return cls._route_calendar(message, matched_keywords, matches)
 
         # 只有时间词，没有动作词 - 需要更谨慎
-        # 排除一些明显不是日历的场景（扩充后的列表）
-        non_calendar_patterns = [
-            # 天气相关
-            '天气', '温度', '气温', '冷', '热',
-            # 疑问词
-            '穿什么', '吃什么', '做什么', '怎么样', '如何', '怎样',
-            '什么', '哪里', '哪儿', '哪个', '哪些', '谁', '为什么',
-            # 活动动词
-            '去', '玩', '看', '逛', '玩儿', '发生', '干', '搞',
-            # 生活场景
-            '电影', '游戏', '节目', '活动', '餐厅', '地方', '好玩',
-            # 问候语相关（防漏网之鱼）
-            '好', '您好', '你好', 'hi', 'hello',
-        ]
-
         if time_matched:
             # 检查是否包含排除关键词
-            has_non_calendar = any(pattern in message for pattern in non_calendar_patterns)
-            if has_non_calendar:
+            if cls.CATEGORY_EXCLUDE in categories:
                 # 包含非日历关键词，不路由
                 return RoutingResult(
                     matched=False,
                     target_agent=None,
                     original_message=message,
-                    matched_keywords=[]
+                    matched_keywords=[],
+                    matches=matches
                 )
 
             # 单独时间词需要更严格的检查
             # 必须满足以下条件之一：
             # 1. 消息长度足够（>= 5 字，说明有上下文）
             # 2. 包含具体时间点（如 "8点"、"10:30"）
-            has_time_point = any(re.search(pattern, message) for pattern in cls.CALENDAR_TIME_PATTERNS)
-            message_length = len(message)
-
-            if has_time_point or message_length >= 5:
+            if has_time_point or len(message) >= 5:
                 # 有时间点或有足够上下文，可以路由
-                return RoutingResult(
-                    matched=True,
-                    target_agent='calendar_agent',
-                    original_message=message,
-                    matched_keywords=matched_keywords
-                )
+                return cls._route_calendar(message, matched_keywords, matches)
 
         # 没有匹配
         return RoutingResult(
             matched=False,
             target_agent=None,
             original_message=message,
-            matched_keywords=[]
+            matched_keywords=[],
+            matches=matches
+        )
+
+    @classmethod
+    def _route_calendar(cls, message: str, matched_keywords: List[str],
+                        matches: List[KeywordMatch]) -> RoutingResult:
+        """路由到 calendar_agent (历史上会被回退的消息除外)"""
+        redirect_filter = get_redirect_filter()
+        hit = redirect_filter.check(message) if redirect_filter else None
+        if hit:
+            return RoutingResult(
+                matched=False,
+                target_agent=None,
+                original_message=message,
+                matched_keywords=matched_keywords + [f'排除:历史回退({hit})'],
+                matches=matches,
+                filtered=True
+            )
+
+        return RoutingResult(
+            matched=True,
+            target_agent='calendar_agent',
+            original_message=message,
+            matched_keywords=matched_keywords,
+            matches=matches
         )
 
     @classmethod
@@ -262,5 +324,8 @@ class KeywordRouter:
         return results
 
 
+KeywordRouter.compile()
+
+
 # 导出
 __all__ = ['KeywordRouter', 'RoutingResult']
@@ -0,0 +1,193 @@
+"""LLM 客户端工厂 - 所有 Agent 和工具共享的模型实例与 HTTP 连接池
+
+每个 (base_url, model) 只维护一个保持长连接的 httpx 连接池 (同步和异步各一个),
+所有 ChatOpenAI / OpenAIEmbeddings 实例都通过这里创建并复用这些连接池,
+避免每个 Agent (甚至每次调用) 各自建立 HTTP 客户端和 TLS 连接。
+
+连接池大小、超时和重试次数见 config.LLM_* 配置。
+
+示例:
+    from core.llm_factory import get_chat_model
+
+    model = get_chat_model(temperature=0)  # 默认使用 config.AGENT_MODEL
+    router_model = get_chat_model(config.ROUTER_MODEL, temperature=0)
+"""
+
+import asyncio
+import threading
+from typing import Dict, Optional, Tuple
+
+import httpx
+from langchain_openai import ChatOpenAI, OpenAIEmbeddings
+
+from config import config
+from core.logger import logger
+
+PoolKey = Tuple[str, str]  # (base_url, model)
+
+_clients: Dict[PoolKey, httpx.Client] = {}
+_async_clients: Dict[PoolKey, httpx.AsyncClient] = {}
+_chat_models: Dict[tuple, ChatOpenAI] = {}
+_embeddings: Dict[tuple, OpenAIEmbeddings] = {}
+_lock = threading.Lock()
+
+
+def _limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=config.LLM_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=config.LLM_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=config.LLM_KEEPALIVE_SECONDS,
+    )
+
+
+def _timeout() -> httpx.Timeout:
+    return httpx.Timeout(config.LLM_TIMEOUT_SECONDS, connect=config.LLM_CONNECT_TIMEOUT_SECONDS)
+
+
+def get_http_client(base_url: str, model: str) -> httpx.Client:
+    """获取 (base_url, model) 对应的同步连接池"""
+    key = (base_url, model)
+    client = _clients.get(key)
+    if client is None:
+        with _lock:
+            client = _clients.get(key)
+            if client is None:
+                # transport 的 retries 只重试建立连接失败; 请求级重试由 OpenAI SDK 的 max_retries 负责
+                client = httpx.Client(
+                    timeout=_timeout(),
+                    transport=httpx.HTTPTransport(limits=_limits(), retries=config.LLM_MAX_RETRIES),
+                )
+                _clients[key] = client
+                logger.debug(f"[LLM] 创建连接池: {model} @ {base_url}")
+    return client
+
+
+def get_async_http_client(base_url: str, model: str) -> httpx.AsyncClient:
+    """获取 (base_url, model) 对应的异步连接池"""
+    key = (base_url, model)
+    client = _async_clients.get(key)
+    if client is None:
+        with _lock:
+            client = _async_clients.get(key)
+            if client is None:
+                client = httpx.AsyncClient(
+                    timeout=_timeout(),
+                    transport=httpx.AsyncHTTPTransport(limits=_limits(), retries=config.LLM_MAX_RETRIES),
+                )
+                _async_clients[key] = client
+    return client
+
+
+def get_chat_model(
+    model: Optional[str] = None,
+    temperature: float = 0,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None
+) -> ChatOpenAI:
+    """获取共享的聊天模型实例 (相同参数返回同一个实例)
+
+    Args:
+        model: 模型名称, 默认 config.AGENT_MODEL
+        temperature: 采样温度
+        base_url: API 地址, 默认 config.OPENAI_API_BASE
+        api_key: API Key, 默认 config.OPENAI_API_KEY
+    """
+    model = model or config.AGENT_MODEL
+    base_url = base_url or config.OPENAI_API_BASE
+    api_key = api_key or config.OPENAI_API_KEY
+
+    key = (base_url, api_key, model, temperature)
+    instance = _chat_models.get(key)
+    if instance is None:
+        http_client = get_http_client(base_url, model)
+        http_async_client = get_async_http_client(base_url, model)
+        with _lock:
+            instance = _chat_models.get(key)
+            if instance is None:
+                instance = ChatOpenAI(
+                    model=model,
+                    base_url=base_url,
+                    api_key=api_key,
+                    temperature=temperature,
+                    timeout=config.LLM_TIMEOUT_SECONDS,
+                    max_retries=config.LLM_MAX_RETRIES,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                )
+                _chat_models[key] = instance
+    return instance
+
+
+def get_embeddings(
+    model: Optional[str] = None,
+    base_url: Optional[str] = None,
+    api_key: Optional[str] = None
+) -> OpenAIEmbeddings:
+    """获取共享的向量模型实例
+
+    Args:
+        model: 模型名称, 默认 config.EMBEDDING_MODEL
+        base_url: API 地址, 默认 config.OPENAI_API_BASE
+        api_key: API Key, 默认 config.OPENAI_API_KEY
+    """
+    model = model or config.EMBEDDING_MODEL
+    base_url = base_url or config.OPENAI_API_BASE
+    api_key = api_key or config.OPENAI_API_KEY
+
+    key = (base_url, api_key, model)
+    instance = _embeddings.get(key)
+    if instance is None:
+        http_client = get_http_client(base_url, model)
+        http_async_client = get_async_http_client(base_url, model)
+        with _lock:
+            instance = _embeddings.get(key)
+            if instance is None:
+                instance = OpenAIEmbeddings(
+                    model=model,
+                    base_url=base_url,
+                    api_key=api_key,
+                    timeout=config.LLM_TIMEOUT_SECONDS,
+                    max_retries=config.LLM_MAX_RETRIES,
+                    http_client=http_client,
+                    http_async_client=http_async_client,
+                )
+                _embeddings[key] = instance
+    return instance
+
+
+async def _aclose_async_clients(clients) -> None:
+    for client in clients:
+        try:
+            await client.aclose()
+        except Exception as e:  # 连接所属的事件循环可能已关闭
+            logger.debug(f"[LLM] 关闭异步连接池失败: {e}")
+
+
+def close_http_clients() -> None:
+    """关闭所有同步和异步连接池并清空缓存的模型实例 (主要用于测试和进程退出)"""
+    with _lock:
+        clients, async_clients = list(_clients.values()), list(_async_clients.values())
+        _clients.clear()
+        _async_clients.clear()
+        _chat_models.clear()
+        _embeddings.clear()
+
+    for client in clients:
+        client.close()
+    if not async_clients:
+        return
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        asyncio.run(_aclose_async_clients(async_clients))
+        return
+    # 在事件循环中调用时, 在独立线程中运行关闭协程 (不能嵌套 asyncio.run)
+    closer = threading.Thread(target=asyncio.run, args=(_aclose_async_clients(async_clients),))
+    closer.start()
+    closer.join()
+
+
+__all__ = [
+    'get_chat_model', 'get_embeddings',
+    'get_http_client', 'get_async_http_client', 'close_http_clients',
+]
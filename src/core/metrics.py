@@ -0,0 +1,358 @@
+"""运行指标 - Prometheus 文本格式的计数器和直方图 (GET /metrics)
+
+记录请求延迟 (按路由阶段和最终 Agent)、LLM 调用次数和延迟 (按模型)、回退次数、
+物品查询延迟 (按 query_item 的匹配级别) 和嵌入调用; 抓取时再读取 Zep 写入积压、
+响应缓存命中和准入控制等已有的统计。
+
+热路径上的开销尽量小: 每个线程写自己的分片 (threading.local 中的 dict), 记录一次指标
+只是一次字典更新, 不加锁; 抓取时才把所有分片合并。已退出线程的分片在抓取时并入
+_retired, 保证计数单调递增 (Flask 开发服务器每个请求一个线程)。
+
+指标只在进程内汇总: ASGI 模式多个 worker (SERVER_WORKERS > 1) 时, 每次抓取只返回
+处理该请求的 worker 的数值, 计数器会在抓取之间跳变; 需要准确指标时使用单个 worker。
+
+示例:
+    REQUEST_SECONDS.observe(1.2, "tag", "note_agent", "success")
+    REDIRECTS.inc("calendar_agent")
+
+    text = render_metrics()  # Prometheus 文本格式
+"""
+
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+from config import config
+from core.logger import logger
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 默认的延迟分桶 (秒)
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+# 本地 SQLite 查询的延迟分桶 (秒)
+DB_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+
+# 抓取时采集的一组样本: (指标名, 类型, 说明, [(标签, 值)])
+Family = Tuple[str, str, str, List[Tuple[Dict[str, str], float]]]
+
+
+class _Shard:
+    """一个线程的指标值 {(指标名, 标签值): 计数 / 直方图分桶}"""
+
+    __slots__ = ('thread', 'values')
+
+    def __init__(self):
+        self.thread = threading.current_thread()
+        self.values: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+
+
+class MetricsRegistry:
+    """指标注册表: 每个线程写自己的分片, 抓取时合并"""
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self._metrics: Dict[str, "_Metric"] = {}
+        self._collectors: List[Callable[[], Iterable[Family]]] = []
+        self._local = threading.local()
+        self._shards: List[_Shard] = []
+        self._retired: Dict[Tuple[str, Tuple[str, ...]], Any] = {}
+        self._lock = threading.Lock()
+
+    # ----- 注册 -----
+
+    def counter(self, name: str, help: str, labelnames: Tuple[str, ...] = ()) -> "Counter":
+        return self._register(Counter(self, name, help, labelnames))
+
+    def histogram(self, name: str, help: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> "Histogram":
+        return self._register(Histogram(self, name, help, labelnames, buckets))
+
+    def _register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"指标已注册: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def register_collector(self, collector: Callable[[], Iterable[Family]]) -> None:
+        """注册抓取时调用的采集函数 (用于读取其他模块已有的统计)"""
+        self._collectors.append(collector)
+
+    # ----- 记录 -----
+
+    def _values(self) -> Dict[Tuple[str, Tuple[str, ...]], Any]:
+        """当前线程的分片 (首次使用时登记, 只有这一步加锁)"""
+        shard = getattr(self._local, 'shard', None)
+        if shard is None:
+            shard = _Shard()
+            self._local.shard = shard
+            with self._lock:
+                self._shards.append(shard)
+        return shard.values
+
+    # ----- 抓取 -----
+
+    def snapshot(self) -> Dict[Tuple[str, Tuple[str, ...]], Any]:
+        """合并所有线程的分片 (已退出线程的分片并入 _retired)"""
+        with self._lock:
+            alive = []
+            for shard in self._shards:
+                if shard.thread.is_alive():
+                    alive.append(shard)
+                else:
+                    _merge(self._retired, shard.values.items())
+            self._shards = alive
+            merged = {key: list(value) if isinstance(value, list) else value
+                      for key, value in self._retired.items()}
+            for shard in alive:
+                # list(dict.items()) 在 C 层完成, 期间不会释放 GIL, 与写入线程之间无需加锁
+                _merge(merged, list(shard.values.items()))
+        return merged
+
+    def render(self) -> str:
+        """Prometheus 文本格式 (version 0.0.4)"""
+        values = self.snapshot()
+        by_metric: Dict[str, List[Tuple[Tuple[str, ...], Any]]] = {}
+        for (name, labels), value in values.items():
+            by_metric.setdefault(name, []).append((labels, value))
+
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render(sorted(by_metric.get(metric.name, []))))
+
+        for collector in self._collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                logger.warning(f"[运行指标] 采集失败: {e}")
+                continue
+            for name, kind, help, samples in families:
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+        return "\n".join(lines) + "\n"
+
+
+def _merge(target: Dict, items: Iterable) -> None:
+    for key, value in items:
+        if isinstance(value, list):
+            current = target.get(key)
+            if current is None:
+                target[key] = list(value)
+            else:
+                for i, v in enumerate(value):
+                    current[i] += v
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ''
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Tuple[str, ...]):
+        self._registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = labelnames
+
+    def _labels(self, labelvalues: Tuple[str, ...], **extra: str) -> Dict[str, str]:
+        return {**dict(zip(self.labelnames, labelvalues)), **extra}
+
+    def render(self, samples) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labelvalues, value in samples:
+            lines.extend(self._render_sample(labelvalues, value))
+        return lines
+
+    def _render_sample(self, labelvalues, value) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, *labelvalues: str, amount: float = 1) -> None:
+        if not self._registry.enabled:
+            return
+        values = self._registry._values()
+        key = (self.name, labelvalues)
+        values[key] = values.get(key, 0) + amount
+
+    def _render_sample(self, labelvalues, value) -> List[str]:
+        return [f"{self.name}{_format_labels(self._labels(labelvalues))} {_format_value(value)}"]
+
+
+class Histogram(_Metric):
+    """延迟直方图 (_count 即调用次数)"""
+
+    kind = 'histogram'
+
+    def __init__(self, registry: MetricsRegistry, name: str, help: str, labelnames: Tuple[str, ...],
+                 buckets: Tuple[float, ...]):
+        super().__init__(registry, name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        if not self._registry.enabled:
+            return
+        values = self._registry._values()
+        key = (self.name, labelvalues)
+        # [各分桶的计数 (最后一个为超出所有上限的), 总和]
+        counts = values.get(key)
+        if counts is None:
+            counts = values[key] = [0] * (len(self.buckets) + 2)
+        counts[bisect_left(self.buckets, value)] += 1
+        counts[-1] += value
+
+    def _render_sample(self, labelvalues, counts) -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            labels = self._labels(labelvalues, le=_format_value(bound))
+            lines.append(f"{self.name}_bucket{_format_labels(labels)} {cumulative}")
+        labels = _format_labels(self._labels(labelvalues))
+        lines.append(f"{self.name}_sum{labels} {_format_value(round(counts[-1], 6))}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+# 全局注册表
+registry = MetricsRegistry(enabled=config.METRICS_ENABLED)
+
+REQUEST_SECONDS = registry.histogram(
+    "youyou_request_duration_seconds", "对话请求的处理耗时",
+    ("routing_stage", "final_agent", "status"))
+REDIRECTS = registry.counter(
+    "youyou_redirects_total", "Agent 判定消息不属于自己并请求回退的次数 (除以请求数即回退率)",
+    ("agent",))
+REDIRECTS_AVOIDED = registry.counter(
+    "youyou_redirects_avoided_total", "回退预判过滤器跳过 calendar_agent 的次数")
+LLM_SECONDS = registry.histogram(
+    "youyou_llm_duration_seconds", "LLM 调用耗时 (_count 即调用次数)", ("model", "status"))
+LLM_TOKENS = registry.counter(
+    "youyou_llm_tokens_total", "LLM 调用消耗的 token 数", ("model",))
+ITEM_QUERY_SECONDS = registry.histogram(
+    "youyou_item_query_duration_seconds", "物品查询 (query_item) 的 SQLite 耗时, 按命中的匹配级别",
+    ("match_type",), DB_BUCKETS)
+EMBEDDING_SECONDS = registry.histogram(
+    "youyou_embedding_duration_seconds", "文本嵌入调用耗时 (_count 即调用次数)", ("status",))
+
+
+def render_metrics() -> str:
+    """所有指标的 Prometheus 文本"""
+    return registry.render()
+
+
+# ----- LLM 调用 -----
+
+class _LLMMetricsHandler(BaseCallbackHandler):
+    """记录所有 LLM 调用的耗时和 token 数 (通过 register_configure_hook 自动加入每个回调管理器)"""
+
+    # 直接在调用线程中执行, 不经过回调线程池
+    run_inline = True
+
+    def __init__(self):
+        # run_id -> (开始时间, 模型); dict 的单次读写在 GIL 下是原子的
+        self._runs: Dict[UUID, Tuple[float, str]] = {}
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        model = (metadata or {}).get('ls_model_name') or (serialized or {}).get('name', 'llm')
+        self._runs[run_id] = (time.perf_counter(), model)
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, metadata=metadata)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is None:
+            return
+        start, model = run
+        LLM_SECONDS.observe(time.perf_counter() - start, model, "success")
+
+        usage = (response.llm_output or {}).get('token_usage') if response.llm_output else None
+        if not usage:
+            message = getattr(response.generations[0][0], 'message', None) if response.generations else None
+            usage = getattr(message, 'usage_metadata', None)
+        if usage and usage.get('total_tokens'):
+            LLM_TOKENS.inc(model, amount=usage['total_tokens'])
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        run = self._runs.pop(run_id, None)
+        if run is not None:
+            LLM_SECONDS.observe(time.perf_counter() - run[0], run[1], "error")
+
+
+_llm_metrics_handler: ContextVar[Optional[_LLMMetricsHandler]] = ContextVar(
+    "youyou_llm_metrics_handler", default=_LLMMetricsHandler() if registry.enabled else None
+)
+register_configure_hook(_llm_metrics_handler, inheritable=True)
+
+
+# ----- 抓取时读取的已有统计 -----
+
+def _collect_runtime() -> Iterable[Family]:
+    """Zep 写入积压、响应缓存和准入控制"""
+    from core.admission import get_admission_controller
+    from core.response_cache import get_response_cache
+    from core.session_history import get_session_manager
+
+    persist = get_session_manager(max_history_length=10, refresh_interval=0).persist_stats()
+    yield ("youyou_zep_persist_pending", "gauge", "等待写入 Zep 的会话历史条数", [({}, persist['pending'])])
+    yield ("youyou_zep_persist_dropped_total", "counter", "积压超过上限而丢弃的 Zep 写入次数",
+           [({}, persist['dropped'])])
+
+    cache = get_response_cache()
+    if cache is not None:
+        stats = cache.stats()
+        yield ("youyou_response_cache_lookups_total", "counter", "响应缓存查询次数",
+               [({'result': 'hit'}, stats['hits']), ({'result': 'miss'}, stats['misses'])])
+        yield ("youyou_response_cache_entries", "gauge", "响应缓存的条目数", [({}, stats['size'])])
+
+    controller = get_admission_controller()
+    if controller is not None:
+        agents = controller.stats()
+        yield ("youyou_admission_active", "gauge", "正在执行的 LLM 调用链数",
+               [({'agent': name}, s['active']) for name, s in agents.items()])
+        yield ("youyou_admission_queue_depth", "gauge", "排队等待的请求数",
+               [({'agent': name}, s['queue_depth']) for name, s in agents.items()])
+        yield ("youyou_admission_rejected_total", "counter", "被准入控制拒绝的请求数",
+               [({'agent': name, 'reason': reason}, s[f'rejected_{reason}'])
+                for name, s in agents.items() for reason in ('queue_full', 'timeout')])
+
+
+registry.register_collector(_collect_runtime)
+
+
+__all__ = [
+    'MetricsRegistry', 'Counter', 'Histogram', 'registry', 'render_metrics', 'CONTENT_TYPE',
+    'REQUEST_SECONDS', 'REDIRECTS', 'REDIRECTS_AVOIDED', 'LLM_SECONDS', 'LLM_TOKENS',
+    'ITEM_QUERY_SECONDS', 'EMBEDDING_SECONDS',
+]
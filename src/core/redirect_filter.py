@@ -0,0 +1,301 @@
+"""回退预判过滤器 - 跳过历史上会被 CalendarAgent 回退的消息
+
+KeywordRouter 把带时间词/动作词的消息直接交给 calendar_agent, 其中一部分
+(如 "明天穿什么"、"下午茶去哪喝") 会被 CalendarAgent 以 [REDIRECT:...] 回退,
+再由 Supervisor 重新路由, 一条消息要付出 2 ~ 4 次 LLM 调用。
+
+本模块从 interaction_logs 中挖掘这些回退记录, 生成一个负向模式集合:
+- 整句: 归一化后 (去空白标点、数字统一为 0) 曾经回退过的消息
+- 片段: 在至少 min_support 条回退消息中出现、且从未出现在日历成功处理的消息中的
+  字符 n-gram (如 "穿什么"、"哪喝")
+
+模式只保存哈希值 (blake2b 64 位), 文件小且不包含原始用户输入。
+KeywordRouter 在按关键词路由到 calendar_agent 之前先检查过滤器, 命中时
+不再调用 CalendarAgent, 直接交给后续路由 (物品快速路径 / 意图分类器 / Supervisor)。
+显式标记 (#提醒 等) 不受过滤器影响。
+
+生成和报告: python scripts/redirect_filter.py build | report
+"""
+
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from config import config
+from core.logger import logger
+
+# 过滤器文件格式版本
+FORMAT_VERSION = 1
+
+# 归一化时去掉的字符: 空白和标点
+_STRIP_RE = re.compile(r'[\s\W_]+', re.UNICODE)
+_DIGIT_RE = re.compile(r'\d+')
+
+# 命中类型
+MATCH_MESSAGE = '整句'
+MATCH_NGRAM = '片段'
+
+
+def normalize_message(message: str) -> str:
+    """归一化消息: 转小写, 去空白和标点, 连续数字统一为 0 ("明天8点" 与 "明天10点" 等价)"""
+    return _DIGIT_RE.sub('0', _STRIP_RE.sub('', message.lower()))
+
+
+def pattern_hash(text: str) -> str:
+    """模式的哈希值 (16 位十六进制)"""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def _ngrams(text: str, n: int) -> Set[str]:
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
+
+
+class RedirectFilter:
+    """回退预判过滤器 (构造后只读, 可在多线程间共享)"""
+
+    def __init__(
+        self,
+        message_hashes: Iterable[str],
+        ngram_hashes: Dict[int, Iterable[str]],
+        metadata: Optional[Dict[str, Any]] = None
+    ):
+        """
+        Args:
+            message_hashes: 整句模式的哈希
+            ngram_hashes: {n: 长度为 n 的片段模式哈希}
+            metadata: 生成信息 (版本、时间、样本数等)
+        """
+        self.message_hashes = set(message_hashes)
+        self.ngram_hashes = {int(n): set(hashes) for n, hashes in ngram_hashes.items() if hashes}
+        self.metadata = dict(metadata or {})
+
+    def __len__(self) -> int:
+        return len(self.message_hashes) + sum(len(hashes) for hashes in self.ngram_hashes.values())
+
+    @property
+    def version(self) -> str:
+        return self.metadata.get('version', 'unknown')
+
+    def check(self, message: str) -> Optional[str]:
+        """检查消息是否命中负向模式
+
+        Returns:
+            命中类型 (MATCH_MESSAGE / MATCH_NGRAM), 未命中返回 None
+        """
+        text = normalize_message(message)
+        if not text:
+            return None
+        if pattern_hash(text) in self.message_hashes:
+            return MATCH_MESSAGE
+        for n, hashes in self.ngram_hashes.items():
+            if any(pattern_hash(gram) in hashes for gram in _ngrams(text, n)):
+                return MATCH_NGRAM
+        return None
+
+    @classmethod
+    def build(
+        cls,
+        redirected: List[str],
+        accepted: List[str],
+        ngram_sizes: Iterable[int] = (2, 3, 4),
+        min_support: int = 3,
+        protected: Iterable[str] = ()
+    ) -> 'RedirectFilter':
+        """从回退和成功处理的消息生成过滤器
+
+        Args:
+            redirected: 被 calendar_agent 回退的消息
+            accepted: calendar_agent 成功处理 (未回退) 的消息
+            ngram_sizes: 片段长度
+            min_support: 片段至少出现在多少条不同的回退消息中
+            protected: 不能作为片段模式的词 (如日历关键词本身)
+        """
+        redirected_texts = {normalize_message(message) for message in redirected} - {''}
+        accepted_texts = {normalize_message(message) for message in accepted} - {''}
+        protected = {normalize_message(word) for word in protected}
+
+        # 整句: 回退过且从未被成功处理过
+        messages = redirected_texts - accepted_texts
+
+        # 片段: 回退消息中常见, 成功处理的消息中从未出现
+        ngrams: Dict[int, List[str]] = {}
+        for n in ngram_sizes:
+            support = Counter(gram for text in redirected_texts for gram in _ngrams(text, n))
+            seen_accepted = set().union(*(_ngrams(text, n) for text in accepted_texts))
+            ngrams[n] = sorted(
+                gram for gram, count in support.items()
+                if count >= min_support and gram not in seen_accepted and gram not in protected
+            )
+
+        now = datetime.now(timezone.utc)
+        metadata = {
+            'version': now.strftime('%Y%m%dT%H%M%SZ'),
+            'built_at': now.isoformat(),
+            'redirected': len(redirected_texts),
+            'accepted': len(accepted_texts),
+            'min_support': min_support,
+            'message_patterns': len(messages),
+            'ngram_patterns': {str(n): len(grams) for n, grams in ngrams.items()},
+        }
+        return cls(
+            (pattern_hash(text) for text in messages),
+            {n: [pattern_hash(gram) for gram in grams] for n, grams in ngrams.items()},
+            metadata
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'format': FORMAT_VERSION,
+            'metadata': self.metadata,
+            'messages': sorted(self.message_hashes),
+            'ngrams': {str(n): sorted(hashes) for n, hashes in sorted(self.ngram_hashes.items())},
+        }
+
+    def save(self, path: Path) -> None:
+        """保存过滤器 (先写临时文件再替换)"""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> 'RedirectFilter':
+        """加载过滤器
+
+        Raises:
+            ValueError: 文件格式版本不匹配
+        """
+        with open(path, encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('format') != FORMAT_VERSION:
+            raise ValueError(f"过滤器格式版本 {data.get('format')} 不受支持 (需要 {FORMAT_VERSION}), 请重新生成")
+        return cls(data['messages'], {int(n): hashes for n, hashes in data['ngrams'].items()}, data.get('metadata'))
+
+
+def load_calendar_outcomes(db_path: Path, since: Optional[str] = None) -> Dict[str, List[str]]:
+    """从交互日志读取 calendar_agent 的处理结果
+
+    被过滤器跳过、且 Supervisor 也没有交给 calendar_agent 的消息同样算作回退,
+    这样重新生成时不会丢掉已生效的模式; 如果 Supervisor 最终交给了
+    calendar_agent, 该消息算作成功处理, 对应模式会在重新生成时被去掉。
+
+    Returns:
+        redirected: 关键词路由到 calendar_agent 后被回退 (或被过滤) 的消息
+        accepted: 最终由 calendar_agent 成功处理的消息 (任意路由阶段)
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    try:
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(interaction_logs)")}
+        filtered = "OR (redirect_filtered = 1 AND final_agent != 'calendar_agent')" \
+            if 'redirect_filtered' in columns else ""
+        redirected = conn.execute(f"""
+            SELECT user_input FROM interaction_logs
+            WHERE ((routing_stage = 'keyword' AND target_agent = 'calendar_agent' AND redirect_occurred = 1)
+                   {filtered})
+              AND created_date >= ?
+        """, (since or '',)).fetchall()
+        accepted = conn.execute("""
+            SELECT user_input FROM interaction_logs
+            WHERE final_agent = 'calendar_agent' AND redirect_occurred = 0
+              AND status = 'success' AND created_date >= ?
+        """, (since or '',)).fetchall()
+    finally:
+        conn.close()
+    return {
+        'redirected': [row[0] for row in redirected],
+        'accepted': [row[0] for row in accepted],
+    }
+
+
+def redirect_savings_report(db_path: Path, since: Optional[str] = None) -> Dict[str, Any]:
+    """统计回退耗时和过滤器节省的耗时
+
+    节省的耗时按 "被过滤的请求数 × (回退请求平均耗时 - 被过滤请求平均耗时)" 估算。
+    """
+    conn = sqlite3.connect(f"file:{db_path}?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    try:
+        def stats(where: str) -> Dict[str, Any]:
+            row = conn.execute(f"""
+                SELECT COUNT(*) AS count, AVG(response_time_ms) AS avg_ms
+                FROM interaction_logs WHERE created_date >= :since AND {where}
+            """, {'since': since or ''}).fetchone()
+            return {'count': row['count'], 'avg_ms': round(row['avg_ms'], 1) if row['avg_ms'] is not None else None}
+
+        keyword_calendar = "routing_stage = 'keyword' AND target_agent = 'calendar_agent'"
+        # 旧日志库在 InteractionLogger 下次写入前还没有 redirect_filtered 列
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(interaction_logs)")}
+        report = {
+            'calendar_accepted': stats(f"{keyword_calendar} AND redirect_occurred = 0"),
+            'calendar_redirected': stats(f"{keyword_calendar} AND redirect_occurred = 1"),
+            'filtered': stats("redirect_filtered = 1") if 'redirect_filtered' in columns
+            else {'count': 0, 'avg_ms': None},
+        }
+    finally:
+        conn.close()
+
+    redirected, filtered = report['calendar_redirected'], report['filtered']
+    checked = redirected['count'] + filtered['count']
+    report['redirect_rate_without_filter'] = round(checked / (checked + report['calendar_accepted']['count']), 4) \
+        if checked + report['calendar_accepted']['count'] else None
+    report['filter_hit_rate'] = round(filtered['count'] / checked, 4) if checked else None
+
+    if filtered['count'] and redirected['avg_ms'] is not None and filtered['avg_ms'] is not None:
+        saved_per_request = redirected['avg_ms'] - filtered['avg_ms']
+        report['saved_ms_per_request'] = round(saved_per_request, 1)
+        report['saved_ms_total'] = round(saved_per_request * filtered['count'])
+    else:
+        report['saved_ms_per_request'] = None
+        report['saved_ms_total'] = None
+    return report
+
+
+# 全局实例
+_filter: Optional[RedirectFilter] = None
+_filter_loaded = False
+_filter_lock = threading.Lock()
+
+
+def get_redirect_filter() -> Optional[RedirectFilter]:
+    """获取全局回退预判过滤器 (首次调用时加载; 未启用或没有过滤器文件时返回 None)"""
+    global _filter, _filter_loaded
+    if not _filter_loaded:
+        with _filter_lock:
+            if not _filter_loaded:
+                _filter = _load_configured_filter()
+                _filter_loaded = True
+    return _filter
+
+
+def _load_configured_filter() -> Optional[RedirectFilter]:
+    if not config.REDIRECT_FILTER_ENABLED:
+        return None
+
+    path = config.REDIRECT_FILTER_PATH
+    if not path.exists():
+        logger.debug(f"[回退过滤] 未找到过滤器文件 {path}, 不生效")
+        return None
+
+    try:
+        redirect_filter = RedirectFilter.load(path)
+    except Exception as e:
+        logger.error(f"[回退过滤] 加载失败: {e}")
+        return None
+
+    logger.info(f"[回退过滤] ✓ 已加载过滤器 v{redirect_filter.version}: {len(redirect_filter)} 个模式")
+    return redirect_filter
+
+
+__all__ = [
+    'RedirectFilter', 'normalize_message', 'pattern_hash',
+    'load_calendar_outcomes', 'redirect_savings_report', 'get_redirect_filter',
+    'MATCH_MESSAGE', 'MATCH_NGRAM',
+]
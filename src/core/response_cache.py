@@ -0,0 +1,216 @@
+"""Agent 响应缓存 - 重复的只读请求直接返回上次的回答, 不调用 LLM
+
+"我记录了哪些物品？"、"搜索一下 Python 笔记" 这类请求每次都会走一遍完全相同的
+LLM 规划和工具调用。本模块在 Agent 的 invoke 方法外加一层缓存:
+
+- 键: (命名空间, 归一化后的输入, 相关数据的版本戳)
+- 数据版本戳由存储层提供 (ItemDatabase.data_version / NoteStorage.data_version),
+  任何写入都会改变版本, 旧条目自然不会再被命中, 随后被 TTL / LRU 淘汰
+- 只缓存成功、非回退、且调用期间数据版本没有变化的响应
+  (调用过程中发生了写入说明这是一次写操作, 不能重放)
+
+示例:
+    class ItemAgent(BaseAgent):
+        @cached_response("item_agent", lambda: (get_database().data_version(config.USER_ID),))
+        def invoke(self, query: str) -> AgentResponse:
+            ...
+
+缓存大小和过期时间见 config.RESPONSE_CACHE_*。
+"""
+
+import copy
+import functools
+import inspect
+import re
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from config import config
+from core.logger import logger
+from core.redirect_detector import detect_redirect
+from core.response_types import AgentResponse
+
+_WHITESPACE_RE = re.compile(r'\s+')
+# 句末的语气标点不影响语义 ("哪些物品？" 与 "哪些物品" 等价)
+_TRAILING_PUNCT = '?!.。~～…'
+
+
+def normalize_query(query: str) -> str:
+    """归一化输入: 全角转半角、转小写、合并空白、去掉句末标点
+
+    与 redirect_filter.normalize_message 不同, 这里保留数字和句中标点,
+    因为它们会影响回答 ("3号柜" 与 "4号柜", "C++" 与 "C")。
+    """
+    text = unicodedata.normalize('NFKC', query).lower()
+    return _WHITESPACE_RE.sub(' ', text).strip().rstrip(_TRAILING_PUNCT).strip()
+
+
+@dataclass
+class _Entry:
+    response: AgentResponse
+    expires_at: float
+
+
+class ResponseCache:
+    """带 TTL 和 LRU 淘汰的响应缓存 (线程安全)"""
+
+    def __init__(self, max_entries: int = 256, ttl_seconds: float = 600):
+        """
+        Args:
+            max_entries: 最多缓存的响应数, 超出时淘汰最久未使用的
+            ttl_seconds: 响应的有效期 (秒)
+        """
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = dict.fromkeys(('hits', 'misses', 'stores', 'uncacheable', 'evictions', 'expirations'), 0)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[AgentResponse]:
+        """查找缓存的响应 (返回副本, 时间戳更新为当前时间)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at <= time.monotonic():
+                del self._entries[key]
+                self._counters['expirations'] += 1
+                entry = None
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters['hits'] += 1
+            response = entry.response
+
+        response = copy.deepcopy(response)
+        response.timestamp = datetime.now().isoformat()
+        return response
+
+    def put(self, key: Hashable, response: AgentResponse) -> None:
+        """缓存响应 (保存副本, 调用方之后修改响应不会影响缓存)"""
+        entry = _Entry(copy.deepcopy(response), time.monotonic() + self.ttl_seconds)
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            self._counters['stores'] += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def record_uncacheable(self) -> None:
+        """记录一次不可缓存的响应 (失败、回退或写操作)"""
+        with self._lock:
+            self._counters['uncacheable'] += 1
+
+    def clear(self) -> None:
+        """清空缓存 (计数器保留)"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """命中/未命中等计数"""
+        with self._lock:
+            stats = dict(self._counters, size=len(self._entries),
+                         max_entries=self.max_entries, ttl_seconds=self.ttl_seconds)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else None
+        return stats
+
+
+def _is_cacheable(response: AgentResponse) -> bool:
+    return response.success and not detect_redirect(response.message).is_redirect
+
+
+def cached_response(namespace: str, versions: Callable[[], Tuple[Hashable, ...]]):
+    """为 Agent 的 invoke(self, query) 方法加上响应缓存 (同时支持 async def ainvoke)
+
+    Args:
+        namespace: 缓存命名空间 (通常是 Agent 名称)
+        versions: 返回相关数据版本戳的函数, 在调用前后各执行一次
+    """
+    def lookup(query: str):
+        """返回 (cache, key, 命中的响应); 不使用缓存时 cache 为 None"""
+        cache = get_response_cache()
+        if cache is None:
+            return None, None, None
+
+        try:
+            before = versions()
+        except Exception as e:
+            logger.warning(f"[响应缓存] 获取 {namespace} 数据版本失败, 跳过缓存: {e}")
+            return None, None, None
+
+        key = (namespace, normalize_query(query), before)
+        cached = cache.get(key)
+        if cached is not None:
+            logger.info(f"[响应缓存] ⚡ 命中 {namespace}: {query[:50]}")
+        return cache, key, cached
+
+    def store(cache: ResponseCache, key: Tuple, response: AgentResponse) -> None:
+        try:
+            unchanged = versions() == key[2]
+        except Exception:
+            unchanged = False
+        if unchanged and _is_cacheable(response):
+            cache.put(key, response)
+        else:
+            cache.record_uncacheable()
+
+    def decorator(invoke: Callable[[Any, str], Any]) -> Callable[[Any, str], Any]:
+        if inspect.iscoroutinefunction(invoke):
+            @functools.wraps(invoke)
+            async def async_wrapper(self, query: str) -> AgentResponse:
+                cache, key, cached = lookup(query)
+                if cached is not None:
+                    return cached
+                response = await invoke(self, query)
+                if cache is not None:
+                    store(cache, key, response)
+                return response
+
+            return async_wrapper
+
+        @functools.wraps(invoke)
+        def wrapper(self, query: str) -> AgentResponse:
+            cache, key, cached = lookup(query)
+            if cached is not None:
+                return cached
+            response = invoke(self, query)
+            if cache is not None:
+                store(cache, key, response)
+            return response
+
+        return wrapper
+
+    return decorator
+
+
+# 全局实例
+_cache: Optional[ResponseCache] = None
+_cache_loaded = False
+_cache_lock = threading.Lock()
+
+
+def get_response_cache() -> Optional[ResponseCache]:
+    """获取全局响应缓存 (未启用时返回 None)"""
+    global _cache, _cache_loaded
+    if not _cache_loaded:
+        with _cache_lock:
+            if not _cache_loaded:
+                if config.RESPONSE_CACHE_ENABLED:
+                    _cache = ResponseCache(config.RESPONSE_CACHE_MAX_ENTRIES, config.RESPONSE_CACHE_TTL_SECONDS)
+                    logger.info(f"[响应缓存] ✓ 已启用: 最多 {_cache.max_entries} 条, "
+                                f"有效期 {_cache.ttl_seconds:.0f}s")
+                _cache_loaded = True
+    return _cache
+
+
+__all__ = ['ResponseCache', 'cached_response', 'normalize_query', 'get_response_cache']
@@ -4,15 +4,18 @@
 - 首次访问从 Zep 加载历史
 - 后续请求使用内存缓存
 - 支持定期刷新策略
-- 异步写入 Zep 持久化
+- 异步写入 Zep 持久化 (固定数量的后台线程, 积压超出上限时丢弃)
 """
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any, Optional
 from datetime import datetime
 
+from config import config
 from core.zep_memory import get_zep_memory
 from core.logger import logger
+from core.tracing import span
 
 
 class SessionHistoryManager:
@@ -24,12 +27,15 @@ class SessionHistoryManager:
     - 定期刷新: 可选的定期从 Zep 重新加载
     """
 
-    def __init__(self, max_history_length: int = 10, refresh_interval: int = 300):
+    def __init__(self, max_history_length: int = 10, refresh_interval: int = 300,
+                 persist_workers: Optional[int] = None, max_pending_persist: Optional[int] = None):
         """初始化会话历史管理器
 
         Args:
             max_history_length: 保留的最大历史消息轮数 (user+assistant算1轮)
             refresh_interval: 刷新间隔(秒),0表示不自动刷新
+            persist_workers: 写入 Zep 的后台线程数 (默认 config.ZEP_PERSIST_WORKERS)
+            max_pending_persist: 等待写入 Zep 的交互上限 (默认 config.ZEP_PERSIST_MAX_PENDING)
         """
         self._histories: Dict[str, List[Dict[str, Any]]] = {}  # {user_id: [messages]}
         self._last_refresh: Dict[str, float] = {}  # {user_id: timestamp}
@@ -37,6 +43,14 @@ class SessionHistoryManager:
         self._refresh_interval = refresh_interval
         self._lock = threading.RLock()
 
+        # 异步持久化: 固定线程数, 突发请求不会创建无限多的线程
+        self._persist_workers = max(1, persist_workers or config.ZEP_PERSIST_WORKERS)
+        self._max_pending = max_pending_persist or config.ZEP_PERSIST_MAX_PENDING
+        self._persist_executor = ThreadPoolExecutor(max_workers=self._persist_workers,
+                                                    thread_name_prefix="zep-persist")
+        self._persist_pending = 0
+        self._persist_dropped = 0
+
         logger.info(f"[会话历史] 初始化管理器: 最大历史={max_history_length}轮, 刷新间隔={refresh_interval}秒")
 
     def get_history(self, user_id: str, force_refresh: bool = False) -> List[Dict[str, Any]]:
@@ -49,7 +63,7 @@ class SessionHistoryManager:
         Returns:
             消息列表 [{"role": "user/assistant", "content": "..."}]
         """
-        with self._lock:
+        with span("session_history.load") as s, self._lock:
             now = time.time()
 
             # 判断是否需要从 Zep 加载/刷新
@@ -61,11 +75,15 @@ class SessionHistoryManager:
                  now - self._last_refresh[user_id] > self._refresh_interval)
             )
 
+            if s:
+                s.attributes['source'] = 'zep' if should_load else 'memory'
+
             if should_load:
                 try:
                     logger.info(f"[会话历史] 从 Zep 加载历史: user_id={user_id}")
-                    zep = get_zep_memory()
-                    messages = zep.get_recent_context(limit=self._max_length * 2)
+                    with span("zep.get_recent_context"):
+                        zep = get_zep_memory()
+                        messages = zep.get_recent_context(limit=self._max_length * 2)
 
                     # 转换格式
                     self._histories[user_id] = [
@@ -95,6 +113,11 @@ class SessionHistoryManager:
             agent_name: 处理该请求的 Agent 名称
             async_persist: 是否异步持久化到 Zep
         """
+        with span("session_history.save"):
+            self._add_interaction(user_id, user_input, assistant_response, agent_name, async_persist)
+
+    def _add_interaction(self, user_id: str, user_input: str, assistant_response: str,
+                         agent_name: Optional[str], async_persist: bool) -> None:
         with self._lock:
             # 确保历史存在
             if user_id not in self._histories:
@@ -116,6 +139,15 @@ class SessionHistoryManager:
 
         # 异步持久化到 Zep
         if async_persist:
+            with self._lock:
+                if self._persist_pending >= self._max_pending:
+                    self._persist_dropped += 1
+                    logger.warning(f"[会话历史] ⚠️  Zep 写入积压 {self._persist_pending} 条, 丢弃本次持久化")
+                    return
+                self._persist_pending += 1
+
+            metadata = {"timestamp": datetime.now().isoformat()}
+
             def _persist():
                 try:
                     zep = get_zep_memory()
@@ -123,13 +155,25 @@ class SessionHistoryManager:
                         user_input=user_input,
                         assistant_response=assistant_response,
                         agent_name=agent_name,
-                        metadata={"timestamp": datetime.now().isoformat()}
+                        metadata=metadata
                     )
                 except Exception as e:
                     logger.warning(f"[会话历史] ⚠️  异步持久化到 Zep 失败: {e}")
+                finally:
+                    with self._lock:
+                        self._persist_pending -= 1
+
+            self._persist_executor.submit(_persist)
 
-            thread = threading.Thread(target=_persist, daemon=True)
-            thread.start()
+    def persist_stats(self) -> Dict[str, Any]:
+        """异步写入 Zep 的积压情况"""
+        with self._lock:
+            return {
+                "workers": self._persist_workers,
+                "pending": self._persist_pending,
+                "max_pending": self._max_pending,
+                "dropped": self._persist_dropped
+            }
 
     def clear_history(self, user_id: str) -> None:
         """清除用户的会话历史 (仅内存,不影响 Zep)
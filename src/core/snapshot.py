@@ -0,0 +1,257 @@
+"""本地数据在线快照
+
+服务运行中即可导出备份, 无需停机:
+- SQLite 数据库 (items.db 或物品分片、interaction_logs.db、notes/notes.db) 使用
+  SQLite 在线备份 API 一步复制, 每个数据库都是某一时刻的一致副本
+- Qdrant 本地存储 (notes/qdrant) 中每个集合的 storage.sqlite 同样通过备份 API 复制,
+  meta.json 等普通文件直接复制 (跳过 .lock)
+- 所有文件打包为一个 tar.gz, 包含 manifest.json (文件列表、大小、sha256、表结构版本)
+
+各文件依次导出, 彼此之间没有协调: notes.db 与 Qdrant 向量数据、物品库与交互日志之间
+可能相差导出期间发生的写入。
+
+用法: create_snapshot() / POST /api/v1/system/snapshot / scripts/snapshot.py
+"""
+import hashlib
+import io
+import json
+import shutil
+import sqlite3
+import tarfile
+import tempfile
+import threading
+import time
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from core.logger import logger
+
+MANIFEST_NAME = "manifest.json"
+MANIFEST_FORMAT = 1
+ARCHIVE_PREFIX = "youyou-snapshot-"
+
+# 同一时刻只允许一个快照任务
+_snapshot_lock = threading.Lock()
+
+
+class SnapshotInProgressError(RuntimeError):
+    """已有快照任务正在执行"""
+
+
+@dataclass
+class SnapshotSource:
+    """快照中的一个文件"""
+    name: str  # 归档内的相对路径
+    path: Path
+    kind: str  # 'sqlite' (在线备份) 或 'file' (直接复制)
+
+
+def collect_sources(data_dir: Path, shard_dir: Optional[Path] = None) -> List[SnapshotSource]:
+    """列出需要导出的文件 (不存在的存储自动跳过)
+
+    Args:
+        data_dir: 数据目录 (config.DATA_DIR)
+        shard_dir: 物品分片目录, 分片模式下导出其中所有分片
+    """
+    sources: List[SnapshotSource] = []
+
+    if shard_dir is not None:
+        for path in sorted(shard_dir.glob("*.db")):
+            sources.append(SnapshotSource(f"items_shards/{path.name}", path, 'sqlite'))
+    elif (data_dir / "items.db").exists():
+        sources.append(SnapshotSource("items.db", data_dir / "items.db", 'sqlite'))
+
+    if (data_dir / "interaction_logs.db").exists():
+        sources.append(SnapshotSource("interaction_logs.db", data_dir / "interaction_logs.db", 'sqlite'))
+
+    notes_dir = data_dir / "notes"
+    if (notes_dir / "notes.db").exists():
+        sources.append(SnapshotSource("notes/notes.db", notes_dir / "notes.db", 'sqlite'))
+
+    qdrant_dir = notes_dir / "qdrant"
+    if qdrant_dir.is_dir():
+        for path in sorted(qdrant_dir.rglob("*")):
+            if not path.is_file() or path.name == ".lock" or path.name.endswith(("-wal", "-shm", "-journal")):
+                continue
+            kind = 'sqlite' if path.suffix == ".sqlite" else 'file'
+            sources.append(SnapshotSource(f"notes/qdrant/{path.relative_to(qdrant_dir).as_posix()}", path, kind))
+
+    return sources
+
+
+def backup_sqlite(source: Path, dest: Path) -> Dict[str, Any]:
+    """使用在线备份 API 复制一个 SQLite 数据库
+
+    在源库的一个读事务内一步复制全部页 (pages=-1)。分步复制时, 其他连接在两步之间的写入
+    会让复制从头开始, 写入频繁时 (如每个请求都写交互日志) 可能永远无法完成; 一步复制不会
+    被打断。WAL 模式的数据库复制期间其他连接照常写入, 其余日志模式的数据库 (如 Qdrant 的
+    storage.sqlite) 复制期间写入会等待。
+
+    Returns:
+        {'pages': 总页数, 'user_version': 表结构版本}
+    """
+    progress = {'pages': 0}
+
+    def on_progress(status: int, remaining: int, total: int) -> None:
+        progress['pages'] = total
+
+    src = sqlite3.connect(str(source), timeout=30.0)
+    dst = sqlite3.connect(str(dest))
+    try:
+        src.backup(dst, pages=-1, progress=on_progress)
+        # 快照文件使用 DELETE 日志模式, 解压后单个文件即可直接使用
+        dst.execute("PRAGMA journal_mode=DELETE")
+        progress['user_version'] = dst.execute("PRAGMA user_version").fetchone()[0]
+        check = dst.execute("PRAGMA quick_check").fetchone()[0]
+        if check != "ok":
+            raise RuntimeError(f"{source.name} 快照校验失败: {check}")
+    finally:
+        dst.close()
+        src.close()
+    return progress
+
+
+def _sha256(path: Path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _prune(output_dir: Path, keep: int) -> List[Path]:
+    """只保留最新的 keep 个快照"""
+    if keep <= 0:
+        return []
+    archives = sorted(output_dir.glob(f"{ARCHIVE_PREFIX}*.tar.gz"))
+    removed = archives[:-keep]
+    for path in removed:
+        path.unlink()
+        logger.info(f"[快照] 删除旧快照: {path.name}")
+    return removed
+
+
+def create_snapshot(data_dir: Optional[Path] = None,
+                    output_dir: Optional[Path] = None,
+                    shard_dir: Optional[Path] = None,
+                    keep: Optional[int] = None) -> Dict[str, Any]:
+    """导出所有本地存储的快照
+
+    Args:
+        data_dir: 数据目录, 默认 config.DATA_DIR
+        output_dir: 快照输出目录, 默认 config.SNAPSHOT_DIR
+        shard_dir: 物品分片目录, 默认在启用分片时使用 config.ITEMS_SHARD_DIR
+        keep: 保留的快照个数, 默认 config.SNAPSHOT_KEEP (<= 0 不清理)
+
+    Returns:
+        快照信息 (归档路径、大小、耗时、manifest)
+
+    Raises:
+        SnapshotInProgressError: 已有快照任务正在执行
+    """
+    from config import config
+    data_dir = Path(data_dir or config.DATA_DIR)
+    output_dir = Path(output_dir or config.SNAPSHOT_DIR)
+    if shard_dir is None and config.ITEMS_SHARDING_ENABLED:
+        shard_dir = config.ITEMS_SHARD_DIR
+    keep = config.SNAPSHOT_KEEP if keep is None else keep
+
+    if not _snapshot_lock.acquire(blocking=False):
+        raise SnapshotInProgressError("已有快照任务正在执行")
+
+    try:
+        start = time.perf_counter()
+        created_at = datetime.now(timezone.utc)
+        output_dir.mkdir(parents=True, exist_ok=True)
+        archive_path = output_dir / f"{ARCHIVE_PREFIX}{created_at.strftime('%Y%m%dT%H%M%S%fZ')}.tar.gz"
+        logger.info(f"[快照] 开始导出: {data_dir} -> {archive_path.name}")
+
+        files = []
+        with tempfile.TemporaryDirectory(prefix="snapshot-", dir=output_dir) as staging:
+            staging_dir = Path(staging)
+            for source in collect_sources(data_dir, shard_dir):
+                dest = staging_dir / source.name
+                dest.parent.mkdir(parents=True, exist_ok=True)
+                step_start = time.perf_counter()
+
+                entry: Dict[str, Any] = {'name': source.name, 'kind': source.kind}
+                if source.kind == 'sqlite':
+                    entry.update(backup_sqlite(source.path, dest))
+                else:
+                    shutil.copy2(source.path, dest)
+
+                entry['bytes'] = dest.stat().st_size
+                entry['sha256'] = _sha256(dest)
+                entry['seconds'] = round(time.perf_counter() - step_start, 4)
+                files.append(entry)
+                logger.debug(f"[快照] {source.name}: {entry['bytes']} 字节, {entry['seconds']}s")
+
+            manifest = {
+                'format': MANIFEST_FORMAT,
+                'created_at': created_at.isoformat(),
+                'data_dir': str(data_dir),
+                'sharded': shard_dir is not None,
+                'files': files,
+            }
+
+            # 先写临时文件再改名, 中途失败不会留下不完整的快照
+            partial = archive_path.with_name(archive_path.name + ".partial")
+            with tarfile.open(partial, "w:gz") as tar:
+                payload = json.dumps(manifest, ensure_ascii=False, indent=2).encode("utf-8")
+                info = tarfile.TarInfo(MANIFEST_NAME)
+                info.size = len(payload)
+                info.mtime = int(created_at.timestamp())
+                tar.addfile(info, io.BytesIO(payload))
+                for entry in files:
+                    tar.add(staging_dir / entry['name'], arcname=entry['name'])
+            partial.replace(archive_path)
+
+        _prune(output_dir, keep)
+        seconds = time.perf_counter() - start
+        size = archive_path.stat().st_size
+        logger.success(f"[快照] ✓ 导出完成: {archive_path.name}, {len(files)} 个文件, {size} 字节, {seconds:.2f}s")
+
+        return {
+            'archive': str(archive_path),
+            'bytes': size,
+            'seconds': round(seconds, 3),
+            'manifest': manifest,
+        }
+    finally:
+        _snapshot_lock.release()
+
+
+def verify_snapshot(archive_path: Path) -> Dict[str, Any]:
+    """校验快照归档: 文件齐全且 sha256 与 manifest 一致
+
+    Returns:
+        {'ok': bool, 'manifest': manifest, 'errors': [错误描述]}
+    """
+    errors = []
+    with tarfile.open(archive_path, "r:gz") as tar:
+        manifest = json.load(tar.extractfile(MANIFEST_NAME))
+        names = set(tar.getnames())
+        for entry in manifest['files']:
+            if entry['name'] not in names:
+                errors.append(f"缺少文件: {entry['name']}")
+                continue
+            digest = hashlib.sha256()
+            with tar.extractfile(entry['name']) as f:
+                for chunk in iter(lambda: f.read(1 << 20), b""):
+                    digest.update(chunk)
+            if digest.hexdigest() != entry['sha256']:
+                errors.append(f"sha256 不一致: {entry['name']}")
+
+    return {'ok': not errors, 'manifest': manifest, 'errors': errors}
+
+
+def list_snapshots(output_dir: Optional[Path] = None) -> List[Dict[str, Any]]:
+    """列出已有的快照 (新的在前)"""
+    from config import config
+    output_dir = Path(output_dir or config.SNAPSHOT_DIR)
+    return [
+        {'archive': str(path), 'bytes': path.stat().st_size}
+        for path in sorted(output_dir.glob(f"{ARCHIVE_PREFIX}*.tar.gz"), reverse=True)
+    ]
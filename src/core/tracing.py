@@ -0,0 +1,268 @@
+"""请求链路追踪 - 记录一次对话请求中每个阶段的耗时
+
+交互日志只记录了总耗时 (response_time_ms), 看不出时间花在了标记解析、关键词路由、
+会话历史加载、Supervisor LLM、子 Agent LLM、工具执行还是持久化上。本模块提供一个
+轻量的 span 树:
+
+- start_trace(): 一次请求的根 span, 通过 contextvar 传递给同一请求内的所有代码
+  (LangGraph 在线程池 / asyncio 任务中执行节点时会复制上下文, 无需显式传参)
+- span(): 一个阶段, 嵌套调用形成父子关系; 不在追踪中时为空操作
+- LLM 调用和工具执行由 _SpanCallbackHandler 通过 LangChain 回调自动记录,
+  Agent 和工具代码不需要改动
+
+请求结束后 span 树写入交互日志库的 interaction_spans 表
+(见 InteractionLogger.save_trace / get_trace, GET /api/v1/system/traces/<trace_id>)。
+
+示例:
+    with start_trace("chat", user_input=text) as trace:
+        with span("keyword_router"):
+            ...
+        with span("agent:note_agent", kind="agent"):
+            graph.invoke(...)  # LLM / 工具 span 自动记录为子节点
+    get_interaction_logger().save_trace(trace)
+"""
+
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.tracers.context import register_configure_hook
+
+
+@dataclass
+class Span:
+    """追踪中的一个阶段 (时间为相对请求开始的毫秒数)"""
+    span_id: int
+    parent_id: Optional[int]
+    name: str
+    kind: str  # request / stage / agent / llm / tool
+    start_ms: float
+    duration_ms: Optional[float] = None
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    parent: Optional["Span"] = field(default=None, repr=False, compare=False)
+
+
+class Trace:
+    """一次请求的 span 集合 (线程安全: 工具可能在其他线程中执行)"""
+
+    def __init__(self, name: str, attributes: Optional[Dict[str, Any]] = None,
+                 trace_id: Optional[str] = None):
+        self.trace_id = trace_id or new_trace_id()
+        self.spans: List[Span] = []
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+        self.root = self.start_span(name, "request", None, attributes)
+
+    def _now_ms(self) -> float:
+        return (time.perf_counter() - self._t0) * 1000
+
+    def start_span(self, name: str, kind: str, parent: Optional[Span],
+                   attributes: Optional[Dict[str, Any]] = None) -> Span:
+        with self._lock:
+            span = Span(
+                span_id=len(self.spans),
+                parent_id=parent.span_id if parent else None,
+                name=name,
+                kind=kind,
+                start_ms=self._now_ms(),
+                attributes=dict(attributes or {}),
+                parent=parent,
+            )
+            self.spans.append(span)
+        return span
+
+    def end_span(self, span: Span, error: Optional[BaseException] = None) -> None:
+        span.duration_ms = self._now_ms() - span.start_ms
+        if error is not None:
+            span.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return self.root.duration_ms
+
+    def tree(self) -> Dict[str, Any]:
+        """嵌套的 span 树 (与 build_tree 的输出格式相同)"""
+        with self._lock:
+            rows = [span_to_row(span) for span in self.spans]
+        return build_tree(rows)
+
+
+def new_trace_id() -> str:
+    """生成追踪 ID (可以在请求开始前生成, 用于 X-Trace-Id 响应头)"""
+    return uuid.uuid4().hex
+
+
+def span_to_row(span: Span) -> Dict[str, Any]:
+    """span 的可序列化表示 (存储和接口使用)"""
+    return {
+        'span_id': span.span_id,
+        'parent_id': span.parent_id,
+        'name': span.name,
+        'kind': span.kind,
+        'start_ms': round(span.start_ms, 3),
+        'duration_ms': round(span.duration_ms, 3) if span.duration_ms is not None else None,
+        'attributes': span.attributes,
+        'error': span.error,
+    }
+
+
+def build_tree(rows: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """把按 span_id 排列的 span 行组装为嵌套树, 返回根节点"""
+    nodes = {row['span_id']: dict(row, children=[]) for row in rows}
+    root = None
+    for node in nodes.values():
+        parent = nodes.get(node['parent_id']) if node['parent_id'] is not None else None
+        if parent is not None:
+            parent['children'].append(node)
+        elif root is None:
+            root = node
+    return root
+
+
+# 当前请求的 span (不在追踪中时为 None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("youyou_current_span", default=None)
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("youyou_current_trace", default=None)
+
+
+def current_trace() -> Optional[Trace]:
+    """当前请求的追踪 (不在追踪中时为 None)"""
+    return _current_trace.get()
+
+
+def current_trace_id() -> Optional[str]:
+    trace = _current_trace.get()
+    return trace.trace_id if trace else None
+
+
+def annotate(**attributes: Any) -> None:
+    """为当前 span 添加属性 (不在追踪中时忽略)"""
+    span = _current_span.get()
+    if span is not None:
+        span.attributes.update(attributes)
+
+
+@contextmanager
+def start_trace(name: str, trace_id: Optional[str] = None, **attributes: Any) -> Iterator[Trace]:
+    """开始一次请求的追踪, with 块内的 span() 和 LLM / 工具调用都记录到这个追踪中"""
+    trace = Trace(name, attributes, trace_id)
+    handler = _SpanCallbackHandler(trace)
+    tokens = (_current_trace.set(trace), _current_span.set(trace.root), _trace_handler.set(handler))
+    error = None
+    try:
+        yield trace
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        trace.end_span(trace.root, error)
+        _trace_handler.reset(tokens[2])
+        _current_span.reset(tokens[1])
+        _current_trace.reset(tokens[0])
+
+
+@contextmanager
+def span(name: str, kind: str = "stage", **attributes: Any) -> Iterator[Optional[Span]]:
+    """记录一个阶段的耗时 (不在追踪中时只执行 with 块)"""
+    parent = _current_span.get()
+    if parent is None:
+        yield None
+        return
+
+    trace = _current_trace.get()
+    child = trace.start_span(name, kind, parent, attributes)
+    token = _current_span.set(child)
+    error = None
+    try:
+        yield child
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        trace.end_span(child, error)
+        _current_span.reset(token)
+
+
+class _SpanCallbackHandler(BaseCallbackHandler):
+    """把 LangChain 的 LLM 调用和工具执行记录为当前 span 的子节点
+
+    通过 register_configure_hook 自动加入请求内的所有回调管理器 (包括嵌套的子 Agent),
+    同一个 handler 实例在每个管理器中只会出现一次。
+    """
+
+    # 在触发回调的上下文中直接执行: on_tool_start 设置的当前 span 需要对工具代码可见
+    run_inline = True
+
+    def __init__(self, trace: Trace):
+        self.trace = trace
+        self._runs: Dict[UUID, Span] = {}
+
+    def _start(self, run_id: UUID, name: str, kind: str, attributes: Dict[str, Any]) -> Span:
+        parent = _current_span.get() or self.trace.root
+        span = self.trace.start_span(name, kind, parent, attributes)
+        self._runs[run_id] = span
+        return span
+
+    def _end(self, run_id: UUID, error: Optional[BaseException] = None) -> Optional[Span]:
+        span = self._runs.pop(run_id, None)
+        if span is not None:
+            self.trace.end_span(span, error)
+        return span
+
+    # ----- LLM -----
+
+    def on_chat_model_start(self, serialized, messages, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        metadata = metadata or {}
+        model = metadata.get('ls_model_name') or (serialized or {}).get('name', 'llm')
+        self._start(run_id, f"llm:{model}", "llm", {'model': model})
+
+    def on_llm_start(self, serialized, prompts, *, run_id: UUID, metadata=None, **kwargs) -> None:
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, metadata=metadata)
+
+    def on_llm_end(self, response, *, run_id: UUID, **kwargs) -> None:
+        span = self._end(run_id)
+        if span is None:
+            return
+        usage = (response.llm_output or {}).get('token_usage') if response.llm_output else None
+        if not usage:
+            message = getattr(response.generations[0][0], 'message', None) if response.generations else None
+            usage = getattr(message, 'usage_metadata', None)
+        if usage:
+            span.attributes['tokens'] = usage.get('total_tokens')
+
+    def on_llm_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        self._end(run_id, error)
+
+    # ----- 工具 -----
+
+    def on_tool_start(self, serialized, input_str, *, run_id: UUID, **kwargs) -> None:
+        name = (serialized or {}).get('name') or kwargs.get('name') or 'tool'
+        # 工具内部的 span (如数据库查询、嵌套的子 Agent) 记录为工具 span 的子节点
+        _current_span.set(self._start(run_id, f"tool:{name}", "tool", {}))
+
+    def on_tool_end(self, output, *, run_id: UUID, **kwargs) -> None:
+        span = self._end(run_id)
+        if span is not None:
+            _current_span.set(span.parent)
+
+    def on_tool_error(self, error: BaseException, *, run_id: UUID, **kwargs) -> None:
+        span = self._end(run_id, error)
+        if span is not None:
+            _current_span.set(span.parent)
+
+
+# 当前请求的回调 handler, 由 LangChain 自动加入每个回调管理器
+_trace_handler: ContextVar[Optional[_SpanCallbackHandler]] = ContextVar("youyou_trace_handler", default=None)
+register_configure_hook(_trace_handler, inheritable=True)
+
+
+__all__ = [
+    'Span', 'Trace', 'start_trace', 'span', 'annotate', 'new_trace_id',
+    'current_trace', 'current_trace_id', 'span_to_row', 'build_tree',
+]
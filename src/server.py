@@ -5,24 +5,39 @@ import subprocess
 import sys
 import time
 import json
+import queue
+import asyncio
+import threading
+from contextlib import asynccontextmanager, contextmanager
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, AsyncIterator, Generator, Iterator, Optional, Tuple, Union
 
-from flask import Flask
+from flask import Flask, Response
 from flask_restx import Api, Resource, fields
 from flask_cors import CORS
 
 from config import config
-from agents.supervisor import supervisor
+from agents.supervisor import supervisor, supervisor_router
 from agents.note_agent import note_agent
 from agents.calendar_agent import calendar_agent
+from agents.item_agent import item_agent
 from core.zep_memory import get_zep_memory
+from core.database import get_database, LIST_FIELDS, MAX_PAGE_SIZE
 from core.session_history import get_session_manager
 from core.tag_parser import TagParser
 from core.keyword_router import KeywordRouter
+from core.item_intent_parser import ItemIntentParser
+from core.intent_classifier import get_intent_classifier
+from core.admission import AdmissionRejected, aadmit, admit, get_admission_controller
+from core.agent_base import AgentRegistry, arun_agent_graph, emit_event, run_agent_graph, stream_events
 from core.redirect_detector import detect_redirect
+from core.redirect_filter import get_redirect_filter
+from core.response_cache import get_response_cache
 from core.interaction_logger import get_interaction_logger, InteractionLog
 from core.response_types import AgentResponse
+from core.snapshot import create_snapshot, SnapshotInProgressError
+from core.tracing import current_trace_id, new_trace_id, span, start_trace
+from core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, REDIRECTS, REDIRECTS_AVOIDED, REQUEST_SECONDS, render_metrics
 
 # 配置日志
 logging.basicConfig(
@@ -34,7 +49,7 @@ logger = logging.getLogger(__name__)
 
 # 创建 Flask 应用
 app = Flask(__name__)
-CORS(app)  # 允许跨域
+CORS(app, expose_headers=['Retry-After', 'X-Trace-Id'])  # 允许跨域
 
 # 创建 API
 api = Api(
@@ -49,6 +64,7 @@ api = Api(
 # 创建命名空间
 ns_chat = api.namespace('chat', description='对话相关接口')
 ns_system = api.namespace('system', description='系统相关接口')
+ns_items = api.namespace('items', description='物品数据接口')
 
 # 定义模型
 chat_request_model = api.model('ChatRequest', {
@@ -150,7 +166,9 @@ item_list (物品列表):
       "location": "书桌抽屉"
     }
   ],
-  "count": 3
+  "count": 3,
+  "has_more": false,
+  "next_cursor": null
 }
 
 chat_response (普通对话):
@@ -233,14 +251,151 @@ config_model = api.model('Config', {
     'data_dir': fields.String(description='数据目录')
 })
 
+item_entry_model = api.model('ItemEntry', {
+    'item': fields.String(required=True, description='物品名称', example='钥匙'),
+    'location': fields.String(required=True, description='位置', example='书桌抽屉'),
+    'location_detail': fields.String(required=False, description='详细位置描述')
+})
+
+item_batch_request_model = api.model('ItemBatchRequest', {
+    'items': fields.List(
+        fields.Nested(item_entry_model),
+        required=False,
+        description='要记录的物品列表 (单事务批量写入)'
+    ),
+    'queries': fields.List(
+        fields.String,
+        required=False,
+        description='要查询的物品名称列表',
+        example=['钥匙', '护照']
+    )
+})
+
+item_batch_response_model = api.model('ItemBatchResponse', {
+    'remembered': fields.List(
+        fields.Raw,
+        description='记录结果, 与 items 顺序一致 (格式同单条记录: status/action/item/location/message)'
+    ),
+    'queried': fields.List(
+        fields.Raw,
+        description='查询结果, 与 queries 顺序一致 (格式同单条查询: status/match_type/item/location/message)'
+    ),
+    'remembered_count': fields.Integer(description='记录条数'),
+    'queried_count': fields.Integer(description='查询条数')
+})
+
+item_page_model = api.model('ItemPage', {
+    'items': fields.List(
+        fields.Raw,
+        description='当前页物品 (按更新时间倒序, 字段由 fields 参数决定)'
+    ),
+    'count': fields.Integer(description='当前页物品数'),
+    'has_more': fields.Boolean(description='是否还有下一页'),
+    'next_cursor': fields.String(description='下一页游标, 没有下一页时为 null')
+})
+
+item_list_parser = api.parser()
+item_list_parser.add_argument('limit', type=int, default=50, location='args',
+                              help=f'每页条数 (1 ~ {MAX_PAGE_SIZE})')
+item_list_parser.add_argument('cursor', type=str, location='args',
+                              help='上一页返回的 next_cursor')
+item_list_parser.add_argument('fields', type=str, location='args',
+                              help=f'逗号分隔的返回字段, 可选: {",".join(LIST_FIELDS)}')
+
 health_model = api.model('Health', {
     'status': fields.String(description='服务状态', example='ok'),
     'timestamp': fields.String(description='时间戳')
 })
 
+snapshot_model = api.model('Snapshot', {
+    'archive': fields.String(description='快照归档路径 (tar.gz)'),
+    'bytes': fields.Integer(description='归档大小 (字节)'),
+    'seconds': fields.Float(description='耗时 (秒)'),
+    'manifest': fields.Raw(description='清单: 每个文件的名称、类型、大小、sha256、表结构版本')
+})
+
+
+cache_stats_model = api.model('CacheStats', {
+    'enabled': fields.Boolean(description='是否启用响应缓存'),
+    'hits': fields.Integer(description='命中次数'),
+    'misses': fields.Integer(description='未命中次数'),
+    'hit_rate': fields.Float(description='命中率'),
+    'stores': fields.Integer(description='写入缓存的响应数'),
+    'uncacheable': fields.Integer(description='不可缓存的响应数 (失败、回退或写操作)'),
+    'evictions': fields.Integer(description='LRU 淘汰数'),
+    'expirations': fields.Integer(description='过期数'),
+    'size': fields.Integer(description='当前缓存条数'),
+    'max_entries': fields.Integer(description='最大缓存条数'),
+    'ttl_seconds': fields.Float(description='有效期 (秒)')
+})
+
+admission_slot_model = api.model('AdmissionSlot', {
+    'active': fields.Integer(description='执行中的调用数'),
+    'queue_depth': fields.Integer(description='当前排队数'),
+    'queue_depth_max': fields.Integer(description='最大排队数 (历史)'),
+    'max_concurrent': fields.Integer(description='最大并发数'),
+    'max_queue': fields.Integer(description='排队上限'),
+    'queue_timeout_seconds': fields.Float(description='排队等待上限 (秒)'),
+    'admitted': fields.Integer(description='获准执行的调用数'),
+    'queued': fields.Integer(description='需要排队的调用数'),
+    'rejected_queue_full': fields.Integer(description='队列已满被拒绝数 (429)'),
+    'rejected_timeout': fields.Integer(description='排队超时被拒绝数 (503)'),
+    'wait_seconds_total': fields.Float(description='累计排队时间 (秒)'),
+    'wait_seconds_max': fields.Float(description='最长排队时间 (秒)'),
+    'wait_seconds_avg': fields.Float(description='平均排队时间 (秒)'),
+    'avg_call_seconds': fields.Float(description='平均调用耗时 (秒, 滑动平均)')
+})
+
+zep_persist_model = api.model('ZepPersistStats', {
+    'workers': fields.Integer(description='后台写入线程数'),
+    'pending': fields.Integer(description='等待写入的交互数'),
+    'max_pending': fields.Integer(description='积压上限'),
+    'dropped': fields.Integer(description='因积压被丢弃的写入数')
+})
+
+admission_stats_model = api.model('AdmissionStats', {
+    'enabled': fields.Boolean(description='是否启用准入控制'),
+    'agents': fields.Raw(description='每个 Agent (及 supervisor) 的准入统计, 格式见 AdmissionSlot'),
+    'zep_persist': fields.Nested(zep_persist_model, description='会话历史异步写入 Zep 的积压')
+})
+
+trace_span_model = api.model('TraceSpan', {
+    'span_id': fields.Integer(description='span 编号 (请求内从 0 开始)'),
+    'parent_id': fields.Integer(description='父 span 编号 (根节点为 null)'),
+    'name': fields.String(description='阶段名称, 如 tag_parser / agent:note_agent / llm:gpt-4o-mini / tool:query_item'),
+    'kind': fields.String(description='类型', enum=['request', 'stage', 'agent', 'llm', 'tool']),
+    'start_ms': fields.Float(description='相对请求开始的时间 (毫秒)'),
+    'duration_ms': fields.Float(description='耗时 (毫秒)'),
+    'attributes': fields.Raw(description='附加属性, 如 model / tokens / match_type'),
+    'error': fields.String(description='出错时的异常信息'),
+    'children': fields.Raw(description='子 span 列表 (格式相同)')
+})
+
+trace_model = api.model('Trace', {
+    'trace_id': fields.String(description='追踪 ID (对话接口的 X-Trace-Id 响应头)'),
+    'interaction': fields.Raw(description='对应的交互日志摘要 {id, routing_stage, target_agent, final_agent, response_time_ms, status}'),
+    'root': fields.Nested(trace_span_model, description='span 树的根节点 (整个请求)')
+})
+
 
 def _log_interaction(user_input: str, response: str, start_time: float, log_data: dict):
     """记录交互日志的辅助函数"""
+    _record_request_metrics(time.time() - start_time, log_data)
+    with span("interaction_log"):
+        _write_interaction_log(user_input, response, start_time, log_data)
+
+
+def _record_request_metrics(seconds: float, log_data: dict) -> None:
+    """更新请求延迟和回退次数指标 (GET /metrics)"""
+    REQUEST_SECONDS.observe(seconds, log_data.get('routing_stage', 'unknown'),
+                            log_data.get('final_agent') or 'none', log_data.get('status', 'success'))
+    if log_data.get('redirect_occurred'):
+        REDIRECTS.inc(log_data.get('target_agent') or 'unknown')
+    if log_data.get('redirect_filtered'):
+        REDIRECTS_AVOIDED.inc()
+
+
+def _write_interaction_log(user_input: str, response: str, start_time: float, log_data: dict):
     try:
         response_time_ms = int((time.time() - start_time) * 1000)
 
@@ -259,7 +414,9 @@ def _log_interaction(user_input: str, response: str, start_time: float, log_data
             redirect_occurred=log_data.get('redirect_occurred', False),
             redirect_reason=log_data.get('redirect_reason'),
             final_agent=log_data.get('final_agent'),
-            status=log_data.get('status', 'success')
+            redirect_filtered=log_data.get('redirect_filtered', False),
+            status=log_data.get('status', 'success'),
+            trace_id=current_trace_id()
         )
 
         get_interaction_logger().log(log_entry)
@@ -267,6 +424,682 @@ def _log_interaction(user_input: str, response: str, start_time: float, log_data
         logger.error(f"[交互日志] 记录失败: {e}")
 
 
+def _emit_routing(stage: str, agent: str, keywords: Optional[list] = None) -> None:
+    """推送路由决策事件 (仅流式接口)"""
+    emit_event('routing', {'stage': stage, 'agent': agent, 'keywords': keywords or []})
+
+
+def _invoke_supervisor(messages: list, query: Optional[str] = None, exclude: tuple = ()) -> AgentResponse:
+    """由 Supervisor 处理消息, 返回实际处理请求的 Agent 的响应
+
+    router 模式: 一次结构化输出选出 Agent, 直接调用该 Agent, 其 AgentResponse 原样返回;
+    路由调用占用 "supervisor" 的准入槽位, 子 Agent 占用自己的槽位 (单独的并发限制同样生效)。
+    tools 模式: Supervisor 以工具方式调用子 Agent, 从 ToolMessage 中解析子 Agent 的响应;
+    整个调用占用 "supervisor" 的槽位。
+
+    Args:
+        messages: 会话历史 + 当前消息
+        query: 交给子 Agent 的消息 (router 模式, 通常为用户的原始消息),
+            为 None 时使用 Supervisor 给出的 query
+        exclude: 不能选择的 Agent (router 模式)
+    """
+    if config.SUPERVISOR_MODE == 'router':
+        with admit("supervisor"):
+            decision = supervisor_router.route(messages, exclude)
+        _emit_routing('supervisor', decision.agent)
+        with admit(decision.agent):
+            agent_response = AgentRegistry.get(decision.agent).invoke(query or decision.query)
+        logger.info(f"📤 {decision.agent} 返回响应 (前200字): {agent_response.message[:200]}...")
+        return agent_response
+
+    _emit_routing('supervisor', "supervisor")
+    with admit("supervisor"):
+        result = run_agent_graph(supervisor, messages, "supervisor")
+    return _supervisor_result_response(result)
+
+
+async def _ainvoke_supervisor(messages: list, query: Optional[str] = None, exclude: tuple = ()) -> AgentResponse:
+    """_invoke_supervisor 的异步版本 (ASGI 服务使用)"""
+    if config.SUPERVISOR_MODE == 'router':
+        async with aadmit("supervisor"):
+            decision = await supervisor_router.aroute(messages, exclude)
+        _emit_routing('supervisor', decision.agent)
+        async with aadmit(decision.agent):
+            agent_response = await AgentRegistry.get(decision.agent).ainvoke(query or decision.query)
+        logger.info(f"📤 {decision.agent} 返回响应 (前200字): {agent_response.message[:200]}...")
+        return agent_response
+
+    _emit_routing('supervisor', "supervisor")
+    async with aadmit("supervisor"):
+        result = await arun_agent_graph(supervisor, messages, "supervisor")
+    return _supervisor_result_response(result)
+
+
+def _supervisor_result_response(result: Dict[str, Any]) -> AgentResponse:
+    """tools 模式: 从 Supervisor 的最终状态中解析子 Agent 的响应"""
+    from langchain_core.messages import ToolMessage
+    from core.response_types import Action
+
+    messages_result = result.get("messages", [])
+    logger.info(f"✓ Supervisor 返回结果,消息数量: {len(messages_result)}")
+
+    # 打印所有消息用于调试
+    for i, msg in enumerate(messages_result):
+        msg_type = type(msg).__name__
+        msg_content = getattr(msg, 'content', str(msg))[:100] if hasattr(msg, 'content') else str(msg)[:100]
+        logger.info(f"  消息[{i}] {msg_type}: {msg_content}")
+
+    # 查找 ToolMessage（说明 Supervisor 调用了子 agent）
+    tool_message = next((msg for msg in messages_result if isinstance(msg, ToolMessage)), None)
+
+    if tool_message:
+        # 透传模式：解析子 agent 返回的完整数据
+        logger.info(f"🎯 找到 ToolMessage: {tool_message.content[:100]}...")
+        try:
+            agent_data = json.loads(tool_message.content)
+            logger.info(f"✅ 透传子 agent 响应: agent={agent_data.get('agent', 'supervisor')}")
+            return AgentResponse(
+                success=agent_data.get("success", True),
+                agent=agent_data.get("agent", "supervisor"),
+                message=agent_data.get("message", ""),
+                actions=[Action(type=a["type"], data=a["data"]) for a in agent_data.get("actions", [])]
+            )
+        except json.JSONDecodeError:
+            # 如果不是 JSON，回退到文本提取
+            response_text = tool_message.content
+            logger.warning("⚠️  ToolMessage.content 不是 JSON 格式，使用文本模式")
+    else:
+        # Supervisor 自处理模式：从 AIMessage 提取文本
+        logger.info("💬 Supervisor 自处理对话（未调用子 agent）")
+        response_text = next(
+            (msg.content for msg in reversed(messages_result)
+             if getattr(msg, 'content', '') and msg.content.strip()),
+            "抱歉,我无法处理这个请求"
+        )
+
+    return AgentResponse(
+        success=True,
+        agent="supervisor",
+        message=response_text,
+        actions=[Action(type="chat_response", data={"text": response_text})]
+    )
+
+
+MAX_MESSAGE_LENGTH = 1000
+SSE_KEEPALIVE_SECONDS = 15  # 流式接口无事件时发送保活注释的间隔
+
+
+def _validate_message(user_input: str) -> Optional[str]:
+    """检查消息, 不合法时返回错误信息"""
+    if not user_input:
+        return "消息不能为空"
+
+    # 添加消息长度限制
+    if len(user_input) > MAX_MESSAGE_LENGTH:
+        logger.warning(f"消息过长: {len(user_input)} 字符 (最大 {MAX_MESSAGE_LENGTH})")
+        return f"消息过长,最多支持 {MAX_MESSAGE_LENGTH} 个字符"
+
+    return None
+
+
+class _AgentCall:
+    """路由流程中的一次子 Agent 调用 (占用该 Agent 的准入槽位)"""
+
+    def __init__(self, agent, query: str):
+        self.agent = agent
+        self.query = query
+
+    def run(self) -> AgentResponse:
+        with admit(self.agent.name):
+            return self.agent.invoke(self.query)
+
+    async def arun(self) -> AgentResponse:
+        async with aadmit(self.agent.name):
+            return await self.agent.ainvoke(self.query)
+
+
+class _SupervisorCall:
+    """路由流程中的一次 Supervisor 调用 (router 模式下包括随后的子 Agent 调用)
+
+    准入槽位由 _invoke_supervisor / _ainvoke_supervisor 按步骤占用。
+    """
+
+    def __init__(self, messages: list, query: Optional[str] = None, exclude: tuple = ()):
+        self.messages = messages
+        self.query = query
+        self.exclude = exclude
+
+    def run(self) -> AgentResponse:
+        return _invoke_supervisor(self.messages, self.query, self.exclude)
+
+    async def arun(self) -> AgentResponse:
+        return await _ainvoke_supervisor(self.messages, self.query, self.exclude)
+
+
+def _message_pipeline(user_input: str, start_time: float,
+                      log_data: dict) -> Generator[Union[_AgentCall, _SupervisorCall], AgentResponse, AgentResponse]:
+    """路由并处理一条消息: 标记 → 关键词 → 物品快速路径 → 意图分类器 → Supervisor
+
+    需要调用 LLM 的步骤以 _AgentCall / _SupervisorCall 的形式 yield 出去, 由调用方执行后
+    把 AgentResponse send 回来: 同步服务 (_process_message) 和异步服务 (_aprocess_message)
+    共用这一份路由逻辑, 返回的响应完全相同。
+
+    在 stream_events() 上下文中调用时, 路由决策和回退以 routing / redirect 事件推送,
+    Agent 执行中的工具调用和 LLM token 由 run_agent_graph 推送。
+
+    Returns:
+        实际处理请求的 Agent 的响应 (StopIteration.value)
+    """
+    logger.info("=" * 80)
+    logger.info(f"📥 收到用户消息: {user_input}")
+    logger.info("-" * 80)
+
+    # 1. 解析标记，检测是否需要直接路由
+    with span("tag_parser"):
+        parse_result = TagParser.parse(user_input)
+
+    if parse_result.has_tag:
+        logger.info(f"🏷️  检测到标记: {parse_result.tag_type}")
+        logger.info(f"🎯 目标 Agent: {parse_result.target_agent}")
+        logger.info(f"📝 清理后的消息: {parse_result.clean_message}")
+
+        # 记录标记路由信息
+        log_data.update({
+            'routing_stage': 'tag',
+            'routing_matched': True,
+            'routing_keywords': json.dumps([f"标记:{parse_result.tag_type}"], ensure_ascii=False),
+            'target_agent': parse_result.target_agent,
+            'final_agent': parse_result.target_agent
+        })
+
+        # 直接路由到指定 Agent（跳过 Supervisor）
+        if parse_result.target_agent == "note_agent":
+            _emit_routing('tag', "note_agent", [f"标记:{parse_result.tag_type}"])
+            logger.info("🚀 直接调用 NoteAgent (跳过 Supervisor)...")
+            agent_response = yield _AgentCall(note_agent, parse_result.clean_message)
+            logger.info(f"📤 NoteAgent 返回响应 (前200字): {agent_response.message[:200]}...")
+
+            # 保存会话历史
+            session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
+            session_mgr.add_interaction(
+                user_id=config.USER_ID,
+                user_input=user_input,
+                assistant_response=agent_response.message,
+                agent_name="note_agent",
+                async_persist=True
+            )
+            logger.info("💾 交互已保存 (标记路由)")
+            logger.info("=" * 80)
+
+            # 记录交互日志
+            _log_interaction(user_input, agent_response.message, start_time, log_data)
+
+            # 返回完整的结构化响应
+            return agent_response
+
+    # 2. 检查关键词路由（优先于 Supervisor）
+    with span("keyword_router"):
+        keyword_result = KeywordRouter.match(user_input)
+
+    if keyword_result.filtered:
+        # 历史上会被 CalendarAgent 回退, 跳过关键词路由 (省去一次 CalendarAgent 调用)
+        logger.info(f"🚫 回退预判: 跳过 CalendarAgent ({', '.join(keyword_result.matched_keywords)})")
+        log_data['redirect_filtered'] = True
+
+    if keyword_result.matched:
+        logger.info(f"🔑 检测到关键词路由")
+        logger.info(f"🎯 目标 Agent: {keyword_result.target_agent}")
+        logger.info(f"📌 匹配的关键词: {', '.join(keyword_result.matched_keywords)}")
+
+        # 记录关键词路由信息
+        log_data.update({
+            'routing_stage': 'keyword',
+            'routing_matched': True,
+            'routing_keywords': json.dumps(keyword_result.matched_keywords, ensure_ascii=False),
+            'target_agent': keyword_result.target_agent
+        })
+
+        # 直接路由到 calendar_agent
+        if keyword_result.target_agent == "calendar_agent":
+            _emit_routing('keyword', "calendar_agent", keyword_result.matched_keywords)
+            logger.info("🚀 直接调用 CalendarAgent (跳过 Supervisor)...")
+            agent_response = yield _AgentCall(calendar_agent, keyword_result.original_message)
+            logger.info(f"📤 CalendarAgent 返回响应 (前200字): {agent_response.message[:200]}...")
+
+            # 检测是否需要回退 (检查 message 字段)
+            redirect_result = detect_redirect(agent_response.message)
+
+            if redirect_result.is_redirect:
+                emit_event('redirect', {'agent': "calendar_agent", 'reason': redirect_result.reason})
+                logger.info(f"🔄 CalendarAgent 请求回退")
+                logger.info(f"📝 回退原因: {redirect_result.reason}")
+                logger.info("🔄 重新使用 Supervisor 路由...")
+
+                # 记录回退信息
+                log_data.update({
+                    'redirect_occurred': True,
+                    'redirect_reason': redirect_result.reason,
+                    'final_agent': 'supervisor',
+                    'status': 'redirect'
+                })
+
+                # 获取会话历史
+                session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
+                session_history = session_mgr.get_history(config.USER_ID)
+
+                # 构建带有回退提示的消息
+                enhanced_message = f"""[系统提示：calendar_agent 已判定此消息不属于日历范畴，原因：{redirect_result.reason}。请从其他可用工具中选择合适的 Agent 处理。]
+
+{user_input}"""
+
+                messages = session_history + [
+                    {"role": "user", "content": enhanced_message}
+                ]
+
+                # 调用 Supervisor 重新路由 (不再选择 calendar_agent, 子 Agent 收到原始消息)
+                agent_response = yield _SupervisorCall(messages, query=user_input, exclude=('calendar_agent',))
+                log_data['final_agent'] = agent_response.agent
+                logger.info(f"📤 {agent_response.agent} 返回响应 (前200字): {agent_response.message[:200]}...")
+
+                # ⚠️ 保存到会话历史时使用原始消息（不包含系统提示）
+                session_mgr.add_interaction(
+                    user_id=config.USER_ID,
+                    user_input=user_input,  # 使用原始消息
+                    assistant_response=agent_response.message,
+                    agent_name=agent_response.agent,
+                    async_persist=True
+                )
+                logger.info("💾 交互已保存 (回退路由)")
+                logger.info("=" * 80)
+
+                # 记录交互日志
+                _log_interaction(user_input, agent_response.message, start_time, log_data)
+
+                return agent_response
+
+            # 没有回退，正常处理
+            log_data.update({'final_agent': 'calendar_agent'})
+
+            # 保存会话历史
+            session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
+            session_mgr.add_interaction(
+                user_id=config.USER_ID,
+                user_input=user_input,
+                assistant_response=agent_response.message,
+                agent_name="calendar_agent",
+                async_persist=True
+            )
+            logger.info("💾 交互已保存 (关键词路由)")
+            logger.info("=" * 80)
+
+            # 记录交互日志
+            _log_interaction(user_input, agent_response.message, start_time, log_data)
+
+            return agent_response
+
+    # 3. 物品快速路径: 常见的记录/查询/列表句式直接执行, 不调用 LLM
+    with span("item_intent_parser"):
+        item_intent = ItemIntentParser.parse(
+            user_input, is_known_item=lambda item: get_database().has_item(item, user_id=config.USER_ID)
+        ) if config.ITEM_FAST_PATH_ENABLED else None
+
+    if item_intent:
+        logger.info(f"⚡ 物品快速路径: {item_intent.pattern}")
+
+        log_data.update({
+            'routing_stage': 'item_fast_path',
+            'routing_matched': True,
+            'routing_keywords': json.dumps([item_intent.pattern], ensure_ascii=False),
+            'target_agent': 'item_agent',
+            'final_agent': 'item_agent'
+        })
+
+        _emit_routing('item_fast_path', "item_agent", [item_intent.pattern])
+        with span("agent:item_agent", kind="agent", fast_path=item_intent.pattern):
+            agent_response = item_agent.handle_intent(item_intent)
+        logger.info(f"📤 ItemAgent 返回响应: {agent_response.message[:200]}")
+
+        # 保存会话历史
+        session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
+        session_mgr.add_interaction(
+            user_id=config.USER_ID,
+            user_input=user_input,
+            assistant_response=agent_response.message,
+            agent_name="item_agent",
+            async_persist=True
+        )
+        logger.info("💾 交互已保存 (物品快速路径)")
+        logger.info("=" * 80)
+
+        # 记录交互日志
+        if not agent_response.success:
+            log_data['status'] = 'error'
+        _log_interaction(user_input, agent_response.message, start_time, log_data)
+
+        return agent_response
+
+    # 4. 本地意图分类器: 高置信度时直接调用目标 Agent (跳过 Supervisor)
+    classifier = get_intent_classifier()
+    with span("intent_classifier"):
+        prediction = classifier.classify(user_input, config.INTENT_CLASSIFIER_THRESHOLD) if classifier else None
+    target = AgentRegistry.get(prediction.label) if prediction else None
+
+    if target:
+        logger.info(f"🧠 意图分类器: {prediction.label} (置信度 {prediction.confidence:.3f})")
+
+        log_data.update({
+            'routing_stage': 'classifier',
+            'routing_matched': True,
+            'routing_keywords': json.dumps(
+                [f"分类器:v{classifier.version}:{prediction.confidence:.3f}"], ensure_ascii=False
+            ),
+            'target_agent': prediction.label,
+            'final_agent': prediction.label
+        })
+
+        _emit_routing('classifier', prediction.label, [f"置信度:{prediction.confidence:.3f}"])
+        agent_response = yield _AgentCall(target, user_input)
+        logger.info(f"📤 {prediction.label} 返回响应 (前200字): {agent_response.message[:200]}...")
+
+        redirect_result = detect_redirect(agent_response.message)
+        if redirect_result.is_redirect:
+            emit_event('redirect', {'agent': prediction.label, 'reason': redirect_result.reason})
+            # 分类错误, 继续走 Supervisor (保留分类器的路由信息用于分析)
+            logger.info(f"🔄 {prediction.label} 请求回退: {redirect_result.reason}")
+            log_data.update({
+                'redirect_occurred': True,
+                'redirect_reason': redirect_result.reason,
+                'status': 'redirect'
+            })
+        else:
+            # 保存会话历史
+            session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
+            session_mgr.add_interaction(
+                user_id=config.USER_ID,
+                user_input=user_input,
+                assistant_response=agent_response.message,
+                agent_name=prediction.label,
+                async_persist=True
+            )
+            logger.info("💾 交互已保存 (意图分类器)")
+            logger.info("=" * 80)
+
+            # 记录交互日志
+            if not agent_response.success:
+                log_data['status'] = 'error'
+            _log_interaction(user_input, agent_response.message, start_time, log_data)
+
+            return agent_response
+
+    # 5. 没有标记、关键词、物品句式或高置信度分类，走正常的 Supervisor 路由
+    logger.info("🔄 未检测到标记、关键词和物品句式，使用 Supervisor 路由...")
+
+    # 记录 Supervisor 路由信息 (分类器回退时保留分类器的路由信息)
+    if not log_data.get('redirect_occurred'):
+        log_data.update({
+            'routing_stage': 'supervisor',
+            'routing_matched': False,
+            'target_agent': 'supervisor'
+        })
+
+    # 获取会话历史管理器
+    session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
+    user_id = config.USER_ID
+
+    # 从内存获取会话历史 (首次会从 Zep 加载)
+    session_history = session_mgr.get_history(user_id)
+    logger.info(f"📚 获取到 {len(session_history)} 条会话历史 (内存缓存)")
+
+    # 构建完整的消息列表（会话历史 + 当前输入）
+    messages = session_history + [{"role": "user", "content": user_input}]
+
+    logger.info(f"📝 总消息数: {len(messages)} (历史 {len(session_history)} + 当前 1)")
+
+    # 调用 supervisor 处理（现在有完整上下文）
+    logger.info(f"🤖 调用 Supervisor 处理请求 (模式: {config.SUPERVISOR_MODE})...")
+    # 意图分类器的目标 Agent 已经回退时, 不再选择它
+    exclude = (log_data['target_agent'],) if log_data.get('redirect_occurred') else ()
+    agent_response = yield _SupervisorCall(messages, query=user_input, exclude=exclude)
+
+    # 更新会话历史
+    session_mgr.add_interaction(
+        user_id=user_id,
+        user_input=user_input,
+        assistant_response=agent_response.message,
+        agent_name=agent_response.agent,  # 使用真实的 agent 名称
+        async_persist=True
+    )
+    logger.info(f"💾 交互已保存: agent={agent_response.agent}")
+    logger.info("=" * 80)
+
+    # 记录交互日志 (final_agent 为实际处理的子 Agent, 是意图分类器的训练标签)
+    log_data['final_agent'] = agent_response.agent
+    _log_interaction(user_input, agent_response.message, start_time, log_data)
+
+    return agent_response
+
+
+def _process_message(user_input: str, start_time: float, log_data: dict) -> AgentResponse:
+    """同步执行路由流程 (Flask 服务)"""
+    pipeline = _message_pipeline(user_input, start_time, log_data)
+    agent_response = None
+    try:
+        while True:
+            call = pipeline.send(agent_response)
+            agent_response = call.run()
+    except StopIteration as stop:
+        return stop.value
+
+
+def _pipeline_step(pipeline: Generator, value: Optional[AgentResponse]) -> Tuple[bool, Any]:
+    """执行路由流程到下一次 LLM 调用, 返回 (是否结束, 下一个调用或最终响应)
+
+    StopIteration 不能穿过 asyncio.to_thread 的 Future, 在这里转换为返回值。
+    """
+    try:
+        return False, pipeline.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+
+
+async def _aprocess_message(user_input: str, start_time: float, log_data: dict) -> AgentResponse:
+    """异步执行路由流程 (ASGI 服务): 等待 LLM 时不占用线程
+
+    两次 LLM 调用之间的同步步骤 (物品快速路径的 SQLite 读写、会话历史从 Zep 加载、
+    交互日志写入等) 在线程池中执行, 不阻塞事件循环上的其他请求。
+    """
+    pipeline = _message_pipeline(user_input, start_time, log_data)
+    agent_response = None
+    while True:
+        done, result = await asyncio.to_thread(_pipeline_step, pipeline, agent_response)
+        if done:
+            return result
+        agent_response = await result.arun()
+
+
+def _log_failure(user_input: str, error: Exception, start_time: float, log_data: dict) -> None:
+    """记录处理失败的错误日志和交互日志"""
+    if isinstance(error, AdmissionRejected):
+        # 过载时的正常拒绝, 不打印堆栈
+        logger.warning(f"🚦 请求被拒绝 ({error.status_code}, Retry-After {error.retry_after}s): {error}")
+        logger.info("=" * 80)
+    else:
+        logger.error("=" * 80)
+        logger.error(f"❌ 处理请求时出错: {error}")
+        logger.error("详细错误信息:", exc_info=True)
+        logger.error("=" * 80)
+
+    # 记录错误日志
+    log_data.update({
+        'status': 'rejected' if isinstance(error, AdmissionRejected) else 'error',
+        'error_message': str(error)
+    })
+    error_response = f"处理请求时出错: {str(error)}"
+    _log_interaction(user_input, error_response, start_time, log_data)
+
+
+@contextmanager
+def _trace_message(user_input: str, trace_id: Optional[str]) -> Iterator[None]:
+    """追踪一条消息的处理过程, 结束后保存 span 树 (未启用链路追踪时不做任何事)"""
+    if not config.TRACING_ENABLED:
+        yield
+        return
+
+    trace = None
+    try:
+        with start_trace("chat", trace_id=trace_id, input_length=len(user_input)) as trace:
+            yield
+    finally:
+        if trace is not None:
+            get_interaction_logger().save_trace(trace)
+
+
+@asynccontextmanager
+async def _atrace_message(user_input: str, trace_id: Optional[str]) -> AsyncIterator[None]:
+    """_trace_message 的异步版本: span 树在线程池中保存, 不阻塞事件循环"""
+    if not config.TRACING_ENABLED:
+        yield
+        return
+
+    trace = None
+    try:
+        with start_trace("chat", trace_id=trace_id, input_length=len(user_input)) as trace:
+            yield
+    finally:
+        if trace is not None:
+            await asyncio.to_thread(get_interaction_logger().save_trace, trace)
+
+
+def _new_trace_id() -> Optional[str]:
+    """为对话请求生成追踪 ID (在 X-Trace-Id 响应头中返回, 未启用链路追踪时为 None)"""
+    return new_trace_id() if config.TRACING_ENABLED else None
+
+
+def _trace_headers(trace_id: Optional[str]) -> Dict[str, str]:
+    return {'X-Trace-Id': trace_id} if trace_id else {}
+
+
+def _handle_message(user_input: str, trace_id: Optional[str] = None) -> AgentResponse:
+    """处理一条消息 (出错时记录错误日志后重新抛出异常)
+
+    Args:
+        user_input: 用户消息
+        trace_id: 链路追踪 ID (为 None 时自动生成)
+    """
+    # 开始计时和初始化日志数据
+    start_time = time.time()
+    log_data = {}
+
+    with _trace_message(user_input, trace_id):
+        try:
+            return _process_message(user_input, start_time, log_data)
+        except Exception as e:
+            _log_failure(user_input, e, start_time, log_data)
+            raise
+
+
+async def _ahandle_message(user_input: str, trace_id: Optional[str] = None) -> AgentResponse:
+    """_handle_message 的异步版本 (ASGI 服务使用)"""
+    start_time = time.time()
+    log_data = {}
+
+    async with _atrace_message(user_input, trace_id):
+        try:
+            return await _aprocess_message(user_input, start_time, log_data)
+        except Exception as e:
+            await asyncio.to_thread(_log_failure, user_input, e, start_time, log_data)
+            raise
+
+
+def _rejection_body(error: AdmissionRejected) -> Dict[str, Any]:
+    """准入控制拒绝时的响应体"""
+    return {"error": str(error), "retry_after": error.retry_after}
+
+
+def _error_event(error: Exception) -> Dict[str, Any]:
+    """流式接口的 error 事件数据 (被准入控制拒绝时附带 status 和 retry_after)"""
+    if isinstance(error, AdmissionRejected):
+        return {"status": error.status_code, **_rejection_body(error)}
+    return {'error': str(error)}
+
+
+def _sse(event: str, data: Dict[str, Any]) -> str:
+    """格式化一个 Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
+def _stream_message(user_input: str, trace_id: Optional[str] = None) -> Iterator[str]:
+    """在后台线程中处理消息, 实时产出 SSE 事件
+
+    最后一个事件是 response (最终的 AgentResponse) 或 error。
+    客户端提前断开时后台线程会继续执行完 (保证会话历史和交互日志完整)。
+    """
+    events: "queue.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = queue.Queue()
+
+    def run():
+        try:
+            with stream_events(lambda event, data: events.put((event, data))):
+                agent_response = _handle_message(user_input, trace_id)
+            events.put(('response', agent_response.to_dict()))
+        except Exception as e:
+            events.put(('error', _error_event(e)))
+        finally:
+            events.put(None)
+
+    threading.Thread(target=run, name="chat-stream", daemon=True).start()
+
+    while True:
+        try:
+            item = events.get(timeout=SSE_KEEPALIVE_SECONDS)
+        except queue.Empty:
+            yield ": keep-alive\n\n"  # 注释行, 防止代理因长时间无数据断开连接
+            continue
+        if item is None:
+            return
+        yield _sse(*item)
+
+
+async def _astream_message(user_input: str, trace_id: Optional[str] = None) -> AsyncIterator[str]:
+    """_stream_message 的异步版本 (ASGI 服务使用): 在事件循环中处理消息, 实时产出 SSE 事件
+
+    客户端提前断开时处理任务会继续执行完 (保证会话历史和交互日志完整)。
+    """
+    loop = asyncio.get_running_loop()
+    events: "asyncio.Queue[Optional[Tuple[str, Dict[str, Any]]]]" = asyncio.Queue()
+
+    def emit(event: str, data: Dict[str, Any]) -> None:
+        # 同步工具在线程池中执行时也会推送事件, 统一交给事件循环入队
+        loop.call_soon_threadsafe(events.put_nowait, (event, data))
+
+    async def run():
+        try:
+            with stream_events(emit):
+                agent_response = await _ahandle_message(user_input, trace_id)
+            emit('response', agent_response.to_dict())
+        except Exception as e:
+            emit('error', _error_event(e))
+        finally:
+            loop.call_soon_threadsafe(events.put_nowait, None)
+
+    task = loop.create_task(run())
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+    while True:
+        try:
+            item = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+        except asyncio.TimeoutError:
+            yield ": keep-alive\n\n"  # 注释行, 防止代理因长时间无数据断开连接
+            continue
+        if item is None:
+            return
+        yield _sse(*item)
+
+
+# 正在执行的异步流式任务 (保持引用, 避免客户端断开后任务被回收)
+_background_tasks: set = set()
+
+
 @ns_chat.route('/message')
 class ChatMessage(Resource):
     """对话接口"""
@@ -275,6 +1108,8 @@ class ChatMessage(Resource):
     @ns_chat.expect(chat_request_model)
     @ns_chat.response(200, 'Success', agent_response_model)
     @ns_chat.response(400, 'Bad Request', error_model)
+    @ns_chat.response(429, 'Agent 繁忙, 排队已满 (见 Retry-After)', error_model)
+    @ns_chat.response(503, 'Agent 繁忙, 排队超时 (见 Retry-After)', error_model)
     @ns_chat.response(500, 'Internal Server Error', error_model)
     def post(self):
         """发送消息给助手
@@ -297,6 +1132,8 @@ class ChatMessage(Resource):
         - timestamp: 响应时间戳
         - error: 错误信息（仅失败时）
 
+        响应头 X-Trace-Id 为本次请求的追踪 ID, 各阶段耗时见 GET /api/v1/system/traces/<trace_id>。
+
         actions 字段中的 type 可能包含：
         - reminder_set: 提醒已设置
         - reminder_list: 提醒列表
@@ -309,313 +1146,164 @@ class ChatMessage(Resource):
         - chat_response: 普通对话
         - error: 错误信息
         """
-        # 开始计时和初始化日志数据
-        start_time = time.time()
-        log_data = {}
-
+        trace_id = _new_trace_id()
         try:
             data = api.payload
             user_input = data.get('message', '')
 
-            if not user_input:
-                return {"error": "消息不能为空"}, 400
+            error = _validate_message(user_input)
+            if error:
+                return {"error": error}, 400
 
-            # 添加消息长度限制
-            MAX_MESSAGE_LENGTH = 1000
-            if len(user_input) > MAX_MESSAGE_LENGTH:
-                logger.warning(f"消息过长: {len(user_input)} 字符 (最大 {MAX_MESSAGE_LENGTH})")
-                return {"error": f"消息过长,最多支持 {MAX_MESSAGE_LENGTH} 个字符"}, 400
+            return _handle_message(user_input, trace_id).to_dict(), 200, _trace_headers(trace_id)
 
-            logger.info("=" * 80)
-            logger.info(f"📥 收到用户消息: {user_input}")
-            logger.info("-" * 80)
+        except AdmissionRejected as e:
+            return _rejection_body(e), e.status_code, {'Retry-After': str(e.retry_after), **_trace_headers(trace_id)}
+        except Exception as e:
+            return {"error": str(e)}, 500, _trace_headers(trace_id)
 
-            # 1. 解析标记，检测是否需要直接路由
-            parse_result = TagParser.parse(user_input)
 
-            if parse_result.has_tag:
-                logger.info(f"🏷️  检测到标记: {parse_result.tag_type}")
-                logger.info(f"🎯 目标 Agent: {parse_result.target_agent}")
-                logger.info(f"📝 清理后的消息: {parse_result.clean_message}")
+@ns_chat.route('/stream')
+class ChatStream(Resource):
+    """流式对话接口 (Server-Sent Events)"""
 
-                # 记录标记路由信息
-                log_data.update({
-                    'routing_stage': 'tag',
-                    'routing_matched': True,
-                    'routing_keywords': json.dumps([f"标记:{parse_result.tag_type}"], ensure_ascii=False),
-                    'target_agent': parse_result.target_agent,
-                    'final_agent': parse_result.target_agent
-                })
+    @ns_chat.doc('stream_message')
+    @ns_chat.expect(chat_request_model)
+    @ns_chat.produces(['text/event-stream'])
+    @ns_chat.response(200, 'SSE 事件流')
+    @ns_chat.response(400, 'Bad Request', error_model)
+    def post(self):
+        """发送消息给助手, 以 SSE 流式返回处理过程
+
+        与 /chat/message 使用相同的路由流程, 但不必等待整个调用链结束:
+        路由决策、工具调用和 LLM token 会实时推送。
+
+        事件 (每个事件为 "event: <名称>" + "data: <JSON>"):
+        - routing: 路由决策 {"stage", "agent", "keywords"}, stage 为 tag/keyword/item_fast_path/classifier/supervisor
+        - redirect: Agent 请求回退 {"agent", "reason"}, 之后会重新路由
+        - tool_call: Agent 调用工具 {"agent", "tool", "args"}
+        - tool_result: 工具执行完成 {"agent", "tool", "actions"}
+        - token: LLM 输出的文本片段 {"agent", "text"}
+        - response: 最终的 AgentResponse (与 /chat/message 的返回格式相同), 流结束
+        - error: 处理出错 {"error"}, 流结束; 被准入控制拒绝时为 {"status", "error", "retry_after"}
+        """
+        data = api.payload or {}
+        user_input = data.get('message', '')
+
+        error = _validate_message(user_input)
+        if error:
+            return {"error": error}, 400
+
+        trace_id = _new_trace_id()
+        return Response(
+            _stream_message(user_input, trace_id),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no', **_trace_headers(trace_id)}
+        )
+
+
+@app.route('/metrics')
+def metrics():
+    """运行指标 (Prometheus 文本格式)"""
+    if not config.METRICS_ENABLED:
+        return Response("metrics disabled\n", status=404, mimetype='text/plain')
+    return Response(render_metrics(), content_type=METRICS_CONTENT_TYPE)
 
-                # 直接路由到指定 Agent（跳过 Supervisor）
-                if parse_result.target_agent == "note_agent":
-                    logger.info("🚀 直接调用 NoteAgent (跳过 Supervisor)...")
-                    agent_response = note_agent.invoke(parse_result.clean_message)
-                    logger.info(f"📤 NoteAgent 返回响应 (前200字): {agent_response.message[:200]}...")
-
-                    # 保存会话历史
-                    session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
-                    session_mgr.add_interaction(
-                        user_id=config.USER_ID,
-                        user_input=user_input,
-                        assistant_response=agent_response.message,
-                        agent_name="note_agent",
-                        async_persist=True
-                    )
-                    logger.info("💾 交互已保存 (标记路由)")
-                    logger.info("=" * 80)
-
-                    # 记录交互日志
-                    _log_interaction(user_input, agent_response.message, start_time, log_data)
-
-                    # 返回完整的结构化响应
-                    return agent_response.to_dict()
-
-            # 2. 检查关键词路由（优先于 Supervisor）
-            keyword_result = KeywordRouter.match(user_input)
-
-            if keyword_result.matched:
-                logger.info(f"🔑 检测到关键词路由")
-                logger.info(f"🎯 目标 Agent: {keyword_result.target_agent}")
-                logger.info(f"📌 匹配的关键词: {', '.join(keyword_result.matched_keywords)}")
-
-                # 记录关键词路由信息
-                log_data.update({
-                    'routing_stage': 'keyword',
-                    'routing_matched': True,
-                    'routing_keywords': json.dumps(keyword_result.matched_keywords, ensure_ascii=False),
-                    'target_agent': keyword_result.target_agent
-                })
 
-                # 直接路由到 calendar_agent
-                if keyword_result.target_agent == "calendar_agent":
-                    logger.info("🚀 直接调用 CalendarAgent (跳过 Supervisor)...")
-                    agent_response = calendar_agent.invoke(keyword_result.original_message)
-                    logger.info(f"📤 CalendarAgent 返回响应 (前200字): {agent_response.message[:200]}...")
+@ns_items.route('')
+class ItemList(Resource):
+    """物品列表接口"""
 
-                    # 检测是否需要回退 (检查 message 字段)
-                    redirect_result = detect_redirect(agent_response.message)
+    @ns_items.doc('list_items')
+    @ns_items.expect(item_list_parser)
+    @ns_items.response(200, 'Success', item_page_model)
+    @ns_items.response(400, 'Bad Request', error_model)
+    @ns_items.response(500, 'Internal Server Error', error_model)
+    def get(self):
+        """分页列出物品
 
-                    if redirect_result.is_redirect:
-                        logger.info(f"🔄 CalendarAgent 请求回退")
-                        logger.info(f"📝 回退原因: {redirect_result.reason}")
-                        logger.info("🔄 重新使用 Supervisor 路由...")
+        按更新时间倒序, 使用游标分页: 将返回的 next_cursor 作为 cursor 参数即可获取下一页。
+        """
+        args = item_list_parser.parse_args()
+        limit = args['limit']
+        if limit is None or not 1 <= limit <= MAX_PAGE_SIZE:
+            return {"error": f"limit 必须在 1 ~ {MAX_PAGE_SIZE} 之间"}, 400
 
-                        # 记录回退信息
-                        log_data.update({
-                            'redirect_occurred': True,
-                            'redirect_reason': redirect_result.reason,
-                            'final_agent': 'supervisor',
-                            'status': 'redirect'
-                        })
+        selected = [name.strip() for name in (args['fields'] or '').split(',') if name.strip()]
 
-                        # 获取会话历史
-                        session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
-                        session_history = session_mgr.get_history(config.USER_ID)
+        try:
+            page = get_database().list_items(
+                user_id=config.USER_ID,
+                limit=limit,
+                cursor=args['cursor'] or None,
+                fields=selected or None
+            )
+        except ValueError as e:
+            return {"error": str(e)}, 400
+        except Exception as e:
+            logger.error(f"❌ 列出物品失败: {e}", exc_info=True)
+            return {"error": str(e)}, 500
 
-                        # 构建带有回退提示的消息
-                        enhanced_message = f"""[系统提示：calendar_agent 已判定此消息不属于日历范畴，原因：{redirect_result.reason}。请从其他可用工具中选择合适的 Agent 处理。]
+        return {
+            "items": page['items'],
+            "count": page['count'],
+            "has_more": page['has_more'],
+            "next_cursor": page['next_cursor']
+        }
 
-{user_input}"""
 
-                        messages = session_history + [
-                            {"role": "user", "content": enhanced_message}
-                        ]
-
-                        # 调用 Supervisor 重新路由
-                        result = supervisor.invoke({"messages": messages})
-
-                        logger.info(f"✓ Supervisor 重新路由完成,消息数量: {len(result.get('messages', []))}")
-
-                        # 提取响应
-                        messages_list = result.get('messages', [])
-                        final_message = messages_list[-1] if messages_list else None
-
-                        if hasattr(final_message, 'content'):
-                            response = final_message.content
-                        else:
-                            response = str(final_message)
-
-                        logger.info(f"📤 Supervisor 返回响应 (前200字): {response[:200]}...")
-
-                        # ⚠️ 保存到会话历史时使用原始消息（不包含系统提示）
-                        session_mgr.add_interaction(
-                            user_id=config.USER_ID,
-                            user_input=user_input,  # 使用原始消息
-                            assistant_response=response,
-                            agent_name="supervisor",  # 标记为 supervisor 处理
-                            async_persist=True
-                        )
-                        logger.info("💾 交互已保存 (回退路由)")
-                        logger.info("=" * 80)
-
-                        # 记录交互日志
-                        _log_interaction(user_input, response, start_time, log_data)
-
-                        # 构造统一的 AgentResponse 格式(回退到 Supervisor)
-                        from core.response_types import Action
-                        supervisor_response = AgentResponse(
-                            success=True,
-                            agent="supervisor",
-                            message=response,
-                            actions=[Action(type="chat_response", data={"text": response})]
-                        )
-                        return supervisor_response.to_dict()
-
-                    # 没有回退，正常处理
-                    log_data.update({'final_agent': 'calendar_agent'})
-
-                    # 保存会话历史
-                    session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
-                    session_mgr.add_interaction(
-                        user_id=config.USER_ID,
-                        user_input=user_input,
-                        assistant_response=agent_response.message,
-                        agent_name="calendar_agent",
-                        async_persist=True
-                    )
-                    logger.info("💾 交互已保存 (关键词路由)")
-                    logger.info("=" * 80)
-
-                    # 记录交互日志
-                    _log_interaction(user_input, agent_response.message, start_time, log_data)
-
-                    return agent_response.to_dict()
-
-            # 3. 没有标记也没有关键词匹配，走正常的 Supervisor 路由
-            logger.info("🔄 未检测到标记和关键词，使用 Supervisor 路由...")
-
-            # 记录 Supervisor 路由信息
-            log_data.update({
-                'routing_stage': 'supervisor',
-                'routing_matched': False,
-                'target_agent': 'supervisor',
-                'final_agent': 'supervisor'
-            })
+@ns_items.route('/batch')
+class ItemBatch(Resource):
+    """物品批量接口"""
 
-            # 获取会话历史管理器
-            session_mgr = get_session_manager(max_history_length=10, refresh_interval=0)
-            user_id = config.USER_ID
+    MAX_BATCH_SIZE = 10000
 
-            # 从内存获取会话历史 (首次会从 Zep 加载)
-            session_history = session_mgr.get_history(user_id)
-            logger.info(f"📚 获取到 {len(session_history)} 条会话历史 (内存缓存)")
+    @ns_items.doc('batch_items')
+    @ns_items.expect(item_batch_request_model)
+    @ns_items.response(200, 'Success', item_batch_response_model)
+    @ns_items.response(400, 'Bad Request', error_model)
+    @ns_items.response(500, 'Internal Server Error', error_model)
+    def post(self):
+        """批量记录/查询物品位置
 
-            # 构建完整的消息列表（会话历史 + 当前输入）
-            messages = session_history + [{"role": "user", "content": user_input}]
+        适用于从清单批量导入物品:
+        - items: 在一个事务内批量记录, 一次提交
+        - queries: 批量查询, 精确匹配合并为一次查询
 
-            logger.info(f"📝 总消息数: {len(messages)} (历史 {len(session_history)} + 当前 1)")
+        两者可同时提供, 先记录后查询。
+        """
+        data = api.payload or {}
+        entries = data.get('items') or []
+        queries = data.get('queries') or []
 
-            # 调用 supervisor 处理（现在有完整上下文）
-            logger.info("🤖 调用 Supervisor Agent 处理请求...")
-            result = supervisor.invoke({
-                "messages": messages
-            })
+        if not entries and not queries:
+            return {"error": "items 和 queries 不能同时为空"}, 400
 
-            logger.info(f"✓ Supervisor 返回结果,消息数量: {len(result.get('messages', []))}")
-
-            # 打印所有消息用于调试
-            messages_list = result.get('messages', [])
-            for i, msg in enumerate(messages_list):
-                msg_type = type(msg).__name__
-                msg_content = getattr(msg, 'content', str(msg))[:100] if hasattr(msg, 'content') else str(msg)[:100]
-                logger.info(f"  消息[{i}] {msg_type}: {msg_content}")
-
-            # 提取响应 - 检查是否有 ToolMessage（子 agent 调用）
-            from langchain_core.messages import ToolMessage
-            from core.response_types import Action
-
-            messages_result = result.get("messages", [])
-            agent_data = None  # 用于存储从 ToolMessage 解析的数据
-            response_text = ""
-            actual_agent_name = "supervisor"  # 默认值
-
-            # 查找 ToolMessage（说明 Supervisor 调用了子 agent）
-            tool_message = None
-            for msg in messages_result:
-                if isinstance(msg, ToolMessage):
-                    tool_message = msg
-                    logger.info(f"🎯 找到 ToolMessage: {msg.content[:100]}...")
-                    break
-
-            if tool_message:
-                # 透传模式：解析子 agent 返回的完整数据
-                try:
-                    agent_data = json.loads(tool_message.content)
-                    actual_agent_name = agent_data.get("agent", "supervisor")
-                    response_text = agent_data.get("message", "")
-                    logger.info(f"✅ 透传子 agent 响应: agent={actual_agent_name}")
-                    logger.info(f"📤 返回响应 (前200字): {response_text[:200]}...")
-                except json.JSONDecodeError:
-                    # 如果不是 JSON，回退到文本提取
-                    response_text = tool_message.content
-                    logger.warning("⚠️  ToolMessage.content 不是 JSON 格式，使用文本模式")
-            else:
-                # Supervisor 自处理模式：从 AIMessage 提取文本
-                logger.info("💬 Supervisor 自处理对话（未调用子 agent）")
-                for msg in reversed(messages_result):
-                    content = getattr(msg, 'content', '')
-                    if content and content.strip():
-                        response_text = content
-                        logger.info(f"从 {type(msg).__name__} 提取到响应: '{response_text[:100]}...'")
-                        break
-
-                if not response_text:
-                    response_text = "抱歉,我无法处理这个请求"
-                    logger.info("所有消息的 content 都为空")
-
-            # 更新会话历史
-            session_mgr.add_interaction(
-                user_id=user_id,
-                user_input=user_input,
-                assistant_response=response_text,
-                agent_name=actual_agent_name,  # 使用真实的 agent 名称
-                async_persist=True
-            )
-            logger.info(f"💾 交互已保存: agent={actual_agent_name}")
-            logger.info("=" * 80)
+        if len(entries) > self.MAX_BATCH_SIZE or len(queries) > self.MAX_BATCH_SIZE:
+            return {"error": f"单次最多支持 {self.MAX_BATCH_SIZE} 条"}, 400
 
-            # 记录交互日志
-            _log_interaction(user_input, response_text, start_time, log_data)
-
-            # 构造 AgentResponse
-            if agent_data:
-                # 透传模式：使用子 agent 返回的完整数据
-                actions = [
-                    Action(type=a["type"], data=a["data"])
-                    for a in agent_data.get("actions", [])
-                ]
-                supervisor_response = AgentResponse(
-                    success=agent_data.get("success", True),
-                    agent=actual_agent_name,
-                    message=response_text,
-                    actions=actions
-                )
-            else:
-                # Supervisor 自处理模式：构造简单响应
-                supervisor_response = AgentResponse(
-                    success=True,
-                    agent="supervisor",
-                    message=response_text,
-                    actions=[Action(type="chat_response", data={"text": response_text})]
-                )
+        for index, entry in enumerate(entries):
+            if not isinstance(entry, dict) or not entry.get('item') or not entry.get('location'):
+                return {"error": f"items[{index}] 缺少 item 或 location"}, 400
 
-            return supervisor_response.to_dict()
+        if not all(isinstance(name, str) and name for name in queries):
+            return {"error": "queries 必须是非空字符串列表"}, 400
 
-        except Exception as e:
-            logger.error("=" * 80)
-            logger.error(f"❌ 处理请求时出错: {e}")
-            logger.error("详细错误信息:", exc_info=True)
-            logger.error("=" * 80)
+        try:
+            db = get_database()
+            remembered = db.remember_items(entries, user_id=config.USER_ID) if entries else []
+            queried = db.query_items(queries, user_id=config.USER_ID) if queries else []
 
-            # 记录错误日志
-            log_data.update({
-                'status': 'error',
-                'error_message': str(e)
-            })
-            error_response = f"处理请求时出错: {str(e)}"
-            _log_interaction(user_input if 'user_input' in locals() else '', error_response, start_time, log_data)
+            logger.info(f"📦 批量物品操作: 记录 {len(remembered)} 条, 查询 {len(queried)} 条")
 
+            return {
+                "remembered": remembered,
+                "queried": queried,
+                "remembered_count": len(remembered),
+                "queried_count": len(queried)
+            }
+        except Exception as e:
+            logger.error(f"❌ 批量物品操作失败: {e}", exc_info=True)
             return {"error": str(e)}, 500
 
 
@@ -633,6 +1321,81 @@ class Health(Resource):
         }
 
 
+@ns_system.route('/snapshot')
+class Snapshot(Resource):
+    """在线快照"""
+
+    @ns_system.doc('create_snapshot')
+    @ns_system.response(200, 'Success', snapshot_model)
+    @ns_system.response(409, '已有快照任务正在执行', error_model)
+    @ns_system.response(500, 'Internal Server Error', error_model)
+    def post(self):
+        """导出所有本地存储的快照
+
+        服务运行中通过 SQLite 在线备份 API 导出物品、笔记、交互日志数据库和 Qdrant 本地存储,
+        打包为一个带 manifest.json 的 tar.gz, 写入 SNAPSHOT_DIR。
+        """
+        try:
+            result = create_snapshot()
+            logger.info(f"💾 快照完成: {result['archive']} ({result['bytes']} 字节, {result['seconds']}s)")
+            return result
+        except SnapshotInProgressError as e:
+            return {"error": str(e)}, 409
+        except Exception as e:
+            logger.error(f"❌ 快照失败: {e}", exc_info=True)
+            return {"error": str(e)}, 500
+
+
+@ns_system.route('/cache')
+class CacheStats(Resource):
+    """响应缓存统计"""
+
+    @ns_system.doc('get_cache_stats')
+    @ns_system.response(200, 'Success', cache_stats_model)
+    def get(self):
+        """获取 Agent 响应缓存的命中/未命中统计"""
+        cache = get_response_cache()
+        if cache is None:
+            return {"enabled": False}
+        return {"enabled": True, **cache.stats()}
+
+
+@ns_system.route('/admission')
+class AdmissionStats(Resource):
+    """准入控制统计"""
+
+    @ns_system.doc('get_admission_stats')
+    @ns_system.response(200, 'Success', admission_stats_model)
+    def get(self):
+        """获取每个 Agent 的执行数、排队深度、排队时间和拒绝次数, 以及 Zep 写入积压"""
+        controller = get_admission_controller()
+        return {
+            "enabled": controller is not None,
+            "agents": controller.stats() if controller else {},
+            "zep_persist": get_session_manager(max_history_length=10, refresh_interval=0).persist_stats()
+        }
+
+
+@ns_system.route('/traces/<string:trace_id>')
+@ns_system.param('trace_id', '追踪 ID (对话接口的 X-Trace-Id 响应头)')
+class TraceDetail(Resource):
+    """请求链路追踪"""
+
+    @ns_system.doc('get_trace')
+    @ns_system.response(200, 'Success', trace_model)
+    @ns_system.response(404, 'Not Found', error_model)
+    def get(self, trace_id):
+        """获取一次对话请求的 span 树
+
+        记录标记解析、关键词路由、会话历史加载、Supervisor / 子 Agent 的 LLM 调用、
+        工具执行 (数据库查询、向量检索、CalDAV 等) 和交互日志写入各自的耗时。
+        """
+        trace = get_interaction_logger().get_trace(trace_id)
+        if trace is None:
+            return {"error": f"追踪不存在: {trace_id}"}, 404
+        return trace
+
+
 @ns_system.route('/config')
 class Config(Resource):
     """配置信息"""
@@ -727,8 +1490,49 @@ def main():
     logger.info("按 Ctrl+C 停止服务")
     logger.info("=" * 60)
 
+    # 后台数据库维护 (历史归档 + 软删除清理 + 空闲页回收)
+    if config.MAINTENANCE_ENABLED:
+        from core.item_maintenance import get_maintenance_scheduler
+        get_maintenance_scheduler().start()
+
+    if config.SERVER_MODE == 'asgi':
+        _run_asgi(host, port)
+        return
+
+    # 加载本地意图分类器模型和回退预判过滤器, 初始化响应缓存和准入控制
+    get_intent_classifier()
+    get_redirect_filter()
+    get_response_cache()
+    get_admission_controller()
+
     app.run(host=host, port=port, debug=False)
 
 
+def _run_asgi(host: str, port: int) -> None:
+    """使用 uvicorn 启动 ASGI 服务 (asgi_app), worker 数量见 config.SERVER_WORKERS
+
+    每个 worker 是独立进程, 启动时各自加载分类器和响应缓存 (asgi_app.lifespan);
+    后台数据库维护只在当前进程运行一份。其他 worker 新建/删除的物品在查询时
+    同步到物品别名索引 (见 ItemDatabase._get_alias_index); /metrics 的指标按进程统计, 不会跨 worker 汇总。
+    """
+    try:
+        import uvicorn
+        import asgi_app  # noqa: F401  提前检查 starlette / a2wsgi 是否安装
+    except ImportError as e:
+        logger.error(f"❌ ASGI 模式缺少依赖: {e}")
+        logger.error("提示: uv sync --extra asgi (或 pip install starlette uvicorn a2wsgi)")
+        sys.exit(1)
+
+    workers = max(1, config.SERVER_WORKERS)
+    logger.info(f"🚀 ASGI 模式: uvicorn, {workers} 个 worker")
+    if workers == 1:
+        uvicorn.run(asgi_app.app, host=host, port=port)
+    else:
+        if config.METRICS_ENABLED:
+            logger.warning(f"⚠️  /metrics 按进程统计, {workers} 个 worker 时每次抓取只返回其中一个的数值")
+        # 多进程时 uvicorn 需要以导入路径加载应用
+        uvicorn.run("asgi_app:app", host=host, port=port, workers=workers)
+
+
 if __name__ == "__main__":
     main()
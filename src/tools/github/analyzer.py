@@ -4,9 +4,8 @@ import requests
 from typing import Dict, Optional, Any
 from urllib.parse import urlparse
 
-from langchain_openai import ChatOpenAI
-
 from config import Config
+from core.llm_factory import get_chat_model
 from core.logger import logger
 
 
@@ -15,11 +14,11 @@ class GitHubAnalyzer:
 
     def __init__(self, config: Config):
         self.config = config
-        self.llm = ChatOpenAI(
-            model=config.AGENT_MODEL,
+        self.llm = get_chat_model(
+            config.AGENT_MODEL,
+            temperature=0,
             base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            temperature=0
+            api_key=config.OPENAI_API_KEY
         )
 
     def _extract_repo_info(self, url: str) -> Optional[Dict[str, Any]]:
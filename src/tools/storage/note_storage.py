@@ -55,6 +55,7 @@ class NoteStorage:
         self._db_path: Optional[Path] = None
         self._conn: Optional[sqlite3.Connection] = None
         self._qdrant_client: Optional[QdrantClient] = None
+        self._write_version = 0  # 本实例提交的写入次数 (数据版本的一部分)
 
     def _ensure_initialized(self):
         """确保存储已初始化"""
@@ -131,6 +132,15 @@ class NoteStorage:
                 )
             )
 
+    def data_version(self) -> str:
+        """数据版本戳, 每次保存/删除笔记后都会改变 (用于响应缓存的键)
+
+        由本实例的写入计数和 SQLite 的 PRAGMA data_version (其他连接的写入) 组成。
+        """
+        self._ensure_initialized()
+        external = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return f"{self._write_version}.{external}"
+
     def save_note(
         self,
         note_id: str,
@@ -163,6 +173,7 @@ class NoteStorage:
             now
         ))
         self._conn.commit()
+        self._write_version += 1
 
         # 保存向量到 Qdrant（如果可用）
         if vector and self._qdrant_client:
@@ -344,6 +355,7 @@ class NoteStorage:
         cursor = self._conn.cursor()
         cursor.execute("DELETE FROM notes WHERE id = ?", (note_id,))
         self._conn.commit()
+        self._write_version += 1
 
         # 从 Qdrant 删除
         try:
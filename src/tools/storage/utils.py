@@ -2,12 +2,14 @@
 import hashlib
 import json
 import uuid
+import time
 from typing import List
 
-from langchain_openai import ChatOpenAI, OpenAIEmbeddings
-
 from config import Config
+from core.llm_factory import get_chat_model, get_embeddings
 from core.logger import logger
+from core.metrics import EMBEDDING_SECONDS
+from core.tracing import span
 
 
 class NoteUtils:
@@ -15,14 +17,14 @@ class NoteUtils:
 
     def __init__(self, config: Config):
         self.config = config
-        self.llm = ChatOpenAI(
-            model=config.AGENT_MODEL,
+        self.llm = get_chat_model(
+            config.AGENT_MODEL,
+            temperature=0,
             base_url=config.OPENAI_API_BASE,
-            api_key=config.OPENAI_API_KEY,
-            temperature=0
+            api_key=config.OPENAI_API_KEY
         )
-        self.embeddings = OpenAIEmbeddings(
-            model=config.EMBEDDING_MODEL,
+        self.embeddings = get_embeddings(
+            config.EMBEDDING_MODEL,
             base_url=config.OPENAI_API_BASE,
             api_key=config.OPENAI_API_KEY
         )
@@ -91,10 +93,14 @@ class NoteUtils:
         Returns:
             嵌入向量
         """
+        start = time.perf_counter()
         try:
-            vector = self.embeddings.embed_query(text)
+            with span("embedding", chars=len(text)):
+                vector = self.embeddings.embed_query(text)
+            EMBEDDING_SECONDS.observe(time.perf_counter() - start, "success")
             return vector
         except Exception as e:
+            EMBEDDING_SECONDS.observe(time.perf_counter() - start, "error")
             logger.error(f"[笔记工具] 生成向量失败: {e}")
             return []
 